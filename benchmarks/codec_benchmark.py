@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Codec microbenchmark for Citi Bikes Real-Time Streaming Project
+
+Measures the per-message encode and decode cost of every available codec on
+GBFS station records, plus the cost of decoding the whole feed document.
+
+Usage:
+    python benchmarks/codec_benchmark.py                       # live station_status feed
+    python benchmarks/codec_benchmark.py --file station_status.json
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.serialization.codec import CODECS, JsonCodec
+from src.utils.constants.routes import BIKES_STATION_STATUS
+
+
+def load_feed(url: str = None, file_path: str = None) -> bytes:
+    """Load a raw GBFS feed document from a file or URL"""
+    if file_path:
+        return Path(file_path).read_bytes()
+    
+    from src.utils.services.http_service import HttpService
+    with HttpService() as http_service:
+        return http_service.get(url).content
+
+
+def time_per_call(func, items, repeat: int) -> float:
+    """Return the best average time per item in nanoseconds over several rounds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for item in items:
+            func(item)
+        elapsed = (time.perf_counter_ns() - start) / len(items)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmark(document: bytes, repeat: int = 5) -> list:
+    """Benchmark every importable codec against one feed document"""
+    stations = JsonCodec().decode(document)['data']['stations']
+    results = []
+    
+    for name, codec_class in CODECS.items():
+        try:
+            codec = codec_class()
+        except ImportError:
+            print(f"Skipping {name}: not installed")
+            continue
+        
+        encoded = [codec.encode(station) for station in stations]
+        results.append({
+            'codec': name,
+            'stations': len(stations),
+            'encode_ns': time_per_call(codec.encode, stations, repeat),
+            'decode_ns': time_per_call(codec.decode, encoded, repeat),
+            'avg_bytes': sum(len(payload) for payload in encoded) / len(encoded),
+            'document_ms': time_per_call(codec.decode, [document], repeat) / 1e6
+        })
+    
+    return results
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Codec microbenchmark on GBFS station payloads")
+    parser.add_argument("--url", default=BIKES_STATION_STATUS, help="GBFS feed URL to download")
+    parser.add_argument("--file", help="Read the feed from a saved JSON file instead of the URL")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per measurement (best is kept)")
+    args = parser.parse_args()
+    
+    document = load_feed(args.url, args.file)
+    results = run_benchmark(document, args.repeat)
+    
+    print(f"{'codec':<8} {'stations':>8} {'encode ns/msg':>14} {'decode ns/msg':>14} {'bytes/msg':>10} {'feed decode ms':>15}")
+    for result in results:
+        print(
+            f"{result['codec']:<8} {result['stations']:>8} {result['encode_ns']:>14.0f} "
+            f"{result['decode_ns']:>14.0f} {result['avg_bytes']:>10.1f} {result['document_ms']:>15.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,487 @@
+"""
+Local stand-ins for the GBFS API and the Kafka broker
+
+FakeGbfsServer serves synthetic Citi Bike feeds of any size from a local HTTP
+server, with a configurable share of stations changing between snapshots.
+InMemoryBroker keeps topics in process memory and hands out KafkaProducer and
+KafkaConsumer replacements, so Bikes, Producer and Consumer run unchanged
+through their real serialization, batching and polling code.
+
+Usage:
+    with FakeGbfsServer(stations=10000, change_rate=0.1) as server, in_memory_kafka() as broker:
+        bikes = Bikes()
+        bikes.process_feed(server.feed("station_status"))
+        broker.highwater(TopicPartition(BIKES_STATION_STATUS_TOPIC, 0))
+"""
+
+import random
+import threading
+import time
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from kafka.consumer.fetcher import ConsumerRecord
+from kafka.structs import OffsetAndMetadata, TopicPartition
+from src.core.bikes_module.feeds import GbfsFeed
+from src.utils.constants.topics import BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC
+from src.utils.serialization.codec import get_codec
+
+# Same fields as kafka-python's RecordMetadata that the pipeline reads
+RecordMetadata = namedtuple('RecordMetadata', ['topic', 'partition', 'offset', 'timestamp'])
+
+FEED_TOPICS = {
+    'station_information': BIKES_STATION_INFORMATION_TOPIC,
+    'station_status': BIKES_STATION_STATUS_TOPIC
+}
+
+
+class SyntheticGbfsFeeds:
+    def __init__(self, stations: int = 1000, change_rate: float = 0.1, seed: int = 7):
+        """
+        Initialize synthetic station_information and station_status documents
+        
+        Args:
+            stations (int): Number of stations in every snapshot
+            change_rate (float): Share of stations whose status changes per snapshot
+            seed (int): Random seed, so runs publish the same data
+        """
+        self.change_rate = change_rate
+        self.codec = get_codec('json')
+        self.rng = random.Random(seed)
+        self.version = 0
+        self.last_updated = int(time.time())
+        self.information = []
+        self.status = []
+        for index in range(stations):
+            station_id = f"66db{index:04x}-0aca-11e7-82f6-3863bb44ef7c"
+            capacity = self.rng.randint(15, 60)
+            bikes = self.rng.randint(0, capacity)
+            self.information.append({
+                'station_id': station_id,
+                'name': f"Station {index}",
+                'short_name': f"{5000 + index}.{index % 10}0",
+                'lat': round(40.70 + self.rng.random() * 0.15, 6),
+                'lon': round(-74.02 + self.rng.random() * 0.12, 6),
+                'region_id': str(71 + index % 3),
+                'capacity': capacity,
+                'rental_methods': ['KEY', 'CREDITCARD']
+            })
+            self.status.append({
+                'station_id': station_id,
+                'num_bikes_available': bikes,
+                'num_ebikes_available': self.rng.randint(0, bikes),
+                'num_bikes_disabled': 0,
+                'num_docks_available': capacity - bikes,
+                'num_docks_disabled': 0,
+                'is_installed': 1,
+                'is_renting': 1,
+                'is_returning': 1,
+                'last_reported': self.last_updated,
+                'legacy_id': str(index)
+            })
+        self.documents: Dict[str, bytes] = {}
+        self.encode()
+    
+    def advance(self) -> int:
+        """
+        Publish the next snapshot, changing change_rate of the station statuses
+        
+        Returns:
+            int: Number of stations that changed
+        """
+        self.version += 1
+        self.last_updated += 1
+        changed = self.rng.sample(range(len(self.status)), int(len(self.status) * self.change_rate))
+        for index in changed:
+            station = self.status[index]
+            capacity = station['num_bikes_available'] + station['num_docks_available']
+            bikes = (station['num_bikes_available'] + self.rng.randint(1, capacity)) % (capacity + 1)
+            station.update(num_bikes_available=bikes, num_ebikes_available=min(station['num_ebikes_available'], bikes),
+                           num_docks_available=capacity - bikes, last_reported=self.last_updated)
+        self.encode()
+        return len(changed)
+    
+    def encode(self):
+        """
+        Encode the current records once, so serving them costs no CPU in the measurement
+        
+        Call it after editing information or status records directly.
+        """
+        for name, records in (('station_information', self.information), ('station_status', self.status)):
+            self.documents[name] = self.codec.encode({
+                'last_updated': self.last_updated,
+                'ttl': 0,
+                'version': '2.3',
+                'data': {'stations': records}
+            })
+
+
+class FakeGbfsServer:
+    def __init__(self, stations: int = 1000, change_rate: float = 0.1, seed: int = 7, port: int = 0):
+        """
+        Initialize a local HTTP server serving synthetic GBFS feeds
+        
+        Feeds are served at /gbfs/en/<feed>.json with an ETag per snapshot, so
+        conditional requests get a 304 until advance() is called.
+        
+        Args:
+            stations (int): Number of stations in every snapshot
+            change_rate (float): Share of stations whose status changes per snapshot
+            seed (int): Random seed of the synthetic data
+            port (int): Port to listen on, 0 for any free port
+        """
+        self.feeds = SyntheticGbfsFeeds(stations, change_rate, seed)
+        self.port = port
+        self.requests = 0
+        self.server = None
+        self._thread = None
+    
+    @property
+    def url(self) -> str:
+        """Base URL of the server"""
+        return f"http://127.0.0.1:{self.port}"
+    
+    def feed(self, name: str, topic: Optional[str] = None) -> GbfsFeed:
+        """
+        Describe one served feed for Bikes.process_feed
+        
+        Args:
+            name (str): 'station_information' or 'station_status'
+            topic (Optional[str]): Topic to publish to, the pipeline topic by default
+        
+        Returns:
+            GbfsFeed: Feed pointing at this server
+        """
+        return GbfsFeed(f"bikes_{name}", f"{self.url}/gbfs/en/{name}.json", topic or FEED_TOPICS[name],
+                        track_changes=name == 'station_status')
+    
+    def advance(self) -> int:
+        """Publish the next snapshot and return the number of changed stations"""
+        return self.feeds.advance()
+    
+    def start(self) -> "FakeGbfsServer":
+        """Start serving in a background thread"""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_GET(self):
+                server.requests += 1
+                name = self.path.split('?')[0].rsplit('/', 1)[-1][:-len('.json')]
+                body = server.feeds.documents.get(name)
+                if body is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{server.feeds.version}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-gbfs", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop serving"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class _CompletedFuture:
+    """Already resolved send future with the callback API of kafka-python's FutureRecordMetadata"""
+    
+    def __init__(self, value=None, exception: Optional[Exception] = None):
+        self.value = value
+        self.exception = exception
+    
+    def add_callback(self, f, *args, **kwargs):
+        if self.exception is None:
+            f(*args, self.value, **kwargs)
+        return self
+    
+    def add_errback(self, f, *args, **kwargs):
+        if self.exception is not None:
+            f(*args, self.exception, **kwargs)
+        return self
+    
+    def get(self, timeout: Optional[float] = None):
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+    
+    def is_done(self) -> bool:
+        return True
+
+
+def _serialize(serializer, topic: str, data: Any) -> Optional[bytes]:
+    """Apply a kafka-python serializer, which is either a Serializer object or a plain callable"""
+    if serializer is None:
+        return data
+    if hasattr(serializer, 'serialize'):
+        return serializer.serialize(topic, data)
+    return serializer(data)
+
+
+def _deserialize(deserializer, topic: str, data: Optional[bytes]) -> Any:
+    """Apply a kafka-python deserializer, which is either a Deserializer object or a plain callable"""
+    if deserializer is None:
+        return data
+    if hasattr(deserializer, 'deserialize'):
+        return deserializer.deserialize(topic, data)
+    return deserializer(data)
+
+
+class InMemoryBroker:
+    def __init__(self, partitions: int = 6):
+        """
+        Initialize a single-node broker that keeps every topic in memory
+        
+        Records are stored serialized, exactly as a real broker receives them, and
+        committed offsets are kept per consumer group.
+        
+        Args:
+            partitions (int): Partitions of every topic, created on first use
+        """
+        self.partitions = partitions
+        self.logs: Dict[str, List[List[tuple]]] = {}
+        self.group_offsets: Dict[str, Dict[TopicPartition, int]] = {}
+        self._round_robin = 0
+        self._appended = threading.Condition()
+    
+    def _topic(self, topic: str) -> List[List[tuple]]:
+        if topic not in self.logs:
+            self.logs[topic] = [[] for _ in range(self.partitions)]
+        return self.logs[topic]
+    
+    def append(self, topic: str, key: Optional[bytes], value: Optional[bytes]) -> RecordMetadata:
+        """
+        Append one serialized record
+        
+        Keyed records always go to the same partition; records without a key are
+        spread round robin.
+        
+        Args:
+            topic (str): Topic name
+            key (Optional[bytes]): Serialized key
+            value (Optional[bytes]): Serialized value, None for a tombstone
+        
+        Returns:
+            RecordMetadata: Partition and offset of the record
+        """
+        timestamp = int(time.time() * 1000)
+        with self._appended:
+            if key is None:
+                partition = self._round_robin % self.partitions
+                self._round_robin += 1
+            else:
+                partition = zlib.crc32(key) % self.partitions
+            log = self._topic(topic)[partition]
+            log.append((key, value, timestamp))
+            self._appended.notify_all()
+        return RecordMetadata(topic, partition, len(log) - 1, timestamp)
+    
+    def fetch(self, tp: TopicPartition, offset: int, max_records: int) -> List[tuple]:
+        """Return up to max_records (offset, key, value, timestamp) entries from an offset"""
+        log = self._topic(tp.topic)[tp.partition]
+        return [(position, *log[position]) for position in range(offset, min(len(log), offset + max_records))]
+    
+    def highwater(self, tp: TopicPartition) -> int:
+        """Offset the next record of a partition will get"""
+        return len(self._topic(tp.topic)[tp.partition])
+    
+    def wait_for_records(self, timeout: float):
+        """Block until a record is appended or the timeout passes"""
+        with self._appended:
+            self._appended.wait(timeout)
+    
+    def record_count(self, topic: str) -> int:
+        """Number of records in all partitions of a topic"""
+        return sum(len(log) for log in self._topic(topic))
+    
+    def producer(self, **configs) -> "InMemoryKafkaProducer":
+        """Create a KafkaProducer replacement writing to this broker"""
+        return InMemoryKafkaProducer(self, **configs)
+    
+    def consumer(self, *topics, **configs) -> "InMemoryKafkaConsumer":
+        """Create a KafkaConsumer replacement reading from this broker"""
+        return InMemoryKafkaConsumer(self, *topics, **configs)
+
+
+class InMemoryKafkaProducer:
+    """KafkaProducer replacement that appends to an InMemoryBroker and acknowledges immediately"""
+    
+    def __init__(self, broker: InMemoryBroker, **configs):
+        self.broker = broker
+        self.configs = configs
+        self.value_serializer = configs.get('value_serializer')
+        self.key_serializer = configs.get('key_serializer')
+        self.sent = 0
+    
+    def send(self, topic: str, value: Any = None, key: Any = None, headers=None, partition=None,
+             timestamp_ms=None) -> _CompletedFuture:
+        try:
+            record_metadata = self.broker.append(
+                topic,
+                _serialize(self.key_serializer, topic, key),
+                _serialize(self.value_serializer, topic, value)
+            )
+        except Exception as e:
+            return _CompletedFuture(exception=e)
+        self.sent += 1
+        return _CompletedFuture(record_metadata)
+    
+    def flush(self, timeout: Optional[float] = None):
+        pass
+    
+    def close(self, timeout: Optional[float] = None):
+        pass
+
+
+class InMemoryKafkaConsumer:
+    """KafkaConsumer replacement reading from an InMemoryBroker as the only member of its group"""
+    
+    def __init__(self, broker: InMemoryBroker, *topics, **configs):
+        self.broker = broker
+        self.configs = configs
+        self.group_id = configs.get('group_id')
+        self.value_deserializer = configs.get('value_deserializer')
+        self.key_deserializer = configs.get('key_deserializer')
+        self.max_poll_records = configs.get('max_poll_records', 500)
+        self.auto_offset_reset = configs.get('auto_offset_reset', 'latest')
+        self.enable_auto_commit = configs.get('enable_auto_commit', True)
+        self._positions: Dict[TopicPartition, int] = {}
+        self._listener = None
+        if topics:
+            self.subscribe(list(topics))
+    
+    def _committed(self) -> Dict[TopicPartition, int]:
+        return self.broker.group_offsets.setdefault(self.group_id, {})
+    
+    def subscribe(self, topics: List[str], listener=None):
+        self._listener = listener
+        self.assign([TopicPartition(topic, partition) for topic in topics
+                     for partition in range(self.broker.partitions)])
+        if listener:
+            listener.on_partitions_assigned(list(self._positions))
+    
+    def assign(self, partitions: List[TopicPartition]):
+        self._positions = {}
+        for tp in partitions:
+            committed = self._committed().get(tp)
+            if committed is None:
+                committed = 0 if self.auto_offset_reset == 'earliest' else self.broker.highwater(tp)
+            self._positions[tp] = committed
+    
+    def assignment(self):
+        return set(self._positions)
+    
+    def partitions_for_topic(self, topic: str):
+        return set(range(self.broker.partitions))
+    
+    def poll(self, timeout_ms: int = 0, max_records: Optional[int] = None) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        deadline = time.monotonic() + timeout_ms / 1000
+        max_records = max_records or self.max_poll_records
+        while True:
+            batches = {}
+            remaining = max_records
+            for tp, position in self._positions.items():
+                if remaining <= 0:
+                    break
+                entries = self.broker.fetch(tp, position, remaining)
+                if not entries:
+                    continue
+                batches[tp] = [
+                    ConsumerRecord(tp.topic, tp.partition, offset, timestamp, 0,
+                                   _deserialize(self.key_deserializer, tp.topic, key),
+                                   _deserialize(self.value_deserializer, tp.topic, value),
+                                   [], None, len(key or b''), len(value or b''), -1)
+                    for offset, key, value, timestamp in entries
+                ]
+                self._positions[tp] = entries[-1][0] + 1
+                remaining -= len(entries)
+            if batches:
+                if self.enable_auto_commit:
+                    self._committed().update(self._positions)
+                return batches
+            
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                return {}
+            self.broker.wait_for_records(min(wait, 0.05))
+    
+    def highwater(self, tp: TopicPartition) -> int:
+        return self.broker.highwater(tp)
+    
+    def end_offsets(self, partitions: List[TopicPartition]) -> Dict[TopicPartition, int]:
+        return {tp: self.broker.highwater(tp) for tp in partitions}
+    
+    def position(self, tp: TopicPartition) -> int:
+        return self._positions[tp]
+    
+    def seek(self, tp: TopicPartition, offset: int):
+        self._positions[tp] = offset
+    
+    def seek_to_beginning(self, *partitions):
+        for tp in partitions or list(self._positions):
+            self._positions[tp] = 0
+    
+    def committed(self, tp: TopicPartition) -> Optional[int]:
+        return self._committed().get(tp)
+    
+    def commit(self, offsets: Optional[Dict[TopicPartition, OffsetAndMetadata]] = None):
+        if offsets is None:
+            self._committed().update(self._positions)
+        else:
+            self._committed().update({tp: offset.offset for tp, offset in offsets.items()})
+    
+    def unsubscribe(self):
+        self._positions = {}
+    
+    def close(self, autocommit: bool = True):
+        if autocommit and self.enable_auto_commit:
+            self._committed().update(self._positions)
+
+
+@contextmanager
+def in_memory_kafka(broker: Optional[InMemoryBroker] = None):
+    """
+    Route every Producer and Consumer created inside the block to an in-memory broker
+    
+    Args:
+        broker (Optional[InMemoryBroker]): Broker to use, a new one by default
+    
+    Yields:
+        InMemoryBroker: The broker
+    """
+    broker = broker or InMemoryBroker()
+    with patch('src.streaming.kafka_producer.producer.KafkaProducer', broker.producer), \
+            patch('src.streaming.kafka_consumer.consumer.KafkaConsumer', broker.consumer):
+        yield broker
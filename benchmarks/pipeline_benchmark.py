@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark for Citi Bikes Real-Time Streaming Project
+
+Runs Bikes, Producer and Consumer against a local fake GBFS server and an
+in-memory Kafka broker, so results depend only on the code and the machine.
+Every scenario polls a synthetic station_status feed of a given size and change
+rate while a consumer reads the topic, and reports poll latency split into fetch,
+parse and publish, producer and consumer throughput, end-to-end latency from
+broker append to consumer, and peak memory of one poll.
+
+Results are saved as JSON together with the git commit, so two runs can be
+compared with --compare; metrics that got worse by more than --threshold percent
+are flagged and the script exits with 1.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py                                   # 1k and 10k stations
+    python benchmarks/pipeline_benchmark.py --stations 1000 100000 --change-rates 0.01 0.5
+    python benchmarks/pipeline_benchmark.py --compare benchmarks/results/pipeline-<commit>.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.fake_services import FakeGbfsServer, InMemoryBroker, in_memory_kafka
+from benchmarks.producer_benchmark import percentile
+from src.core.bikes_module.bikes import Bikes
+from src.streaming.kafka_consumer.consumer import Consumer
+
+RESULTS_DIRECTORY = PROJECT_ROOT / "benchmarks" / "results"
+
+# Metrics compared between runs and whether a higher value is better
+COMPARED_METRICS = {
+    'poll_p50_ms': False,
+    'poll_p99_ms': False,
+    'fetch_ms': False,
+    'parse_ms': False,
+    'publish_ms': False,
+    'publish_records_per_second': True,
+    'consume_records_per_second': True,
+    'e2e_p50_ms': False,
+    'e2e_p99_ms': False,
+    'peak_poll_memory_mb': False
+}
+
+
+def mean_ms(reports: List[Dict[str, Any]], key: str) -> float:
+    """Average of a per-poll report timing in milliseconds"""
+    values = [report[key] for report in reports if key in report]
+    return statistics.fmean(values) * 1000 if values else 0.0
+
+
+def follow_topic(consumer: Consumer, stop_event: threading.Event, latencies: List[float]):
+    """Consume until stopped, recording the time from broker append to consumption in ms"""
+    while not stop_event.is_set():
+        batches = consumer.poll_batches(timeout_ms=50)
+        if not batches:
+            continue
+        now_ms = time.time() * 1000
+        for records in batches.values():
+            latencies.extend(now_ms - record.timestamp for record in records)
+        consumer.commit(batches)
+
+
+def replay_topic(topic: str, expected: int, timeout: float = 60.0) -> float:
+    """Read a topic from the beginning with a new group and return the records per second"""
+    consumer = Consumer("pipeline-benchmark-replay", enable_auto_commit=False)
+    try:
+        consumer.subscribe_to_topics([topic])
+        consumed = 0
+        start = time.perf_counter()
+        while consumed < expected and time.perf_counter() - start < timeout:
+            batches = consumer.poll_batches(timeout_ms=100)
+            consumed += sum(len(records) for records in batches.values())
+            consumer.commit(batches)
+        elapsed = time.perf_counter() - start
+    finally:
+        consumer.close()
+    return consumed / elapsed if elapsed else 0.0
+
+
+def run_scenario(stations: int, change_rate: float, polls: int, codec: Optional[str] = None,
+                 columnar: bool = False, streaming: bool = False) -> Dict[str, Any]:
+    """
+    Benchmark one feed size and change rate end to end
+    
+    Args:
+        stations (int): Stations in the synthetic feed
+        change_rate (float): Share of stations changing between two polls
+        polls (int): Timed polls after the initial full snapshot
+        codec (Optional[str]): JSON codec of Bikes, orjson by default
+        columnar (bool): Diff stations with the NumPy StationSnapshot
+        streaming (bool): Parse the feed incrementally while downloading
+    
+    Returns:
+        Dict[str, Any]: Scenario parameters and measurements
+    """
+    broker = InMemoryBroker()
+    latencies: List[float] = []
+    stop_event = threading.Event()
+    
+    with FakeGbfsServer(stations=stations, change_rate=change_rate) as server, in_memory_kafka(broker):
+        feed = server.feed("station_status")
+        bikes = Bikes(codec=codec, columnar=columnar, streaming=streaming)
+        consumer = Consumer("pipeline-benchmark", enable_auto_commit=False)
+        consumer.subscribe_to_topics([feed.topic])
+        follower = threading.Thread(target=follow_topic, args=(consumer, stop_event, latencies), daemon=True)
+        follower.start()
+        
+        try:
+            # The first poll publishes the full snapshot and warms up connections
+            bikes.process_feed(feed)
+            
+            reports, poll_seconds = [], []
+            for _ in range(polls):
+                server.advance()
+                start = time.perf_counter()
+                reports.append(bikes.process_feed(feed))
+                poll_seconds.append(time.perf_counter() - start)
+            
+            server.advance()
+            tracemalloc.start()
+            bikes.process_feed(feed)
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            
+            published = broker.record_count(feed.topic)
+            deadline = time.monotonic() + 30
+            while len(latencies) < published and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            stop_event.set()
+            follower.join(timeout=5)
+            consumer.close()
+            bikes.close()
+        
+        consume_rate = replay_topic(feed.topic, published)
+    
+    records = sum(report['records'] for report in reports)
+    publish_seconds = sum(report['publish_seconds'] for report in reports)
+    poll_seconds.sort()
+    latencies.sort()
+    return {
+        'name': f"stations={stations} change_rate={change_rate}",
+        'stations': stations,
+        'change_rate': change_rate,
+        'polls': polls,
+        'records_published': published,
+        'records_consumed': len(latencies),
+        'poll_p50_ms': percentile(poll_seconds, 50) * 1000,
+        'poll_p99_ms': percentile(poll_seconds, 99) * 1000,
+        'fetch_ms': mean_ms(reports, 'fetch_seconds'),
+        'parse_ms': mean_ms(reports, 'parse_seconds'),
+        'publish_ms': mean_ms(reports, 'publish_seconds'),
+        'publish_records_per_second': records / publish_seconds if publish_seconds else 0.0,
+        'consume_records_per_second': consume_rate,
+        'e2e_p50_ms': percentile(latencies, 50),
+        'e2e_p99_ms': percentile(latencies, 99),
+        'peak_poll_memory_mb': peak_memory / 2 ** 20
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    """Commit the benchmark ran on and whether tracked files had local changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': "unknown", 'dirty': False}
+    return {'commit': commit, 'dirty': dirty}
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Print the change of every metric against a baseline run
+    
+    Args:
+        results (Dict[str, Any]): Current run
+        baseline (Dict[str, Any]): Earlier run loaded from its results file
+        threshold (float): Percent change in the bad direction that counts as a regression
+    
+    Returns:
+        List[str]: Descriptions of the regressions
+    """
+    regressions = []
+    previous = {scenario['name']: scenario for scenario in baseline['scenarios']}
+    print(f"\nCompared with {baseline['run']['commit']} ({baseline['run']['timestamp']}):")
+    for scenario in results['scenarios']:
+        before = previous.get(scenario['name'])
+        if before is None:
+            print(f"{scenario['name']}: not in baseline")
+            continue
+        print(scenario['name'])
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), scenario[metric]
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            print(f"  {metric:<28} {old:>12.2f} -> {new:>12.2f} ({change:+.1f}%){flag}")
+            if flag:
+                regressions.append(f"{scenario['name']} {metric} {change:+.1f}%")
+    return regressions
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local stand-ins")
+    parser.add_argument("--stations", type=int, nargs="+", default=[1000, 10000],
+                        help="Feed sizes to benchmark (1000 to 100000 stations)")
+    parser.add_argument("--change-rates", type=float, nargs="+", default=[0.05, 0.5],
+                        help="Shares of stations changing between polls")
+    parser.add_argument("--polls", type=int, default=5, help="Timed polls per scenario")
+    parser.add_argument("--codec", choices=["json", "orjson"], default=None, help="JSON codec of Bikes")
+    parser.add_argument("--columnar", action="store_true", help="Diff stations with the NumPy StationSnapshot")
+    parser.add_argument("--streaming", action="store_true", help="Parse feeds incrementally while downloading")
+    parser.add_argument("--output", default=None,
+                        help="Results file (default: benchmarks/results/pipeline-<commit>-<time>.json)")
+    parser.add_argument("--compare", default=None, help="Results file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent a metric may get worse before --compare reports a regression")
+    args = parser.parse_args()
+    
+    # Per-poll logs would dominate the measurement
+    logging.basicConfig(level=logging.WARNING)
+    
+    run = dict(git_revision(), timestamp=datetime.now().isoformat(timespec='seconds'),
+               python=platform.python_version(), platform=platform.platform(), args=vars(args))
+    scenarios = []
+    for stations in args.stations:
+        for change_rate in args.change_rates:
+            print(f"Running stations={stations} change_rate={change_rate}...", flush=True)
+            scenarios.append(run_scenario(stations, change_rate, args.polls, args.codec, args.columnar, args.streaming))
+    results = {'run': run, 'scenarios': scenarios}
+    
+    print(f"\n{'scenario':<34} {'poll p50':>9} {'fetch':>8} {'parse':>8} {'publish':>8} "
+          f"{'pub rec/s':>10} {'con rec/s':>10} {'e2e p99':>8} {'mem MB':>7}")
+    for scenario in scenarios:
+        print(
+            f"{scenario['name']:<34} {scenario['poll_p50_ms']:>9.1f} {scenario['fetch_ms']:>8.1f} "
+            f"{scenario['parse_ms']:>8.1f} {scenario['publish_ms']:>8.1f} "
+            f"{scenario['publish_records_per_second']:>10.0f} {scenario['consume_records_per_second']:>10.0f} "
+            f"{scenario['e2e_p99_ms']:>8.1f} {scenario['peak_poll_memory_mb']:>7.1f}"
+        )
+    
+    output = Path(args.output) if args.output else RESULTS_DIRECTORY / (
+        f"pipeline-{run['commit']}{'-dirty' if run['dirty'] else ''}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults saved to {output}")
+    
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions above {args.threshold}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Producer profile benchmark for Citi Bikes Real-Time Streaming Project
+
+Publishes the same set of station status messages with every producer throughput
+profile against a running broker and reports messages per second and the ack
+latency distribution (time from send to broker acknowledgement) of each profile.
+
+Usage:
+    python benchmarks/producer_benchmark.py                                  # all profiles, localhost:9092
+    python benchmarks/producer_benchmark.py --profiles low-latency balanced --messages 200000
+"""
+
+import argparse
+import logging
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.core.config import PRODUCER_PROFILES
+from src.streaming.kafka_producer.producer import Producer
+
+
+def make_stations(count: int, seed: int = 7) -> list:
+    """Build station_status records shaped like the Citi Bike feed"""
+    rng = random.Random(seed)
+    now = int(time.time())
+    stations = []
+    for index in range(count):
+        capacity = rng.randint(15, 60)
+        bikes = rng.randint(0, capacity)
+        stations.append({
+            'station_id': f"66db{index:04x}-0aca-11e7-82f6-3863bb44ef7c",
+            'num_bikes_available': bikes,
+            'num_ebikes_available': rng.randint(0, bikes),
+            'num_bikes_disabled': rng.randint(0, 2),
+            'num_docks_available': capacity - bikes,
+            'num_docks_disabled': 0,
+            'is_installed': 1,
+            'is_renting': 1,
+            'is_returning': 1,
+            'last_reported': now - rng.randint(0, 300),
+            'legacy_id': str(index)
+        })
+    return stations
+
+
+def percentile(values: list, q: float) -> float:
+    """Return the q-th percentile (0-100) of already sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def run_profile(profile: str, stations: list, messages: int, topic: str, bootstrap_servers: str) -> dict:
+    """Publish messages with one profile and measure throughput and ack latency"""
+    latencies = []
+    lock = threading.Lock()
+    
+    def on_ack(sent_at, record_metadata, error):
+        if error is None:
+            with lock:
+                latencies.append(time.perf_counter() - sent_at)
+    
+    producer = Producer(bootstrap_servers=bootstrap_servers, profile=profile, max_in_flight=100000)
+    try:
+        # Warm up metadata and connections outside the measurement
+        producer.data_producer(topic, stations[0], key=stations[0]['station_id'])
+        
+        start = time.perf_counter()
+        for index in range(messages):
+            station = stations[index % len(stations)]
+            sent_at = time.perf_counter()
+            producer.send_async(
+                topic, station, key=station['station_id'],
+                callback=lambda record_metadata, error, sent_at=sent_at: on_ack(sent_at, record_metadata, error)
+            )
+        acks = producer.ack_barrier(raise_on_error=False)
+        elapsed = time.perf_counter() - start
+    finally:
+        producer.close()
+    
+    latencies.sort()
+    return {
+        'profile': profile,
+        'messages': messages,
+        'failed': acks['failed'],
+        'seconds': elapsed,
+        'messages_per_second': messages / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000
+    }
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Throughput and ack latency of the producer profiles")
+    parser.add_argument("--bootstrap-servers", default="localhost:9092", help="Kafka broker to publish to")
+    parser.add_argument("--topic", default="bikes-producer-benchmark", help="Topic to publish to")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(PRODUCER_PROFILES), default=list(PRODUCER_PROFILES),
+                        help="Profiles to benchmark")
+    parser.add_argument("--messages", type=int, default=100000, help="Messages published per profile")
+    parser.add_argument("--stations", type=int, default=2000, help="Distinct station records cycled through")
+    args = parser.parse_args()
+    
+    # Per-send and per-barrier logs would dominate the measurement
+    logging.basicConfig(level=logging.WARNING)
+    
+    stations = make_stations(args.stations)
+    results = [run_profile(profile, stations, args.messages, args.topic, args.bootstrap_servers)
+               for profile in args.profiles]
+    
+    print(f"{'profile':<15} {'messages':>9} {'failed':>7} {'msgs/s':>10} {'p50 ack ms':>11} {'p99 ack ms':>11} {'max ack ms':>11}")
+    for result in results:
+        print(
+            f"{result['profile']:<15} {result['messages']:>9} {result['failed']:>7} "
+            f"{result['messages_per_second']:>10.0f} {result['p50_ms']:>11.2f} "
+            f"{result['p99_ms']:>11.2f} {result['max_ms']:>11.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Spatial index microbenchmark for Citi Bikes Real-Time Streaming Project
+
+Fills a station state store with synthetic stations spread over the New York
+service area, indexes them and measures k-nearest and bounding-box query latency
+with and without an availability filter, next to a linear scan for reference.
+
+Usage:
+    python benchmarks/spatial_benchmark.py                     # 2k and 10k stations
+    python benchmarks/spatial_benchmark.py --stations 500 50000 --queries 5000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.streaming.state_store.spatial_index import StationSpatialIndex, haversine_m
+from src.streaming.state_store.station_store import StationStateStore
+
+# Rough extent of the station network
+MIN_LAT, MAX_LAT = 40.63, 40.88
+MIN_LON, MAX_LON = -74.05, -73.85
+
+
+def build_store(stations: int, seed: int = 42) -> StationStateStore:
+    """Create a store with random station coordinates and availability"""
+    rng = random.Random(seed)
+    store = StationStateStore()
+    for station in range(stations):
+        key = str(station)
+        store.upsert_information(key, {
+            'station_id': key,
+            'name': f"Station {station}",
+            'lat': rng.uniform(MIN_LAT, MAX_LAT),
+            'lon': rng.uniform(MIN_LON, MAX_LON),
+            'capacity': 30
+        })
+        bikes = rng.choice([0, 0, 1, 3, 8, 15])
+        store.upsert_status(key, {
+            'station_id': key,
+            'num_bikes_available': bikes,
+            'num_docks_available': 30 - bikes,
+            'is_renting': 1,
+            'is_returning': 1
+        })
+    return store
+
+
+def percentiles(func, queries: list) -> dict:
+    """Run func over every query and return p50/p99/max latency in microseconds"""
+    timings = []
+    for query in queries:
+        start = time.perf_counter_ns()
+        func(query)
+        timings.append((time.perf_counter_ns() - start) / 1000)
+    timings.sort()
+    return {
+        'p50_us': timings[len(timings) // 2],
+        'p99_us': timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        'max_us': timings[-1]
+    }
+
+
+def run_benchmark(stations: int, queries: int, k: int = 5, seed: int = 42) -> list:
+    """Benchmark the index queries over one store size"""
+    store = build_store(stations, seed)
+    index = StationSpatialIndex(store)
+    start = time.perf_counter()
+    index.rebuild()
+    build_ms = (time.perf_counter() - start) * 1000
+    
+    rng = random.Random(seed + 1)
+    points = [(rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LON, MAX_LON)) for _ in range(queries)]
+    keys = store.keys()
+    
+    def linear_scan(point):
+        lat, lon = point
+        return sorted(
+            (haversine_m(lat, lon, store.value(key, 'lat'), store.value(key, 'lon')), key) for key in keys
+            if store.value(key, 'num_bikes_available') >= 1
+        )[:k]
+    
+    scenarios = {
+        f'nearest {k}': lambda point: index.nearest(point[0], point[1], k),
+        f'nearest {k} with bikes': lambda point: index.nearest(point[0], point[1], k, min_bikes=1),
+        '1 km box': lambda point: index.within(point[0] - 0.0045, point[1] - 0.006, point[0] + 0.0045, point[1] + 0.006),
+        '1 km box with docks': lambda point: index.within(point[0] - 0.0045, point[1] - 0.006,
+                                                          point[0] + 0.0045, point[1] + 0.006, min_docks=1),
+        # The scan is orders of magnitude slower, so a sample of the queries is enough
+        f'linear scan {k} with bikes': (linear_scan, points[:max(1, queries // 20)])
+    }
+    
+    results = []
+    for name, scenario in scenarios.items():
+        func, scenario_points = scenario if isinstance(scenario, tuple) else (scenario, points)
+        results.append({'stations': stations, 'query': name, 'build_ms': build_ms,
+                        **percentiles(func, scenario_points)})
+    return results
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Spatial index microbenchmark on synthetic stations")
+    parser.add_argument("--stations", type=int, nargs="+", default=[2000, 10000], help="Store sizes to benchmark")
+    parser.add_argument("--queries", type=int, default=2000, help="Queries per scenario")
+    parser.add_argument("--k", type=int, default=5, help="Stations returned by nearest queries")
+    args = parser.parse_args()
+    
+    print(f"{'stations':>8} {'query':<26} {'build ms':>9} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+    for stations in args.stations:
+        for result in run_benchmark(stations, args.queries, args.k):
+            print(
+                f"{result['stations']:>8} {result['query']:<26} {result['build_ms']:>9.1f} "
+                f"{result['p50_us']:>8.1f} {result['p99_us']:>8.1f} {result['max_us']:>8.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,30 +13,26 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from streaming.kafka_consumer.consumer import Consumer
+from streaming.kafka_consumer.consumer_group import ConsumerGroupRunner
+from streaming.kafka_consumer.compacted_reader import CompactedTopicReader
+from streaming.rollups.station_rollups import ParquetRollupOutput, StationRollupStage, TopicRollupOutput
+from streaming.sinks.parquet_sink import ParquetSink
+from streaming.state_store.materializer import StationStateMaterializer
+from streaming.state_store.spatial_index import StationSpatialIndex
+from streaming.state_store.station_store import StationStateStore
 from utils.constants.topics import BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC
+from utils.observability.log_setup import configure_logging
+# The consumer modules record into the registry of the src package, so serve that one
+from src.utils.observability.metrics import MetricsServer
 
 def setup_logging(log_level: str = "INFO") -> logging.Logger:
-    """Set up logging configuration"""
-    log_levels = {
-        "DEBUG": logging.DEBUG,
-        "INFO": logging.INFO,
-        "WARNING": logging.WARNING,
-        "ERROR": logging.ERROR,
-        "CRITICAL": logging.CRITICAL
-    }
-    
-    logging.basicConfig(
-        level=log_levels.get(log_level.upper(), logging.INFO),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('logs/citibikes_consumer.log')
-        ]
-    )
+    """Set up logging through a background queue listener to stdout and a rotating log file"""
+    configure_logging(level=log_level, file_path='logs/citibikes_consumer.log',
+                      multiprocess=True)
     
     return logging.getLogger(__name__)
 
-def test_consumer():
+def test_consumer(wire_format: str = "json", schema_registry: str = None):
     """Test the Kafka consumer functionality"""
     logger = logging.getLogger(__name__)
     
@@ -44,7 +40,7 @@ def test_consumer():
         logger.info("Starting Citi Bikes Consumer Test")
         
         # Initialize consumer
-        consumer = Consumer("bikes-consumer-test-group")
+        consumer = Consumer("bikes-consumer-test-group", wire_format=wire_format, schema_registry=schema_registry)
         logger.info("Consumer initialized successfully")
         
         # Subscribe to both topics
@@ -57,15 +53,10 @@ def test_consumer():
         start_time = time.time()
         timeout = 30  # seconds
         
+        # Messages are counted per topic and summarized; run with DEBUG to see samples
         message_count = 0
         for message in consumer.consume_messages():
             message_count += 1
-            logger.info(f"Message {message_count} received:")
-            logger.info(f"   Topic: {message['topic']}")
-            logger.info(f"   Partition: {message['partition']}")
-            logger.info(f"   Offset: {message['offset']}")
-            logger.info(f"   Data: {message['value']}")
-            logger.info("-" * 50)
             
             # Check if timeout reached
             if time.time() - start_time > timeout:
@@ -84,14 +75,14 @@ def test_consumer():
             consumer.close()
             logger.info("Consumer closed")
 
-def consume_single_message():
+def consume_single_message(wire_format: str = "json", schema_registry: str = None):
     """Test consuming a single message from each topic"""
     logger = logging.getLogger(__name__)
     
     try:
         logger.info("Testing single message consumption")
         
-        with Consumer("bikes-single-test-group") as consumer:
+        with Consumer("bikes-single-test-group", wire_format=wire_format, schema_registry=schema_registry) as consumer:
             # Test station information topic
             logger.info(f"Testing {BIKES_STATION_INFORMATION_TOPIC}")
             message = consumer.consume_single_message(BIKES_STATION_INFORMATION_TOPIC)
@@ -114,12 +105,123 @@ def consume_single_message():
         logger.error(f"Error in single message test: {e}")
         raise
 
+def run_consumer_group(workers: int = None, group_id: str = "bikes-consumer-group", topics: list = None,
+                       wire_format: str = "json", schema_registry: str = None):
+    """Consume with one process per worker in a single consumer group until SIGINT/SIGTERM"""
+    logger = logging.getLogger(__name__)
+    
+    topics = topics or [BIKES_STATION_STATUS_TOPIC]
+    runner = ConsumerGroupRunner(topics, group_id=group_id, workers=workers, wire_format=wire_format,
+                                 schema_registry=schema_registry)
+    logger.info(f"Starting consumer group {group_id} with {runner.workers} workers (Ctrl+C to stop)")
+    stats = runner.run()
+    logger.info(f"Consumed {stats['records']} records per worker: {stats['records_per_worker']}")
+
+def load_station_catalog(wire_format: str = "json", schema_registry: str = None):
+    """Rebuild the current station catalogue from the compacted station information topic"""
+    logger = logging.getLogger(__name__)
+    
+    catalog = CompactedTopicReader(wire_format=wire_format, schema_registry=schema_registry).load_station_catalog()
+    logger.info(f"Station catalogue holds {len(catalog)} stations")
+    for key, station in list(catalog.items())[:5]:
+        logger.info(f"   {key}: {station.get('name')}")
+
+def run_station_state(checkpoint_path: str = "state/station_state.ckpt", report_interval: float = 10.0,
+                      wire_format: str = "json", schema_registry: str = None):
+    """Maintain the materialized station state until Ctrl+C, reporting its size periodically"""
+    logger = logging.getLogger(__name__)
+    
+    store = StationStateStore()
+    spatial_index = StationSpatialIndex(store)
+    materializer = StationStateMaterializer(store, checkpoint_path=checkpoint_path, wire_format=wire_format,
+                                            schema_registry=schema_registry, spatial_index=spatial_index)
+    materializer.start()
+    logger.info(f"Materializing station state (checkpoint: {checkpoint_path}, Ctrl+C to stop)")
+    try:
+        while materializer.join(report_interval):
+            stats = materializer.stats()
+            logger.info(f"Station state: {stats['stations']} stations, {stats['records_applied']} records applied, "
+                        f"{len(spatial_index)} stations indexed")
+    except KeyboardInterrupt:
+        logger.info("Station state interrupted by user")
+    finally:
+        # Re-raises a failure of the materializer thread, so main() exits with an error
+        materializer.stop()
+
+def run_parquet_sink(location: str = "datalake", endpoint_url: str = None, max_file_seconds: float = 300.0,
+                     report_interval: float = 60.0, wire_format: str = "json", schema_registry: str = None,
+                     topics: list = None):
+    """Write the station topics, or the given ones, to the Parquet data lake until Ctrl+C"""
+    logger = logging.getLogger(__name__)
+    
+    sink = ParquetSink(location, topics=topics, endpoint_url=endpoint_url, max_file_seconds=max_file_seconds,
+                       wire_format=wire_format, schema_registry=schema_registry)
+    sink.start()
+    logger.info(f"Writing Parquet files to {sink.storage.uri()} (Ctrl+C to stop)")
+    try:
+        while sink.join(report_interval):
+            stats = sink.stats()
+            logger.info(f"Parquet sink: {stats['files_written']} files, {stats['records_written']} records written, "
+                        f"{stats['records_buffered']} buffered")
+    except KeyboardInterrupt:
+        logger.info("Parquet sink interrupted by user")
+    finally:
+        # Re-raises a failure of the sink thread, so main() exits with an error
+        sink.stop()
+
+def run_station_rollups(output: str = "topic", location: str = "datalake", endpoint_url: str = None,
+                        report_interval: float = 60.0, wire_format: str = "json", schema_registry: str = None):
+    """Emit windowed station and region rollups until Ctrl+C"""
+    logger = logging.getLogger(__name__)
+    
+    rollup_output = ParquetRollupOutput(location, endpoint_url=endpoint_url) if output == "parquet" else TopicRollupOutput()
+    stage = StationRollupStage(rollup_output, wire_format=wire_format, schema_registry=schema_registry)
+    stage.start()
+    logger.info(f"Emitting station rollups to the {output} output (Ctrl+C to stop)")
+    try:
+        while stage.join(report_interval):
+            stats = stage.stats()
+            logger.info(f"Station rollups: {stats['records_applied']} records applied, {stats['rollups_emitted']} "
+                        f"rollups emitted, {stats['entities']} entities, {stats['late_records']} late records")
+    except KeyboardInterrupt:
+        logger.info("Station rollups interrupted by user")
+    finally:
+        # Re-raises a failure of the stage thread, so main() exits with an error
+        stage.stop()
+
 def main():
     """Main entry point"""
     import argparse
     parser = argparse.ArgumentParser(description="Citi Bikes Consumer")
-    parser.add_argument("--mode", choices=["test", "single"], default="test",
-                       help="Consumer mode: test (continuous) or single message")
+    parser.add_argument("--mode", choices=["test", "single", "group", "catalog", "state", "sink", "rollups"],
+                       default="test",
+                       help="Consumer mode: test (continuous), single message, a multi-process consumer group, "
+                            "loading the station catalogue from the compacted topic, the materialized station state "
+                            "writing the station topics to the Parquet data lake or windowed station rollups")
+    parser.add_argument("--checkpoint-path", default="state/station_state.ckpt",
+                       help="Station state checkpoint file in state mode")
+    parser.add_argument("--sink-location", default="datalake",
+                       help="Local directory or s3://bucket/prefix the Parquet files are written to in sink mode "
+                            "and by Parquet rollups")
+    parser.add_argument("--rollup-output", choices=["topic", "parquet"], default="topic",
+                       help="Send rollups to the rollups topic or write them straight to Parquet in rollups mode")
+    parser.add_argument("--s3-endpoint-url", default=None,
+                       help="Endpoint of an S3-compatible store such as MinIO in sink mode")
+    parser.add_argument("--rollover-seconds", type=float, default=300.0,
+                       help="Write out a Parquet file after it has been open this many seconds in sink mode")
+    parser.add_argument("--workers", type=int, default=None,
+                       help="Number of worker processes in group mode (default: one per CPU)")
+    parser.add_argument("--group-id", default="bikes-consumer-group",
+                       help="Consumer group ID in group mode")
+    parser.add_argument("--topics", nargs="+", default=None,
+                       help=f"Topics to consume in group mode (default: {BIKES_STATION_STATUS_TOPIC}) or to write "
+                            f"in sink mode (default: both station topics)")
+    parser.add_argument("--wire-format", choices=["json", "avro"], default="json",
+                       help="Kafka message format written by the pipeline")
+    parser.add_argument("--schema-registry", default=None,
+                       help="Schema registry URL or local schema directory for Avro (default: config/schemas)")
+    parser.add_argument("--metrics-port", type=int, default=9109,
+                       help="Serve Prometheus metrics on localhost:<port>/metrics (0 disables the endpoint)")
     parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
                        help="Logging level")
     
@@ -132,13 +234,31 @@ def main():
     # Set up logging
     logger = setup_logging(args.log_level)
     
+    if args.metrics_port:
+        try:
+            MetricsServer(args.metrics_port).start()
+        except OSError:
+            logger.warning("Continuing without a metrics endpoint")
+    
     try:
         logger.info("Starting Citi Bikes Consumer")
         
         if args.mode == "test":
-            test_consumer()
+            test_consumer(args.wire_format, args.schema_registry)
+        elif args.mode == "group":
+            run_consumer_group(args.workers, args.group_id, args.topics, args.wire_format, args.schema_registry)
+        elif args.mode == "catalog":
+            load_station_catalog(args.wire_format, args.schema_registry)
+        elif args.mode == "state":
+            run_station_state(args.checkpoint_path, wire_format=args.wire_format, schema_registry=args.schema_registry)
+        elif args.mode == "sink":
+            run_parquet_sink(args.sink_location, args.s3_endpoint_url, args.rollover_seconds,
+                             wire_format=args.wire_format, schema_registry=args.schema_registry, topics=args.topics)
+        elif args.mode == "rollups":
+            run_station_rollups(args.rollup_output, args.sink_location, args.s3_endpoint_url,
+                                wire_format=args.wire_format, schema_registry=args.schema_registry)
         else:
-            consume_single_message()
+            consume_single_message(args.wire_format, args.schema_registry)
             
         logger.info("Consumer completed successfully!")
         return 0
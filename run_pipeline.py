@@ -8,94 +8,144 @@ import sys
 import os
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import signal
+import threading
 from pathlib import Path
 
 # Add the src directory to Python path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from core.bikes_module.bikes import Bikes
+from core.scheduler import Scheduler, CATCH_UP_POLICIES
 from utils.constants.routes import BIKES_STATION_INFORMATION, BIKES_STATION_STATUS
+from utils.observability.log_setup import configure_logging
 
-# Global variable for graceful shutdown
+# Global variables for graceful shutdown; the event also interrupts waits between runs
 running = True
+shutdown_event = threading.Event()
 
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully"""
     global running
     logging.info(f"Received signal {signum}. Shutting down gracefully...")
     running = False
+    shutdown_event.set()
 
 def setup_logging(log_level: str = "INFO") -> logging.Logger:
-    """Set up logging configuration"""
-    log_levels = {
-        "DEBUG": logging.DEBUG,
-        "INFO": logging.INFO,
-        "WARNING": logging.WARNING,
-        "ERROR": logging.ERROR,
-        "CRITICAL": logging.CRITICAL
-    }
-    
-    logging.basicConfig(
-        level=log_levels.get(log_level.upper(), logging.INFO),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('logs/citibikes_pipeline.log')
-        ]
-    )
+    """Set up logging through a background queue listener to stdout and a rotating log file"""
+    configure_logging(level=log_level, file_path='logs/citibikes_pipeline.log')
     
     return logging.getLogger(__name__)
 
-def run_single_execution(bikes: Bikes, logger: logging.Logger) -> bool:
+def log_snapshot_report(report: dict, logger: logging.Logger) -> None:
+    """Log the counts and timings of one published feed snapshot"""
+    if report.get('skipped'):
+        logger.info(f"{report['feed']}: no new snapshot ({report['skipped']}), fetch {report['fetch_seconds']:.3f}s")
+        return
+    
+    published = f"{report['records']} records"
+    if 'stations' in report:
+        published += f" of {report['stations']} stations"
+        if report['checkpoint']:
+            published += " (full checkpoint)"
+    logger.info(
+        f"{report['feed']}: {published} "
+        f"({report['acked']} acked, {report['failed']} failed) - "
+        f"fetch {report['fetch_seconds']:.3f}s, publish {report['publish_seconds']:.3f}s"
+    )
+
+def run_single_execution(bikes: Bikes, logger: logging.Logger, concurrent: bool = False) -> bool:
     """Run a single execution of the data pipeline"""
     try:
         logger.info("Starting Citi Bikes Real-Time Streaming Pipeline")
+        cycle_start = time.perf_counter()
         
-        # Fetch and stream station information
-        logger.info("Fetching station information...")
-        bikes.get_bikes_station_information(BIKES_STATION_INFORMATION)
-        logger.info("Station information processed successfully")
+        if concurrent:
+            reports = fetch_feeds_concurrently(bikes, logger, cycle_start)
+        else:
+            reports = []
+            
+            # Fetch and stream station information
+            logger.info("Fetching station information...")
+            station_info = bikes.get_bikes_station_information(BIKES_STATION_INFORMATION)
+            log_snapshot_report(station_info, logger)
+            reports.append(station_info)
+            
+            # Fetch and stream station status
+            logger.info("Fetching station status...")
+            station_status = bikes.get_bikes_station_status(BIKES_STATION_STATUS)
+            log_snapshot_report(station_status, logger)
+            reports.append(station_status)
         
-        # Fetch and stream station status
-        logger.info("Fetching station status...")
-        bikes.get_bikes_station_status(BIKES_STATION_STATUS)
-        logger.info("Station status processed successfully")
+        total_records = sum(report['records'] for report in reports)
+        logger.info(
+            f"Data pipeline execution completed successfully! Total records: {total_records} "
+            f"in {time.perf_counter() - cycle_start:.3f}s"
+        )
         
-        logger.info("Data pipeline execution completed successfully!")
         return True
         
     except Exception as e:
         logger.error(f"Error in main pipeline: {e}")
         return False
 
-def run_continuous_streaming(bikes: Bikes, logger: logging.Logger, interval: int = 60) -> None:
-    """Run continuous streaming with specified interval"""
-    logger.info(f"Starting continuous streaming with {interval} second intervals")
+def fetch_feeds_concurrently(bikes: Bikes, logger: logging.Logger, cycle_start: float) -> list:
+    """Fetch all feeds in parallel and log each snapshot as soon as it is published"""
+    feeds = {
+        "station information": (bikes.get_bikes_station_information, BIKES_STATION_INFORMATION),
+        "station status": (bikes.get_bikes_station_status, BIKES_STATION_STATUS)
+    }
+    
+    logger.info(f"Fetching {len(feeds)} feeds concurrently...")
+    reports = []
+    with ThreadPoolExecutor(max_workers=len(feeds), thread_name_prefix="feed") as executor:
+        futures = {executor.submit(fetch, url): name for name, (fetch, url) in feeds.items()}
+        for future in as_completed(futures):
+            report = future.result()
+            log_snapshot_report(report, logger)
+            logger.info(f"{futures[future]} published {time.perf_counter() - cycle_start:.3f}s into the cycle")
+            reports.append(report)
+    
+    return reports
+
+def log_scheduler_metrics(scheduler: Scheduler, logger: logging.Logger) -> None:
+    """Log the lag and overrun metrics of every scheduled feed"""
+    for name, metrics in scheduler.metrics().items():
+        logger.info(
+            f"Schedule {name}: {metrics['runs']} runs, {metrics['failures']} failed, "
+            f"{metrics['overruns']} overruns, {metrics['skipped_ticks']} skipped ticks, "
+            f"lag {metrics['last_lag_seconds']:.3f}s (max {metrics['max_lag_seconds']:.3f}s)"
+        )
+
+def run_continuous_streaming(bikes: Bikes, logger: logging.Logger, status_interval: float = 10,
+                             information_interval: float = 3600, catch_up: str = "skip",
+                             metrics_interval: float = 60) -> None:
+    """Run continuous streaming with a separate drift-free cadence per feed"""
+    logger.info(
+        f"Starting continuous streaming: station status every {status_interval}s, "
+        f"station information every {information_interval}s"
+    )
     logger.info("Press Ctrl+C to stop streaming")
     
-    execution_count = 0
-    start_time = time.time()
+    def feed_job(fetch, url):
+        def run():
+            log_snapshot_report(fetch(url), logger)
+        return run
+    
+    scheduler = Scheduler(stop_event=shutdown_event)
+    scheduler.add_job("station_information", information_interval,
+                      feed_job(bikes.get_bikes_station_information, BIKES_STATION_INFORMATION), catch_up)
+    scheduler.add_job("station_status", status_interval,
+                      feed_job(bikes.get_bikes_station_status, BIKES_STATION_STATUS), catch_up)
     
     try:
-        while running:
-            execution_count += 1
-            logger.info(f"Execution #{execution_count} starting at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            success = run_single_execution(bikes, logger)
-            
-            if success:
-                logger.info(f"Execution #{execution_count} completed successfully")
-            else:
-                logger.error(f"Execution #{execution_count} failed")
-            
-            # Calculate next execution time
-            elapsed = time.time() - start_time
-            next_execution = interval - (elapsed % interval)
-            
-            if running:  # Check again in case signal was received
-                logger.info(f"Next execution in {next_execution:.1f} seconds...")
-                time.sleep(next_execution)
+        # The pool has one worker per job, so lag metrics keep flowing even while both
+        # feed jobs are stuck
+        scheduler.add_job("scheduler_metrics", metrics_interval,
+                          lambda: log_scheduler_metrics(scheduler, logger), delay=metrics_interval)
+        scheduler.run()
+        log_scheduler_metrics(scheduler, logger)
             
     except KeyboardInterrupt:
         logger.info("Continuous streaming interrupted by user")
@@ -114,8 +164,16 @@ def main():
     parser = argparse.ArgumentParser(description="Citi Bikes Real-Time Streaming Pipeline")
     parser.add_argument("--mode", choices=["single", "continuous"], default="single",
                        help="Execution mode: single run or continuous streaming")
-    parser.add_argument("--interval", type=int, default=60,
-                       help="Interval between executions in seconds (for continuous mode)")
+    parser.add_argument("--interval", type=int, default=None,
+                       help="Interval between executions in seconds; overrides the per-feed intervals")
+    parser.add_argument("--status-interval", type=float, default=10,
+                       help="Seconds between station status polls (for continuous mode)")
+    parser.add_argument("--information-interval", type=float, default=3600,
+                       help="Seconds between station information polls (for continuous mode)")
+    parser.add_argument("--catch-up", choices=CATCH_UP_POLICIES, default="skip",
+                       help="What to do with ticks missed while a poll overran its interval")
+    parser.add_argument("--concurrent", action="store_true",
+                       help="Fetch and publish all GBFS feeds in parallel within each single execution")
     parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
                        help="Logging level")
     
@@ -136,7 +194,7 @@ def main():
         
         if args.mode == "single":
             logger.info("Running single execution mode")
-            success = run_single_execution(bikes, logger)
+            success = run_single_execution(bikes, logger, args.concurrent)
             if success:
                 logger.info("Pipeline completed successfully!")
                 return 0
@@ -145,7 +203,10 @@ def main():
                 return 1
         else:
             logger.info("Running continuous streaming mode")
-            run_continuous_streaming(bikes, logger, args.interval)
+            run_continuous_streaming(bikes, logger,
+                                     status_interval=args.interval or args.status_interval,
+                                     information_interval=args.interval or args.information_interval,
+                                     catch_up=args.catch_up)
             return 0
             
     except Exception as e:
@@ -33,6 +33,10 @@ python src/aws/create_glue_role.py
 echo "🕷️ Setting up Glue database and crawler..."
 python src/aws/setup_glue.py
 
+# Register the Parquet data lake tables
+echo "🗂️ Registering Parquet data lake tables..."
+python src/aws/create_parquet_tables.py
+
 # Upload initial logs
 echo "📤 Uploading initial logs to S3..."
 python src/aws/aws_upload.py
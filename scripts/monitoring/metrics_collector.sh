@@ -138,8 +138,38 @@ echo ""
 echo -e "${BLUE}⚡ Performance Indicators${NC}"
 echo "========================="
 
-# Check if logs are being actively written
-if [ -f "logs/citibikes_pipeline.log" ]; then
+PIPELINE_METRICS_URL="${PIPELINE_METRICS_URL:-http://localhost:9108/metrics}"
+CONSUMER_METRICS_URL="${CONSUMER_METRICS_URL:-http://localhost:9109/metrics}"
+
+# Sum every sample of a series, optionally only lines containing a label filter
+metric_sum() {
+    echo "$1" | grep -E "^$2(\{| )" | grep -F -- "${3:-}" | awk '{sum += $NF} END {printf "%.0f", sum}'
+}
+
+# Average of a histogram in milliseconds, over all label combinations
+metric_avg_ms() {
+    echo "$1" | awk -v name="$2" '
+        index($1, name "_sum") == 1 {sum += $NF}
+        index($1, name "_count") == 1 {count += $NF}
+        END {printf "%.1f", count ? sum / count * 1000 : 0}'
+}
+
+PIPELINE_SCRAPE=$(curl -s --max-time 2 "$PIPELINE_METRICS_URL" 2>/dev/null)
+CONSUMER_SCRAPE=$(curl -s --max-time 2 "$CONSUMER_METRICS_URL" 2>/dev/null)
+
+if [ -n "$PIPELINE_SCRAPE" ]; then
+    echo "Pipeline Activity: Active (metrics at $PIPELINE_METRICS_URL)"
+    echo "  - Records published: $(metric_sum "$PIPELINE_SCRAPE" bikes_feed_records_total)"
+    echo "  - Polls without new snapshot: $(metric_sum "$PIPELINE_SCRAPE" bikes_feed_polls_total 'outcome="skipped')"
+    echo "  - Failed polls: $(metric_sum "$PIPELINE_SCRAPE" bikes_feed_polls_total 'outcome="error"')"
+    echo "  - Avg fetch latency: $(metric_avg_ms "$PIPELINE_SCRAPE" bikes_feed_fetch_seconds) ms"
+    echo "  - Avg parse time: $(metric_avg_ms "$PIPELINE_SCRAPE" bikes_feed_parse_seconds) ms"
+    echo "  - Avg produce ack latency: $(metric_avg_ms "$PIPELINE_SCRAPE" bikes_produce_ack_seconds) ms"
+    echo "  - Failed sends: $(metric_sum "$PIPELINE_SCRAPE" bikes_produce_messages_total 'outcome="failed"')"
+    echo "  - Cycle overruns: $(metric_sum "$PIPELINE_SCRAPE" bikes_job_overruns_total)"
+    echo "  - Skipped ticks: $(metric_sum "$PIPELINE_SCRAPE" bikes_job_skipped_ticks_total)"
+elif [ -f "logs/citibikes_pipeline.log" ]; then
+    # No metrics endpoint, fall back to checking if logs are being actively written
     LOG_SIZE_1=$(stat -f%z logs/citibikes_pipeline.log)
     sleep 2
     LOG_SIZE_2=$(stat -f%z logs/citibikes_pipeline.log)
@@ -150,7 +180,16 @@ if [ -f "logs/citibikes_pipeline.log" ]; then
         echo "Pipeline Activity: Inactive (logs static)"
     fi
 else
-    echo "Pipeline Activity: Unknown (no logs)"
+    echo "Pipeline Activity: Unknown (no metrics endpoint or logs)"
+fi
+
+if [ -n "$CONSUMER_SCRAPE" ]; then
+    echo "Consumer Activity: Active (metrics at $CONSUMER_METRICS_URL)"
+    echo "  - Records consumed: $(metric_sum "$CONSUMER_SCRAPE" bikes_consumer_records_total)"
+    echo "  - Total lag: $(metric_sum "$CONSUMER_SCRAPE" bikes_consumer_lag) records"
+    echo "  - Max partition lag: $(echo "$CONSUMER_SCRAPE" | grep '^bikes_consumer_lag{' | awk '$NF > max {max = $NF} END {printf "%.0f", max}') records"
+else
+    echo "Consumer Activity: Unknown (no metrics endpoint at $CONSUMER_METRICS_URL)"
 fi
 
 # Check Docker resource usage
@@ -1,43 +1,328 @@
 #!/usr/bin/env python3
-"""Minimal S3 log uploader for Citibikes pipeline"""
+"""Incremental S3 log shipper for Citibikes pipeline"""
 
-import boto3
+import argparse
+import glob
+import gzip
+import io
+import json
+import logging
 import os
-from datetime import datetime
+import re
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import boto3
+from boto3.s3.transfer import TransferConfig
 from dotenv import load_dotenv
 
 # Load environment variables from aws_config.env
 load_dotenv('aws_config.env')
 
-def upload_logs_to_s3():
-    """Upload log files to S3 bucket"""
-    try:
-        s3_client = boto3.client('s3')
-        bucket_name = os.getenv('S3_BUCKET_NAME', 'citibikes-logs-2024')
-        
-        log_files = ['citibikes_pipeline.log', 'citibikes_consumer.log']
-        
-        for log_file in log_files:
-            if os.path.exists(log_file):
-                timestamp = datetime.now().strftime('%Y/%m/%d/%H')
-                s3_key = f"logs/{timestamp}/{log_file}"
-                
-                print(f"Uploading {log_file} to s3://{bucket_name}/{s3_key}")
-                s3_client.upload_file(log_file, bucket_name, s3_key)
-                print(f"Successfully uploaded {log_file}")
+# Active and rotated logs of the producer and consumer
+DEFAULT_LOG_PATTERNS = ("logs/*.log", "logs/*.log.*", "citibikes_*.log", "citibikes_*.log.*")
+
+# Compressed segments are mostly single requests; larger ones go up as 16 MB parts, 8 at a time
+DEFAULT_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True
+)
+
+# How far to look for the end of a line when cutting a log into segments
+LINE_SEARCH_BYTES = 1024 * 1024
+
+# Date at the start of a log line written with the configured format
+LINE_DATE = re.compile(rb'(\d{4}-\d{2}-\d{2})[ T]')
+
+
+class LogShipper:
+    def __init__(self, bucket: str, prefix: str = "logs", state_path: str = "state/log_shipper.json",
+                 patterns: Sequence[str] = DEFAULT_LOG_PATTERNS, max_workers: int = 8,
+                 segment_bytes: int = 32 * 1024 * 1024, compresslevel: int = 6,
+                 transfer_config: TransferConfig = DEFAULT_TRANSFER_CONFIG, s3_client=None,
+                 endpoint_url: Optional[str] = None):
+        """
+        Initialize a shipper that uploads only the log bytes not shipped before
+        
+        The byte offset shipped so far is remembered per file identity (device and
+        inode), so a log renamed by rotation continues where it left off and a new file
+        under the old name starts from zero. New bytes up to the last complete line are
+        cut into segments, gzip-compressed and uploaded concurrently. Every segment key
+        holds its byte range, so runs never overwrite each other. Offsets only advance
+        past segments that were uploaded; segments uploaded beyond a failed one are kept
+        in the state, so the next run uploads only the failed range again, under the same
+        key when the segment size is unchanged. The dt= partition comes from the date of
+        the first line of a segment, not from the time of the upload.
+        
+        Args:
+            bucket (str): Destination bucket
+            prefix (str): Key prefix; objects go to <prefix>/<host>/<log>/dt=<date>/
+            state_path (str): JSON file holding the shipped offsets
+            patterns (Sequence[str]): Glob patterns of the log files to ship
+            max_workers (int): Segments compressed and uploaded at the same time
+            segment_bytes (int): Uncompressed size of one segment
+            compresslevel (int): gzip level, 1 (fastest) to 9 (smallest)
+            transfer_config (TransferConfig): Multipart settings of one segment upload
+            s3_client: Preconfigured boto3 S3 client, created from the environment by default
+            endpoint_url (Optional[str]): Endpoint of an S3-compatible store
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.state_path = state_path
+        self.patterns = tuple(patterns)
+        self.max_workers = max_workers
+        self.segment_bytes = segment_bytes
+        self.compresslevel = compresslevel
+        self.transfer_config = transfer_config
+        self.s3_client = s3_client or boto3.client('s3', endpoint_url=endpoint_url)
+        self.host = socket.gethostname()
+        self.logger = logging.getLogger(__name__)
+        self.state = self._load_state()
+    
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        """Shipped offset and last known path per file identity"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable shipper state {self.state_path}: {e}")
+            return {}
+    
+    def _save_state(self):
+        """Write the state atomically"""
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.state_path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file, indent=2, sort_keys=True)
+        os.replace(temporary, self.state_path)
+    
+    def discover(self) -> List[Tuple[str, str, int]]:
+        """
+        Find the log files matching the patterns
+        
+        Returns:
+            List[Tuple[str, str, int]]: Path, file identity and size of every file
+        """
+        files = {}
+        for pattern in self.patterns:
+            for path in glob.glob(pattern):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                identity = f"{stat.st_dev}:{stat.st_ino}"
+                # Hard links or overlapping patterns yield one file once
+                files.setdefault(identity, (path, identity, stat.st_size))
+        return sorted(files.values())
+    
+    @staticmethod
+    def _line_end(file, position: int, limit: int) -> int:
+        """Offset just after the first newline at or after position, or position if there is none"""
+        file.seek(position)
+        chunk = file.read(min(LINE_SEARCH_BYTES, limit - position))
+        newline = chunk.find(b'\n')
+        return position + newline + 1 if newline >= 0 else position
+    
+    def plan_segments(self, path: str, start: int, size: int, stop: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Cut the unshipped bytes of a file into segments ending at line boundaries
+        
+        Args:
+            path (str): Log file
+            start (int): Offset shipped so far
+            size (int): Current file size
+            stop (Optional[int]): Line boundary to stop at, e.g. the start of a segment uploaded before
+        
+        Returns:
+            List[Tuple[int, int]]: Start and end offset of every segment
+        """
+        with open(path, 'rb') as file:
+            if stop is not None:
+                end = min(stop, size)
             else:
-                print(f"Warning: Log file {log_file} not found")
-                
-        return True
+                # Only ship complete lines; a line still being written goes with the next run
+                tail = max(start, size - LINE_SEARCH_BYTES)
+                file.seek(tail)
+                last_newline = file.read(size - tail).rfind(b'\n')
+                end = tail + last_newline + 1 if last_newline >= 0 else start
+            
+            segments = []
+            position = start
+            while position < end:
+                cut = position + self.segment_bytes
+                cut = self._line_end(file, cut, end) if cut < end else end
+                segments.append((position, cut))
+                position = cut
+        return segments
+    
+    def segment_key(self, path: str, identity: str, start: int, end: int, date: str) -> str:
+        """Object key of one segment, unique per file and byte range"""
+        name = os.path.basename(path).split('.log')[0] + '.log'
+        inode = identity.split(':')[1]
+        return f"{self.prefix}/{self.host}/{name}/dt={date}/{name}.{inode}.{start:015d}-{end:015d}.gz"
+    
+    def pending_segments(self, path: str, identity: str, size: int) -> List[Tuple[int, int]]:
+        """
+        Plan the segments of a file not uploaded yet, around those uploaded beyond its offset
+        
+        Args:
+            path (str): Log file
+            identity (str): File identity
+            size (int): Current file size
+        
+        Returns:
+            List[Tuple[int, int]]: Start and end offset of every segment to upload
+        """
+        state = self.state[identity]
+        segments = []
+        position = state['offset']
+        for uploaded_start, uploaded_end in state['uploaded']:
+            if uploaded_start > position:
+                segments.extend(self.plan_segments(path, position, size, stop=uploaded_start))
+            position = max(position, uploaded_end)
+        if size > position:
+            segments.extend(self.plan_segments(path, position, size))
+        return segments
+    
+    def _upload_segment(self, path: str, identity: str, start: int, end: int) -> Tuple[str, int]:
+        """Read, compress and upload one segment; returns its key and compressed size"""
+        with open(path, 'rb') as file:
+            file.seek(start)
+            data = file.read(end - start)
+        # A segment belongs to the day of its first line, so a retry lands under the same key
+        match = LINE_DATE.match(data)
+        date = match.group(1).decode() if match else self.state[identity]['dt']
+        key = self.segment_key(path, identity, start, end, date)
+        compressed = gzip.compress(data, compresslevel=self.compresslevel)
+        self.s3_client.upload_fileobj(
+            io.BytesIO(compressed), self.bucket, key,
+            ExtraArgs={'ContentType': 'text/plain', 'ContentEncoding': 'gzip'},
+            Config=self.transfer_config
+        )
+        return key, len(compressed)
+    
+    def ship(self) -> Dict[str, Any]:
+        """
+        Upload the new bytes of every log file
+        
+        Returns:
+            Dict[str, Any]: Files and segments shipped, bytes read and uploaded, failures and duration
+        """
+        start_time = time.perf_counter()
+        report = {'files': 0, 'segments': 0, 'bytes_read': 0, 'bytes_uploaded': 0, 'failed_segments': 0}
+        files = self.discover()
+        present = {identity for _, identity, _ in files}
+        
+        # End offset of every uploaded segment by its start offset, per file
+        pending: Dict[str, Dict[int, int]] = {}
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for path, identity, size in files:
+                previous = self.state.get(identity, {})
+                shipped = previous.get('offset', 0)
+                uploaded = [tuple(segment) for segment in previous.get('uploaded', [])]
+                if size < max([shipped] + [end for _, end in uploaded]):
+                    # Truncated in place; its old content is gone, ship what is there now
+                    self.logger.warning(f"{path} shrank below its shipped offset, shipping it from the start")
+                    shipped, uploaded = 0, []
+                # Fallback date of segments whose first line has none: the day the file was first seen
+                self.state[identity] = {'path': path, 'offset': shipped, 'uploaded': sorted(uploaded),
+                                        'dt': previous.get('dt', today)}
+                try:
+                    segments = self.pending_segments(path, identity, size)
+                except OSError as e:
+                    # Rotated away between listing and reading; found under its new name next run
+                    self.logger.warning(f"Skipping {path}: {e}")
+                    continue
+                if not segments:
+                    continue
+                pending[identity] = dict(self.state[identity]['uploaded'])
+                for segment_start, segment_end in segments:
+                    future = executor.submit(self._upload_segment, path, identity, segment_start, segment_end)
+                    futures[future] = (path, identity, segment_start, segment_end)
+            
+            for future in as_completed(futures):
+                path, identity, segment_start, segment_end = futures[future]
+                try:
+                    _, uploaded = future.result()
+                except Exception as e:
+                    report['failed_segments'] += 1
+                    self.logger.error(f"Failed to upload bytes {segment_start}-{segment_end} of {path}: {e}")
+                    continue
+                report['segments'] += 1
+                report['bytes_read'] += segment_end - segment_start
+                report['bytes_uploaded'] += uploaded
+                pending[identity][segment_start] = segment_end
+        
+        for identity, uploaded_segments in pending.items():
+            # Advance over the uploaded segments up to the first gap left by a failure
+            offset = self.state[identity]['offset']
+            while offset in uploaded_segments:
+                offset = uploaded_segments.pop(offset)
+            if offset > self.state[identity]['offset']:
+                report['files'] += 1
+            self.state[identity]['offset'] = offset
+            # Segments beyond the gap stay recorded, so the next run does not upload them again
+            self.state[identity]['uploaded'] = sorted(
+                [start, end] for start, end in uploaded_segments.items() if start >= offset
+            )
+        
+        # Forget files that were deleted after rotation
+        for identity in set(self.state) - present:
+            del self.state[identity]
+        self._save_state()
+        
+        report['seconds'] = time.perf_counter() - start_time
+        self.logger.info(
+            f"Shipped {report['bytes_read']} bytes of {report['files']} log files as {report['segments']} "
+            f"segments ({report['bytes_uploaded']} bytes compressed) in {report['seconds']:.1f}s"
+        )
+        return report
+
+
+def upload_logs_to_s3(bucket_name: Optional[str] = None, prefix: str = "logs", state_path: str = "state/log_shipper.json",
+                      max_workers: int = 8, endpoint_url: Optional[str] = None, s3_client=None):
+    """Upload the new tail of every log file to S3"""
+    try:
+        bucket_name = bucket_name or os.getenv('S3_BUCKET_NAME', 'citibikes-logs-2024')
+        shipper = LogShipper(bucket_name, prefix=prefix, state_path=state_path, max_workers=max_workers,
+                             endpoint_url=endpoint_url, s3_client=s3_client)
+        report = shipper.ship()
         
+        print(f"Shipped {report['bytes_read']} new bytes from {report['files']} log files to "
+              f"s3://{bucket_name}/{shipper.prefix}/ as {report['segments']} segments "
+              f"({report['bytes_uploaded']} bytes compressed) in {report['seconds']:.1f}s")
+        if report['failed_segments']:
+            print(f"Warning: {report['failed_segments']} segments failed and will be retried on the next run")
+        return not report['failed_segments']
+    
     except Exception as e:
         print(f"Error uploading logs: {e}")
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ship new log lines to S3 as compressed segments")
+    parser.add_argument("--bucket", default=None, help="Destination bucket (default: S3_BUCKET_NAME)")
+    parser.add_argument("--prefix", default="logs", help="Key prefix of the segments")
+    parser.add_argument("--state-file", default="state/log_shipper.json", help="File holding the shipped offsets")
+    parser.add_argument("--workers", type=int, default=8, help="Segments uploaded concurrently")
+    parser.add_argument("--endpoint-url", default=None, help="Endpoint of an S3-compatible store")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
     print("Starting S3 log upload...")
-    success = upload_logs_to_s3()
+    success = upload_logs_to_s3(args.bucket, args.prefix, args.state_file, args.workers, args.endpoint_url)
     if success:
         print("All logs uploaded successfully!")
     else:
-        print("Log upload failed") 
\ No newline at end of file
+        print("Log upload failed")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Register typed Glue tables over the Parquet files written by the data lake sink"""
+
+import os
+import sys
+from pathlib import Path
+
+import boto3
+from dotenv import load_dotenv
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src.streaming.sinks.parquet_sink import PARQUET_TABLES, glue_table_input
+
+# Load environment variables from aws_config.env
+load_dotenv('aws_config.env')
+
+def create_parquet_tables(glue_client=None, location=None, database_name=None, compression="zstd"):
+    """Create or update one Glue table per feed, partitioned by dt and hour"""
+    try:
+        glue_client = glue_client or boto3.client('glue')
+        database_name = database_name or os.getenv('GLUE_DATABASE_NAME', 'citibikes_analytics')
+        location = location or os.getenv(
+            'DATALAKE_LOCATION', f"s3://{os.getenv('S3_BUCKET_NAME', 'citibikes-logs-2024')}/datalake")
+        
+        try:
+            glue_client.create_database(DatabaseInput={'Name': database_name})
+            print(f"Database {database_name} created")
+        except glue_client.exceptions.AlreadyExistsException:
+            pass
+        
+        for table in PARQUET_TABLES.values():
+            table_input = glue_table_input(table, location, compression)
+            try:
+                glue_client.create_table(DatabaseName=database_name, TableInput=table_input)
+                print(f"Table {database_name}.{table.feed} created at {table_input['StorageDescriptor']['Location']}")
+            except glue_client.exceptions.AlreadyExistsException:
+                glue_client.update_table(DatabaseName=database_name, TableInput=table_input)
+                print(f"Table {database_name}.{table.feed} updated")
+        
+        return True
+    
+    except Exception as e:
+        print(f"Error creating Parquet tables: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = create_parquet_tables(location=sys.argv[1] if len(sys.argv) > 1 else None)
+    if success:
+        print("Parquet tables are ready for Athena!")
+    else:
+        print("Parquet table creation failed")
@@ -1,70 +1,414 @@
 #!/usr/bin/env python3
-"""Minimal Athena queries for Citibikes analytics"""
+"""Concurrent Athena queries for Citibikes analytics"""
 
-import boto3
+import hashlib
+import json
+import logging
 import os
+import re
 import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import boto3
+import pyarrow as pa
+from botocore.config import Config
 from dotenv import load_dotenv
 
 # Load environment variables from aws_config.env
 load_dotenv('aws_config.env')
 
+TERMINAL_STATES = ('SUCCEEDED', 'FAILED', 'CANCELLED')
+
+# Statements whose results only depend on the data and may be served from the cache
+CACHEABLE_STATEMENT = re.compile(r"^\s*(select|with|describe|show)\b", re.IGNORECASE)
+
+# Functions whose value changes between runs; a query calling them is never served from the cache
+NONDETERMINISTIC_FUNCTION = re.compile(
+    r"\b(current_date|current_time|current_timestamp|current_timezone|localtime|localtimestamp"
+    r"|now\s*\(|rand\s*\(|random\s*\(|uuid\s*\()",
+    re.IGNORECASE
+)
+
+# batch_get_query_execution accepts at most 50 ids per call
+BATCH_GET_LIMIT = 50
+
+
+def _to_bool(value: str) -> bool:
+    return value.lower() == 'true'
+
+
+# Python conversion of the VarCharValue of every Athena column type; others stay strings
+PYTHON_TYPES: Dict[str, Callable[[str], Any]] = {
+    'tinyint': int, 'smallint': int, 'integer': int, 'int': int, 'bigint': int,
+    'double': float, 'float': float, 'real': float,
+    'decimal': Decimal,
+    'boolean': _to_bool,
+    'date': date.fromisoformat,
+    'timestamp': datetime.fromisoformat
+}
+
+
+def _typed(value: Optional[str], convert: Optional[Callable[[str], Any]]) -> Any:
+    """Convert one result value, keeping it as text if it does not parse"""
+    if value is None or convert is None:
+        return value
+    try:
+        return convert(value)
+    except (ValueError, ArithmeticError):
+        return value
+
+
+def _cacheable(sql: str) -> bool:
+    """Whether the results of a statement only depend on the data it reads"""
+    return bool(CACHEABLE_STATEMENT.match(sql)) and not NONDETERMINISTIC_FUNCTION.search(sql)
+
+
+def _arrow_array(values: List[Any], data_type: pa.DataType) -> pa.Array:
+    """Arrow array of converted values; values the column type cannot hold, e.g. a NaN decimal, become null"""
+    try:
+        return pa.array(values, type=data_type)
+    except (ValueError, TypeError, ArithmeticError):
+        pass
+    cleaned = []
+    for value in values:
+        try:
+            pa.scalar(value, type=data_type)
+        except (ValueError, TypeError, ArithmeticError):
+            value = None
+        cleaned.append(value)
+    return pa.array(cleaned, type=data_type)
+
+
+def _arrow_type(column: Dict[str, Any]) -> pa.DataType:
+    """Arrow type of an Athena result column"""
+    athena_type = column['Type']
+    if athena_type in ('tinyint', 'smallint', 'integer', 'int'):
+        return pa.int32()
+    if athena_type == 'bigint':
+        return pa.int64()
+    if athena_type == 'double':
+        return pa.float64()
+    if athena_type in ('float', 'real'):
+        return pa.float32()
+    if athena_type == 'decimal':
+        return pa.decimal128(column.get('Precision') or 38, column.get('Scale') or 0)
+    if athena_type == 'boolean':
+        return pa.bool_()
+    if athena_type == 'date':
+        return pa.date32()
+    if athena_type == 'timestamp':
+        return pa.timestamp('ms')
+    return pa.string()
+
+
+class AthenaQueryError(Exception):
+    """Raised when an Athena query fails or is cancelled"""
+
+
+class AthenaQueryRunner:
+    def __init__(self, database: Optional[str] = None, output_location: Optional[str] = None,
+                 workgroup: Optional[str] = None, athena_client=None, max_concurrency: int = 5,
+                 poll_interval: float = 0.25, max_poll_interval: float = 5.0, backoff: float = 1.5,
+                 cache_ttl: float = 3600.0, cache_path: Optional[str] = None, page_size: int = 1000):
+        """
+        Initialize a client that runs Athena queries concurrently
+        
+        Queries are submitted up to max_concurrency at a time and all running queries are
+        polled together with one batch_get_query_execution call. The poll interval starts
+        at poll_interval and grows by backoff up to max_poll_interval while nothing
+        changes, so short queries return quickly and long ones cost few requests.
+        Successful SELECT, WITH, DESCRIBE and SHOW queries are cached by a hash of the
+        database, workgroup and normalized SQL; a repeated query within cache_ttl reads
+        the stored results of the earlier execution instead of scanning again. Queries
+        calling current_date, now(), rand() and similar functions always run again.
+        
+        Args:
+            database (Optional[str]): Glue database, GLUE_DATABASE_NAME by default
+            output_location (Optional[str]): s3:// location of the results, ATHENA_OUTPUT_LOCATION by default
+            workgroup (Optional[str]): Athena workgroup, the account default by default
+            athena_client: Preconfigured boto3 Athena client, e.g. one wrapped in a Stubber
+            max_concurrency (int): Queries running at the same time; keep below the account quota
+            poll_interval (float): First wait between two status polls in seconds
+            max_poll_interval (float): Longest wait between two status polls in seconds
+            backoff (float): Factor the wait grows by while no query finishes
+            cache_ttl (float): Seconds a successful result may be reused; 0 disables the cache
+            cache_path (Optional[str]): JSON file persisting the cache across processes
+            page_size (int): Rows per get_query_results page, at most 1000
+        """
+        self.database = database or os.getenv('GLUE_DATABASE_NAME', 'citibikes_analytics')
+        self.output_location = output_location or os.getenv(
+            'ATHENA_OUTPUT_LOCATION', 's3://citibikes-logs-2024/athena-output/')
+        self.workgroup = workgroup
+        # Adaptive retries slow down client-side when Athena throttles the API
+        self.athena_client = athena_client or boto3.client(
+            'athena', config=Config(retries={'max_attempts': 10, 'mode': 'adaptive'}))
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.cache_ttl = cache_ttl
+        self.cache_path = cache_path
+        self.page_size = page_size
+        self.logger = logging.getLogger(__name__)
+        self._cache: Dict[str, Tuple[str, float]] = self._load_cache()
+    
+    def _load_cache(self) -> Dict[str, Tuple[str, float]]:
+        """Query hash to execution id and completion time"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as file:
+                return {key: tuple(value) for key, value in json.load(file).items()}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable query cache {self.cache_path}: {e}")
+            return {}
+    
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.cache_path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self._cache, file)
+        os.replace(temporary, self.cache_path)
+    
+    def query_hash(self, sql: str) -> str:
+        """Cache key of a query; line breaks, indentation and a trailing semicolon do not matter"""
+        normalized = " ".join(sql.split()).rstrip(';')
+        return hashlib.sha256(f"{self.database}\0{self.workgroup}\0{normalized}".encode('utf-8')).hexdigest()
+    
+    def cached_execution(self, sql: str) -> Optional[str]:
+        """Execution id of a still valid earlier run of the same query"""
+        if not self.cache_ttl or not _cacheable(sql):
+            return None
+        entry = self._cache.get(self.query_hash(sql))
+        if entry and time.time() - entry[1] < self.cache_ttl:
+            return entry[0]
+        return None
+    
+    def submit(self, sql: str) -> str:
+        """
+        Start a query without waiting for it
+        
+        Args:
+            sql (str): Query text
+        
+        Returns:
+            str: Query execution id
+        """
+        request = {
+            'QueryString': sql,
+            'QueryExecutionContext': {'Database': self.database},
+            'ResultConfiguration': {'OutputLocation': self.output_location}
+        }
+        if self.workgroup:
+            request['WorkGroup'] = self.workgroup
+        try:
+            return self.athena_client.start_query_execution(**request)['QueryExecutionId']
+        except Exception as e:
+            self.logger.error(f"Failed to start query: {e}")
+            raise
+    
+    def run_queries(self, queries: Dict[str, str], timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Run named queries concurrently and wait for all of them
+        
+        Args:
+            queries (Dict[str, str]): SQL by query name
+            timeout (Optional[float]): Seconds after which queries still running are cancelled
+        
+        Returns:
+            Dict[str, Dict[str, Any]]: Per query name the execution id, final state, error,
+                whether it came from the cache, bytes scanned and run time in milliseconds
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        queued = list(queries.items())
+        running: Dict[str, str] = {}
+        deadline = time.monotonic() + timeout if timeout else None
+        interval = self.poll_interval
+        
+        while queued or running:
+            while queued and len(running) < self.max_concurrency:
+                name, sql = queued.pop(0)
+                cached = self.cached_execution(sql)
+                if cached:
+                    results[name] = {'execution_id': cached, 'state': 'SUCCEEDED', 'error': None, 'cached': True,
+                                     'data_scanned_bytes': 0, 'execution_ms': 0}
+                    continue
+                try:
+                    running[self.submit(sql)] = name
+                except Exception as e:
+                    results[name] = {'execution_id': None, 'state': 'FAILED', 'error': str(e), 'cached': False,
+                                     'data_scanned_bytes': 0, 'execution_ms': 0}
+                    continue
+                interval = self.poll_interval
+            if not running:
+                break
+            
+            if deadline and time.monotonic() >= deadline:
+                for execution_id, name in running.items():
+                    try:
+                        self.athena_client.stop_query_execution(QueryExecutionId=execution_id)
+                    except Exception as e:
+                        # Keep cancelling the rest; the results collected so far are still returned
+                        self.logger.warning(f"Failed to stop query {name} ({execution_id}): {e}")
+                    results[name] = {'execution_id': execution_id, 'state': 'CANCELLED', 'error': "Timed out",
+                                     'cached': False, 'data_scanned_bytes': 0, 'execution_ms': 0}
+                break
+            
+            time.sleep(interval)
+            finished = False
+            execution_ids = list(running)
+            for start in range(0, len(execution_ids), BATCH_GET_LIMIT):
+                response = self.athena_client.batch_get_query_execution(
+                    QueryExecutionIds=execution_ids[start:start + BATCH_GET_LIMIT])
+                for execution in response['QueryExecutions']:
+                    status = execution['Status']
+                    if status['State'] not in TERMINAL_STATES:
+                        continue
+                    finished = True
+                    execution_id = execution['QueryExecutionId']
+                    name = running.pop(execution_id)
+                    statistics = execution.get('Statistics', {})
+                    results[name] = {
+                        'execution_id': execution_id,
+                        'state': status['State'],
+                        'error': status.get('StateChangeReason'),
+                        'cached': False,
+                        'data_scanned_bytes': statistics.get('DataScannedInBytes', 0),
+                        'execution_ms': statistics.get('EngineExecutionTimeInMillis', 0)
+                    }
+                    if status['State'] == 'SUCCEEDED' and _cacheable(queries[name]):
+                        self._cache[self.query_hash(queries[name])] = (execution_id, time.time())
+                    elif status['State'] != 'SUCCEEDED':
+                        self.logger.error(f"Query {name} {status['State']}: {status.get('StateChangeReason')}")
+            interval = self.poll_interval if finished else min(interval * self.backoff, self.max_poll_interval)
+        
+        self._save_cache()
+        return results
+    
+    def iter_pages(self, execution_id: str) -> Iterator[Tuple[List[Dict[str, Any]], List[List[Optional[str]]]]]:
+        """
+        Stream the result pages of a finished query
+        
+        Args:
+            execution_id (str): Query execution id
+        
+        Yields:
+            Tuple[List[Dict[str, Any]], List[List[Optional[str]]]]: Column info and raw values of one page
+        """
+        paginator = self.athena_client.get_paginator('get_query_results')
+        first_page = True
+        for page in paginator.paginate(QueryExecutionId=execution_id,
+                                       PaginationConfig={'PageSize': self.page_size}):
+            columns = page['ResultSet']['ResultSetMetadata']['ColumnInfo']
+            rows = [[datum.get('VarCharValue') for datum in row['Data']] for row in page['ResultSet']['Rows']]
+            # SELECT results repeat the column names as the first row; DESCRIBE and SHOW do not
+            if first_page and rows and rows[0] == [column['Name'] for column in columns]:
+                rows = rows[1:]
+            first_page = False
+            yield columns, rows
+    
+    def iter_rows(self, execution_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the rows of a finished query with values converted to their column types
+        
+        Args:
+            execution_id (str): Query execution id
+        
+        Yields:
+            Dict[str, Any]: One row by column name
+        """
+        for columns, rows in self.iter_pages(execution_id):
+            converters = [(column['Name'], PYTHON_TYPES.get(column['Type'])) for column in columns]
+            for row in rows:
+                yield {name: _typed(value, convert) for (name, convert), value in zip(converters, row)}
+    
+    def iter_arrow_batches(self, execution_id: str) -> Iterator[pa.RecordBatch]:
+        """
+        Stream the results of a finished query as one Arrow record batch per page
+        
+        Values that do not convert to their column type are null, as Arrow columns
+        cannot fall back to text the way iter_rows does.
+        
+        Args:
+            execution_id (str): Query execution id
+        
+        Yields:
+            pa.RecordBatch: Typed columns of one page
+        """
+        for columns, rows in self.iter_pages(execution_id):
+            schema = pa.schema([(column['Name'], _arrow_type(column)) for column in columns])
+            arrays = []
+            for index, (column, field) in enumerate(zip(columns, schema)):
+                convert = PYTHON_TYPES.get(column['Type'])
+                arrays.append(_arrow_array([_typed(row[index], convert) for row in rows], field.type))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+    
+    def run(self, sql: str, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Run one query and return its typed rows
+        
+        Args:
+            sql (str): Query text
+            timeout (Optional[float]): Seconds after which the query is cancelled
+        
+        Returns:
+            List[Dict[str, Any]]: Rows by column name
+        """
+        result = self.run_queries({'query': sql}, timeout)['query']
+        if result['state'] != 'SUCCEEDED':
+            raise AthenaQueryError(f"Query {result['execution_id']} {result['state']}: {result['error']}")
+        return list(self.iter_rows(result['execution_id']))
+
+
 def query_athena():
     """Run sample queries on Glue tables"""
     try:
-        athena_client = boto3.client('athena')
-        s3_client = boto3.client('s3')
-        
-        database = os.getenv('GLUE_DATABASE_NAME', 'citibikes_analytics')
-        output_location = os.getenv('ATHENA_OUTPUT_LOCATION', 's3://citibikes-logs-2024/athena-output/')
+        runner = AthenaQueryRunner(cache_path='state/athena_cache.json')
         
         # Sample queries
         queries = {
             'total_logs': 'SELECT COUNT(*) as total_logs FROM logs_manual',
             'sample_data': 'SELECT * FROM logs_manual LIMIT 10',
-            'log_structure': 'DESCRIBE logs_manual'
+            'log_structure': 'DESCRIBE logs_manual',
+            'emptiest_stations': (
+                "SELECT station_id, AVG(num_bikes_available) AS avg_bikes FROM station_status "
+                "WHERE dt = CAST(current_date AS varchar) GROUP BY station_id ORDER BY avg_bikes LIMIT 10"
+            )
         }
         
-        for query_name, query in queries.items():
-            print(f"Running query: {query_name}")
-            print(f"SQL: {query}")
-            
-            # Start query execution
-            response = athena_client.start_query_execution(
-                QueryString=query,
-                QueryExecutionContext={'Database': database},
-                ResultConfiguration={'OutputLocation': output_location}
-            )
-            
-            query_execution_id = response['QueryExecutionId']
-            print(f"Query ID: {query_execution_id}")
-            
-            # Wait for completion
-            while True:
-                query_status = athena_client.get_query_execution(QueryExecutionId=query_execution_id)
-                state = query_status['QueryExecution']['Status']['State']
-                
-                if state == 'SUCCEEDED':
-                    print(f"Query {query_name} completed successfully!")
-                    break
-                elif state in ['FAILED', 'CANCELLED']:
-                    print(f"Query {query_name} failed: {state}")
-                    break
-                
-                time.sleep(2)
-            
+        print(f"Running {len(queries)} queries...")
+        results = runner.run_queries(queries)
+        success = True
+        for query_name, result in results.items():
+            print(f"Query: {query_name} ({result['execution_id']})")
+            print(f"SQL: {queries[query_name]}")
+            if result['state'] != 'SUCCEEDED':
+                print(f"Query {query_name} failed: {result['state']} {result['error'] or ''}")
+                success = False
+            else:
+                source = "cache" if result['cached'] else f"{result['data_scanned_bytes']} bytes scanned"
+                print(f"Query {query_name} completed successfully! ({source})")
+                for row in runner.iter_rows(result['execution_id']):
+                    print(f"   {row}")
             print("-" * 50)
         
-        return True
-        
+        return success
+    
     except Exception as e:
         print(f"Error querying Athena: {e}")
         return False
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     print("Running Athena queries...")
     success = query_athena()
     if success:
         print("All queries completed!")
     else:
-        print("Some queries failed") 
\ No newline at end of file
+        print("Some queries failed")
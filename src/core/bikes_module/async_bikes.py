@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Dict, Any, List, Optional
+from src.core.bikes_module.feeds import GbfsFeed, FeedFreshness, default_feeds, extract_records, record_key, skipped_report
+from src.core.bikes_module.station_diff import StationStatusTracker
+from src.utils.observability.metrics import observe_feed_report
+from src.utils.serialization.codec import get_codec
+from src.utils.services.async_http_service import AsyncHttpService
+from src.streaming.kafka_producer.async_producer import AsyncProducer
+
+
+class AsyncBikes:
+    def __init__(self, feeds: Optional[List[GbfsFeed]] = None, bootstrap_servers: Optional[str] = None,
+                 linger_ms: Optional[int] = None, batch_size: Optional[int] = None, compression_type: Optional[str] = None,
+                 changes_only: bool = True, checkpoint_every: int = 60, respect_ttl: bool = True,
+                 codec: Optional[str] = None, max_concurrency: int = 50, wire_format: str = 'json',
+                 schema_registry: Optional[str] = None, producer_profile: Optional[str] = None,
+                 allow_json: bool = False):
+        """
+        Initialize the asyncio Bikes orchestrator
+        
+        All feeds, possibly of several bike-share systems, are fetched and published
+        from a single event loop.
+        
+        Args:
+            feeds (Optional[List[GbfsFeed]]): Feeds to poll, Citi Bike by default
+            bootstrap_servers (Optional[str]): Kafka broker addresses, from Config by default
+            linger_ms (Optional[int]): Producer linger time used to fill batches, overriding the profile
+            batch_size (Optional[int]): Producer per-partition batch size in bytes, overriding the profile
+            compression_type (Optional[str]): Producer compression codec or 'none', overriding the profile
+            changes_only (bool): Publish only changed stations for feeds with track_changes
+            checkpoint_every (int): Publish a full snapshot every N polls of a tracked feed
+            respect_ttl (bool): Skip feeds that are within their GBFS ttl or unchanged
+            codec (Optional[str]): JSON codec used to decode feeds and encode messages
+            max_concurrency (int): Maximum number of feeds processed at the same time
+            wire_format (str): Kafka message format, 'json' or schema-registry framed 'avro'
+            schema_registry (Optional[str]): Schema registry URL or local schema directory for Avro
+            producer_profile (Optional[str]): Producer throughput profile from Config
+            allow_json (bool): With Avro, publish topics without a schema as JSON, see Bikes
+        """
+        self.feeds = feeds if feeds is not None else default_feeds()
+        self.changes_only = changes_only
+        self.checkpoint_every = checkpoint_every
+        self.respect_ttl = respect_ttl
+        self.codec = get_codec(codec)
+        self.http_service = AsyncHttpService(max_connections=max_concurrency)
+        self.producer = AsyncProducer(
+            bootstrap_servers=bootstrap_servers,
+            linger_ms=linger_ms,
+            batch_size=batch_size,
+            compression_type=compression_type,
+            codec=self.codec,
+            wire_format=wire_format,
+            schema_registry=schema_registry,
+            profile=producer_profile,
+            allow_json=allow_json
+        )
+        self.freshness = FeedFreshness()
+        self.trackers: Dict[str, StationStatusTracker] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.logger = logging.getLogger(__name__)
+    
+    async def start(self):
+        """Open the HTTP session and connect the producer"""
+        await self.http_service.start()
+        await self.producer.start()
+        self.logger.info(f"Async Bikes orchestrator started with {len(self.feeds)} feeds")
+    
+    async def run_cycle(self) -> List[Dict[str, Any]]:
+        """
+        Fetch and publish every feed concurrently
+        
+        Returns:
+            List[Dict[str, Any]]: One snapshot report per feed; feeds that failed are
+            reported with an 'error' entry instead of aborting the cycle
+        """
+        results = await asyncio.gather(
+            *(self.fetch_and_publish(feed) for feed in self.feeds),
+            return_exceptions=True
+        )
+        
+        reports = []
+        for feed, result in zip(self.feeds, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Error processing feed {feed.name} ({feed.url}): {result}")
+                error = result
+                result = skipped_report(feed.topic, feed.name, "error", 0.0)
+                result['error'] = str(error)
+            observe_feed_report(result)
+            reports.append(result)
+        return reports
+    
+    async def fetch_and_publish(self, feed: GbfsFeed) -> Dict[str, Any]:
+        """
+        Fetch one feed and publish its stations
+        
+        Args:
+            feed (GbfsFeed): Feed to process
+            
+        Returns:
+            Dict[str, Any]: Snapshot report in the same shape as Bikes reports
+        """
+        async with self._semaphore:
+            fetch_start = time.perf_counter()
+            
+            if self.respect_ttl and self.freshness.is_fresh(feed.url):
+                return skipped_report(feed.topic, feed.name, "ttl not expired", time.perf_counter() - fetch_start)
+            
+            body = await self.http_service.get_bytes(feed.url, conditional=self.respect_ttl)
+            if body is None:
+                return skipped_report(feed.topic, feed.name, "not modified", time.perf_counter() - fetch_start)
+            
+            parse_start = time.perf_counter()
+            fetch_seconds = parse_start - fetch_start
+            document = self.codec.decode(body)
+            
+            if self.respect_ttl and self.freshness.is_repeat(feed.url, document):
+                self.freshness.update(feed.url, document)
+                return skipped_report(feed.topic, feed.name, "same last_updated", fetch_seconds)
+            
+            stations = extract_records(feed, document)
+            parse_seconds = time.perf_counter() - parse_start
+            tracker = self._tracker_for(feed)
+            checkpoint = True
+            if tracker is not None:
+                stations_total = len(stations)
+                stations, checkpoint = tracker.diff(stations)
+            
+            publish_start = time.perf_counter()
+            try:
+                result = await self.producer.send_batch(feed.topic, stations, key_func=partial(record_key, feed))
+            except Exception:
+                if tracker is not None:
+                    tracker.reset()
+                self.http_service.clear_validators(feed.url)
+                raise
+            
+            self.freshness.update(feed.url, document)
+            report = {
+                'feed': feed.name,
+                'topic': feed.topic,
+                'records': len(stations),
+                'acked': result['acked'],
+                'failed': result['failed'],
+                'fetch_seconds': fetch_seconds,
+                'parse_seconds': parse_seconds,
+                'publish_seconds': time.perf_counter() - publish_start
+            }
+            if tracker is not None:
+                report['stations'] = stations_total
+                report['checkpoint'] = checkpoint
+            return report
+    
+    def _tracker_for(self, feed: GbfsFeed) -> Optional[StationStatusTracker]:
+        """Return the change tracker of a feed, creating it on first use"""
+        if not (self.changes_only and feed.track_changes):
+            return None
+        if feed.url not in self.trackers:
+            self.trackers[feed.url] = StationStatusTracker(checkpoint_every=self.checkpoint_every)
+        return self.trackers[feed.url]
+    
+    async def run_forever(self, interval: float, stop_event: asyncio.Event, on_cycle=None):
+        """
+        Run cycles every interval seconds until stop_event is set
+        
+        Args:
+            interval (float): Seconds between the start of two cycles
+            stop_event (asyncio.Event): Event that ends the loop, also while waiting
+            on_cycle (Optional[Callable]): Called with the reports of every cycle
+        """
+        next_cycle = time.monotonic()
+        while not stop_event.is_set():
+            reports = await self.run_cycle()
+            if on_cycle:
+                on_cycle(reports)
+            
+            next_cycle += interval
+            delay = next_cycle - time.monotonic()
+            if delay < 0:
+                # Cycle overran the interval: start the next one now and re-anchor
+                next_cycle = time.monotonic()
+                continue
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def close(self):
+        """Close the HTTP session and flush the producer"""
+        await self.http_service.close()
+        await self.producer.close()
+    
+    async def __aenter__(self):
+        """Async context manager entry"""
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit"""
+        await self.close()
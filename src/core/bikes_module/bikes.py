@@ -1,23 +1,278 @@
+import logging
+import time
+from functools import partial
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import numpy as np
+from src.utils.observability.log_setup import LogAggregator
+from src.utils.observability.metrics import FEED_POLLS, observe_feed_report
 from src.utils.services.http_service import HttpService
-from src.streaming.kafka_producer.producer import Producer
+from src.utils.serialization.codec import get_codec
+from src.utils.serialization.stream_parser import iter_array_items
+from src.core.bikes_module.station_diff import StationStatusTracker
+from src.core.bikes_module.station_snapshot import StationSnapshot, ColumnarStatusTracker
+from src.core.bikes_module.feeds import GbfsFeed, FeedFreshness, extract_records, record_key, skipped_report
+from src.streaming.kafka_producer.producer import Producer, AckTracker
 from src.utils.constants.topics import BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC
 
 
 class Bikes:
-    def __init__(self):
+    def __init__(self, batch_mode: bool = True, linger_ms: Optional[int] = None, batch_size: Optional[int] = None,
+                 compression_type: Optional[str] = None, changes_only: bool = True,
+                 checkpoint_every: int = 60, respect_ttl: bool = True, codec: Optional[str] = None,
+                 streaming: bool = False, columnar: bool = False, wire_format: str = 'json',
+                 schema_registry: Optional[str] = None, producer_profile: Optional[str] = None,
+                 allow_json: bool = False):
+        """
+        Initialize the Bikes orchestrator
+        
+        Args:
+            batch_mode (bool): Publish each feed snapshot through Producer.send_batch
+                instead of logging and sending record by record
+            linger_ms (Optional[int]): Producer linger time used to fill batches, overriding the profile
+            batch_size (Optional[int]): Producer per-partition batch size in bytes, overriding the profile
+            compression_type (Optional[str]): Producer compression codec or 'none', overriding the profile
+            changes_only (bool): Publish only stations whose status changed since the
+                previous poll of this orchestrator
+            checkpoint_every (int): Publish a full status snapshot every N polls
+            respect_ttl (bool): Skip feeds whose GBFS last_updated + ttl has not expired
+                and feeds the server reports as unchanged (304 or same last_updated)
+            codec (Optional[str]): JSON codec used to decode feeds and encode messages
+            streaming (bool): Parse feeds incrementally off the socket and publish each
+                station as soon as it is decoded. Only HTTP validators are honoured in
+                this mode since last_updated/ttl are not read
+            columnar (bool): Load station feeds into a NumPy StationSnapshot to drop
+                invalid stations and find changed ones with vectorized operations
+                (not used with streaming)
+            wire_format (str): Kafka message format, 'json' or schema-registry framed 'avro'
+            schema_registry (Optional[str]): Schema registry URL or local schema directory for Avro
+            producer_profile (Optional[str]): Producer throughput profile from Config, the
+                configured one by default
+            allow_json (bool): With Avro, publish topics without a schema as JSON, as
+                feeds found through discovery have none
+        """
+        self.batch_mode = batch_mode
+        self.streaming = streaming
+        self.columnar = columnar and not streaming
+        self.respect_ttl = respect_ttl
+        self.freshness = FeedFreshness()
+        self.changes_only = changes_only
+        self.checkpoint_every = checkpoint_every
+        self.trackers: Dict[str, StationStatusTracker] = {}
+        self.codec = get_codec(codec)
         self.http_service = HttpService()
-        self.producer = Producer()
+        self.producer = Producer(
+            codec=self.codec,
+            wire_format=wire_format,
+            schema_registry=schema_registry,
+            linger_ms=linger_ms,
+            batch_size=batch_size,
+            compression_type=compression_type,
+            profile=producer_profile,
+            allow_json=allow_json
+        )
+        self.logger = logging.getLogger(__name__)
+        # Record mode counts published records per feed, with a DEBUG sample every 1000
+        self.record_log = LogAggregator(self.logger, "Records published", sample_every=1000)
         
     def get_bikes_station_information(self, url, params={}):
-        response = self.http_service.get(url, params).json()
-        for message in response['data']['stations']:
-            print("bikes_station_information", message)
-            self.producer.data_producer(BIKES_STATION_INFORMATION_TOPIC, message)
+        feed = GbfsFeed("bikes_station_information", url, BIKES_STATION_INFORMATION_TOPIC)
+        return self.process_feed(feed, params)
             
     def get_bikes_station_status(self, url, params={}):
-        response = self.http_service.get(url, params).json()
-        for message in response['data']['stations']:
-            print("bikes_station_status", message)
-            self.producer.data_producer(BIKES_STATION_STATUS_TOPIC, message)
+        feed = GbfsFeed("bikes_station_status", url, BIKES_STATION_STATUS_TOPIC, track_changes=True)
+        return self.process_feed(feed, params)
+    
+    def process_feed(self, feed: GbfsFeed, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Fetch one GBFS feed and publish its records
+        
+        Args:
+            feed (GbfsFeed): Feed to process
+            params (Optional[Dict[str, Any]]): Query parameters
+            
+        Returns:
+            Dict[str, Any]: Snapshot report with record counts and timings
+        """
+        try:
+            report = self._process_feed(feed, params)
+        except Exception:
+            FEED_POLLS.labels(feed.name, "error").inc()
+            raise
+        observe_feed_report(report)
+        return report
+    
+    def _process_feed(self, feed: GbfsFeed, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fetch, parse and publish one feed, returning the snapshot report"""
+        tracker = self._tracker_for(feed)
+        if self.streaming and feed.records_key:
+            return self._stream_feed_incrementally(feed, params, tracker)
+        
+        url, topic = feed.url, feed.topic
+        fetch_start = time.perf_counter()
+        
+        if self.respect_ttl and self.freshness.is_fresh(url):
+            return skipped_report(topic, feed.name, "ttl not expired", time.perf_counter() - fetch_start)
+        
+        if self.respect_ttl:
+            http_response = self.http_service.get_if_modified(url, params)
+            if http_response is None:
+                return skipped_report(topic, feed.name, "not modified", time.perf_counter() - fetch_start)
+        else:
+            http_response = self.http_service.get(url, params)
+        
+        parse_start = time.perf_counter()
+        fetch_seconds = parse_start - fetch_start
+        response = self.codec.decode(http_response.content)
+        
+        if self.respect_ttl and self.freshness.is_repeat(url, response):
+            self.freshness.update(url, response)
+            return skipped_report(topic, feed.name, "same last_updated", fetch_seconds)
+        
+        stations = extract_records(feed, response)
+        parse_seconds = time.perf_counter() - parse_start
+        try:
+            if self.columnar and feed.records_key == "stations":
+                changed, checkpoint = self._select_columnar(feed, stations, tracker)
+            elif tracker is not None:
+                changed, checkpoint = tracker.diff(stations)
+            else:
+                changed, checkpoint = stations, True
             
-            
\ No newline at end of file
+            try:
+                report = self.publish_snapshot(topic, changed, feed.name, partial(record_key, feed))
+            except Exception:
+                if tracker is not None:
+                    # The index already holds this poll, so force a full resend next time
+                    tracker.reset()
+                raise
+            if tracker is not None:
+                report['stations'] = len(stations)
+                report['checkpoint'] = checkpoint
+        except Exception:
+            # Without validators the next poll downloads the feed again instead of a 304
+            self.http_service.clear_validators(url)
+            raise
+        
+        self.freshness.update(url, response)
+        report['fetch_seconds'] = fetch_seconds
+        report['parse_seconds'] = parse_seconds
+        return report
+    
+    def _tracker_for(self, feed: GbfsFeed) -> Optional[StationStatusTracker]:
+        """Return the change tracker of a feed, creating it on first use"""
+        if not (self.changes_only and feed.track_changes):
+            return None
+        if feed.url not in self.trackers:
+            tracker_class = ColumnarStatusTracker if self.columnar else StationStatusTracker
+            self.trackers[feed.url] = tracker_class(checkpoint_every=self.checkpoint_every)
+        return self.trackers[feed.url]
+    
+    def _select_columnar(self, feed: GbfsFeed, stations: List[Dict[str, Any]],
+                         tracker: Optional[ColumnarStatusTracker]) -> Tuple[List[Dict[str, Any]], bool]:
+        """Drop invalid stations and, for tracked feeds, unchanged ones using a StationSnapshot"""
+        snapshot = StationSnapshot.from_records(stations)
+        valid = snapshot.validate()
+        rows = np.arange(len(snapshot))
+        if not valid.all():
+            rows = np.flatnonzero(valid)
+            self.logger.warning(
+                f"{feed.name}: dropping {len(snapshot) - len(rows)} invalid stations, "
+                f"e.g. {snapshot.station_id[~valid][:5].tolist()}"
+            )
+            snapshot = snapshot.take(rows)
+        
+        checkpoint = True
+        if tracker is not None:
+            changed, checkpoint = tracker.diff_snapshot(snapshot)
+            rows = rows[changed]
+        return [stations[row] for row in rows], checkpoint
+    
+    def _stream_feed_incrementally(self, feed: GbfsFeed, params,
+                                   tracker: Optional[StationStatusTracker] = None) -> Dict[str, Any]:
+        """Publish records while the feed is still downloading, returning the snapshot report"""
+        url, topic = feed.url, feed.topic
+        fetch_start = time.perf_counter()
+        chunks = self.http_service.stream(url, params, conditional=self.respect_ttl)
+        if chunks is None:
+            return skipped_report(topic, feed.name, "not modified", time.perf_counter() - fetch_start)
+        
+        checkpoint = tracker.begin_poll() if tracker is not None else True
+        ack_tracker = AckTracker()
+        stations = 0
+        records = 0
+        try:
+            for station in iter_array_items(chunks, feed.records_key, self.codec):
+                stations += 1
+                if tracker is not None and not tracker.observe(station):
+                    continue
+                if feed.tag_system:
+                    station['system_id'] = feed.system_id
+                self.producer.send_async(topic, station, key=record_key(feed, station), ack_tracker=ack_tracker)
+                records += 1
+            fetch_seconds = time.perf_counter() - fetch_start
+            
+            publish_start = time.perf_counter()
+            result = self.producer.ack_barrier(ack_tracker=ack_tracker)
+        except Exception:
+            if tracker is not None:
+                tracker.reset()
+            self.http_service.clear_validators(url)
+            raise
+        
+        if tracker is not None:
+            tracker.end_poll()
+        
+        report = {
+            'feed': feed.name,
+            'topic': topic,
+            'records': records,
+            'acked': result['acked'],
+            'failed': result['failed'],
+            'fetch_seconds': fetch_seconds,
+            'publish_seconds': time.perf_counter() - publish_start
+        }
+        if tracker is not None:
+            report['stations'] = stations
+            report['checkpoint'] = checkpoint
+        return report
+    
+    def publish_snapshot(self, topic: str, stations: List[Dict[str, Any]], feed: str = None,
+                         key_func: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None) -> Dict[str, Any]:
+        """
+        Publish a complete feed snapshot to Kafka
+        
+        Args:
+            topic (str): Target topic name
+            stations (List[Dict[str, Any]]): Station records of one snapshot
+            feed (str): Feed name used in the report and record-mode output
+            key_func (Optional[Callable[[Dict[str, Any]], Optional[str]]]): Derives each
+                record's message key, e.g. its station_id
+            
+        Returns:
+            Dict[str, Any]: Record counts and publish timings for the snapshot
+        """
+        publish_start = time.perf_counter()
+        if self.batch_mode:
+            result = self.producer.send_batch(topic, stations, key_func=key_func)
+        else:
+            ack_tracker = AckTracker()
+            for message in stations:
+                self.record_log.record(feed or topic, sample=message)
+                key = key_func(message) if key_func else None
+                self.producer.send_async(topic, message, key=key, ack_tracker=ack_tracker)
+            result = self.producer.ack_barrier(ack_tracker=ack_tracker)
+        
+        return {
+            'feed': feed or topic,
+            'topic': topic,
+            'records': len(stations),
+            'acked': result['acked'],
+            'failed': result['failed'],
+            'publish_seconds': time.perf_counter() - publish_start
+        }
+    
+    def close(self):
+        """Release the HTTP session and flush the producer"""
+        self.http_service.close()
+        self.record_log.flush()
+        self.producer.close()
@@ -0,0 +1,102 @@
+import logging
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse
+from src.core.bikes_module.feeds import GbfsFeed, FEED_RECORD_KEYS, FEED_RECORD_ID_FIELDS
+from src.utils.constants.topics import GBFS_FEED_TOPICS
+from src.utils.serialization.codec import get_codec
+from src.utils.services.http_service import HttpService
+
+# Feeds that describe the feed list itself rather than system data
+SKIPPED_FEEDS = {"gbfs", "gbfs_versions", "manifest"}
+
+# Feeds whose records are diffed between polls so only changes are published
+TRACKED_FEEDS = {"station_status"}
+
+
+class GbfsDiscovery:
+    def __init__(self, http_service: HttpService, codec: Optional[str] = None, language: str = "en"):
+        """
+        Resolve GBFS auto-discovery documents (gbfs.json) into feeds
+        
+        Args:
+            http_service (HttpService): Service used to download discovery documents
+            codec (Optional[str]): JSON codec used to decode them
+            language (str): Preferred language of GBFS 1.x/2.x discovery documents
+        """
+        self.http_service = http_service
+        self.codec = get_codec(codec)
+        self.language = language
+        self.logger = logging.getLogger(__name__)
+    
+    def discover(self, discovery_url: str) -> List[GbfsFeed]:
+        """
+        Resolve every feed advertised by one discovery document
+        
+        Args:
+            discovery_url (str): URL of the system's gbfs.json
+            
+        Returns:
+            List[GbfsFeed]: Feeds of the system, tagged with its system_id
+        """
+        document = self._get_json(discovery_url)
+        feed_urls = {
+            feed['name']: feed['url']
+            for feed in self._feed_list(document['data'])
+            if feed['name'] not in SKIPPED_FEEDS
+        }
+        system_id = self._system_id(discovery_url, feed_urls.get('system_information'))
+        
+        feeds = [
+            GbfsFeed(
+                name=f"{system_id}/{name}",
+                url=url,
+                topic=GBFS_FEED_TOPICS.get(name, f"bikes-{name.replace('_', '-')}"),
+                system_id=system_id,
+                track_changes=name in TRACKED_FEEDS,
+                records_key=FEED_RECORD_KEYS.get(name),
+                tag_system=True,
+                key_field=FEED_RECORD_ID_FIELDS.get(name)
+            )
+            for name, url in feed_urls.items()
+        ]
+        self.logger.info(f"Discovered {len(feeds)} feeds for system {system_id}: {sorted(feed_urls)}")
+        return feeds
+    
+    def discover_all(self, discovery_urls: List[str]) -> List[GbfsFeed]:
+        """
+        Resolve the feeds of several systems
+        
+        Args:
+            discovery_urls (List[str]): URLs of gbfs.json documents
+            
+        Returns:
+            List[GbfsFeed]: Feeds of every system that could be resolved
+        """
+        feeds = []
+        for discovery_url in discovery_urls:
+            try:
+                feeds.extend(self.discover(discovery_url))
+            except Exception as e:
+                self.logger.error(f"Failed to resolve GBFS discovery document {discovery_url}: {e}")
+        return feeds
+    
+    def _feed_list(self, data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Return the feed list of a discovery document's data object"""
+        # GBFS 3.0 lists feeds directly, earlier versions nest them under a language
+        if 'feeds' in data:
+            return data['feeds']
+        language = self.language if self.language in data else next(iter(data))
+        return data[language]['feeds']
+    
+    def _system_id(self, discovery_url: str, system_information_url: Optional[str]) -> str:
+        """Read the system_id from system_information, falling back to the host name"""
+        if system_information_url:
+            try:
+                return self._get_json(system_information_url)['data']['system_id']
+            except Exception as e:
+                self.logger.warning(f"Could not read system_id from {system_information_url}: {e}")
+        return urlparse(discovery_url).hostname
+    
+    def _get_json(self, url: str) -> Dict[str, Any]:
+        """Download and decode a JSON document"""
+        return self.codec.decode(self.http_service.get(url).content)
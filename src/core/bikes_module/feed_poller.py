@@ -0,0 +1,62 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+from src.core.bikes_module.bikes import Bikes
+from src.core.bikes_module.feeds import GbfsFeed, skipped_report
+
+
+class FeedPoller:
+    def __init__(self, bikes: Bikes, feeds: List[GbfsFeed], min_interval: float = 10, max_workers: int = 8):
+        """
+        Poll many GBFS feeds, each on the cadence given by its own ttl
+        
+        A feed is due again once its GBFS last_updated + ttl has passed, but never
+        sooner than min_interval seconds after its previous poll.
+        
+        Args:
+            bikes (Bikes): Orchestrator that fetches and publishes each feed
+            feeds (List[GbfsFeed]): Feeds to poll
+            min_interval (float): Minimum number of seconds between two polls of a feed
+            max_workers (int): Maximum number of feeds polled at the same time
+        """
+        self.bikes = bikes
+        self.feeds = feeds
+        self.min_interval = min_interval
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+        self._next_due: Dict[str, float] = {feed.url: 0.0 for feed in feeds}
+    
+    def poll_due(self) -> List[Dict[str, Any]]:
+        """
+        Poll every feed that is due
+        
+        Returns:
+            List[Dict[str, Any]]: Snapshot reports of the polled feeds; failed feeds
+            are reported with an 'error' entry
+        """
+        now = time.time()
+        due = [feed for feed in self.feeds if self._next_due[feed.url] <= now]
+        if not due:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(due)), thread_name_prefix="feed") as executor:
+            return list(executor.map(self._poll, due))
+    
+    def _poll(self, feed: GbfsFeed) -> Dict[str, Any]:
+        """Poll one feed and schedule its next poll"""
+        started = time.time()
+        try:
+            report = self.bikes.process_feed(feed)
+        except Exception as e:
+            self.logger.error(f"Error processing feed {feed.name} ({feed.url}): {e}")
+            report = skipped_report(feed.topic, feed.name, "error", time.time() - started)
+            report['error'] = str(e)
+        
+        next_refresh = self.bikes.freshness.next_refresh(feed.url) or 0.0
+        self._next_due[feed.url] = max(started + self.min_interval, next_refresh)
+        return report
+    
+    def seconds_until_next(self) -> float:
+        """Return the number of seconds until the next feed is due"""
+        return max(0.0, min(self._next_due.values(), default=time.time() + self.min_interval) - time.time())
@@ -0,0 +1,150 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from src.utils.constants.routes import BIKES_STATION_INFORMATION, BIKES_STATION_STATUS
+from src.utils.constants.topics import BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC
+
+
+# Member of a GBFS document's "data" object that holds the feed's records. Feeds not
+# listed here (e.g. system_information) are published as a single record.
+FEED_RECORD_KEYS = {
+    "station_information": "stations",
+    "station_status": "stations",
+    "free_bike_status": "bikes",
+    "vehicle_status": "vehicles",
+    "vehicle_types": "vehicle_types",
+    "system_regions": "regions",
+    "system_alerts": "alerts",
+    "system_pricing_plans": "plans"
+}
+
+# Field identifying a record within its feed; it becomes the Kafka message key so every
+# record of one entity lands on the same partition and compacted topics keep its latest version
+FEED_RECORD_ID_FIELDS = {
+    "station_information": "station_id",
+    "station_status": "station_id",
+    "free_bike_status": "bike_id",
+    "vehicle_status": "vehicle_id",
+    "vehicle_types": "vehicle_type_id",
+    "system_regions": "region_id",
+    "system_alerts": "alert_id",
+    "system_pricing_plans": "plan_id",
+    "system_information": "system_id"
+}
+
+
+@dataclass
+class GbfsFeed:
+    """A GBFS feed and the topic its records are published to"""
+    name: str
+    url: str
+    topic: str
+    system_id: str = "citibike-nyc"
+    track_changes: bool = False
+    records_key: Optional[str] = "stations"
+    tag_system: bool = False
+    key_field: Optional[str] = "station_id"
+
+
+def extract_records(feed: GbfsFeed, document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Return the records of a decoded GBFS document
+    
+    Args:
+        feed (GbfsFeed): Feed the document belongs to
+        document (Dict[str, Any]): Decoded GBFS document
+        
+    Returns:
+        List[Dict[str, Any]]: Records to publish, tagged with the feed's system_id
+        when feed.tag_system is set
+    """
+    data = document['data']
+    records = data[feed.records_key] if feed.records_key else [data]
+    if feed.tag_system:
+        records = [dict(record, system_id=feed.system_id) for record in records]
+    return records
+
+
+def record_key(feed: GbfsFeed, record: Dict[str, Any]) -> Optional[str]:
+    """
+    Return the Kafka message key of a feed record
+    
+    Args:
+        feed (GbfsFeed): Feed the record belongs to
+        record (Dict[str, Any]): Feed record
+        
+    Returns:
+        Optional[str]: The record's id, prefixed with the system_id for feeds that mix
+        several systems in one topic, or None when the feed has no id field
+    """
+    if not feed.key_field or record.get(feed.key_field) is None:
+        return None
+    record_id = str(record[feed.key_field])
+    if feed.tag_system and feed.key_field != "system_id":
+        return f"{feed.system_id}:{record_id}"
+    return record_id
+
+
+def default_feeds() -> List[GbfsFeed]:
+    """Citi Bike station information and station status feeds"""
+    return [
+        GbfsFeed("bikes_station_information", BIKES_STATION_INFORMATION, BIKES_STATION_INFORMATION_TOPIC),
+        GbfsFeed("bikes_station_status", BIKES_STATION_STATUS, BIKES_STATION_STATUS_TOPIC, track_changes=True)
+    ]
+
+
+class FeedFreshness:
+    """Remembers the GBFS last_updated and ttl of the last published document per feed URL"""
+    
+    def __init__(self):
+        self._feeds: Dict[str, Dict[str, int]] = {}
+    
+    def is_fresh(self, url: str) -> bool:
+        """Check whether the last published document of a feed is still within its ttl"""
+        next_refresh = self.next_refresh(url)
+        return next_refresh is not None and time.time() < next_refresh
+    
+    def is_repeat(self, url: str, document: Dict[str, Any]) -> bool:
+        """Check whether a document carries the same last_updated as the previous one"""
+        previous = self._feeds.get(url)
+        last_updated = self._to_epoch(document.get('last_updated'))
+        return bool(previous) and last_updated is not None and previous['last_updated'] == last_updated
+    
+    def next_refresh(self, url: str) -> Optional[float]:
+        """Return the epoch time at which a feed's ttl expires, or None if unknown"""
+        freshness = self._feeds.get(url)
+        if not freshness or not freshness['last_updated'] or not freshness['ttl']:
+            return None
+        return freshness['last_updated'] + freshness['ttl']
+    
+    def update(self, url: str, document: Dict[str, Any]):
+        """Store the last_updated and ttl of a document"""
+        self._feeds[url] = {
+            'last_updated': self._to_epoch(document.get('last_updated')),
+            'ttl': document.get('ttl') or 0
+        }
+    
+    @staticmethod
+    def _to_epoch(last_updated: Any) -> Optional[float]:
+        """Convert a GBFS last_updated (POSIX seconds, or RFC 3339 since GBFS 3.0) to epoch seconds"""
+        if isinstance(last_updated, str):
+            try:
+                return datetime.fromisoformat(last_updated.replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                return None
+        return last_updated
+
+
+def skipped_report(topic: str, feed: str, reason: str, fetch_seconds: float) -> Dict[str, Any]:
+    """Build the report for a poll that found no new snapshot"""
+    return {
+        'feed': feed,
+        'topic': topic,
+        'records': 0,
+        'acked': 0,
+        'failed': 0,
+        'skipped': reason,
+        'fetch_seconds': fetch_seconds,
+        'publish_seconds': 0.0
+    }
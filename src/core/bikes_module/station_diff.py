@@ -0,0 +1,92 @@
+from typing import Dict, Any, List, Tuple, Iterable
+
+# Station status fields whose change makes a station worth republishing.
+# last_reported is deliberately excluded: it advances on every dock heartbeat.
+STATUS_FIELDS = (
+    'num_bikes_available',
+    'num_ebikes_available',
+    'num_bikes_disabled',
+    'num_docks_available',
+    'num_docks_disabled',
+    'is_installed',
+    'is_renting',
+    'is_returning'
+)
+
+
+class StationStatusTracker:
+    def __init__(self, fields: Tuple[str, ...] = STATUS_FIELDS, checkpoint_every: int = 60):
+        """
+        Track the last published status of every station
+        
+        Args:
+            fields (Tuple[str, ...]): Status fields compared between polls
+            checkpoint_every (int): Publish a full snapshot every N polls (0 disables
+                checkpoints after the first poll)
+        """
+        self.fields = fields
+        self.checkpoint_every = checkpoint_every
+        self._last_state: Dict[str, tuple] = {}
+        self._current_state: Dict[str, tuple] = {}
+        self._checkpoint = False
+        self._polls = 0
+    
+    def diff(self, stations: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Compare a status snapshot against the previous one
+        
+        Args:
+            stations (Iterable[Dict[str, Any]]): Station status records of one poll
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: Stations to publish and whether this
+            poll is a full-snapshot checkpoint
+        """
+        checkpoint = self.begin_poll()
+        changed = [station for station in stations if self.observe(station)]
+        self.end_poll()
+        return changed, checkpoint
+    
+    def begin_poll(self) -> bool:
+        """
+        Start comparing a poll whose stations arrive one at a time through observe()
+        
+        Returns:
+            bool: Whether this poll is a full-snapshot checkpoint
+        """
+        self._checkpoint = not self._last_state or (
+            self.checkpoint_every > 0 and self._polls % self.checkpoint_every == 0
+        )
+        self._polls += 1
+        self._current_state = {}
+        return self._checkpoint
+    
+    def observe(self, station: Dict[str, Any]) -> bool:
+        """
+        Record one station of the current poll
+        
+        Args:
+            station (Dict[str, Any]): Station status record
+            
+        Returns:
+            bool: Whether the station should be published
+        """
+        station_id = station.get('station_id')
+        state = tuple(station.get(field) for field in self.fields)
+        self._current_state[station_id] = state
+        return self._checkpoint or self._last_state.get(station_id) != state
+    
+    def end_poll(self):
+        """Make the current poll the baseline for the next one"""
+        # Stations missing from this poll are dropped so they count as new if they return
+        self._last_state = self._current_state
+        self._current_state = {}
+    
+    def reset(self):
+        """Forget all known state so the next poll publishes a full snapshot"""
+        self._last_state = {}
+        self._current_state = {}
+        self._polls = 0
+    
+    def __len__(self):
+        return len(self._last_state)
@@ -0,0 +1,355 @@
+import io
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import numpy as np
+from src.core.bikes_module.station_diff import STATUS_FIELDS
+
+# Value of an integer column for a field the record did not carry
+MISSING = -1
+
+# Integer columns and their dtypes; lat/lon are float64 with NaN for missing values
+INT_COLUMNS = {
+    'capacity': np.int32,
+    'num_bikes_available': np.int32,
+    'num_ebikes_available': np.int32,
+    'num_bikes_disabled': np.int32,
+    'num_docks_available': np.int32,
+    'num_docks_disabled': np.int32,
+    'is_installed': np.int8,
+    'is_renting': np.int8,
+    'is_returning': np.int8,
+    'last_reported': np.int64
+}
+FLOAT_COLUMNS = ('lat', 'lon')
+
+
+@dataclass
+class StationSnapshot:
+    """
+    One GBFS station feed poll as a struct of arrays, one row per station
+    
+    Holds station_status and/or station_information fields; columns a feed does not
+    carry are MISSING (NaN for coordinates).
+    """
+    station_id: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    capacity: np.ndarray
+    num_bikes_available: np.ndarray
+    num_ebikes_available: np.ndarray
+    num_bikes_disabled: np.ndarray
+    num_docks_available: np.ndarray
+    num_docks_disabled: np.ndarray
+    is_installed: np.ndarray
+    is_renting: np.ndarray
+    is_returning: np.ndarray
+    last_reported: np.ndarray
+    last_updated: Optional[float] = None
+    
+    @classmethod
+    def from_records(cls, stations: Sequence[Dict[str, Any]], last_updated: Optional[float] = None) -> "StationSnapshot":
+        """
+        Build a snapshot from decoded station records
+        
+        Args:
+            stations (Sequence[Dict[str, Any]]): station_status or station_information records
+            last_updated (Optional[float]): Feed last_updated in epoch seconds
+        
+        Returns:
+            StationSnapshot: Columnar snapshot in record order
+        """
+        columns = {
+            'station_id': np.array([str(station.get('station_id')) for station in stations], dtype=object)
+        }
+        for column in FLOAT_COLUMNS:
+            # None converts to NaN
+            columns[column] = np.array([station.get(column) for station in stations], dtype=np.float64)
+        for column, dtype in INT_COLUMNS.items():
+            values = [station.get(column) for station in stations]
+            if values.count(None) == len(values):
+                # Field not carried by this feed
+                columns[column] = np.full(len(values), MISSING, dtype=dtype)
+                continue
+            try:
+                columns[column] = np.array(values, dtype=dtype)
+            except (TypeError, ValueError):
+                # Gaps (None) or RFC 3339 timestamps need the per-value conversion
+                columns[column] = np.array([_to_int(value) for value in values], dtype=dtype)
+        return cls(last_updated=last_updated, **columns)
+    
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "StationSnapshot":
+        """
+        Build a snapshot from a decoded station_status or station_information document
+        
+        Args:
+            document (Dict[str, Any]): GBFS document with data.stations
+        
+        Returns:
+            StationSnapshot: Columnar snapshot of the document's stations
+        """
+        last_updated = document.get('last_updated')
+        return cls.from_records(document['data']['stations'], None if last_updated is None else _to_int(last_updated))
+    
+    def __len__(self) -> int:
+        return len(self.station_id)
+    
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Return every column by name"""
+        return {field.name: getattr(self, field.name) for field in fields(self) if field.name != 'last_updated'}
+    
+    def take(self, rows: np.ndarray) -> "StationSnapshot":
+        """
+        Select rows by boolean mask or index array
+        
+        Args:
+            rows (np.ndarray): Boolean mask or row indices
+        
+        Returns:
+            StationSnapshot: New snapshot with the selected rows
+        """
+        return StationSnapshot(
+            last_updated=self.last_updated,
+            **{name: column[rows] for name, column in self.columns().items()}
+        )
+    
+    def validate(self) -> np.ndarray:
+        """
+        Check every station for values a GBFS feed should never carry
+        
+        Returns:
+            np.ndarray: Boolean mask of valid rows: no negative counts, 0/1 flags,
+            coordinates in range and bikes plus docks not above capacity
+        """
+        valid = np.ones(len(self), dtype=bool)
+        for column in ('num_bikes_available', 'num_ebikes_available', 'num_bikes_disabled',
+                       'num_docks_available', 'num_docks_disabled', 'capacity'):
+            valid &= getattr(self, column) >= MISSING
+        for column in ('is_installed', 'is_renting', 'is_returning'):
+            valid &= getattr(self, column) <= 1
+            valid &= getattr(self, column) >= MISSING
+        # NaN compares false, so missing coordinates must be let through explicitly
+        valid &= np.isnan(self.lat) | ((self.lat >= -90) & (self.lat <= 90))
+        valid &= np.isnan(self.lon) | ((self.lon >= -180) & (self.lon <= 180))
+        
+        known = (self.capacity >= 0) & (self.num_bikes_available >= 0) & (self.num_docks_available >= 0)
+        valid &= ~known | (self.num_bikes_available + self.num_docks_available <= self.capacity)
+        return valid
+    
+    def changed_since(self, previous: "StationSnapshot", columns: Tuple[str, ...] = STATUS_FIELDS) -> np.ndarray:
+        """
+        Compare against an earlier snapshot, matching stations by station_id
+        
+        Args:
+            previous (StationSnapshot): Earlier snapshot
+            columns (Tuple[str, ...]): Columns compared between the snapshots
+        
+        Returns:
+            np.ndarray: Boolean mask of rows that are new or differ in any column
+        """
+        if not len(previous):
+            return np.ones(len(self), dtype=bool)
+        
+        if len(previous) == len(self) and np.array_equal(previous.station_id, self.station_id):
+            # Feeds list stations in a stable order, so rows usually line up already
+            found = np.ones(len(self), dtype=bool)
+            matches = np.arange(len(self))
+        else:
+            order = np.argsort(previous.station_id)
+            sorted_ids = previous.station_id[order]
+            positions = np.minimum(np.searchsorted(sorted_ids, self.station_id), len(sorted_ids) - 1)
+            found = sorted_ids[positions] == self.station_id
+            matches = order[positions]
+        
+        changed = ~found
+        for column in columns:
+            changed |= getattr(self, column) != getattr(previous, column)[matches]
+        return changed
+    
+    def join_information(self, information: "StationSnapshot") -> "StationSnapshot":
+        """
+        Fill coordinates and capacity from a station_information snapshot
+        
+        Args:
+            information (StationSnapshot): Snapshot of station_information
+        
+        Returns:
+            StationSnapshot: Copy of this snapshot with lat, lon and capacity of known stations
+        """
+        joined = self.take(np.arange(len(self)))
+        if not len(information):
+            return joined
+        
+        order = np.argsort(information.station_id)
+        sorted_ids = information.station_id[order]
+        positions = np.minimum(np.searchsorted(sorted_ids, self.station_id), len(sorted_ids) - 1)
+        found = sorted_ids[positions] == self.station_id
+        rows = order[positions[found]]
+        for column in ('lat', 'lon', 'capacity'):
+            getattr(joined, column)[found] = getattr(information, column)[rows]
+        return joined
+    
+    def totals(self) -> Dict[str, int]:
+        """
+        Aggregate the snapshot across stations
+        
+        Returns:
+            Dict[str, int]: Station count, available bikes/e-bikes/docks, disabled
+            bikes/docks, renting stations and total known capacity
+        """
+        def total(column: np.ndarray) -> int:
+            return int(column[column > 0].sum())
+        
+        return {
+            'stations': len(self),
+            'bikes_available': total(self.num_bikes_available),
+            'ebikes_available': total(self.num_ebikes_available),
+            'docks_available': total(self.num_docks_available),
+            'bikes_disabled': total(self.num_bikes_disabled),
+            'docks_disabled': total(self.num_docks_disabled),
+            'stations_renting': int((self.is_renting == 1).sum()),
+            'capacity': total(self.capacity)
+        }
+    
+    def fill_ratio(self) -> np.ndarray:
+        """
+        Share of each station's docks holding an available bike
+        
+        Returns:
+            np.ndarray: Bikes available / capacity per station, NaN when either is unknown
+        """
+        known = (self.capacity > 0) & (self.num_bikes_available >= 0)
+        ratio = np.full(len(self), np.nan)
+        ratio[known] = self.num_bikes_available[known] / self.capacity[known]
+        return ratio
+    
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        Convert back to station records, leaving out missing fields
+        
+        Returns:
+            List[Dict[str, Any]]: One dict per station
+        """
+        columns = {name: column.tolist() for name, column in self.columns().items()}
+        records = []
+        for row in range(len(self)):
+            record = {}
+            for name, values in columns.items():
+                value = values[row]
+                if name in INT_COLUMNS and value == MISSING:
+                    continue
+                if name in FLOAT_COLUMNS and value != value:
+                    continue
+                record[name] = value
+            records.append(record)
+        return records
+    
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the columns as a compressed NumPy archive
+        
+        Returns:
+            bytes: Archive readable by from_bytes
+        """
+        buffer = io.BytesIO()
+        columns = self.columns()
+        # Ids are stored as fixed-width unicode; object arrays would need pickle
+        columns['station_id'] = columns['station_id'].astype(str)
+        last_updated = np.array([np.nan if self.last_updated is None else self.last_updated])
+        np.savez_compressed(buffer, last_updated=last_updated, **columns)
+        return buffer.getvalue()
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StationSnapshot":
+        """
+        Deserialize a snapshot written by to_bytes
+        
+        Args:
+            data (bytes): Archive bytes
+        
+        Returns:
+            StationSnapshot: The snapshot
+        """
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            columns = {name: archive[name] for name in archive.files}
+        last_updated = float(columns.pop('last_updated')[0])
+        columns['station_id'] = columns['station_id'].astype(object)
+        return cls(last_updated=None if np.isnan(last_updated) else last_updated, **columns)
+
+
+class ColumnarStatusTracker:
+    def __init__(self, fields: Tuple[str, ...] = STATUS_FIELDS, checkpoint_every: int = 60):
+        """
+        Vectorized drop-in for StationStatusTracker.diff
+        
+        Keeps the previous poll as a StationSnapshot and finds changed stations with
+        array comparisons instead of per-station tuple lookups.
+        
+        Args:
+            fields (Tuple[str, ...]): Status fields compared between polls
+            checkpoint_every (int): Publish a full snapshot every N polls (0 disables
+                checkpoints after the first poll)
+        """
+        self.fields = fields
+        self.checkpoint_every = checkpoint_every
+        self._previous: Optional[StationSnapshot] = None
+        self._polls = 0
+    
+    def diff(self, stations: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Compare a status snapshot against the previous one
+        
+        Args:
+            stations (Sequence[Dict[str, Any]]): Station status records of one poll
+        
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: Stations to publish and whether this
+            poll is a full-snapshot checkpoint
+        """
+        snapshot = StationSnapshot.from_records(stations)
+        changed, checkpoint = self.diff_snapshot(snapshot)
+        return [stations[row] for row in np.flatnonzero(changed)], checkpoint
+    
+    def diff_snapshot(self, snapshot: StationSnapshot) -> Tuple[np.ndarray, bool]:
+        """
+        Compare a columnar snapshot against the previous one
+        
+        Args:
+            snapshot (StationSnapshot): Current poll
+        
+        Returns:
+            Tuple[np.ndarray, bool]: Boolean mask of stations to publish and whether
+            this poll is a full-snapshot checkpoint
+        """
+        checkpoint = self._previous is None or (
+            self.checkpoint_every > 0 and self._polls % self.checkpoint_every == 0
+        )
+        self._polls += 1
+        if checkpoint:
+            changed = np.ones(len(snapshot), dtype=bool)
+        else:
+            changed = snapshot.changed_since(self._previous, self.fields)
+        self._previous = snapshot
+        return changed, checkpoint
+    
+    def reset(self):
+        """Forget all known state so the next poll publishes a full snapshot"""
+        self._previous = None
+        self._polls = 0
+    
+    def __len__(self):
+        return 0 if self._previous is None else len(self._previous)
+
+
+def _to_int(value: Any) -> int:
+    """Convert a GBFS number, flag or timestamp to an int column value"""
+    if value is None:
+        return MISSING
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            # GBFS 3.0 timestamps are RFC 3339 strings
+            return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    return int(value)
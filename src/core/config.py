@@ -4,9 +4,46 @@ Configuration file for Citi Bikes Real-Time Streaming Project
 """
 
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from dataclasses import dataclass
 
+@dataclass
+class ProducerProfile:
+    """Producer batching and compression settings for one throughput/latency trade-off"""
+    compression_type: Optional[str] = None
+    linger_ms: int = 0
+    batch_size: int = 16384
+    buffer_memory: int = 32 * 1024 * 1024
+    max_in_flight_requests_per_connection: int = 5
+
+# Named producer profiles, from the lowest ack latency to the highest message rate
+PRODUCER_PROFILES = {
+    # Send every record immediately, uncompressed, in small requests
+    "low-latency": ProducerProfile(
+        compression_type=None,
+        linger_ms=0,
+        batch_size=16 * 1024,
+        buffer_memory=32 * 1024 * 1024,
+        max_in_flight_requests_per_connection=5
+    ),
+    # Wait briefly to fill gzip-compressed batches of a station feed (the pipeline default)
+    "balanced": ProducerProfile(
+        compression_type="gzip",
+        linger_ms=50,
+        batch_size=256 * 1024,
+        buffer_memory=64 * 1024 * 1024,
+        max_in_flight_requests_per_connection=5
+    ),
+    # Large lz4 batches and a deeper in-flight window for bulk publishing and backfills
+    "max-throughput": ProducerProfile(
+        compression_type="lz4",
+        linger_ms=100,
+        batch_size=1024 * 1024,
+        buffer_memory=256 * 1024 * 1024,
+        max_in_flight_requests_per_connection=10
+    )
+}
+
 @dataclass
 class KafkaConfig:
     """Kafka configuration settings"""
@@ -14,6 +51,7 @@ class KafkaConfig:
     topic_prefix: str = "bikes"
     producer_acks: str = "all"
     producer_retries: int = 3
+    producer_profile: str = "balanced"
     consumer_group_id: str = "bikes-consumer-group"
     consumer_auto_offset_reset: str = "earliest"
     consumer_enable_auto_commit: bool = True
@@ -62,6 +100,9 @@ class Config:
         if os.getenv("KAFKA_BOOTSTRAP_SERVERS"):
             self.kafka.bootstrap_servers = os.getenv("KAFKA_BOOTSTRAP_SERVERS")
         
+        if os.getenv("KAFKA_PRODUCER_PROFILE"):
+            self.kafka.producer_profile = os.getenv("KAFKA_PRODUCER_PROFILE")
+        
         if os.getenv("KAFKA_CONSUMER_GROUP_ID"):
             self.kafka.consumer_group_id = os.getenv("KAFKA_CONSUMER_GROUP_ID")
         
@@ -92,6 +133,32 @@ class Config:
             "auto_commit_interval_ms": self.kafka.consumer_auto_commit_interval_ms
         }
     
+    def get_producer_config(self, profile: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get KafkaProducer settings for a throughput profile
+        
+        Args:
+            profile (Optional[str]): Profile name, the configured producer_profile by default
+        
+        Returns:
+            Dict[str, Any]: KafkaProducer keyword arguments
+        """
+        name = profile or self.kafka.producer_profile
+        if name not in PRODUCER_PROFILES:
+            source = "" if profile else " (KafkaConfig.producer_profile, set from KAFKA_PRODUCER_PROFILE)"
+            raise ValueError(f"Unknown producer profile '{name}'{source}, expected one of {sorted(PRODUCER_PROFILES)}")
+        settings = PRODUCER_PROFILES[name]
+        return {
+            "bootstrap_servers": [self.kafka.bootstrap_servers],
+            "acks": self.kafka.producer_acks,
+            "retries": self.kafka.producer_retries,
+            "compression_type": settings.compression_type,
+            "linger_ms": settings.linger_ms,
+            "batch_size": settings.batch_size,
+            "buffer_memory": settings.buffer_memory,
+            "max_in_flight_requests_per_connection": settings.max_in_flight_requests_per_connection
+        }
+    
     def get_api_config(self) -> Dict[str, Any]:
         """Get API configuration as dictionary"""
         return {
@@ -127,6 +194,8 @@ class Config:
             # Validate Kafka settings
             if not self.kafka.bootstrap_servers:
                 raise ValueError("Kafka bootstrap servers cannot be empty")
+            # The producer profile is checked when a producer is created, so a bad
+            # KAFKA_PRODUCER_PROFILE does not break every import of the config
             
             # Validate API settings
             if self.api.timeout <= 0:
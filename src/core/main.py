@@ -4,60 +4,89 @@ Main execution script for Citi Bikes Real-Time Streaming Project
 """
 
 import argparse
+import asyncio
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import signal
+import threading
 import sys
 from src.core.bikes_module.bikes import Bikes
+from src.core.bikes_module.discovery import GbfsDiscovery
+from src.core.bikes_module.feed_poller import FeedPoller
+from src.core.config import PRODUCER_PROFILES
+from src.core.scheduler import Scheduler, CATCH_UP_POLICIES
+from src.streaming.kafka_admin.topic_admin import TopicAdmin
+from src.utils.observability.log_setup import configure_logging
+from src.utils.observability.metrics import MetricsServer
+from src.utils.services.http_service import HttpService
 from src.utils.constants.routes import BIKES_STATION_INFORMATION, BIKES_STATION_STATUS
 
-# Global variable for graceful shutdown
+# Global variables for graceful shutdown; the event also interrupts waits between runs
 running = True
+shutdown_event = threading.Event()
 
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully"""
     global running
     logging.info(f"Received signal {signum}. Shutting down gracefully...")
     running = False
+    shutdown_event.set()
 
 def setup_logging(log_level: str = "INFO") -> logging.Logger:
-    """Set up logging configuration"""
-    log_levels = {
-        "DEBUG": logging.DEBUG,
-        "INFO": logging.INFO,
-        "WARNING": logging.WARNING,
-        "ERROR": logging.ERROR,
-        "CRITICAL": logging.CRITICAL
-    }
-    
-    logging.basicConfig(
-        level=log_levels.get(log_level.upper(), logging.INFO),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('citibikes_pipeline.log')
-        ]
-    )
+    """Set up logging through a background queue listener to stdout and a rotating log file"""
+    configure_logging(level=log_level, file_path='citibikes_pipeline.log')
     
     return logging.getLogger(__name__)
 
-def run_single_execution(bikes: Bikes, logger: logging.Logger) -> bool:
+def log_snapshot_report(report: dict, logger: logging.Logger) -> None:
+    """Log the counts and timings of one published feed snapshot"""
+    if report.get('error'):
+        logger.error(f"{report['feed']}: failed ({report['error']})")
+        return
+    if report.get('skipped'):
+        logger.info(f"{report['feed']}: no new snapshot ({report['skipped']}), fetch {report['fetch_seconds']:.3f}s")
+        return
+    
+    published = f"{report['records']} records"
+    if 'stations' in report:
+        published += f" of {report['stations']} stations"
+        if report['checkpoint']:
+            published += " (full checkpoint)"
+    logger.info(
+        f"{report['feed']}: {published} "
+        f"({report['acked']} acked, {report['failed']} failed) - "
+        f"fetch {report['fetch_seconds']:.3f}s, publish {report['publish_seconds']:.3f}s"
+    )
+
+def run_single_execution(bikes: Bikes, logger: logging.Logger, concurrent: bool = False) -> bool:
     """Run a single execution of the data pipeline"""
     try:
         logger.info("Starting Citi Bikes Real-Time Streaming Pipeline")
+        cycle_start = time.perf_counter()
         
-        # Fetch and stream station information
-        logger.info("Fetching station information...")
-        station_info = bikes.get_bikes_station_information(BIKES_STATION_INFORMATION)
-        logger.info(f"Station information processed: {len(station_info)} records")
-        
-        # Fetch and stream station status
-        logger.info("Fetching station status...")
-        station_status = bikes.get_bikes_station_status(BIKES_STATION_STATUS)
-        logger.info(f"Station status processed: {len(station_status)} records")
+        if concurrent:
+            reports = fetch_feeds_concurrently(bikes, logger, cycle_start)
+        else:
+            reports = []
+            
+            # Fetch and stream station information
+            logger.info("Fetching station information...")
+            station_info = bikes.get_bikes_station_information(BIKES_STATION_INFORMATION)
+            log_snapshot_report(station_info, logger)
+            reports.append(station_info)
+            
+            # Fetch and stream station status
+            logger.info("Fetching station status...")
+            station_status = bikes.get_bikes_station_status(BIKES_STATION_STATUS)
+            log_snapshot_report(station_status, logger)
+            reports.append(station_status)
         
-        total_records = len(station_info) + len(station_status)
-        logger.info(f"Data pipeline execution completed successfully! Total records: {total_records}")
+        total_records = sum(report['records'] for report in reports)
+        logger.info(
+            f"Data pipeline execution completed successfully! Total records: {total_records} "
+            f"in {time.perf_counter() - cycle_start:.3f}s"
+        )
         
         return True
         
@@ -65,33 +94,62 @@ def run_single_execution(bikes: Bikes, logger: logging.Logger) -> bool:
         logger.error(f"Error in main pipeline: {e}")
         return False
 
-def run_continuous_streaming(bikes: Bikes, logger: logging.Logger, interval: int = 60) -> None:
-    """Run continuous streaming with specified interval"""
-    logger.info(f"Starting continuous streaming with {interval} second intervals")
+def fetch_feeds_concurrently(bikes: Bikes, logger: logging.Logger, cycle_start: float) -> list:
+    """Fetch all feeds in parallel and log each snapshot as soon as it is published"""
+    feeds = {
+        "station information": (bikes.get_bikes_station_information, BIKES_STATION_INFORMATION),
+        "station status": (bikes.get_bikes_station_status, BIKES_STATION_STATUS)
+    }
+    
+    logger.info(f"Fetching {len(feeds)} feeds concurrently...")
+    reports = []
+    with ThreadPoolExecutor(max_workers=len(feeds), thread_name_prefix="feed") as executor:
+        futures = {executor.submit(fetch, url): name for name, (fetch, url) in feeds.items()}
+        for future in as_completed(futures):
+            report = future.result()
+            log_snapshot_report(report, logger)
+            logger.info(f"{futures[future]} published {time.perf_counter() - cycle_start:.3f}s into the cycle")
+            reports.append(report)
+    
+    return reports
+
+def log_scheduler_metrics(scheduler: Scheduler, logger: logging.Logger) -> None:
+    """Log the lag and overrun metrics of every scheduled feed"""
+    for name, metrics in scheduler.metrics().items():
+        logger.info(
+            f"Schedule {name}: {metrics['runs']} runs, {metrics['failures']} failed, "
+            f"{metrics['overruns']} overruns, {metrics['skipped_ticks']} skipped ticks, "
+            f"lag {metrics['last_lag_seconds']:.3f}s (max {metrics['max_lag_seconds']:.3f}s)"
+        )
+
+def run_continuous_streaming(bikes: Bikes, logger: logging.Logger, status_interval: float = 10,
+                             information_interval: float = 3600, catch_up: str = "skip",
+                             metrics_interval: float = 60) -> None:
+    """Run continuous streaming with a separate drift-free cadence per feed"""
+    logger.info(
+        f"Starting continuous streaming: station status every {status_interval}s, "
+        f"station information every {information_interval}s"
+    )
     logger.info("Press Ctrl+C to stop streaming")
     
-    execution_count = 0
-    start_time = time.time()
+    def feed_job(fetch, url):
+        def run():
+            log_snapshot_report(fetch(url), logger)
+        return run
+    
+    scheduler = Scheduler(stop_event=shutdown_event)
+    scheduler.add_job("station_information", information_interval,
+                      feed_job(bikes.get_bikes_station_information, BIKES_STATION_INFORMATION), catch_up)
+    scheduler.add_job("station_status", status_interval,
+                      feed_job(bikes.get_bikes_station_status, BIKES_STATION_STATUS), catch_up)
     
     try:
-        while running:
-            execution_count += 1
-            logger.info(f"Execution #{execution_count} starting at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            success = run_single_execution(bikes, logger)
-            
-            if success:
-                logger.info(f"Execution #{execution_count} completed successfully")
-            else:
-                logger.error(f"Execution #{execution_count} failed")
-            
-            # Calculate next execution time
-            elapsed = time.time() - start_time
-            next_execution = interval - (elapsed % interval)
-            
-            if running:  # Check again in case signal was received
-                logger.info(f"Next execution in {next_execution:.1f} seconds...")
-                time.sleep(next_execution)
+        # The pool has one worker per job, so lag metrics keep flowing even while both
+        # feed jobs are stuck
+        scheduler.add_job("scheduler_metrics", metrics_interval,
+                          lambda: log_scheduler_metrics(scheduler, logger), delay=metrics_interval)
+        scheduler.run()
+        log_scheduler_metrics(scheduler, logger)
             
     except KeyboardInterrupt:
         logger.info("Continuous streaming interrupted by user")
@@ -99,20 +157,222 @@ def run_continuous_streaming(bikes: Bikes, logger: logging.Logger, interval: int
         logger.error(f"Unexpected error in continuous streaming: {e}")
         raise
 
+def run_discovery_streaming(poller: FeedPoller, logger: logging.Logger, continuous: bool = True) -> bool:
+    """Poll every discovered feed, each on its own ttl, until shutdown"""
+    logger.info(f"Polling {len(poller.feeds)} discovered feeds (minimum interval {poller.min_interval}s)")
+    success = True
+    
+    while running:
+        reports = poller.poll_due()
+        for report in reports:
+            log_snapshot_report(report, logger)
+            success = success and 'error' not in report
+        
+        if not continuous:
+            break
+        
+        wait = poller.seconds_until_next()
+        if running and wait > 0:
+            logger.debug(f"Next feed due in {wait:.1f} seconds...")
+            shutdown_event.wait(wait)
+    
+    return success
+
+def run_async_streaming(args: argparse.Namespace, logger: logging.Logger) -> None:
+    """Run continuous streaming on the asyncio engine"""
+    # Imported lazily so aiohttp/aiokafka are only needed for this mode
+    from src.core.bikes_module.async_bikes import AsyncBikes
+    
+    interval = args.interval or 60
+    
+    async def stream():
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop_event.set)
+        
+        feeds = None
+        if args.discover:
+            with HttpService() as http_service:
+                feeds = GbfsDiscovery(http_service, codec=args.codec).discover_all(args.discover)
+        
+        async with AsyncBikes(
+            feeds=feeds,
+            linger_ms=args.linger_ms,
+            batch_size=args.batch_size,
+            compression_type=args.compression,
+            producer_profile=args.producer_profile,
+            changes_only=not args.full_snapshots,
+            checkpoint_every=args.checkpoint_every,
+            respect_ttl=not args.ignore_ttl,
+            codec=args.codec,
+            wire_format=args.wire_format,
+            schema_registry=args.schema_registry,
+            allow_json=bool(args.discover)
+        ) as bikes:
+            logger.info(f"Starting async streaming of {len(bikes.feeds)} feeds with {interval} second intervals")
+            
+            def on_cycle(reports):
+                for report in reports:
+                    log_snapshot_report(report, logger)
+            
+            await bikes.run_forever(interval, stop_event, on_cycle)
+    
+    asyncio.run(stream())
+
+def async_incompatible_options(args: argparse.Namespace) -> list:
+    """Options the asyncio engine does not implement, as given on the command line"""
+    options = []
+    if args.streaming_parse:
+        options.append("--streaming-parse")
+    if args.publish_mode != "batch":
+        options.append(f"--publish-mode {args.publish_mode}")
+    if args.columnar:
+        options.append("--columnar")
+    if args.concurrent:
+        options.append("--concurrent")
+    return options
+
 def main():
     """Main function to run the Citi Bikes data pipeline"""
     parser = argparse.ArgumentParser(description="Citi Bikes Real-Time Streaming Pipeline")
     parser.add_argument(
         "--mode", 
-        choices=["single", "continuous"], 
+        choices=["single", "continuous", "async"], 
         default="single",
-        help="Execution mode: single run or continuous streaming"
+        help="Execution mode: single run, continuous streaming or continuous streaming on the asyncio engine"
     )
     parser.add_argument(
         "--interval", 
         type=int, 
+        default=None,
+        help="Interval between executions in seconds; overrides the per-feed intervals (default 60 in async mode)"
+    )
+    parser.add_argument(
+        "--status-interval",
+        type=float,
+        default=10,
+        help="Seconds between station status polls (for continuous mode)"
+    )
+    parser.add_argument(
+        "--information-interval",
+        type=float,
+        default=3600,
+        help="Seconds between station information polls (for continuous mode)"
+    )
+    parser.add_argument(
+        "--catch-up",
+        choices=CATCH_UP_POLICIES,
+        default="skip",
+        help="What to do with ticks missed while a poll overran its interval"
+    )
+    parser.add_argument(
+        "--discover",
+        action="append",
+        metavar="GBFS_URL",
+        help="Poll every feed advertised by this gbfs.json discovery document (repeatable)"
+    )
+    parser.add_argument(
+        "--min-feed-interval",
+        type=float,
+        default=10,
+        help="Minimum seconds between two polls of a discovered feed"
+    )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Fetch and publish all GBFS feeds in parallel within each single execution"
+    )
+    parser.add_argument(
+        "--publish-mode",
+        choices=["batch", "record"],
+        default="batch",
+        help="Publish whole feed snapshots in one batch or record by record"
+    )
+    parser.add_argument(
+        "--producer-profile",
+        choices=sorted(PRODUCER_PROFILES),
+        default=None,
+        help="Producer throughput profile setting compression, linger, batch size, buffer memory "
+             "and in-flight requests (default: KafkaConfig.producer_profile, 'balanced')"
+    )
+    parser.add_argument(
+        "--linger-ms",
+        type=int,
+        default=None,
+        help="Producer linger time in milliseconds used to fill batches, overriding the profile"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Producer per-partition batch size in bytes, overriding the profile"
+    )
+    parser.add_argument(
+        "--compression",
+        choices=["none", "gzip", "snappy", "lz4"],
+        default=None,
+        help="Producer compression codec, overriding the profile"
+    )
+    parser.add_argument(
+        "--full-snapshots",
+        action="store_true",
+        help="Publish every station status on each poll instead of only changed stations"
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
         default=60,
-        help="Interval between executions in seconds (for continuous mode)"
+        help="Publish a full station status snapshot every N polls"
+    )
+    parser.add_argument(
+        "--ignore-ttl",
+        action="store_true",
+        help="Fetch and publish every feed on each cycle, ignoring GBFS ttl and HTTP validators"
+    )
+    parser.add_argument(
+        "--codec",
+        choices=["orjson", "json"],
+        default="orjson",
+        help="JSON codec for feed decoding and Kafka message serialization"
+    )
+    parser.add_argument(
+        "--wire-format",
+        choices=["json", "avro"],
+        default="json",
+        help="Kafka message format; avro writes station topics as compact schema-registry framed Avro"
+    )
+    parser.add_argument(
+        "--schema-registry",
+        default=None,
+        help="Schema registry URL (e.g. http://localhost:8081) or local schema directory (default: config/schemas)"
+    )
+    parser.add_argument(
+        "--streaming-parse",
+        action="store_true",
+        help="Parse feeds incrementally and publish stations while the download is in progress"
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Validate and diff station feeds as NumPy column arrays instead of per-station dicts"
+    )
+    parser.add_argument(
+        "--create-topics",
+        action="store_true",
+        help="Create missing feed topics and enable log compaction on reference-data topics before starting"
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=6,
+        help="Partitions of topics created by --create-topics"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=9108,
+        help="Serve Prometheus metrics on localhost:<port>/metrics (0 disables the endpoint)"
     )
     parser.add_argument(
         "--log-level", 
@@ -122,6 +382,11 @@ def main():
     )
     
     args = parser.parse_args()
+    if args.mode == "async":
+        # The async engine always fetches feeds concurrently and publishes whole snapshots
+        unsupported = async_incompatible_options(args)
+        if unsupported:
+            parser.error(f"--mode async does not support {', '.join(unsupported)}")
     
     # Set up logging
     logger = setup_logging(args.log_level)
@@ -130,19 +395,76 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
+    if args.metrics_port:
+        try:
+            MetricsServer(args.metrics_port).start()
+        except OSError:
+            logger.warning("Continuing without a metrics endpoint")
+    
+    if args.create_topics:
+        try:
+            with TopicAdmin(num_partitions=args.partitions) as admin:
+                for topic, outcome in admin.ensure_pipeline_topics().items():
+                    logger.info(f"Topic {topic}: {outcome}")
+        except Exception as e:
+            logger.error(f"Failed to prepare Kafka topics: {e}")
+            return 1
+    
+    if args.mode == "async":
+        try:
+            run_async_streaming(args, logger)
+            return 0
+        except Exception as e:
+            logger.error(f"Fatal error in async pipeline: {e}")
+            return 1
+        finally:
+            logger.info("Pipeline shutdown complete")
+    
     bikes = None
     try:
         # Initialize the bikes orchestrator
-        bikes = Bikes()
+        bikes = Bikes(
+            batch_mode=args.publish_mode == "batch",
+            linger_ms=args.linger_ms,
+            batch_size=args.batch_size,
+            compression_type=args.compression,
+            producer_profile=args.producer_profile,
+            changes_only=not args.full_snapshots,
+            checkpoint_every=args.checkpoint_every,
+            respect_ttl=not args.ignore_ttl,
+            codec=args.codec,
+            streaming=args.streaming_parse,
+            columnar=args.columnar,
+            wire_format=args.wire_format,
+            schema_registry=args.schema_registry,
+            # Discovered feeds other than the station ones have no Avro schema
+            allow_json=bool(args.discover)
+        )
         logger.info("Bikes orchestrator initialized successfully")
         
+        if args.discover:
+            # Multi-feed, multi-system mode driven by gbfs.json
+            feeds = GbfsDiscovery(bikes.http_service, codec=args.codec).discover_all(args.discover)
+            if not feeds:
+                logger.error("No feeds could be discovered")
+                return 1
+            poller = FeedPoller(bikes, feeds, min_interval=args.min_feed_interval)
+            success = run_discovery_streaming(poller, logger, continuous=args.mode == "continuous")
+            return 0 if success else 1
+        
         if args.mode == "single":
             # Single execution mode
-            success = run_single_execution(bikes, logger)
+            success = run_single_execution(bikes, logger, args.concurrent)
             return 0 if success else 1
         else:
             # Continuous streaming mode
-            run_continuous_streaming(bikes, logger, args.interval)
+            run_continuous_streaming(
+                bikes,
+                logger,
+                status_interval=args.interval or args.status_interval,
+                information_interval=args.interval or args.information_interval,
+                catch_up=args.catch_up
+            )
             return 0
             
     except Exception as e:
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Drift-free job scheduler for Citi Bikes Real-Time Streaming Project
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.observability.metrics import (
+    JOB_DURATION_SECONDS, JOB_FAILURES, JOB_LAG_SECONDS, JOB_OVERRUNS, JOB_SKIPPED_TICKS
+)
+
+# What to do with the ticks a job missed because a run took longer than its interval
+CATCH_UP_POLICIES = ("skip", "catch_up", "reanchor")
+
+# Seconds between checks for finished jobs while any job is running
+JOB_POLL_SECONDS = 0.1
+
+
+@dataclass
+class ScheduledJob:
+    """A callable run on a fixed cadence, with its lag statistics"""
+    name: str
+    interval: float
+    func: Callable[[], Any]
+    catch_up: str = "skip"
+    max_catch_up: int = 3
+    next_run: float = 0.0
+    running: bool = False
+    runs: int = 0
+    failures: int = 0
+    overruns: int = 0
+    skipped_ticks: int = 0
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+    last_duration: float = 0.0
+
+
+class Scheduler:
+    def __init__(self, stop_event: Optional[threading.Event] = None, max_workers: Optional[int] = None):
+        """
+        Run jobs on independent, drift-free cadences
+        
+        Each job is scheduled on the grid start + k * interval, so a run's duration
+        never shifts later runs. When a run overruns its interval the job's catch-up
+        policy decides what happens to the missed ticks:
+        
+        - skip: drop them and continue on the original grid
+        - catch_up: run up to max_catch_up missed ticks back to back, then skip the rest
+        - reanchor: start a new grid one interval after the overrunning run finished
+        
+        Args:
+            stop_event (Optional[threading.Event]): Event that stops the scheduler; it
+                also interrupts the wait between runs
+            max_workers (Optional[int]): Maximum number of jobs running at the same time;
+                by default one worker per registered job, so a stuck job never keeps
+                another job from running
+        """
+        self.stop_event = stop_event or threading.Event()
+        self.max_workers = max_workers
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+    
+    def add_job(self, name: str, interval: float, func: Callable[[], Any], catch_up: str = "skip",
+                max_catch_up: int = 3, delay: float = 0.0) -> ScheduledJob:
+        """
+        Register a job
+        
+        Args:
+            name (str): Unique job name, used in logs and metrics
+            interval (float): Seconds between two scheduled runs
+            func (Callable[[], Any]): Function to run
+            catch_up (str): Catch-up policy for missed ticks, see CATCH_UP_POLICIES
+            max_catch_up (int): Maximum missed ticks replayed by the catch_up policy
+            delay (float): Seconds before the first run
+            
+        Returns:
+            ScheduledJob: The registered job
+        """
+        if interval <= 0:
+            raise ValueError(f"Interval of job {name} must be positive")
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy '{catch_up}', expected one of {CATCH_UP_POLICIES}")
+        
+        job = ScheduledJob(name, interval, func, catch_up, max_catch_up, next_run=time.monotonic() + delay)
+        self.jobs[name] = job
+        self.logger.info(f"Scheduled job {name} every {interval}s (catch-up policy: {catch_up})")
+        return job
+    
+    def run(self):
+        """Run jobs until the stop event is set"""
+        # A job never overlaps itself, so one worker per job is all the pool can use
+        workers = self.max_workers or max(1, len(self.jobs))
+        self.logger.info(f"Scheduler started with {len(self.jobs)} jobs on {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job") as executor:
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                with self._lock:
+                    due = [job for job in self.jobs.values() if not job.running and job.next_run <= now]
+                    for job in due:
+                        job.running = True
+                
+                for job in due:
+                    executor.submit(self._run_job, job)
+                
+                # Sleep until the next job is due or stop is requested
+                self.stop_event.wait(timeout=self._seconds_until_next())
+        
+        self.logger.info("Scheduler stopped")
+    
+    def stop(self):
+        """Ask the scheduler to stop; running jobs are allowed to finish"""
+        self.stop_event.set()
+    
+    def _seconds_until_next(self) -> float:
+        """Return the time until the earliest idle job is due"""
+        with self._lock:
+            idle = [job.next_run for job in self.jobs.values() if not job.running]
+            busy = len(idle) < len(self.jobs)
+        wait = max(0.0, min(idle) - time.monotonic()) if idle else JOB_POLL_SECONDS
+        # A running job may finish already due (overrun or catch-up), so check on it regularly
+        return min(wait, JOB_POLL_SECONDS) if busy else wait
+    
+    def _run_job(self, job: ScheduledJob):
+        """Run one job and schedule its next run"""
+        started = time.monotonic()
+        job.last_lag = started - job.next_run
+        job.max_lag = max(job.max_lag, job.last_lag)
+        
+        try:
+            job.func()
+        except Exception as e:
+            job.failures += 1
+            JOB_FAILURES.labels(job.name).inc()
+            self.logger.error(f"Job {job.name} failed: {e}")
+        
+        finished = time.monotonic()
+        job.last_duration = finished - started
+        job.runs += 1
+        JOB_LAG_SECONDS.labels(job.name).observe(max(0.0, job.last_lag))
+        JOB_DURATION_SECONDS.labels(job.name).observe(job.last_duration)
+        
+        with self._lock:
+            self._schedule_next(job, finished)
+            job.running = False
+        
+        self.logger.debug(
+            f"Job {job.name} run #{job.runs}: lag {job.last_lag:.3f}s, duration {job.last_duration:.3f}s"
+        )
+    
+    def _schedule_next(self, job: ScheduledJob, now: float):
+        """Advance a job on its grid, applying its catch-up policy to missed ticks"""
+        if job.last_duration > job.interval:
+            job.overruns += 1
+            JOB_OVERRUNS.labels(job.name).inc()
+            self.logger.warning(f"Job {job.name} overran its {job.interval}s interval ({job.last_duration:.3f}s)")
+        
+        job.next_run += job.interval
+        if job.next_run > now:
+            return
+        
+        missed = int((now - job.next_run) // job.interval) + 1
+        if job.catch_up == "catch_up":
+            # Keep at most max_catch_up missed ticks; they run back to back from now
+            dropped = max(0, missed - job.max_catch_up)
+            job.next_run += dropped * job.interval
+        elif job.catch_up == "reanchor":
+            dropped = missed
+            job.next_run = now + job.interval
+        else:
+            dropped = missed
+            job.next_run += missed * job.interval
+        
+        if dropped:
+            job.skipped_ticks += dropped
+            JOB_SKIPPED_TICKS.labels(job.name).inc(dropped)
+            self.logger.warning(f"Job {job.name} is behind schedule, skipped {dropped} tick(s)")
+    
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-job scheduling metrics
+        
+        Returns:
+            Dict[str, Dict[str, Any]]: Runs, failures, overruns, skipped ticks, lag and
+            duration of every job
+        """
+        return {
+            job.name: {
+                'interval': job.interval,
+                'runs': job.runs,
+                'failures': job.failures,
+                'overruns': job.overruns,
+                'skipped_ticks': job.skipped_ticks,
+                'last_lag_seconds': job.last_lag,
+                'max_lag_seconds': job.max_lag,
+                'last_duration_seconds': job.last_duration
+            }
+            for job in self.jobs.values()
+        }
+    
+    def job_names(self) -> List[str]:
+        """Return the names of the registered jobs"""
+        return list(self.jobs)
@@ -0,0 +1 @@
+from .topic_admin import TopicAdmin, COMPACTED_TOPIC_CONFIG
@@ -0,0 +1,134 @@
+import logging
+from typing import Dict, Optional
+from kafka.admin import KafkaAdminClient, NewTopic, ConfigResource, ConfigResourceType
+from kafka.errors import TopicAlreadyExistsError
+from src.utils.constants.topics import COMPACTED_TOPICS, DERIVED_TOPICS, GBFS_FEED_TOPICS
+
+# Topic configuration of reference-data topics that keep only the latest record per key
+COMPACTED_TOPIC_CONFIG = {
+    'cleanup.policy': 'compact',
+    # Compact once 10% of the log is superseded records; the active segment is never
+    # compacted, so roll it hourly to bound what a bootstrapping consumer reads
+    'min.cleanable.dirty.ratio': '0.1',
+    'segment.ms': str(60 * 60 * 1000),
+    # Keep tombstones for a day so consumers that lag behind still see removed stations
+    'delete.retention.ms': str(24 * 60 * 60 * 1000)
+}
+
+class TopicAdmin:
+    def __init__(self, bootstrap_servers: str = 'localhost:9092', num_partitions: int = 6,
+                 replication_factor: int = 1):
+        """
+        Initialize the Kafka topic admin
+        
+        Args:
+            bootstrap_servers (str): Kafka bootstrap servers
+            num_partitions (int): Partitions of topics created by this admin; station
+                keyed topics spread stations over them
+            replication_factor (int): Replication factor of created topics
+        """
+        self.bootstrap_servers = bootstrap_servers
+        self.num_partitions = num_partitions
+        self.replication_factor = replication_factor
+        self.admin = None
+        self.logger = logging.getLogger(__name__)
+        self._initialize_admin()
+    
+    def _initialize_admin(self):
+        """Initialize the Kafka admin client"""
+        try:
+            self.admin = KafkaAdminClient(bootstrap_servers=self.bootstrap_servers, client_id='bikes-topic-admin')
+            self.logger.info(f"Topic admin initialized successfully with bootstrap servers: {self.bootstrap_servers}")
+        except Exception as e:
+            self.logger.error(f"Failed to initialize topic admin: {e}")
+            raise
+    
+    def ensure_topic(self, topic: str, compacted: bool = False, num_partitions: Optional[int] = None) -> str:
+        """
+        Create a topic if it does not exist and apply the compaction settings
+        
+        Args:
+            topic (str): Topic name
+            compacted (bool): Use log compaction instead of time-based deletion
+            num_partitions (Optional[int]): Partitions of a new topic, num_partitions by default
+            
+        Returns:
+            str: 'created', 'updated' (compaction applied to an existing topic) or 'exists'
+            when the topic already has the settings
+        """
+        topic_config = dict(COMPACTED_TOPIC_CONFIG) if compacted else {}
+        try:
+            if topic not in set(self.admin.list_topics()):
+                try:
+                    self.admin.create_topics([NewTopic(
+                        name=topic,
+                        num_partitions=num_partitions or self.num_partitions,
+                        replication_factor=self.replication_factor,
+                        topic_configs=topic_config
+                    )])
+                    self.logger.info(f"Created topic {topic} (compacted: {compacted})")
+                    return 'created'
+                except TopicAlreadyExistsError:
+                    pass
+            
+            if compacted:
+                current = self.describe_topic_config(topic)
+                if all(current.get(name) == value for name, value in topic_config.items()):
+                    return 'exists'
+                # Topics auto-created by the broker use cleanup.policy=delete
+                self.admin.alter_configs([ConfigResource(ConfigResourceType.TOPIC, topic, configs=topic_config)])
+                self.logger.info(f"Applied compaction settings to topic {topic}")
+                return 'updated'
+            return 'exists'
+        except Exception as e:
+            self.logger.error(f"Failed to ensure topic {topic}: {e}")
+            raise
+    
+    def describe_topic_config(self, topic: str) -> Dict[str, str]:
+        """
+        Get the current configuration of a topic
+        
+        Args:
+            topic (str): Topic name
+            
+        Returns:
+            Dict[str, str]: Config value per name, including broker defaults
+        """
+        responses = self.admin.describe_configs([ConfigResource(ConfigResourceType.TOPIC, topic)])
+        config = {}
+        for response in responses:
+            for error_code, error_message, _, _, entries in response.resources:
+                if error_code:
+                    raise RuntimeError(f"Failed to describe topic {topic}: {error_message} (error {error_code})")
+                for entry in entries:
+                    config[entry[0]] = entry[1]
+        return config
+    
+    def ensure_pipeline_topics(self) -> Dict[str, str]:
+        """
+        Ensure every GBFS feed topic and derived topic exists, compacting the reference-data topics
+        
+        Returns:
+            Dict[str, str]: Outcome of ensure_topic per topic
+        """
+        return {
+            topic: self.ensure_topic(topic, compacted=topic in COMPACTED_TOPICS)
+            for topic in (*GBFS_FEED_TOPICS.values(), *DERIVED_TOPICS)
+        }
+    
+    def close(self):
+        """Close the admin connection"""
+        try:
+            if self.admin:
+                self.admin.close()
+                self.logger.info("Topic admin closed successfully")
+        except Exception as e:
+            self.logger.error(f"Error closing topic admin: {e}")
+    
+    def __enter__(self):
+        """Context manager entry"""
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit"""
+        self.close()
@@ -1 +1,3 @@
-from .consumer import Consumer
\ No newline at end of file
+from .consumer import Consumer
+from .consumer_group import ConsumerGroupRunner
+from .compacted_reader import CompactedTopicReader
\ No newline at end of file
@@ -0,0 +1,96 @@
+import logging
+import time
+from kafka import KafkaConsumer
+from kafka.structs import TopicPartition
+from typing import Dict, Any, Optional, Union
+from src.utils.constants.topics import BIKES_STATION_INFORMATION_TOPIC
+from src.utils.serialization.avro_codec import value_deserializer
+from src.utils.serialization.codec import JsonCodec, get_codec
+
+class CompactedTopicReader:
+    def __init__(self, bootstrap_servers: str = 'localhost:9092', codec: Optional[Union[str, JsonCodec]] = None,
+                 wire_format: str = 'json', schema_registry: Optional[str] = None):
+        """
+        Initialize a reader that rebuilds the latest value per key of a compacted topic
+        
+        It reads without a consumer group, from the beginning of every partition up to the
+        end offsets seen at start, so a new consumer can load current reference data
+        (e.g. the station catalogue) before it starts consuming live updates.
+        
+        Args:
+            bootstrap_servers (str): Kafka bootstrap servers
+            codec (Optional[Union[str, JsonCodec]]): Value codec, orjson by default
+            wire_format (str): 'json' or 'avro', see Consumer
+            schema_registry (Optional[str]): Schema registry URL or local schema directory
+        """
+        self.bootstrap_servers = bootstrap_servers
+        self.codec = get_codec(codec)
+        self.value_deserializer = value_deserializer(self.codec, wire_format, schema_registry)
+        self.logger = logging.getLogger(__name__)
+    
+    def read_latest(self, topic: str, timeout_ms: int = 30000) -> Dict[str, Any]:
+        """
+        Read the latest value of every key in a topic
+        
+        Args:
+            topic (str): Compacted topic to read
+            timeout_ms (int): Maximum time to spend reading in milliseconds
+            
+        Returns:
+            Dict[str, Any]: Latest value per key; keys whose latest record is a tombstone
+            are left out
+        """
+        consumer = KafkaConsumer(
+            bootstrap_servers=self.bootstrap_servers,
+            group_id=None,
+            enable_auto_commit=False,
+            value_deserializer=self.value_deserializer,
+            key_deserializer=lambda x: x.decode('utf-8') if x else None
+        )
+        try:
+            partitions = [TopicPartition(topic, partition) for partition in consumer.partitions_for_topic(topic) or ()]
+            if not partitions:
+                self.logger.warning(f"Topic {topic} not found, nothing to bootstrap")
+                return {}
+            
+            consumer.assign(partitions)
+            consumer.seek_to_beginning(*partitions)
+            end_offsets = consumer.end_offsets(partitions)
+            pending = {tp for tp in partitions if end_offsets[tp] > consumer.position(tp)}
+            
+            latest: Dict[str, Any] = {}
+            records = 0
+            deadline = time.monotonic() + timeout_ms / 1000
+            while pending and time.monotonic() < deadline:
+                for tp, batch in consumer.poll(timeout_ms=1000).items():
+                    for record in batch:
+                        records += 1
+                        if record.key is None:
+                            continue
+                        if record.value is None:
+                            latest.pop(record.key, None)
+                        else:
+                            latest[record.key] = record.value
+                pending = {tp for tp in pending if consumer.position(tp) < end_offsets[tp]}
+            
+            if pending:
+                self.logger.warning(f"Timed out bootstrapping {topic}, {len(pending)} partitions not read to the end")
+            self.logger.info(f"Bootstrapped {len(latest)} keys of {topic} from {records} records")
+            return latest
+        except Exception as e:
+            self.logger.error(f"Error bootstrapping topic {topic}: {e}")
+            raise
+        finally:
+            consumer.close()
+    
+    def load_station_catalog(self, timeout_ms: int = 30000) -> Dict[str, Dict[str, Any]]:
+        """
+        Load the current station information of every station
+        
+        Args:
+            timeout_ms (int): Maximum time to spend reading in milliseconds
+            
+        Returns:
+            Dict[str, Dict[str, Any]]: Station information keyed by station key
+        """
+        return self.read_latest(BIKES_STATION_INFORMATION_TOPIC, timeout_ms)
@@ -1,19 +1,41 @@
-import json
 import logging
-from kafka import KafkaConsumer
-from typing import List, Dict, Any
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from kafka.consumer.fetcher import ConsumerRecord
+from kafka.structs import OffsetAndMetadata, TopicPartition
+from typing import List, Dict, Any, Optional, Tuple, Union
+from src.utils.observability.log_setup import LogAggregator
+from src.utils.observability.metrics import CONSUMER_LAG, CONSUMER_RECORDS
+from src.utils.serialization.avro_codec import value_deserializer
+from src.utils.serialization.codec import JsonCodec, get_codec
 
 class Consumer:
-    def __init__(self, group_id: str = "bikes-consumer-group"):
+    def __init__(self, group_id: str = "bikes-consumer-group", codec: Optional[Union[str, JsonCodec]] = None,
+                 enable_auto_commit: bool = True, max_poll_records: int = 500, wire_format: str = 'json',
+                 schema_registry: Optional[str] = None):
         """
         Initialize Kafka Consumer
         
         Args:
             group_id (str): Consumer group ID for offset management
+            codec (Optional[Union[str, JsonCodec]]): Value codec, orjson by default
+            enable_auto_commit (bool): Commit offsets in the background every second; disable
+                it and call commit() after processing each batch for at-least-once delivery
+            max_poll_records (int): Default maximum number of records returned by one poll
+            wire_format (str): 'json', or 'avro' to read schema-registry framed Avro; JSON
+                payloads are still decoded with the codec
+            schema_registry (Optional[str]): Schema registry URL or local schema directory
+                used with Avro, config/schemas by default
         """
         self.group_id = group_id
+        self.codec = get_codec(codec)
+        self.value_deserializer = value_deserializer(self.codec, wire_format, schema_registry)
+        self.enable_auto_commit = enable_auto_commit
+        self.max_poll_records = max_poll_records
         self.consumer = None
         self.logger = logging.getLogger(__name__)
+        self.consumed_log = LogAggregator(self.logger, "Messages consumed", sample_every=1000)
+        # Records behind the high watermark per (topic, partition) after the last poll
+        self.lag: Dict[Tuple[str, int], int] = {}
         self._initialize_consumer()
     
     def _initialize_consumer(self):
@@ -23,62 +45,139 @@ class Consumer:
                 group_id=self.group_id,
                 bootstrap_servers=['localhost:9092'],
                 auto_offset_reset='earliest',
-                enable_auto_commit=True,
+                enable_auto_commit=self.enable_auto_commit,
                 auto_commit_interval_ms=1000,
-                value_deserializer=lambda x: json.loads(x.decode('utf-8')) if x else None,
+                max_poll_records=self.max_poll_records,
+                value_deserializer=self.value_deserializer,
                 key_deserializer=lambda x: x.decode('utf-8') if x else None
             )
-            self.logger.info(f"Consumer initialized successfully with group ID: {self.group_id}")
+            self.logger.info(
+                f"Consumer initialized successfully with group ID: {self.group_id} "
+                f"(auto commit: {self.enable_auto_commit})"
+            )
         except Exception as e:
             self.logger.error(f"Failed to initialize consumer: {e}")
             raise
     
-    def subscribe_to_topics(self, topics: List[str]):
+    def subscribe_to_topics(self, topics: List[str], listener: Optional[ConsumerRebalanceListener] = None):
         """
         Subscribe to multiple Kafka topics
         
         Args:
             topics (List[str]): List of topic names to subscribe to
+            listener (Optional[ConsumerRebalanceListener]): Called when partitions are revoked or assigned
         """
         try:
-            self.consumer.subscribe(topics)
+            if listener:
+                self.consumer.subscribe(topics, listener=listener)
+            else:
+                self.consumer.subscribe(topics)
             self.logger.info(f"Subscribed to topics: {topics}")
         except Exception as e:
             self.logger.error(f"Failed to subscribe to topics {topics}: {e}")
             raise
     
+    def poll_batches(self, max_records: Optional[int] = None,
+                     timeout_ms: int = 1000) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        """
+        Poll one batch of records from the subscribed topics
+        
+        Records are returned as delivered by Kafka, grouped by partition and in offset
+        order within each partition. Pass the batch to commit() once it has been processed.
+        
+        Args:
+            max_records (Optional[int]): Maximum number of records to return, max_poll_records by default
+            timeout_ms (int): Maximum time to wait for records in milliseconds
+            
+        Returns:
+            Dict[TopicPartition, List[ConsumerRecord]]: Records per partition, empty on timeout
+        """
+        if not self.consumer:
+            raise RuntimeError("Consumer not initialized")
+        
+        try:
+            batches = self.consumer.poll(timeout_ms=timeout_ms, max_records=max_records or self.max_poll_records)
+        except Exception as e:
+            self.logger.error(f"Error polling messages: {e}")
+            raise
+        
+        for tp, records in batches.items():
+            CONSUMER_RECORDS.labels(self.group_id, tp.topic).inc(len(records))
+            # The high watermark arrives with every fetch response, so this costs no request
+            highwater = self.consumer.highwater(tp)
+            if records and isinstance(highwater, int):
+                lag = max(0, highwater - records[-1].offset - 1)
+                self.lag[(tp.topic, tp.partition)] = lag
+                CONSUMER_LAG.labels(self.group_id, tp.topic, tp.partition).set(lag)
+        
+        if batches:
+            self.logger.debug(
+                f"Polled {sum(len(records) for records in batches.values())} records "
+                f"from {len(batches)} partitions"
+            )
+        return batches
+    
+    def commit(self, batches: Optional[Dict[TopicPartition, List[ConsumerRecord]]] = None):
+        """
+        Synchronously commit consumed offsets
+        
+        Args:
+            batches (Optional[Dict[TopicPartition, List[ConsumerRecord]]]): Processed batches
+                returned by poll_batches(); only their offsets are committed. Without it the
+                positions of everything polled so far are committed.
+        """
+        offsets = None
+        if batches:
+            offsets = {partition: records[-1].offset + 1 for partition, records in batches.items() if records}
+        self.commit_offsets(offsets)
+    
+    def commit_offsets(self, offsets: Optional[Dict[TopicPartition, int]] = None):
+        """
+        Synchronously commit explicit offsets
+        
+        Args:
+            offsets (Optional[Dict[TopicPartition, int]]): Next offset to read per partition;
+                None commits the positions of everything polled so far
+        """
+        try:
+            if offsets is None:
+                self.consumer.commit()
+            else:
+                self.consumer.commit({
+                    partition: OffsetAndMetadata(offset, None) for partition, offset in offsets.items()
+                })
+            self.logger.debug(f"Committed offsets for {len(offsets) if offsets is not None else 'all'} partitions")
+        except Exception as e:
+            self.logger.error(f"Failed to commit offsets: {e}")
+            raise
+    
     def consume_messages(self, max_messages: int = None, timeout_ms: int = 5000):
         """
         Consume messages from subscribed topics
         
         Args:
             max_messages (int, optional): Maximum number of messages to consume
-            timeout_ms (int): Timeout for message consumption in milliseconds
+            timeout_ms (int): Stop once no message arrived for this many milliseconds
             
         Yields:
             Dict: Message data with topic, partition, offset, and value
         """
-        if not self.consumer:
-            raise RuntimeError("Consumer not initialized")
-        
         message_count = 0
         try:
-            for message in self.consumer:
-                message_data = {
-                    'topic': message.topic,
-                    'partition': message.partition,
-                    'offset': message.offset,
-                    'key': message.key,
-                    'value': message.value,
-                    'timestamp': message.timestamp
-                }
+            while True:
+                remaining = max_messages - message_count if max_messages else None
+                batches = self.poll_batches(max_records=remaining, timeout_ms=timeout_ms)
+                if not batches:
+                    self.logger.info(f"No messages received within {timeout_ms} ms")
+                    return
                 
-                self.logger.info(f"Received message from {message.topic}:{message.partition}:{message.offset}")
-                yield message_data
-                
-                message_count += 1
-                if max_messages and message_count >= max_messages:
-                    break
+                for tp, records in batches.items():
+                    self.consumed_log.record(tp.topic, count=len(records), sample=records[0].value if records else None)
+                    for record in records:
+                        yield self._to_message(record)
+                        message_count += 1
+                        if max_messages and message_count >= max_messages:
+                            return
                     
         except Exception as e:
             self.logger.error(f"Error consuming messages: {e}")
@@ -97,21 +196,26 @@ class Consumer:
         """
         try:
             self.consumer.subscribe([topic])
-            message = next(self.consumer, None)
-            if message:
-                return {
-                    'topic': message.topic,
-                    'partition': message.partition,
-                    'offset': message.offset,
-                    'key': message.key,
-                    'value': message.value,
-                    'timestamp': message.timestamp
-                }
+            for records in self.poll_batches(max_records=1, timeout_ms=timeout_ms).values():
+                if records:
+                    return self._to_message(records[0])
             return None
         except Exception as e:
             self.logger.error(f"Error consuming single message from {topic}: {e}")
             raise
     
+    @staticmethod
+    def _to_message(record: ConsumerRecord) -> Dict[str, Any]:
+        """Convert a Kafka record to the message dict yielded by consume_messages"""
+        return {
+            'topic': record.topic,
+            'partition': record.partition,
+            'offset': record.offset,
+            'key': record.key,
+            'value': record.value,
+            'timestamp': record.timestamp
+        }
+    
     def unsubscribe(self):
         """Unsubscribe from all topics"""
         try:
@@ -125,6 +229,7 @@ class Consumer:
         try:
             if self.consumer:
                 self.consumer.close()
+                self.consumed_log.flush()
                 self.logger.info("Consumer closed successfully")
         except Exception as e:
             self.logger.error(f"Error closing consumer: {e}")
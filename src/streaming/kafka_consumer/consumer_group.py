@@ -0,0 +1,323 @@
+"""
+Multi-process consumer group runner for Citi Bikes Real-Time Streaming Project
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from kafka import ConsumerRebalanceListener
+from src.streaming.kafka_consumer.consumer import Consumer
+from src.utils.observability.metrics import CONSUMER_LAG, CONSUMER_RECORDS
+from src.utils.serialization.codec import JsonCodec
+
+# Called with the records of one poll, grouped by partition, before they are committed
+BatchHandler = Callable[[Dict[Any, List[Any]]], None]
+
+
+class CommitOnRevoke(ConsumerRebalanceListener):
+    """Rebalance listener that commits consumed offsets before partitions move to another worker"""
+    
+    def __init__(self, consumer: Consumer, worker_id: int):
+        """
+        Initialize the listener
+        
+        Args:
+            consumer (Consumer): Consumer whose offsets are committed
+            worker_id (int): Worker number, used in logs
+        """
+        self.consumer = consumer
+        self.worker_id = worker_id
+        self.logger = logging.getLogger(__name__)
+    
+    def on_partitions_revoked(self, revoked):
+        """Commit before giving up partitions so the next owner does not replay them"""
+        if revoked:
+            self.consumer.commit()
+            self.logger.info(f"Worker {self.worker_id} released {len(revoked)} partitions")
+    
+    def on_partitions_assigned(self, assigned):
+        """Log the partitions this worker now owns"""
+        partitions = sorted(f"{tp.topic}:{tp.partition}" for tp in assigned)
+        self.logger.info(f"Worker {self.worker_id} assigned partitions: {partitions}")
+
+
+def consume_worker(worker_id: int, group_id: str, topics: List[str], stop_event, stats_queue,
+                   handler: Optional[BatchHandler] = None, max_records: int = 500,
+                   poll_timeout_ms: int = 1000, stats_interval: float = 10.0,
+                   codec: Optional[Union[str, JsonCodec]] = None, wire_format: str = 'json',
+                   schema_registry: Optional[str] = None):
+    """
+    Consume in a worker process until the group is stopped or the worker gets SIGTERM
+    
+    Each polled batch is handed to the handler and committed afterwards, so a crash
+    replays at most the batch in progress (at-least-once).
+    
+    Args:
+        worker_id (int): Worker number, used in logs and stats
+        group_id (str): Consumer group shared by all workers
+        topics (List[str]): Topics to subscribe to
+        stop_event: multiprocessing.Event that stops every worker of the group
+        stats_queue: multiprocessing.Queue receiving throughput deltas and partition lag
+        handler (Optional[BatchHandler]): Batch processing function; records are only counted without it
+        max_records (int): Maximum records per poll
+        poll_timeout_ms (int): Maximum wait of one poll in milliseconds
+        stats_interval (float): Seconds between two stats reports
+        codec (Optional[Union[str, JsonCodec]]): Value codec, orjson by default
+        wire_format (str): 'json' or 'avro', see Consumer
+        schema_registry (Optional[str]): Schema registry URL or local schema directory
+    """
+    logger = logging.getLogger(__name__)
+    terminated = []
+    # Ctrl+C reaches the whole process group; the supervisor decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: terminated.append(signum))
+    
+    records = batches = 0
+    topic_records: Dict[str, int] = {}
+    last_report = time.monotonic()
+    
+    def report(now: float):
+        stats_queue.put({
+            'worker_id': worker_id,
+            'pid': os.getpid(),
+            'records': records,
+            'batches': batches,
+            'topic_records': topic_records,
+            'lag': dict(consumer.lag),
+            'seconds': now - last_report
+        })
+    
+    consumer = Consumer(group_id, codec=codec, enable_auto_commit=False, max_poll_records=max_records,
+                        wire_format=wire_format, schema_registry=schema_registry)
+    try:
+        consumer.subscribe_to_topics(topics, listener=CommitOnRevoke(consumer, worker_id))
+        logger.info(f"Worker {worker_id} (pid {os.getpid()}) consuming {topics}")
+        
+        while not stop_event.is_set() and not terminated:
+            polled = consumer.poll_batches(max_records=max_records, timeout_ms=poll_timeout_ms)
+            if polled:
+                if handler:
+                    handler(polled)
+                consumer.commit(polled)
+                batches += 1
+                for tp, partition_records in polled.items():
+                    records += len(partition_records)
+                    topic_records[tp.topic] = topic_records.get(tp.topic, 0) + len(partition_records)
+            
+            now = time.monotonic()
+            if now - last_report >= stats_interval:
+                report(now)
+                records = batches = 0
+                topic_records = {}
+                last_report = now
+        
+        logger.info(f"Worker {worker_id} stopping")
+    except Exception as e:
+        logger.error(f"Worker {worker_id} failed: {e}")
+        raise
+    finally:
+        report(time.monotonic())
+        # Closing leaves the group right away, so the remaining workers rebalance immediately
+        consumer.close()
+
+
+class ConsumerGroupRunner:
+    def __init__(self, topics: List[str], group_id: str = "bikes-consumer-group", workers: Optional[int] = None,
+                 handler: Optional[BatchHandler] = None, max_records: int = 500, poll_timeout_ms: int = 1000,
+                 stats_interval: float = 10.0, max_restarts: int = 5,
+                 codec: Optional[Union[str, JsonCodec]] = None, wire_format: str = 'json',
+                 schema_registry: Optional[str] = None):
+        """
+        Initialize a supervisor running one consumer process per worker in the same group
+        
+        Kafka assigns each worker its own set of partitions, so consumption scales with
+        partitions and cores. Workers that die are restarted, up to max_restarts times each.
+        The handler must be picklable (a module-level function) on platforms that spawn
+        worker processes.
+        
+        Args:
+            topics (List[str]): Topics to consume
+            group_id (str): Consumer group ID shared by the workers
+            workers (Optional[int]): Number of worker processes, one per CPU by default
+            handler (Optional[BatchHandler]): Batch processing function run in the workers
+            max_records (int): Maximum records per poll
+            poll_timeout_ms (int): Maximum wait of one poll in milliseconds
+            stats_interval (float): Seconds between throughput reports
+            max_restarts (int): Maximum restarts of a single worker before it is given up
+            codec (Optional[Union[str, JsonCodec]]): Value codec, orjson by default
+            wire_format (str): 'json' or 'avro', see Consumer
+            schema_registry (Optional[str]): Schema registry URL or local schema directory
+        """
+        self.topics = topics
+        self.group_id = group_id
+        self.workers = workers or os.cpu_count() or 1
+        self.handler = handler
+        self.max_records = max_records
+        self.poll_timeout_ms = poll_timeout_ms
+        self.stats_interval = stats_interval
+        self.max_restarts = max_restarts
+        self.codec = codec
+        self.wire_format = wire_format
+        self.schema_registry = schema_registry
+        self.logger = logging.getLogger(__name__)
+        
+        self.stop_event = multiprocessing.Event()
+        self.stats_queue = multiprocessing.Queue()
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.restarts: Dict[int, int] = {}
+        self.totals = {'records': 0, 'batches': 0}
+        self.worker_records: Dict[int, int] = {}
+        self._window_records = 0
+        self._started = 0.0
+    
+    def start(self):
+        """Start all worker processes"""
+        self._started = time.monotonic()
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+        self.logger.info(f"Started {self.workers} consumer workers in group {self.group_id} for {self.topics}")
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        Run the group until SIGINT/SIGTERM or stop(), supervising the workers
+        
+        Returns:
+            Dict[str, Any]: Aggregated throughput stats
+        """
+        previous = {signum: signal.signal(signum, lambda signum, frame: self.stop())
+                    for signum in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            self.start()
+            next_report = time.monotonic() + self.stats_interval
+            while not self.stop_event.is_set():
+                self._collect_stats(timeout=1.0)
+                self._supervise()
+                
+                if time.monotonic() >= next_report:
+                    self._log_throughput()
+                    next_report += self.stats_interval
+        finally:
+            self.shutdown()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        
+        return self.stats()
+    
+    def stop(self):
+        """Ask every worker to finish its current batch and leave the group"""
+        if not self.stop_event.is_set():
+            self.logger.info("Stopping consumer group...")
+        self.stop_event.set()
+    
+    def shutdown(self, timeout: float = 30.0):
+        """
+        Stop the workers and wait for them to exit
+        
+        Args:
+            timeout (float): Seconds to wait before remaining workers are terminated
+        """
+        self.stop()
+        deadline = time.monotonic() + timeout
+        # A worker only exits once its final report has left its queue buffer, so keep
+        # draining the queue while waiting for them
+        while any(process.is_alive() for process in self.processes.values()) and time.monotonic() < deadline:
+            self._collect_stats(timeout=min(0.1, max(0.0, deadline - time.monotonic())))
+        for worker_id, process in self.processes.items():
+            if process.is_alive():
+                self.logger.warning(f"Worker {worker_id} did not stop in time, terminating it")
+                process.terminate()
+            process.join()
+        self._collect_stats(timeout=0)
+        
+        stats = self.stats()
+        self.logger.info(
+            f"Consumer group stopped: {stats['records']} records in {stats['batches']} batches "
+            f"({stats['records_per_second']:.1f} records/s), {stats['restarts']} restarts"
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get aggregated stats of all workers
+        
+        Returns:
+            Dict[str, Any]: Records, batches, average rate, restarts and records per worker
+        """
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {
+            'workers': self.workers,
+            'records': self.totals['records'],
+            'batches': self.totals['batches'],
+            'records_per_second': self.totals['records'] / elapsed if elapsed else 0.0,
+            'restarts': sum(self.restarts.values()),
+            'records_per_worker': dict(self.worker_records)
+        }
+    
+    def _spawn(self, worker_id: int):
+        """Start (or restart) one worker process"""
+        process = multiprocessing.Process(
+            target=consume_worker,
+            args=(worker_id, self.group_id, self.topics, self.stop_event, self.stats_queue, self.handler,
+                  self.max_records, self.poll_timeout_ms, self.stats_interval, self.codec,
+                  self.wire_format, self.schema_registry),
+            name=f"consumer-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self.processes[worker_id] = process
+    
+    def _supervise(self):
+        """Restart workers that exited without being asked to"""
+        for worker_id, process in list(self.processes.items()):
+            if process.is_alive() or self.stop_event.is_set():
+                continue
+            
+            if process.exitcode == 0:
+                # A worker that got its own SIGTERM exits cleanly and is not replaced
+                self.logger.info(f"Worker {worker_id} exited")
+                del self.processes[worker_id]
+                continue
+            
+            restarts = self.restarts.get(worker_id, 0)
+            if restarts >= self.max_restarts:
+                self.logger.error(f"Worker {worker_id} died with exit code {process.exitcode}, giving up after {restarts} restarts")
+                del self.processes[worker_id]
+                continue
+            
+            self.restarts[worker_id] = restarts + 1
+            self.logger.warning(f"Worker {worker_id} died with exit code {process.exitcode}, restarting ({restarts + 1}/{self.max_restarts})")
+            self._spawn(worker_id)
+        
+        if not self.processes:
+            self.logger.error("No consumer workers left")
+            self.stop()
+    
+    def _collect_stats(self, timeout: float):
+        """Drain throughput reports sent by the workers"""
+        try:
+            report = self.stats_queue.get(timeout=timeout) if timeout else self.stats_queue.get_nowait()
+            while True:
+                self.totals['records'] += report['records']
+                self.totals['batches'] += report['batches']
+                self.worker_records[report['worker_id']] = self.worker_records.get(report['worker_id'], 0) + report['records']
+                self._window_records += report['records']
+                # Workers run in their own processes, so their metrics are folded into this registry
+                for topic, count in report.get('topic_records', {}).items():
+                    CONSUMER_RECORDS.labels(self.group_id, topic).inc(count)
+                for (topic, partition), lag in report.get('lag', {}).items():
+                    CONSUMER_LAG.labels(self.group_id, topic, partition).set(lag)
+                report = self.stats_queue.get_nowait()
+        except queue.Empty:
+            pass
+    
+    def _log_throughput(self):
+        """Log the group throughput of the last stats interval"""
+        self.logger.info(
+            f"Consumer group: {self._window_records / self.stats_interval:.1f} records/s over the last "
+            f"{self.stats_interval:.0f}s, {self.totals['records']} total, {len(self.processes)} workers alive"
+        )
+        self._window_records = 0
@@ -1,40 +1,129 @@
-import json
 import logging
+import threading
+import time
 from kafka import KafkaProducer
 from kafka.errors import KafkaError
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, Tuple, Union
+from src.core.config import Config, config as default_config
+from src.utils.serialization.avro_codec import value_serializer
+from src.utils.observability.log_setup import LogAggregator
+from src.utils.observability.metrics import PRODUCE_ACK_SECONDS, PRODUCE_MESSAGES
+from src.utils.serialization.codec import JsonCodec, get_codec
+
+class AckTracker:
+    """Counts the outcome of asynchronous sends between two ack barriers"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._acked = 0
+        self._failed = 0
+        self._last_error = None
+    
+    def record_success(self):
+        """Count one acknowledged send"""
+        with self._lock:
+            self._acked += 1
+    
+    def record_failure(self, error: Exception):
+        """Count one failed send"""
+        with self._lock:
+            self._failed += 1
+            self._last_error = error
+    
+    def drain(self) -> Tuple[Dict[str, int], Optional[Exception]]:
+        """Return the counts and last error so far and start counting from zero"""
+        with self._lock:
+            result = {'acked': self._acked, 'failed': self._failed}
+            last_error = self._last_error
+            self._acked = 0
+            self._failed = 0
+            self._last_error = None
+        return result, last_error
+
 
 class Producer:
-    def __init__(self, bootstrap_servers: str = 'localhost:9092'):
+    def __init__(self, bootstrap_servers: Optional[str] = None, max_in_flight: int = 1000,
+                 linger_ms: Optional[int] = None, batch_size: Optional[int] = None,
+                 compression_type: Optional[str] = None, codec: Optional[Union[str, JsonCodec]] = None,
+                 wire_format: str = 'json', schema_registry: Optional[str] = None,
+                 profile: Optional[str] = None, config: Optional[Config] = None, allow_json: bool = False):
         """
         Initialize Kafka Producer
         
+        Brokers, acks, retries and the batching settings come from the throughput profile
+        in Config; arguments that are not None override the profile.
+        
         Args:
-            bootstrap_servers (str): Kafka broker addresses
+            bootstrap_servers (Optional[str]): Kafka broker addresses
+            max_in_flight (int): Maximum number of unacknowledged asynchronous sends
+            linger_ms (Optional[int]): Time to wait for more records before sending a batch
+            batch_size (Optional[int]): Maximum size of a per-partition batch in bytes
+            compression_type (Optional[str]): 'gzip', 'snappy', 'lz4' or 'none'
+            codec (Optional[Union[str, JsonCodec]]): Value codec, orjson by default
+            wire_format (str): 'json', or 'avro' to write station topics as schema-registry
+                framed Avro; sending to a topic without a schema raises
+            schema_registry (Optional[str]): Schema registry URL or local schema directory
+                used with Avro, config/schemas by default
+            profile (Optional[str]): 'low-latency', 'balanced' or 'max-throughput', the
+                configured KafkaConfig.producer_profile by default
+            config (Optional[Config]): Configuration to read, the global config by default
+            allow_json (bool): With Avro, write topics without a schema as JSON instead of
+                raising, e.g. for feeds found through discovery
         """
-        self.bootstrap_servers = bootstrap_servers
+        config = config or default_config
+        # Resolved here rather than at import, so a bad profile fails with a clear error
+        self.settings = config.get_producer_config(profile)
+        self.profile = profile or config.kafka.producer_profile
+        if bootstrap_servers:
+            self.settings['bootstrap_servers'] = [bootstrap_servers]
+        if linger_ms is not None:
+            self.settings['linger_ms'] = linger_ms
+        if batch_size is not None:
+            self.settings['batch_size'] = batch_size
+        if compression_type is not None:
+            self.settings['compression_type'] = None if compression_type == 'none' else compression_type
+        
+        self.bootstrap_servers = ','.join(self.settings['bootstrap_servers'])
+        self.max_in_flight = max_in_flight
+        self.linger_ms = self.settings['linger_ms']
+        self.batch_size = self.settings['batch_size']
+        self.compression_type = self.settings['compression_type']
+        self.codec = get_codec(codec)
+        self.wire_format = wire_format
+        self.value_serializer = value_serializer(self.codec, wire_format, schema_registry, allow_json)
         self.producer = None
         self.logger = logging.getLogger(__name__)
+        # Per-message outcomes are counted and summarized instead of logged one by one
+        self.sent_log = LogAggregator(self.logger, "Messages sent", sample_every=1000)
+        self.failed_log = LogAggregator(self.logger, "Failed sends", level=logging.ERROR,
+                                        sample_every=1000, sample_level=logging.ERROR)
+        
+        # Bookkeeping for asynchronous sends between two ack barriers
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._ack_tracker = AckTracker()
+        
         self._initialize_producer()
     
     def _initialize_producer(self):
         """Initialize the Kafka producer with proper configuration"""
         try:
+            # Requests are pipelined per connection; snapshots are ordered by ack_barrier()
+            # Note: enable_idempotence removed for compatibility
             self.producer = KafkaProducer(
-                bootstrap_servers=[self.bootstrap_servers],
-                value_serializer=lambda x: json.dumps(x).encode('utf-8') if x else None,
+                value_serializer=self.value_serializer,
                 key_serializer=lambda x: x.encode('utf-8') if x else None,
-                acks='all',  # Wait for all replicas to acknowledge
-                retries=3,   # Retry failed sends
-                max_in_flight_requests_per_connection=1
-                # Note: enable_idempotence removed for compatibility
+                **self.settings
+            )
+            self.logger.info(
+                f"Producer initialized successfully with bootstrap servers: {self.bootstrap_servers} "
+                f"(profile: {self.profile}, compression: {self.compression_type}, linger: {self.linger_ms}ms, "
+                f"batch: {self.batch_size} bytes, codec: {self.codec.name}, wire format: {self.wire_format})"
             )
-            self.logger.info(f"Producer initialized successfully with bootstrap servers: {self.bootstrap_servers}")
         except Exception as e:
             self.logger.error(f"Failed to initialize producer: {e}")
             raise
     
-    def data_producer(self, topic: str, message: Dict[str, Any], key: Optional[str] = None):
+    def data_producer(self, topic: str, message: Dict[str, Any], key: Optional[str] = None, wait: bool = True):
         """
         Send a message to a Kafka topic
         
@@ -42,12 +131,18 @@ class Producer:
             topic (str): Target topic name
             message (Dict[str, Any]): Message data to send
             key (Optional[str]): Message key for partitioning
+            wait (bool): Block until the broker acknowledges the message. When False the
+                send is pipelined through send_async() and a future is returned instead
         """
         if not self.producer:
             raise RuntimeError("Producer not initialized")
         
+        if not wait:
+            return self.send_async(topic, message, key=key)
+        
         try:
             # Send message with callback for success/failure tracking
+            sent_at = time.perf_counter()
             future = self.producer.send(
                 topic=topic,
                 value=message,
@@ -56,47 +151,153 @@ class Producer:
             
             # Wait for the send to complete and check for errors
             record_metadata = future.get(timeout=10)
+            PRODUCE_ACK_SECONDS.labels(topic).observe(time.perf_counter() - sent_at)
+            PRODUCE_MESSAGES.labels(topic, "acked").inc()
             
-            self.logger.info(
-                f"Message sent successfully to {topic}:{record_metadata.partition}:{record_metadata.offset}"
-            )
+            self.sent_log.record(topic, sample=record_metadata)
             
             return record_metadata
             
         except KafkaError as e:
+            PRODUCE_MESSAGES.labels(topic, "failed").inc()
             self.logger.error(f"Failed to send message to topic {topic}: {e}")
             raise
         except Exception as e:
             self.logger.error(f"Unexpected error sending message to topic {topic}: {e}")
             raise
     
-    def send_batch(self, topic: str, messages: list, key: Optional[str] = None):
+    def send_async(self, topic: str, message: Dict[str, Any], key: Optional[str] = None,
+                   callback: Optional[Callable[[Any, Optional[Exception]], None]] = None,
+                   ack_tracker: Optional[AckTracker] = None):
+        """
+        Send a message without waiting for the broker acknowledgement
+        
+        At most max_in_flight messages may be unacknowledged at any time; once the
+        window is full this call blocks until an earlier send completes. Use
+        ack_barrier() to wait for everything sent so far.
+        
+        Args:
+            topic (str): Target topic name
+            message (Dict[str, Any]): Message data to send
+            key (Optional[str]): Message key for partitioning
+            callback (Optional[Callable]): Called as callback(record_metadata, error)
+                once the send completes; exactly one of the two arguments is None
+            ack_tracker (Optional[AckTracker]): Tracker counting this send, so that
+                concurrent callers can take independent ack barriers. Defaults to the
+                producer-wide tracker
+            
+        Returns:
+            FutureRecordMetadata: Future resolving to the record metadata
+        """
+        if not self.producer:
+            raise RuntimeError("Producer not initialized")
+        
+        self._in_flight.acquire()
+        sent_at = time.perf_counter()
+        try:
+            future = self.producer.send(topic=topic, value=message, key=key)
+        except Exception as e:
+            self._in_flight.release()
+            self.logger.error(f"Unexpected error sending message to topic {topic}: {e}")
+            raise
+        
+        ack_tracker = ack_tracker or self._ack_tracker
+        future.add_callback(self._on_send_success, topic, sent_at, ack_tracker, callback)
+        future.add_errback(self._on_send_error, topic, sent_at, ack_tracker, callback)
+        return future
+    
+    def _on_send_success(self, topic, sent_at, ack_tracker, callback, record_metadata):
+        """Record a successful asynchronous send"""
+        ack_tracker.record_success()
+        self._in_flight.release()
+        PRODUCE_ACK_SECONDS.labels(topic).observe(time.perf_counter() - sent_at)
+        PRODUCE_MESSAGES.labels(topic, "acked").inc()
+        if callback:
+            callback(record_metadata, None)
+    
+    def _on_send_error(self, topic, sent_at, ack_tracker, callback, error):
+        """Record a failed asynchronous send"""
+        ack_tracker.record_failure(error)
+        self._in_flight.release()
+        PRODUCE_ACK_SECONDS.labels(topic).observe(time.perf_counter() - sent_at)
+        PRODUCE_MESSAGES.labels(topic, "failed").inc()
+        self.failed_log.record(topic, sample=error)
+        if callback:
+            callback(None, error)
+    
+    def ack_barrier(self, timeout: Optional[float] = None, raise_on_error: bool = True,
+                    ack_tracker: Optional[AckTracker] = None) -> Dict[str, int]:
+        """
+        Wait until every asynchronous send issued so far has been acknowledged
+        
+        Args:
+            timeout (Optional[float]): Maximum time to wait in seconds
+            raise_on_error (bool): Raise KafkaError if any send since the last barrier failed
+            ack_tracker (Optional[AckTracker]): Tracker whose counts are reported,
+                defaults to the producer-wide tracker
+            
+        Returns:
+            Dict[str, int]: Number of acknowledged and failed sends since the last barrier
+        """
+        if not self.producer:
+            raise RuntimeError("Producer not initialized")
+        
+        self.producer.flush(timeout=timeout)
+        
+        result, last_error = (ack_tracker or self._ack_tracker).drain()
+        
+        self.logger.debug(f"Ack barrier reached: {result['acked']} acknowledged, {result['failed']} failed")
+        
+        if result['failed'] and raise_on_error:
+            raise KafkaError(f"{result['failed']} messages failed to send, last error: {last_error}")
+        
+        return result
+    
+    def send_batch(self, topic: str, messages: list, key: Optional[str] = None,
+                   key_func: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None) -> Dict[str, Any]:
         """
         Send multiple messages to a Kafka topic
         
+        All messages are handed to the producer without waiting, so they are grouped
+        into batches according to linger_ms, batch_size and compression_type, and a
+        single ack barrier is taken once the last message has been queued.
+        
         Args:
             topic (str): Target topic name
             messages (list): List of messages to send
             key (Optional[str]): Message key for partitioning
+            key_func (Optional[Callable[[Dict[str, Any]], Optional[str]]]): Derives the key
+                of each message, overriding key
+            
+        Returns:
+            Dict[str, Any]: Sent, acknowledged and failed counts plus the time spent
+            queueing (send_seconds) and waiting for acknowledgements (ack_seconds)
         """
         if not self.producer:
             raise RuntimeError("Producer not initialized")
         
         try:
-            futures = []
+            ack_tracker = AckTracker()
+            start = time.perf_counter()
             for message in messages:
-                future = self.producer.send(topic=topic, value=message, key=key)
-                futures.append(future)
+                message_key = key_func(message) if key_func else key
+                self.send_async(topic, message, key=message_key, ack_tracker=ack_tracker)
+            queued = time.perf_counter()
             
-            # Wait for all messages to be sent
-            for future in futures:
-                record_metadata = future.get(timeout=10)
-                self.logger.info(
-                    f"Batch message sent to {topic}:{record_metadata.partition}:{record_metadata.offset}"
-                )
+            acks = self.ack_barrier(ack_tracker=ack_tracker)
+            finished = time.perf_counter()
             
             self.logger.info(f"Successfully sent {len(messages)} messages to topic {topic}")
             
+            return {
+                'topic': topic,
+                'sent': len(messages),
+                'acked': acks['acked'],
+                'failed': acks['failed'],
+                'send_seconds': queued - start,
+                'ack_seconds': finished - queued
+            }
+            
         except Exception as e:
             self.logger.error(f"Failed to send batch messages to topic {topic}: {e}")
             raise
@@ -115,6 +316,8 @@ class Producer:
         try:
             if self.producer:
                 self.producer.close()
+                self.sent_log.flush()
+                self.failed_log.flush()
                 self.logger.info("Producer closed successfully")
         except Exception as e:
             self.logger.error(f"Error closing producer: {e}")
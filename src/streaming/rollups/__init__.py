@@ -0,0 +1,2 @@
+from .station_rollups import (DEFAULT_WINDOWS, ParquetRollupOutput, StationRollupAggregator, StationRollupStage,
+                              TopicRollupOutput, WindowSpec)
@@ -0,0 +1,565 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from kafka.structs import TopicPartition
+
+from src.streaming.kafka_consumer.consumer import Consumer
+from src.streaming.kafka_producer.producer import Producer
+from src.streaming.sinks.parquet_sink import KAFKA_COLUMNS, STATION_ROLLUPS_TABLE, partition_path
+from src.streaming.sinks.storage import open_storage
+from src.utils.constants.topics import (BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_ROLLUPS_TOPIC,
+                                       BIKES_STATION_STATUS_TOPIC)
+from src.utils.observability.metrics import ROLLUP_WATERMARK_LAG_SECONDS, ROLLUPS
+from src.utils.serialization.codec import JsonCodec
+
+
+@dataclass(frozen=True)
+class WindowSpec:
+    """A window size and how often it is emitted; slide equals size for tumbling windows"""
+    name: str
+    size: int
+    slide: int
+
+
+DEFAULT_WINDOWS = (
+    WindowSpec("1m", 60, 60),
+    WindowSpec("15m", 15 * 60, 15 * 60),
+    WindowSpec("1h", 60 * 60, 60 * 60),
+    # The last 15 minutes every minute and the last hour every 5 minutes
+    WindowSpec("15m/1m", 15 * 60, 60),
+    WindowSpec("1h/5m", 60 * 60, 5 * 60)
+)
+
+
+class _Pane:
+    """Mergeable availability statistics of one entity over one pane of time"""
+    
+    __slots__ = ('min_bikes', 'max_bikes', 'bike_seconds', 'covered_seconds', 'empty_seconds',
+                 'full_seconds', 'turnover', 'observations')
+    
+    def __init__(self):
+        self.min_bikes = None
+        self.max_bikes = None
+        self.bike_seconds = 0.0
+        self.covered_seconds = 0.0
+        self.empty_seconds = 0.0
+        self.full_seconds = 0.0
+        self.turnover = 0
+        self.observations = 0
+    
+    def include(self, bikes: int):
+        if self.min_bikes is None or bikes < self.min_bikes:
+            self.min_bikes = bikes
+        if self.max_bikes is None or bikes > self.max_bikes:
+            self.max_bikes = bikes
+    
+    def hold(self, bikes: int, docks: int, seconds: float):
+        """Account for a state that lasted the given time within the pane"""
+        self.include(bikes)
+        self.covered_seconds += seconds
+        self.bike_seconds += bikes * seconds
+        if bikes == 0:
+            self.empty_seconds += seconds
+        if docks == 0:
+            self.full_seconds += seconds
+    
+    def merge(self, other: "_Pane"):
+        if other.min_bikes is not None:
+            self.include(other.min_bikes)
+            self.include(other.max_bikes)
+        self.bike_seconds += other.bike_seconds
+        self.covered_seconds += other.covered_seconds
+        self.empty_seconds += other.empty_seconds
+        self.full_seconds += other.full_seconds
+        self.turnover += other.turnover
+        self.observations += other.observations
+
+
+class _Entity:
+    """Current availability of a station or region and its panes not yet rolled up"""
+    
+    __slots__ = ('bikes', 'docks', 'since', 'panes')
+    
+    def __init__(self, bikes: int, docks: int, since: int):
+        self.bikes = bikes
+        self.docks = docks
+        self.since = since
+        self.panes: Dict[int, _Pane] = {}
+
+
+class StationRollupAggregator:
+    def __init__(self, windows: Sequence[WindowSpec] = DEFAULT_WINDOWS):
+        """
+        Initialize windowed availability rollups per station and per region
+        
+        Station status is a step function: a station keeps its bike and dock counts until
+        the next update. Every update closes the previous step, whose duration is added
+        to fixed panes of time (the greatest common divisor of all window sizes and
+        slides). When the watermark passes the end of a pane, every entity's current
+        step is carried up to it and each window ending there is rolled up by merging
+        its panes, so a sliding window costs no more than the panes it spans.
+        
+        Per window the rollup holds min/max bikes, the time-weighted average bikes,
+        seconds spent empty (no bikes) and full (no docks), turnover (the sum of bike
+        count changes) and the observed and covered time. A region's counts are the sums
+        over its stations.
+        
+        Args:
+            windows (Sequence[WindowSpec]): Windows to emit
+        """
+        self.windows = tuple(windows)
+        pane_seconds = 0
+        for window in self.windows:
+            if window.size % window.slide:
+                raise ValueError(f"Window {window.name}: size must be a multiple of the slide")
+            pane_seconds = math.gcd(pane_seconds, math.gcd(window.size, window.slide))
+        self.pane_ms = pane_seconds * 1000
+        self.retention_ms = max(window.size for window in self.windows) * 1000
+        self.entities: Dict[Tuple[str, str], _Entity] = {}
+        self.station_regions: Dict[str, str] = {}
+        self.closed_until: Optional[int] = None
+        self.late_records = 0
+    
+    def _pane_start(self, timestamp: int) -> int:
+        return timestamp - timestamp % self.pane_ms
+    
+    def _carry(self, entity: _Entity, until: int):
+        """Add the entity's current step up to the given time to its panes"""
+        since = entity.since
+        while since < until:
+            start = self._pane_start(since)
+            end = min(until, start + self.pane_ms)
+            pane = entity.panes.get(start)
+            if pane is None:
+                pane = entity.panes[start] = _Pane()
+            pane.hold(entity.bikes, entity.docks, (end - since) / 1000)
+            since = end
+        entity.since = max(entity.since, until)
+    
+    def _observe(self, key: Tuple[str, str], timestamp: int, bikes: int, docks: int, turnover: int):
+        entity = self.entities.get(key)
+        if entity is None:
+            entity = self.entities[key] = _Entity(bikes, docks, timestamp)
+        else:
+            self._carry(entity, timestamp)
+            entity.bikes, entity.docks = bikes, docks
+        start = self._pane_start(entity.since)
+        pane = entity.panes.get(start)
+        if pane is None:
+            pane = entity.panes[start] = _Pane()
+        pane.include(bikes)
+        pane.turnover += turnover
+        pane.observations += 1
+    
+    def observe_status(self, station_id: str, timestamp: int, bikes: int, docks: int):
+        """
+        Apply one station status update
+        
+        Args:
+            station_id (str): Station ID
+            timestamp (int): Event time in epoch milliseconds
+            bikes (int): num_bikes_available
+            docks (int): num_docks_available
+        """
+        if self.closed_until is None:
+            self.closed_until = self._pane_start(timestamp)
+        elif timestamp < self.closed_until:
+            # Its pane was already rolled up; count the update from the first open pane
+            self.late_records += 1
+            timestamp = self.closed_until
+        
+        station = self.entities.get(('station', station_id))
+        previous_bikes = station.bikes if station else bikes
+        previous_docks = station.docks if station else 0
+        # Out-of-order updates within open panes take effect at the latest time seen
+        timestamp = max(timestamp, station.since) if station else timestamp
+        turnover = abs(bikes - previous_bikes)
+        self._observe(('station', station_id), timestamp, bikes, docks, turnover)
+        
+        region_id = self.station_regions.get(station_id)
+        if region_id is not None:
+            if station is None:
+                self._add_to_region(region_id, timestamp, bikes, docks, 0)
+            else:
+                self._add_to_region(region_id, timestamp, bikes - previous_bikes, docks - previous_docks, turnover)
+    
+    def _add_to_region(self, region_id: str, timestamp: int, bikes: int, docks: int, turnover: int):
+        region = self.entities.get(('region', region_id))
+        if region is not None:
+            timestamp = max(timestamp, region.since)
+            bikes, docks = region.bikes + bikes, region.docks + docks
+        self._observe(('region', region_id), timestamp, bikes, docks, turnover)
+    
+    def set_region(self, station_id: str, region_id: Optional[str], timestamp: int):
+        """
+        Assign a station to a region, moving its current counts between region totals
+        
+        Args:
+            station_id (str): Station ID
+            region_id (Optional[str]): Region from station_information, None for none
+            timestamp (int): Event time in epoch milliseconds
+        """
+        previous = self.station_regions.get(station_id)
+        if previous == region_id:
+            return
+        if region_id is None:
+            self.station_regions.pop(station_id, None)
+        else:
+            self.station_regions[station_id] = region_id
+        
+        station = self.entities.get(('station', station_id))
+        if station is None:
+            return
+        if self.closed_until is not None:
+            timestamp = max(timestamp, self.closed_until)
+        if previous is not None:
+            self._add_to_region(previous, timestamp, -station.bikes, -station.docks, 0)
+        if region_id is not None:
+            self._add_to_region(region_id, timestamp, station.bikes, station.docks, 0)
+    
+    def advance(self, watermark: int) -> List[Dict[str, Any]]:
+        """
+        Roll up every window that ends at or before the watermark
+        
+        Args:
+            watermark (int): Event time in epoch milliseconds up to which no more updates are expected
+        
+        Returns:
+            List[Dict[str, Any]]: One rollup per entity and window that ended
+        """
+        if self.closed_until is None:
+            return []
+        closed = self._pane_start(watermark)
+        if closed <= self.closed_until:
+            return []
+        
+        for entity in self.entities.values():
+            self._carry(entity, closed)
+        
+        rollups = []
+        for window in self.windows:
+            slide_ms, size_ms = window.slide * 1000, window.size * 1000
+            # Window ends aligned to the slide in (closed_until, closed]
+            end = self.closed_until - self.closed_until % slide_ms + slide_ms
+            while end <= closed:
+                rollups.extend(self._roll_up(window, end - size_ms, end))
+                end += slide_ms
+        
+        horizon = closed - self.retention_ms
+        for entity in self.entities.values():
+            for start in [start for start in entity.panes if start < horizon]:
+                del entity.panes[start]
+        self.closed_until = closed
+        return rollups
+    
+    def _roll_up(self, window: WindowSpec, start: int, end: int) -> List[Dict[str, Any]]:
+        rollups = []
+        for (kind, entity_id), entity in self.entities.items():
+            total = _Pane()
+            for pane_start in range(start, end, self.pane_ms):
+                pane = entity.panes.get(pane_start)
+                if pane is not None:
+                    total.merge(pane)
+            if not total.covered_seconds and not total.observations:
+                continue
+            rollups.append({
+                'entity': kind,
+                'entity_id': entity_id,
+                'window_name': window.name,
+                'window_start': start,
+                'window_end': end,
+                'min_bikes': total.min_bikes,
+                'max_bikes': total.max_bikes,
+                'avg_bikes': total.bike_seconds / total.covered_seconds if total.covered_seconds else None,
+                'empty_seconds': total.empty_seconds,
+                'full_seconds': total.full_seconds,
+                'turnover': total.turnover,
+                'observations': total.observations,
+                'covered_seconds': total.covered_seconds
+            })
+            ROLLUPS.labels(kind, window.name).inc()
+        return rollups
+
+
+class TopicRollupOutput:
+    def __init__(self, producer: Optional[Producer] = None, topic: str = BIKES_STATION_ROLLUPS_TOPIC):
+        """
+        Initialize rollup output to a Kafka topic, keyed by entity
+        
+        Args:
+            producer (Optional[Producer]): Producer to send with, a new one by default
+            topic (str): Destination topic
+        """
+        self.producer = producer or Producer()
+        self.topic = topic
+    
+    def write(self, rollups: List[Dict[str, Any]]):
+        self.producer.send_batch(self.topic, rollups, key_func=lambda rollup: f"{rollup['entity']}:{rollup['entity_id']}")
+    
+    def close(self):
+        self.producer.close()
+
+
+class ParquetRollupOutput:
+    def __init__(self, location: str = "datalake", compression: str = "zstd",
+                 endpoint_url: Optional[str] = None, storage=None):
+        """
+        Initialize rollup output as Parquet files in the data lake layout
+        
+        Files go under feed=station_rollups/dt=<date>/hour=<hour>/ by window end, with
+        the columns of the station_rollups table the sink writes from the rollup topic.
+        
+        Args:
+            location (str): Local directory or s3://bucket/prefix
+            compression (str): Parquet compression codec
+            endpoint_url (Optional[str]): Endpoint of an S3-compatible store
+            storage: LocalStorage or S3Storage to write to instead of opening location
+        """
+        self.storage = storage or open_storage(location, endpoint_url)
+        self.compression = compression
+        self.logger = logging.getLogger(__name__)
+    
+    def write(self, rollups: List[Dict[str, Any]]):
+        table = STATION_ROLLUPS_TABLE
+        by_hour = defaultdict(list)
+        for rollup in rollups:
+            # The same partition as the sink gives a rollup read from the topic
+            by_hour[table.partition_hour(rollup, int(time.time() * 1000))].append(rollup)
+        
+        for hour, rows in by_hour.items():
+            columns = {column.name: [column.convert(row.get(column.name)) for row in rows] for column in table.columns}
+            columns.update({column.name: [None] * len(rows) for column in KAFKA_COLUMNS})
+            output = pa.BufferOutputStream()
+            pq.write_table(pa.Table.from_pydict(columns, schema=table.schema), output, compression=self.compression)
+            key = (f"{partition_path(table.feed, hour)}/"
+                   f"part-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet")
+            self.storage.put(key, output.getvalue().to_pybytes())
+            self.logger.debug(f"Wrote {len(rows)} rollups to {self.storage.uri(key)}")
+    
+    def close(self):
+        pass
+
+
+class StationRollupStage:
+    def __init__(self, output=None, windows: Sequence[WindowSpec] = DEFAULT_WINDOWS,
+                 group_id: str = "bikes-station-rollups", lateness_seconds: float = 30.0,
+                 max_records: int = 1000, codec: Optional[Union[str, JsonCodec]] = None,
+                 wire_format: str = 'json', schema_registry: Optional[str] = None):
+        """
+        Initialize the streaming rollup stage over the station topics
+        
+        Event time is the Kafka timestamp of each status record. The watermark trails
+        the event time every status partition has reached by lateness_seconds, so a
+        replay reading one partition ahead of another does not make the other's records
+        late. Once a poll comes back empty and every assigned status partition has been
+        read up to its end offset, it trails the wall clock instead, so windows close
+        even when no station changes; an empty poll in the middle of a replay does not
+        count. Offsets are committed after each batch of rollups is written; the open
+        panes are kept in memory only, so after a restart the first window of each size
+        covers less time, as covered_seconds shows.
+        
+        Args:
+            output: TopicRollupOutput or ParquetRollupOutput, the rollup topic by default
+            windows (Sequence[WindowSpec]): Windows to emit
+            group_id (str): Consumer group ID of the stage
+            lateness_seconds (float): How long to wait for late records before closing a pane
+            max_records (int): Maximum records per poll
+            codec (Optional[Union[str, JsonCodec]]): Value codec, orjson by default
+            wire_format (str): 'json' or 'avro', see Consumer
+            schema_registry (Optional[str]): Schema registry URL or local schema directory
+        """
+        self.output = output
+        self.aggregator = StationRollupAggregator(windows)
+        self.group_id = group_id
+        self.lateness_ms = int(lateness_seconds * 1000)
+        self.max_records = max_records
+        self.codec = codec
+        self.wire_format = wire_format
+        self.schema_registry = schema_registry
+        self.consumer = None
+        self.records = 0
+        self.rollups = 0
+        self.stop_event = threading.Event()
+        self.stopped = threading.Event()
+        self.logger = logging.getLogger(__name__)
+        # Latest event time per status partition
+        self._event_times: Dict[TopicPartition, int] = {}
+        self._thread = None
+        self._failure: Optional[BaseException] = None
+    
+    def apply(self, batches: Dict[TopicPartition, List[Any]]):
+        """
+        Feed polled records to the aggregator
+        
+        Args:
+            batches (Dict[TopicPartition, List[Any]]): Records per partition from Consumer.poll_batches
+        """
+        now_ms = int(time.time() * 1000)
+        aggregator = self.aggregator
+        for tp, records in batches.items():
+            is_status = tp.topic == BIKES_STATION_STATUS_TOPIC
+            for record in records:
+                value = record.value
+                if not isinstance(value, dict):
+                    continue
+                station_id = record.key or value.get('station_id')
+                if station_id is None:
+                    continue
+                timestamp = record.timestamp if record.timestamp >= 0 else now_ms
+                if not is_status:
+                    aggregator.set_region(str(station_id), value.get('region_id'), timestamp)
+                    continue
+                bikes, docks = value.get('num_bikes_available'), value.get('num_docks_available')
+                if not isinstance(bikes, int) or not isinstance(docks, int):
+                    continue
+                aggregator.observe_status(str(station_id), timestamp, bikes, docks)
+                if timestamp > self._event_times.get(tp, -1):
+                    self._event_times[tp] = timestamp
+            self.records += len(records)
+    
+    def caught_up(self) -> bool:
+        """Whether every assigned status partition has been read up to its end offset"""
+        if not self.consumer or not self.consumer.consumer:
+            return False
+        kafka_consumer = self.consumer.consumer
+        try:
+            partitions = [tp for tp in kafka_consumer.assignment() if tp.topic == BIKES_STATION_STATUS_TOPIC]
+            if not partitions:
+                return False
+            end_offsets = kafka_consumer.end_offsets(partitions)
+            return all(kafka_consumer.position(tp) >= end_offsets[tp] for tp in partitions)
+        except Exception as e:
+            # Not knowing the end offsets, keep following event time
+            self.logger.warning(f"Could not check the status partitions for lag: {e}")
+            return False
+    
+    def watermark(self, idle: bool) -> int:
+        """Event time up to which panes can be closed"""
+        if idle:
+            return int(time.time() * 1000) - self.lateness_ms
+        return min(self._event_times.values(), default=0) - self.lateness_ms
+    
+    def emit(self, watermark: int) -> int:
+        """
+        Write the rollups of every window the watermark closed and commit
+        
+        Args:
+            watermark (int): Event time in epoch milliseconds
+        
+        Returns:
+            int: Rollups written
+        """
+        rollups = self.aggregator.advance(watermark)
+        ROLLUP_WATERMARK_LAG_SECONDS.set(time.time() - watermark / 1000)
+        if not rollups:
+            return 0
+        self.output.write(rollups)
+        if self.consumer:
+            self.consumer.commit()
+        self.rollups += len(rollups)
+        self.logger.info(f"Emitted {len(rollups)} rollups up to {datetime.fromtimestamp(watermark / 1000, tz=timezone.utc):%H:%M:%S}")
+        return len(rollups)
+    
+    def run(self, poll_timeout_ms: int = 1000):
+        """
+        Consume until stop() is called
+        
+        Args:
+            poll_timeout_ms (int): Maximum wait of one poll in milliseconds
+        """
+        self.consumer = None
+        try:
+            self.output = self.output or TopicRollupOutput()
+            self.consumer = Consumer(self.group_id, codec=self.codec, enable_auto_commit=False,
+                                     max_poll_records=self.max_records, wire_format=self.wire_format,
+                                     schema_registry=self.schema_registry)
+            self.consumer.subscribe_to_topics([BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC])
+            while not self.stop_event.is_set():
+                batches = self.consumer.poll_batches(timeout_ms=poll_timeout_ms)
+                if batches:
+                    self.apply(batches)
+                self.emit(self.watermark(idle=not batches and self.caught_up()))
+        except Exception as e:
+            self.logger.error(f"Station rollup stage failed: {e}")
+            # Kept for join()/stop(), as an exception raised in the background thread
+            # would otherwise look like a clean stop to the caller
+            self._failure = e
+            raise
+        finally:
+            if self.consumer:
+                self.consumer.close()
+            if self.output:
+                self.output.close()
+            self.stopped.set()
+    
+    def start(self):
+        """Run the stage in a background thread"""
+        self.stop_event.clear()
+        self.stopped.clear()
+        self._failure = None
+        self._thread = threading.Thread(target=self.run, name="station-rollups", daemon=True)
+        self._thread.start()
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the background thread
+        
+        Args:
+            timeout (Optional[float]): Seconds to wait
+        
+        Returns:
+            bool: Whether the stage is still running
+        
+        Raises:
+            Exception: The error the background thread failed with, raised once
+        """
+        if not self._thread:
+            return False
+        if not self.stopped.wait(timeout):
+            return True
+        self._raise_failure()
+        return False
+    
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop consuming
+        
+        Args:
+            timeout (Optional[float]): Seconds to wait for the background thread
+        
+        Raises:
+            Exception: The error the background thread failed with, unless join() raised it
+        """
+        self.stop_event.set()
+        if self._thread:
+            self.stopped.wait(timeout)
+            self._raise_failure()
+    
+    def _raise_failure(self):
+        """Re-raise the error that ended the background thread, once"""
+        failure, self._failure = self._failure, None
+        if failure is not None:
+            raise failure
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get stage stats
+        
+        Returns:
+            Dict[str, Any]: Records applied, rollups emitted, entities tracked and late records
+        """
+        return {
+            'records_applied': self.records,
+            'rollups_emitted': self.rollups,
+            'entities': len(self.aggregator.entities),
+            'late_records': self.aggregator.late_records
+        }
@@ -0,0 +1,2 @@
+from .parquet_sink import PARQUET_TABLES, ParquetSink, ParquetTable, glue_table_input
+from .storage import LocalStorage, S3Storage, open_storage
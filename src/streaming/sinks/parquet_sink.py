@@ -0,0 +1,549 @@
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from kafka import ConsumerRebalanceListener
+from kafka.structs import TopicPartition
+
+from src.streaming.kafka_consumer.consumer import Consumer
+from src.streaming.sinks.storage import open_storage
+from src.utils.constants.topics import (BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_ROLLUPS_TOPIC,
+                                       BIKES_STATION_STATUS_TOPIC)
+from src.utils.observability.metrics import SINK_BYTES, SINK_FILES, SINK_RECORDS, SINK_WRITE_SECONDS
+from src.utils.serialization.codec import JsonCodec
+
+MILLISECONDS_PER_HOUR = 3600 * 1000
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return None if value is None else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    # GBFS 1.x sends 0/1 where 2.x sends booleans
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ("true", "false", "1", "0"):
+        return value.lower() in ("true", "1")
+    return None
+
+
+def _to_str(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _to_text(value: Any) -> Optional[str]:
+    # GBFS 3.0 localizes names as [{"text": ..., "language": ...}]; keep the English one
+    if isinstance(value, list):
+        texts = [item for item in value if isinstance(item, dict) and 'text' in item]
+        if not texts:
+            return None
+        english = next((item for item in texts if str(item.get('language', '')).startswith('en')), texts[0])
+        return str(english['text'])
+    return _to_str(value)
+
+
+def _to_epoch_ms(value: Any) -> Optional[int]:
+    # GBFS 2.x reports POSIX seconds, 3.0 an RFC 3339 string
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value * 1000)
+    try:
+        return int(datetime.fromisoformat(str(value)).timestamp() * 1000)
+    except ValueError:
+        return None
+
+
+def _to_string_list(value: Any) -> Optional[List[str]]:
+    return [str(item) for item in value] if isinstance(value, list) else None
+
+
+def _to_string_map(value: Any) -> Optional[List[Tuple[str, str]]]:
+    return [(str(key), str(item)) for key, item in value.items()] if isinstance(value, dict) else None
+
+
+def _to_vehicle_counts(value: Any) -> Optional[List[Dict[str, Any]]]:
+    if not isinstance(value, list):
+        return None
+    return [
+        {'vehicle_type_id': _to_str(item.get('vehicle_type_id')), 'count': _to_int(item.get('count'))}
+        for item in value if isinstance(item, dict)
+    ]
+
+
+@dataclass(frozen=True)
+class Column:
+    """One typed column of a data lake table"""
+    name: str
+    arrow_type: pa.DataType
+    glue_type: str
+    convert: Callable[[Any], Any] = _to_str
+
+
+@dataclass(frozen=True)
+class ParquetTable:
+    """Parquet layout and Glue table of one feed"""
+    feed: str
+    topic: str
+    columns: Tuple[Column, ...]
+    # Event time in epoch milliseconds a row is partitioned by, the Kafka timestamp when None
+    partition_time: Optional[Callable[[Dict[str, Any]], Optional[int]]] = None
+    
+    @property
+    def schema(self) -> pa.Schema:
+        return pa.schema([(column.name, column.arrow_type) for column in self.columns + KAFKA_COLUMNS])
+    
+    def partition_hour(self, value: Dict[str, Any], timestamp: int) -> int:
+        """Hour since the epoch of the partition a row goes to, given its Kafka timestamp"""
+        event_time = self.partition_time(value) if self.partition_time else None
+        return (timestamp if event_time is None else event_time) // MILLISECONDS_PER_HOUR
+
+
+def _window_partition_time(value: Dict[str, Any]) -> Optional[int]:
+    """A rollup belongs to the hour its window covers, so a window ending on the hour goes to the hour before"""
+    window_end = _to_int(value.get('window_end'))
+    return window_end - 1 if window_end is not None else None
+
+
+# Where every row came from, so files can be deduplicated against the topic after a replay
+KAFKA_COLUMNS = (
+    Column('kafka_partition', pa.int32(), 'int'),
+    Column('kafka_offset', pa.int64(), 'bigint'),
+    Column('kafka_timestamp', pa.timestamp('ms'), 'timestamp')
+)
+
+VEHICLE_COUNT_TYPE = pa.list_(pa.struct([('vehicle_type_id', pa.string()), ('count', pa.int32())]))
+
+STATION_STATUS_TABLE = ParquetTable(
+    feed="station_status",
+    topic=BIKES_STATION_STATUS_TOPIC,
+    columns=(
+        Column('station_id', pa.string(), 'string'),
+        Column('num_bikes_available', pa.int32(), 'int', _to_int),
+        Column('num_ebikes_available', pa.int32(), 'int', _to_int),
+        Column('num_bikes_disabled', pa.int32(), 'int', _to_int),
+        Column('num_docks_available', pa.int32(), 'int', _to_int),
+        Column('num_docks_disabled', pa.int32(), 'int', _to_int),
+        Column('num_scooters_available', pa.int32(), 'int', _to_int),
+        Column('num_scooters_unavailable', pa.int32(), 'int', _to_int),
+        Column('is_installed', pa.bool_(), 'boolean', _to_bool),
+        Column('is_renting', pa.bool_(), 'boolean', _to_bool),
+        Column('is_returning', pa.bool_(), 'boolean', _to_bool),
+        Column('eightd_has_available_keys', pa.bool_(), 'boolean', _to_bool),
+        Column('last_reported', pa.timestamp('ms'), 'timestamp', _to_epoch_ms),
+        Column('legacy_id', pa.string(), 'string'),
+        Column('vehicle_types_available', VEHICLE_COUNT_TYPE,
+               'array<struct<vehicle_type_id:string,count:int>>', _to_vehicle_counts),
+        Column('system_id', pa.string(), 'string')
+    )
+)
+
+STATION_INFORMATION_TABLE = ParquetTable(
+    feed="station_information",
+    topic=BIKES_STATION_INFORMATION_TOPIC,
+    columns=(
+        Column('station_id', pa.string(), 'string'),
+        Column('name', pa.string(), 'string', _to_text),
+        Column('short_name', pa.string(), 'string'),
+        Column('lat', pa.float64(), 'double', _to_float),
+        Column('lon', pa.float64(), 'double', _to_float),
+        Column('region_id', pa.string(), 'string'),
+        Column('capacity', pa.int32(), 'int', _to_int),
+        Column('legacy_id', pa.string(), 'string'),
+        Column('external_id', pa.string(), 'string'),
+        Column('station_type', pa.string(), 'string'),
+        Column('has_kiosk', pa.bool_(), 'boolean', _to_bool),
+        Column('electric_bike_surcharge_waiver', pa.bool_(), 'boolean', _to_bool),
+        Column('eightd_has_key_dispenser', pa.bool_(), 'boolean', _to_bool),
+        Column('rental_methods', pa.list_(pa.string()), 'array<string>', _to_string_list),
+        Column('rental_uris', pa.map_(pa.string(), pa.string()), 'map<string,string>', _to_string_map),
+        Column('system_id', pa.string(), 'string')
+    )
+)
+
+STATION_ROLLUPS_TABLE = ParquetTable(
+    feed="station_rollups",
+    topic=BIKES_STATION_ROLLUPS_TOPIC,
+    columns=(
+        Column('entity', pa.string(), 'string'),
+        Column('entity_id', pa.string(), 'string'),
+        Column('window_name', pa.string(), 'string'),
+        Column('window_start', pa.timestamp('ms'), 'timestamp', _to_int),
+        Column('window_end', pa.timestamp('ms'), 'timestamp', _to_int),
+        Column('min_bikes', pa.int32(), 'int', _to_int),
+        Column('max_bikes', pa.int32(), 'int', _to_int),
+        Column('avg_bikes', pa.float64(), 'double', _to_float),
+        Column('empty_seconds', pa.float64(), 'double', _to_float),
+        Column('full_seconds', pa.float64(), 'double', _to_float),
+        Column('turnover', pa.int32(), 'int', _to_int),
+        Column('observations', pa.int32(), 'int', _to_int),
+        Column('covered_seconds', pa.float64(), 'double', _to_float)
+    ),
+    # Rollups are produced when a window closes, which can be long after it during a replay
+    partition_time=_window_partition_time
+)
+
+# Tables written by the sink, by topic
+PARQUET_TABLES = {table.topic: table for table in (STATION_STATUS_TABLE, STATION_INFORMATION_TABLE,
+                                                   STATION_ROLLUPS_TABLE)}
+
+# Topics the sink writes unless told otherwise: the raw station feeds
+STATION_TOPICS = [BIKES_STATION_STATUS_TOPIC, BIKES_STATION_INFORMATION_TOPIC]
+
+
+def partition_path(feed: str, hour: int) -> str:
+    """Hive-style directory of a feed and an hour since the epoch (UTC), e.g. feed=station_status/dt=2024-05-01/hour=13"""
+    start = datetime.fromtimestamp(hour * 3600, tz=timezone.utc)
+    return f"feed={feed}/dt={start:%Y-%m-%d}/hour={start:%H}"
+
+
+def glue_table_input(table: ParquetTable, location: str, compression: str = "zstd",
+                     first_date: str = "2024-01-01") -> Dict[str, Any]:
+    """
+    Get the Glue TableInput of a feed's Parquet files
+    
+    Partitions are resolved by Athena partition projection, so new hours are queryable
+    as soon as their first file is written, without a crawler or MSCK REPAIR.
+    
+    Args:
+        table (ParquetTable): Feed table
+        location (str): s3:// location the sink writes to
+        compression (str): Parquet compression codec of the files
+        first_date (str): Earliest dt partition to project
+    
+    Returns:
+        Dict[str, Any]: TableInput for glue create_table/update_table
+    """
+    table_location = f"{location.rstrip('/')}/feed={table.feed}"
+    return {
+        'Name': table.feed,
+        'TableType': 'EXTERNAL_TABLE',
+        'Parameters': {
+            'EXTERNAL': 'TRUE',
+            'classification': 'parquet',
+            'parquet.compression': compression.upper(),
+            'projection.enabled': 'true',
+            'projection.dt.type': 'date',
+            'projection.dt.format': 'yyyy-MM-dd',
+            'projection.dt.range': f"{first_date},NOW",
+            'projection.hour.type': 'integer',
+            'projection.hour.range': '0,23',
+            'projection.hour.digits': '2',
+            'storage.location.template': f"{table_location}/dt=${{dt}}/hour=${{hour}}/"
+        },
+        'StorageDescriptor': {
+            'Columns': [{'Name': column.name, 'Type': column.glue_type}
+                        for column in table.columns + KAFKA_COLUMNS],
+            'Location': f"{table_location}/",
+            'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+            'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+            'SerdeInfo': {
+                'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe',
+                'Parameters': {'serialization.format': '1'}
+            }
+        },
+        'PartitionKeys': [
+            {'Name': 'dt', 'Type': 'string'},
+            {'Name': 'hour', 'Type': 'int'}
+        ]
+    }
+
+
+class _FileBuffer:
+    """Rows of one feed and hour waiting to be written as a single Parquet file"""
+    
+    def __init__(self, table: ParquetTable, hour: int):
+        self.table = table
+        self.hour = hour
+        self.columns: Dict[str, List[Any]] = {column.name: [] for column in table.columns + KAFKA_COLUMNS}
+        self.records = 0
+        self.bytes = 0
+        self.opened_at = time.monotonic()
+        # Lowest offset held per Kafka partition; offsets below it can be committed
+        self.first_offsets: Dict[TopicPartition, int] = {}
+    
+    def append(self, tp: TopicPartition, record):
+        columns = self.columns
+        value = record.value
+        for column in self.table.columns:
+            columns[column.name].append(column.convert(value.get(column.name)))
+        columns['kafka_partition'].append(record.partition)
+        columns['kafka_offset'].append(record.offset)
+        columns['kafka_timestamp'].append(record.timestamp if record.timestamp >= 0 else None)
+        self.first_offsets.setdefault(tp, record.offset)
+        self.records += 1
+        self.bytes += max(record.serialized_value_size, 0)
+    
+    def to_parquet(self, compression: str) -> bytes:
+        arrow_table = pa.Table.from_pydict(self.columns, schema=self.table.schema)
+        output = pa.BufferOutputStream()
+        pq.write_table(arrow_table, output, compression=compression)
+        return output.getvalue().to_pybytes()
+
+
+class FlushOnRevoke(ConsumerRebalanceListener):
+    """Rebalance listener that writes out buffered rows before their partitions move to another sink"""
+    
+    def __init__(self, sink: "ParquetSink"):
+        self.sink = sink
+    
+    def on_partitions_revoked(self, revoked):
+        if revoked:
+            self.sink.flush()
+    
+    def on_partitions_assigned(self, assigned):
+        pass
+
+
+class ParquetSink:
+    def __init__(self, location: str = "datalake", topics: Optional[List[str]] = None,
+                 group_id: str = "bikes-parquet-sink", max_file_records: int = 500000,
+                 max_file_bytes: int = 128 * 1024 * 1024, max_file_seconds: float = 300.0,
+                 compression: str = "zstd", endpoint_url: Optional[str] = None, storage=None,
+                 max_records: int = 5000, codec: Optional[Union[str, JsonCodec]] = None,
+                 wire_format: str = 'json', schema_registry: Optional[str] = None):
+        """
+        Initialize a data lake sink writing the station topics as Parquet
+        
+        Records are buffered per feed and UTC hour of their Kafka timestamp and written
+        as one compressed Parquet file under feed=<feed>/dt=<date>/hour=<hour>/ once the
+        buffer reaches max_file_records or max_file_bytes, or has been open for
+        max_file_seconds. Offsets are committed only after every record below them is
+        in a written file, so a crash replays the unwritten records rather than losing
+        them; the kafka_partition and kafka_offset columns identify duplicates.
+        
+        Args:
+            location (str): Local directory or s3://bucket/prefix to write to
+            topics (Optional[List[str]]): Topics to write, both station topics by default;
+                add bikes-station-rollups to also archive the rollups
+            group_id (str): Consumer group ID of the sink
+            max_file_records (int): Roll a file over after this many records
+            max_file_bytes (int): Roll a file over after this many serialized Kafka value bytes
+            max_file_seconds (float): Roll a file over after it has been open this long
+            compression (str): Parquet compression codec: 'zstd', 'snappy', 'gzip' or 'none'
+            endpoint_url (Optional[str]): Endpoint of an S3-compatible store such as MinIO
+            storage: LocalStorage or S3Storage to write to instead of opening location
+            max_records (int): Maximum records per poll
+            codec (Optional[Union[str, JsonCodec]]): Value codec, orjson by default
+            wire_format (str): 'json' or 'avro', see Consumer
+            schema_registry (Optional[str]): Schema registry URL or local schema directory
+        """
+        topics = topics or STATION_TOPICS
+        unknown = [topic for topic in topics if topic not in PARQUET_TABLES]
+        if unknown:
+            raise ValueError(f"No Parquet table for topics {unknown}, expected some of {sorted(PARQUET_TABLES)}")
+        
+        self.storage = storage or open_storage(location, endpoint_url)
+        self.topics = topics
+        self.group_id = group_id
+        self.max_file_records = max_file_records
+        self.max_file_bytes = max_file_bytes
+        self.max_file_seconds = max_file_seconds
+        self.compression = compression
+        self.max_records = max_records
+        self.codec = codec
+        self.wire_format = wire_format
+        self.schema_registry = schema_registry
+        self.consumer = None
+        self.buffers: Dict[Tuple[str, int], _FileBuffer] = {}
+        self.files_written = 0
+        self.records_written = 0
+        self.bytes_written = 0
+        self.stop_event = threading.Event()
+        self.stopped = threading.Event()
+        self.logger = logging.getLogger(__name__)
+        self._next_offsets: Dict[TopicPartition, int] = {}
+        self._committed: Dict[TopicPartition, int] = {}
+        self._thread = None
+        self._failure: Optional[BaseException] = None
+    
+    def add(self, batches: Dict[TopicPartition, List[Any]]):
+        """
+        Buffer polled records and write the files that are full
+        
+        Args:
+            batches (Dict[TopicPartition, List[Any]]): Records per partition from Consumer.poll_batches
+        """
+        now_ms = int(time.time() * 1000)
+        for tp, records in batches.items():
+            table = PARQUET_TABLES[tp.topic]
+            for record in records:
+                # Tombstones of the compacted information topic carry no row
+                if not isinstance(record.value, dict):
+                    continue
+                hour = table.partition_hour(record.value, record.timestamp if record.timestamp >= 0 else now_ms)
+                buffer = self.buffers.get((table.feed, hour))
+                if buffer is None:
+                    buffer = self.buffers[(table.feed, hour)] = _FileBuffer(table, hour)
+                buffer.append(tp, record)
+                if buffer.records >= self.max_file_records or buffer.bytes >= self.max_file_bytes:
+                    self._write(buffer)
+            if records:
+                self._next_offsets[tp] = records[-1].offset + 1
+    
+    def flush(self, due_only: bool = False):
+        """
+        Write buffered rows and commit the offsets they covered
+        
+        Args:
+            due_only (bool): Only write buffers open for at least max_file_seconds
+        """
+        now = time.monotonic()
+        for buffer in list(self.buffers.values()):
+            if not due_only or now - buffer.opened_at >= self.max_file_seconds:
+                self._write(buffer)
+        self.commit()
+    
+    def commit(self):
+        """Commit, per partition, the offset below which every record has been written"""
+        if not self.consumer:
+            return
+        offsets = dict(self._next_offsets)
+        for buffer in self.buffers.values():
+            for tp, offset in buffer.first_offsets.items():
+                if offset < offsets.get(tp, offset + 1):
+                    offsets[tp] = offset
+        offsets = {tp: offset for tp, offset in offsets.items() if self._committed.get(tp) != offset}
+        if offsets:
+            self.consumer.commit_offsets(offsets)
+            self._committed.update(offsets)
+    
+    def _write(self, buffer: _FileBuffer):
+        """Encode a buffer as one Parquet file and store it"""
+        feed = buffer.table.feed
+        key = (f"{partition_path(feed, buffer.hour)}/"
+               f"part-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet")
+        start = time.perf_counter()
+        try:
+            data = buffer.to_parquet(self.compression)
+            self.storage.put(key, data)
+        except Exception as e:
+            self.logger.error(f"Failed to write {buffer.records} {feed} records to {self.storage.uri(key)}: {e}")
+            raise
+        
+        del self.buffers[(feed, buffer.hour)]
+        self.files_written += 1
+        self.records_written += buffer.records
+        self.bytes_written += len(data)
+        SINK_FILES.labels(feed).inc()
+        SINK_RECORDS.labels(feed).inc(buffer.records)
+        SINK_BYTES.labels(feed).inc(len(data))
+        SINK_WRITE_SECONDS.labels(feed).observe(time.perf_counter() - start)
+        self.logger.info(
+            f"Wrote {buffer.records} {feed} records ({buffer.bytes} bytes in Kafka, {len(data)} as Parquet) "
+            f"to {self.storage.uri(key)}"
+        )
+    
+    def run(self, poll_timeout_ms: int = 1000):
+        """
+        Consume until stop() is called, then write out and commit everything buffered
+        
+        Args:
+            poll_timeout_ms (int): Maximum wait of one poll in milliseconds
+        """
+        self.consumer = None
+        try:
+            self.consumer = Consumer(self.group_id, codec=self.codec, enable_auto_commit=False,
+                                     max_poll_records=self.max_records, wire_format=self.wire_format,
+                                     schema_registry=self.schema_registry)
+            self.consumer.subscribe_to_topics(self.topics, listener=FlushOnRevoke(self))
+            while not self.stop_event.is_set():
+                batches = self.consumer.poll_batches(timeout_ms=poll_timeout_ms)
+                if batches:
+                    self.add(batches)
+                self.flush(due_only=True)
+            
+            self.flush()
+        except Exception as e:
+            self.logger.error(f"Parquet sink failed: {e}")
+            # Kept for join()/stop(), as an exception raised in the background thread
+            # would otherwise look like a clean stop to the caller
+            self._failure = e
+            raise
+        finally:
+            if self.consumer:
+                self.consumer.close()
+            self.stopped.set()
+    
+    def start(self):
+        """Run the sink in a background thread"""
+        self.stop_event.clear()
+        self.stopped.clear()
+        self._failure = None
+        self._thread = threading.Thread(target=self.run, name="parquet-sink", daemon=True)
+        self._thread.start()
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the background thread
+        
+        Args:
+            timeout (Optional[float]): Seconds to wait
+        
+        Returns:
+            bool: Whether the sink is still running
+        
+        Raises:
+            Exception: The error the background thread failed with, raised once
+        """
+        if not self._thread:
+            return False
+        if not self.stopped.wait(timeout):
+            return True
+        self._raise_failure()
+        return False
+    
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop consuming after writing out every buffered record
+        
+        Args:
+            timeout (Optional[float]): Seconds to wait for the background thread
+        
+        Raises:
+            Exception: The error the background thread failed with, unless join() raised it
+        """
+        self.stop_event.set()
+        if self._thread:
+            self.stopped.wait(timeout)
+            self._raise_failure()
+    
+    def _raise_failure(self):
+        """Re-raise the error that ended the background thread, once"""
+        failure, self._failure = self._failure, None
+        if failure is not None:
+            raise failure
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get sink stats
+        
+        Returns:
+            Dict[str, Any]: Files, records and Parquet bytes written, and records still buffered
+        """
+        return {
+            'files_written': self.files_written,
+            'records_written': self.records_written,
+            'bytes_written': self.bytes_written,
+            'records_buffered': sum(buffer.records for buffer in self.buffers.values()),
+            'location': self.storage.uri()
+        }
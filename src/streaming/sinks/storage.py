@@ -0,0 +1,103 @@
+import logging
+import os
+import tempfile
+from typing import Optional
+
+import boto3
+
+
+class LocalStorage:
+    def __init__(self, root: str):
+        """
+        Initialize file output under a local directory
+        
+        Args:
+            root (str): Directory the object keys are resolved against
+        """
+        self.root = root
+        self.logger = logging.getLogger(__name__)
+    
+    def put(self, key: str, data: bytes):
+        """
+        Write an object atomically, so readers never see a partial file
+        
+        Args:
+            key (str): Path relative to the root, using forward slashes
+            data (bytes): File content
+        """
+        path = os.path.join(self.root, *key.split('/'))
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Hidden temporary name, so Athena/Spark style readers skip it while it is written
+        fd, temporary = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, path)
+        except Exception as e:
+            self.logger.error(f"Failed to write {path}: {e}")
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+    
+    def uri(self, key: str = "") -> str:
+        """Location of a key, or of the root without one"""
+        return os.path.join(os.path.abspath(self.root), *key.split('/')) if key else os.path.abspath(self.root)
+
+
+class S3Storage:
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, s3_client=None):
+        """
+        Initialize object output to S3 or an S3-compatible store such as MinIO
+        
+        Args:
+            bucket (str): Bucket name
+            prefix (str): Key prefix every object is written under
+            endpoint_url (Optional[str]): Endpoint of an S3-compatible store, AWS by default
+            s3_client: Preconfigured boto3 S3 client, created from the environment by default
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.s3_client = s3_client or boto3.client('s3', endpoint_url=endpoint_url)
+        self.logger = logging.getLogger(__name__)
+    
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+    
+    def put(self, key: str, data: bytes):
+        """
+        Upload an object in one request; S3 makes it visible only once complete
+        
+        Args:
+            key (str): Key relative to the prefix
+            data (bytes): Object content
+        """
+        try:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+        except Exception as e:
+            self.logger.error(f"Failed to upload s3://{self.bucket}/{self._key(key)}: {e}")
+            raise
+    
+    def uri(self, key: str = "") -> str:
+        """s3:// location of a key, or of the prefix without one"""
+        path = self._key(key) if key else self.prefix
+        return f"s3://{self.bucket}/{path}" if path else f"s3://{self.bucket}"
+
+
+def open_storage(location: str, endpoint_url: Optional[str] = None):
+    """
+    Get the storage for an output location
+    
+    Args:
+        location (str): s3://bucket/prefix, or a local directory
+        endpoint_url (Optional[str]): Endpoint of an S3-compatible store
+    
+    Returns:
+        LocalStorage or S3Storage
+    """
+    if location.startswith("s3://"):
+        bucket, _, prefix = location[len("s3://"):].partition('/')
+        return S3Storage(bucket, prefix, endpoint_url=endpoint_url)
+    return LocalStorage(location)
@@ -0,0 +1,3 @@
+from .station_store import StationStateStore
+from .spatial_index import StationSpatialIndex
+from .materializer import StationStateMaterializer
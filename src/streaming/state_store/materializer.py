@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple, Union
+from kafka import ConsumerRebalanceListener
+from kafka.structs import TopicPartition
+from src.streaming.kafka_consumer.consumer import Consumer
+from src.streaming.state_store.spatial_index import StationSpatialIndex
+from src.streaming.state_store.station_store import StationStateStore
+from src.utils.constants.topics import BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC
+from src.utils.serialization.codec import JsonCodec
+
+
+class ResumeFromCheckpoint(ConsumerRebalanceListener):
+    """Rebalance listener that positions assigned partitions at the store's checkpoint"""
+    
+    def __init__(self, materializer: "StationStateMaterializer"):
+        self.materializer = materializer
+    
+    def on_partitions_revoked(self, revoked):
+        """Checkpoint before giving up partitions so their state is not lost"""
+        if revoked:
+            self.materializer.checkpoint()
+    
+    def on_partitions_assigned(self, assigned):
+        """Resume from the checkpointed offsets, or rebuild from the start of the topic"""
+        consumer = self.materializer.consumer.consumer
+        for tp in assigned:
+            offset = self.materializer.offsets.get((tp.topic, tp.partition))
+            if offset is None:
+                consumer.seek_to_beginning(tp)
+            else:
+                consumer.seek(tp, offset)
+
+
+class StationStateMaterializer:
+    def __init__(self, store: Optional[StationStateStore] = None, checkpoint_path: str = "state/station_state.ckpt",
+                 group_id: str = "bikes-station-state", checkpoint_interval: float = 30.0,
+                 max_records: int = 1000, codec: Optional[Union[str, JsonCodec]] = None,
+                 wire_format: str = 'json', schema_registry: Optional[str] = None,
+                 spatial_index: Optional[StationSpatialIndex] = None):
+        """
+        Initialize a materialized view of the station topics
+        
+        Consumes station status and station information into a StationStateStore.
+        The store is checkpointed to disk together with the offsets it reflects and the
+        offsets are committed afterwards, so a restart resumes from the checkpoint
+        instead of replaying the topics. Partitions without a checkpointed offset are
+        read from the beginning. A spatial index over the store is kept in step with
+        station information as it arrives.
+        
+        Args:
+            store (Optional[StationStateStore]): Store to fill, a new one by default
+            checkpoint_path (str): Checkpoint file
+            group_id (str): Consumer group ID of the view
+            checkpoint_interval (float): Seconds between two checkpoints
+            max_records (int): Maximum records per poll
+            codec (Optional[Union[str, JsonCodec]]): Value codec, orjson by default
+            wire_format (str): 'json' or 'avro', see Consumer
+            schema_registry (Optional[str]): Schema registry URL or local schema directory
+            spatial_index (Optional[StationSpatialIndex]): Index over the same store to update
+        """
+        self.store = store if store is not None else StationStateStore()
+        if spatial_index is not None and spatial_index.store is not self.store:
+            raise ValueError("The spatial index must be built over the materialized store")
+        self.spatial_index = spatial_index
+        self.checkpoint_path = checkpoint_path
+        self.group_id = group_id
+        self.checkpoint_interval = checkpoint_interval
+        self.max_records = max_records
+        self.codec = codec
+        self.wire_format = wire_format
+        self.schema_registry = schema_registry
+        self.offsets: Dict[Tuple[str, int], int] = {}
+        self.consumer = None
+        self.applied = 0
+        self.stop_event = threading.Event()
+        self.stopped = threading.Event()
+        self.logger = logging.getLogger(__name__)
+        self._thread = None
+        self._failure: Optional[BaseException] = None
+        self._last_checkpoint = time.monotonic()
+    
+    def apply(self, batches: Dict[TopicPartition, List[Any]]):
+        """
+        Apply polled records to the store
+        
+        Args:
+            batches (Dict[TopicPartition, List[Any]]): Records per partition from Consumer.poll_batches
+        """
+        store = self.store
+        spatial_index = self.spatial_index
+        for tp, records in batches.items():
+            is_status = tp.topic == BIKES_STATION_STATUS_TOPIC
+            for record in records:
+                value = record.value
+                key = record.key
+                if key is None:
+                    if not value or value.get('station_id') is None:
+                        continue
+                    key = str(value['station_id'])
+                
+                if value is None:
+                    store.remove(key, status=is_status, information=not is_status)
+                elif is_status:
+                    store.upsert_status(key, value)
+                else:
+                    store.upsert_information(key, value)
+                # Status never moves a station, so only information touches the index
+                if spatial_index is not None and not is_status:
+                    spatial_index.refresh(key)
+            if records:
+                self.offsets[(tp.topic, tp.partition)] = records[-1].offset + 1
+                self.applied += len(records)
+    
+    def checkpoint(self):
+        """Save the store with its offsets, then commit the same offsets to Kafka"""
+        self.store.save_checkpoint(self.checkpoint_path, self.offsets)
+        if self.consumer and self.offsets:
+            self.consumer.commit_offsets({
+                TopicPartition(topic, partition): offset
+                for (topic, partition), offset in self.offsets.items()
+            })
+        self._last_checkpoint = time.monotonic()
+        self.logger.info(f"Checkpointed {len(self.store)} stations after {self.applied} records")
+    
+    def run(self, poll_timeout_ms: int = 1000):
+        """
+        Consume until stop() is called
+        
+        Args:
+            poll_timeout_ms (int): Maximum wait of one poll in milliseconds
+        """
+        self.consumer = None
+        try:
+            self.offsets = self.store.load_checkpoint(self.checkpoint_path)
+            if self.spatial_index is not None:
+                self.spatial_index.rebuild()
+            self.consumer = Consumer(self.group_id, codec=self.codec, enable_auto_commit=False,
+                                     max_poll_records=self.max_records, wire_format=self.wire_format,
+                                     schema_registry=self.schema_registry)
+            self.consumer.subscribe_to_topics(
+                [BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC],
+                listener=ResumeFromCheckpoint(self)
+            )
+            while not self.stop_event.is_set():
+                batches = self.consumer.poll_batches(timeout_ms=poll_timeout_ms)
+                if batches:
+                    self.apply(batches)
+                if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                    self.checkpoint()
+            
+            self.checkpoint()
+        except Exception as e:
+            self.logger.error(f"Station state materializer failed: {e}")
+            # Kept for join()/stop(), as an exception raised in the background thread
+            # would otherwise look like a clean stop to the caller
+            self._failure = e
+            raise
+        finally:
+            if self.consumer:
+                self.consumer.close()
+            self.stopped.set()
+    
+    def start(self):
+        """Run the materializer in a background thread, leaving the store to be queried"""
+        self.stop_event.clear()
+        self.stopped.clear()
+        self._failure = None
+        self._thread = threading.Thread(target=self.run, name="station-state", daemon=True)
+        self._thread.start()
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the background thread
+        
+        Args:
+            timeout (Optional[float]): Seconds to wait
+            
+        Returns:
+            bool: Whether the materializer is still running
+        
+        Raises:
+            Exception: The error the background thread failed with, raised once
+        """
+        if not self._thread:
+            return False
+        # Waiting on an event rather than Thread.join keeps a Ctrl+C during the wait
+        # from breaking later waits
+        if not self.stopped.wait(timeout):
+            return True
+        self._raise_failure()
+        return False
+    
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop consuming after a final checkpoint
+        
+        Args:
+            timeout (Optional[float]): Seconds to wait for the background thread
+        
+        Raises:
+            Exception: The error the background thread failed with, unless join() raised it
+        """
+        self.stop_event.set()
+        if self._thread:
+            self.stopped.wait(timeout)
+            self._raise_failure()
+    
+    def _raise_failure(self):
+        """Re-raise the error that ended the background thread, once"""
+        failure, self._failure = self._failure, None
+        if failure is not None:
+            raise failure
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get materializer stats
+        
+        Returns:
+            Dict[str, Any]: Stations held, records applied and offsets per partition
+        """
+        return {
+            'stations': len(self.store),
+            'records_applied': self.applied,
+            'offsets': {f"{topic}:{partition}": offset for (topic, partition), offset in self.offsets.items()}
+        }
@@ -0,0 +1,309 @@
+import heapq
+import logging
+import math
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from src.streaming.state_store.station_store import StationStateStore
+
+# Mean earth radius used for great-circle distances
+EARTH_RADIUS_M = 6371008.8
+
+# Metres per degree of latitude (and of longitude at the equator)
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+Cell = Tuple[int, int]
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in metres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class _Grid:
+    """Station keys per cell, coordinates and cell per station, and the occupied cell range"""
+    
+    __slots__ = ('cells', 'positions', 'bounds')
+    
+    def __init__(self):
+        self.cells: Dict[Cell, Tuple[str, ...]] = {}
+        self.positions: Dict[str, Tuple[float, float, Cell]] = {}
+        self.bounds: Optional[Tuple[int, int, int, int]] = None
+
+
+class StationSpatialIndex:
+    def __init__(self, store: StationStateStore, cell_degrees: float = 0.005):
+        """
+        Initialize a grid index over the station coordinates held in a StationStateStore
+        
+        Stations are bucketed into square lat/lon cells (0.005 degrees is about 550 m
+        north-south in New York), so a query only looks at the cells around it instead of
+        every station. Coordinates come from station information and are re-read with
+        refresh() when it changes; availability is not copied into the index but read
+        from the store while filtering, so every answer reflects the latest status.
+        
+        Cells are immutable tuples replaced on every change and rebuild() swaps in a
+        complete new grid, so a query from another thread never sees a cell mid-update
+        or a half-built grid. This covers the index only: StationStateStore does not
+        lock reads against writes, so the availability and joined state a query reads
+        while the store is being updated may mix old and new values of a station.
+        
+        Args:
+            store (StationStateStore): Store holding station information and status
+            cell_degrees (float): Cell edge in degrees
+        """
+        if cell_degrees <= 0:
+            raise ValueError("cell_degrees must be positive")
+        self.store = store
+        self.cell_degrees = cell_degrees
+        self._grid = _Grid()
+        self.logger = logging.getLogger(__name__)
+    
+    def __len__(self) -> int:
+        """Number of indexed stations"""
+        return len(self._grid.positions)
+    
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+    
+    def refresh(self, key: str):
+        """
+        Re-read a station's coordinates from the store, moving or dropping it as needed
+        
+        Args:
+            key (str): Station key
+        """
+        self._place(self._grid, key)
+    
+    def _place(self, grid: _Grid, key: str):
+        """Move, add or drop a station in a grid according to its coordinates in the store"""
+        lat = self.store.value(key, 'lat')
+        lon = self.store.value(key, 'lon')
+        previous = grid.positions.get(key)
+        if lat is None or lon is None:
+            if previous is not None:
+                self._discard(grid, key, previous[2])
+                del grid.positions[key]
+            return
+        
+        cell = self._cell(lat, lon)
+        if previous is not None and previous[2] != cell:
+            self._discard(grid, key, previous[2])
+        # Coordinates first, so a station is never listed in a cell without them
+        grid.positions[key] = (lat, lon, cell)
+        if previous is None or previous[2] != cell:
+            grid.cells[cell] = grid.cells.get(cell, ()) + (key,)
+            self._extend_bounds(grid, cell)
+    
+    @staticmethod
+    def _discard(grid: _Grid, key: str, cell: Cell):
+        remaining = tuple(member for member in grid.cells.get(cell, ()) if member != key)
+        if remaining:
+            grid.cells[cell] = remaining
+        else:
+            grid.cells.pop(cell, None)
+    
+    @staticmethod
+    def _extend_bounds(grid: _Grid, cell: Cell):
+        if grid.bounds is None:
+            grid.bounds = (cell[0], cell[0], cell[1], cell[1])
+            return
+        min_row, max_row, min_col, max_col = grid.bounds
+        grid.bounds = (min(min_row, cell[0]), max(max_row, cell[0]), min(min_col, cell[1]), max(max_col, cell[1]))
+    
+    def rebuild(self, keys: Optional[Iterable[str]] = None):
+        """
+        Index every station of the store from scratch, e.g. after restoring a checkpoint
+        
+        The new grid is built aside and replaces the old one in a single assignment, so
+        queries keep answering from the old grid until the new one is complete.
+        
+        Args:
+            keys (Optional[Iterable[str]]): Stations to index, all stations of the store by default
+        """
+        grid = _Grid()
+        for key in (self.store.keys() if keys is None else keys):
+            self._place(grid, key)
+        self._grid = grid
+        self.logger.info(f"Indexed {len(grid.positions)} stations in {len(grid.cells)} cells")
+    
+    def _available(self, key: str, min_bikes: int, min_ebikes: int, min_docks: int) -> bool:
+        """Whether a station currently meets the availability thresholds"""
+        value = self.store.value
+        if min_bikes and ((value(key, 'num_bikes_available') or 0) < min_bikes or value(key, 'is_renting') == 0):
+            return False
+        if min_ebikes and ((value(key, 'num_ebikes_available') or 0) < min_ebikes or value(key, 'is_renting') == 0):
+            return False
+        if min_docks and ((value(key, 'num_docks_available') or 0) < min_docks or value(key, 'is_returning') == 0):
+            return False
+        return True
+    
+    def _result(self, key: str, distance: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Joined station state, with the distance to the query point when there is one"""
+        state = self.store.get(key)
+        if state is not None and distance is not None:
+            state['distance_m'] = distance
+        return state
+    
+    def nearest(self, lat: float, lon: float, k: int = 5, min_bikes: int = 0, min_ebikes: int = 0,
+                min_docks: int = 0, max_distance_m: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Find the k closest stations that currently meet the availability thresholds
+        
+        Searches rings of cells outwards from the query point and stops once no station
+        beyond the searched rings can be closer than the k-th match.
+        
+        Args:
+            lat (float): Query latitude
+            lon (float): Query longitude
+            k (int): Number of stations to return
+            min_bikes (int): Minimum bikes available at a renting station
+            min_ebikes (int): Minimum e-bikes available at a renting station
+            min_docks (int): Minimum docks available at a returning station
+            max_distance_m (Optional[float]): Ignore stations further away than this
+        
+        Returns:
+            List[Dict[str, Any]]: Joined station state with distance_m, closest first
+        """
+        # One grid for the whole query, even if rebuild() swaps in another meanwhile
+        grid = self._grid
+        bounds = grid.bounds
+        if k <= 0 or bounds is None:
+            return []
+        
+        cells = grid.cells
+        positions = grid.positions
+        filtered = min_bikes or min_ebikes or min_docks
+        row, col = self._cell(lat, lon)
+        min_row, max_row, min_col, max_col = bounds
+        max_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+        # Lower bound for metres per degree of longitude anywhere the search can reach
+        reach = abs(lat) + (max_ring + 1) * self.cell_degrees
+        lon_scale = math.cos(math.radians(min(reach, 90.0)))
+        
+        # Max-heap of the best matches as (-distance, key)
+        best: List[Tuple[float, str]] = []
+        for ring in range(max_ring + 1):
+            for cell in self._ring(bounds, row, col, ring):
+                for key in cells.get(cell, ()):
+                    position = positions.get(key)
+                    if position is None:
+                        continue
+                    distance = haversine_m(lat, lon, position[0], position[1])
+                    if max_distance_m is not None and distance > max_distance_m:
+                        continue
+                    if len(best) == k and distance >= -best[0][0]:
+                        continue
+                    if filtered and not self._available(key, min_bikes, min_ebikes, min_docks):
+                        continue
+                    if len(best) == k:
+                        heapq.heapreplace(best, (-distance, key))
+                    else:
+                        heapq.heappush(best, (-distance, key))
+            
+            # Anything outside the searched square is at least this far from the query point
+            lat_margin = min(lat - (row - ring) * self.cell_degrees, (row + ring + 1) * self.cell_degrees - lat)
+            lon_margin = min(lon - (col - ring) * self.cell_degrees, (col + ring + 1) * self.cell_degrees - lon)
+            outside = min(lat_margin, lon_margin * lon_scale) * METERS_PER_DEGREE
+            if max_distance_m is not None and outside > max_distance_m:
+                break
+            if len(best) == k and outside >= -best[0][0]:
+                break
+        
+        results = []
+        for negative_distance, key in sorted(best, reverse=True):
+            state = self._result(key, -negative_distance)
+            if state is not None:
+                results.append(state)
+        return results
+    
+    @staticmethod
+    def _ring(bounds: Tuple[int, int, int, int], row: int, col: int, ring: int) -> Iterable[Cell]:
+        """Occupied-area cells on the border of the square of the given radius around a cell"""
+        min_row, max_row, min_col, max_col = bounds
+        low_col, high_col = max(col - ring, min_col), min(col + ring, max_col)
+        for r in range(max(row - ring, min_row), min(row + ring, max_row) + 1):
+            if r == row - ring or r == row + ring:
+                for c in range(low_col, high_col + 1):
+                    yield r, c
+            else:
+                if col - ring >= min_col:
+                    yield r, col - ring
+                if ring and col + ring <= max_col:
+                    yield r, col + ring
+    
+    def within(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, min_bikes: int = 0,
+               min_ebikes: int = 0, min_docks: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find the stations inside a bounding box that currently meet the availability thresholds
+        
+        Args:
+            min_lat (float): Southern edge
+            min_lon (float): Western edge
+            max_lat (float): Northern edge
+            max_lon (float): Eastern edge
+            min_bikes (int): Minimum bikes available at a renting station
+            min_ebikes (int): Minimum e-bikes available at a renting station
+            min_docks (int): Minimum docks available at a returning station
+            limit (Optional[int]): Return at most this many stations
+        
+        Returns:
+            List[Dict[str, Any]]: Joined station state, in no particular order
+        """
+        grid = self._grid
+        bounds = grid.bounds
+        if bounds is None or min_lat > max_lat or min_lon > max_lon:
+            return []
+        
+        cells = grid.cells
+        positions = grid.positions
+        filtered = min_bikes or min_ebikes or min_docks
+        low_row, low_col = self._cell(min_lat, min_lon)
+        high_row, high_col = self._cell(max_lat, max_lon)
+        min_row, max_row, min_col, max_col = bounds
+        low_row, high_row = max(low_row, min_row), min(high_row, max_row)
+        low_col, high_col = max(low_col, min_col), min(high_col, max_col)
+        if low_row > high_row or low_col > high_col:
+            return []
+        
+        if (high_row - low_row + 1) * (high_col - low_col + 1) <= len(cells):
+            candidates = [cells.get((r, c), ()) for r in range(low_row, high_row + 1)
+                          for c in range(low_col, high_col + 1)]
+        else:
+            # A box larger than the occupied area is cheaper to answer from the occupied cells
+            candidates = [members for (r, c), members in list(cells.items())
+                          if low_row <= r <= high_row and low_col <= c <= high_col]
+        
+        results = []
+        for members in candidates:
+            for key in members:
+                position = positions.get(key)
+                if position is None or not (min_lat <= position[0] <= max_lat and min_lon <= position[1] <= max_lon):
+                    continue
+                if filtered and not self._available(key, min_bikes, min_ebikes, min_docks):
+                    continue
+                state = self._result(key)
+                if state is not None:
+                    results.append(state)
+                    if limit is not None and len(results) >= limit:
+                        return results
+        return results
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get index stats
+        
+        Returns:
+            Dict[str, Any]: Stations and cells indexed, and the most stations in one cell
+        """
+        grid = self._grid
+        cells = list(grid.cells.values())
+        return {
+            'stations': len(grid.positions),
+            'cells': len(cells),
+            'max_cell_stations': max((len(members) for members in cells), default=0)
+        }
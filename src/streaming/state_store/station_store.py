@@ -0,0 +1,296 @@
+import logging
+import math
+import os
+import pickle
+from array import array
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Integer status columns, stored as int64 with MISSING for fields a record did not carry
+STATUS_COLUMNS = (
+    'num_bikes_available',
+    'num_ebikes_available',
+    'num_bikes_disabled',
+    'num_docks_available',
+    'num_docks_disabled',
+    'is_installed',
+    'is_renting',
+    'is_returning',
+    'last_reported'
+)
+
+# Station information columns: coordinates as float64, capacity as int64, labels as strings
+INFORMATION_FLOAT_COLUMNS = ('lat', 'lon')
+INFORMATION_INT_COLUMNS = ('capacity',)
+INFORMATION_TEXT_COLUMNS = ('name', 'short_name', 'region_id', 'system_id')
+
+MISSING = -1
+
+CHECKPOINT_VERSION = 1
+
+
+class StationStateStore:
+    def __init__(self):
+        """
+        Initialize an in-memory table of current station state
+        
+        Every station owns one row, located through a key -> row dict, and each field is
+        a column in a typed array (or a list for text). Updates overwrite the row in
+        place, so lookups and upserts are O(1) and the table stays compact regardless of
+        how many messages have been applied. Status and information are joined on the
+        station key, which is the Kafka message key of both topics.
+        """
+        self._index: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._status = {column: array('q') for column in STATUS_COLUMNS}
+        self._floats = {column: array('d') for column in INFORMATION_FLOAT_COLUMNS}
+        self._ints = {column: array('q') for column in INFORMATION_INT_COLUMNS}
+        self._texts: Dict[str, List[Optional[str]]] = {column: [] for column in INFORMATION_TEXT_COLUMNS}
+        self._has_status = bytearray()
+        self._has_information = bytearray()
+        self._stations = 0
+        self.logger = logging.getLogger(__name__)
+    
+    def __len__(self) -> int:
+        """Number of stations with status or information"""
+        return self._stations
+    
+    def __contains__(self, key: str) -> bool:
+        """Check whether a station has status or information"""
+        row = self._index.get(key)
+        return row is not None and bool(self._has_status[row] or self._has_information[row])
+    
+    def keys(self) -> List[str]:
+        """Keys of the stations with status or information"""
+        return [key for row, key in enumerate(list(self._keys))
+                if self._has_status[row] or self._has_information[row]]
+    
+    def _row(self, key: str) -> int:
+        """Return the row of a station, appending an empty row on first sight"""
+        row = self._index.get(key)
+        if row is not None:
+            return row
+        
+        row = len(self._keys)
+        for column in self._status.values():
+            column.append(MISSING)
+        for column in self._floats.values():
+            column.append(math.nan)
+        for column in self._ints.values():
+            column.append(MISSING)
+        for column in self._texts.values():
+            column.append(None)
+        self._has_status.append(0)
+        self._has_information.append(0)
+        # Publish the row only once every column has it, keys() last but for the index,
+        # so concurrent readers never index past the end of a column
+        self._keys.append(key)
+        self._index[key] = row
+        return row
+    
+    def upsert_status(self, key: str, status: Dict[str, Any]):
+        """
+        Store the latest status of a station
+        
+        Args:
+            key (str): Station key
+            status (Dict[str, Any]): station_status record
+        """
+        row = self._row(key)
+        for column, values in self._status.items():
+            values[row] = _to_int(status.get(column))
+        self._mark(row, self._has_status)
+    
+    def upsert_information(self, key: str, information: Dict[str, Any]):
+        """
+        Store the latest information of a station
+        
+        Args:
+            key (str): Station key
+            information (Dict[str, Any]): station_information record
+        """
+        row = self._row(key)
+        for column, values in self._floats.items():
+            value = information.get(column)
+            values[row] = math.nan if value is None else float(value)
+        for column, values in self._ints.items():
+            values[row] = _to_int(information.get(column))
+        for column, values in self._texts.items():
+            value = information.get(column)
+            values[row] = None if value is None else str(value)
+        self._mark(row, self._has_information)
+    
+    def _mark(self, row: int, flags: bytearray):
+        """Flag a row as holding status or information, counting newly known stations"""
+        if not (self._has_status[row] or self._has_information[row]):
+            self._stations += 1
+        flags[row] = 1
+    
+    def remove(self, key: str, status: bool = True, information: bool = True):
+        """
+        Forget a station, e.g. on a tombstone; its row is reused if the station returns
+        
+        Args:
+            key (str): Station key
+            status (bool): Forget its status
+            information (bool): Forget its information
+        """
+        row = self._index.get(key)
+        if row is None or not (self._has_status[row] or self._has_information[row]):
+            return
+        if status:
+            self._has_status[row] = 0
+        if information:
+            self._has_information[row] = 0
+        if not (self._has_status[row] or self._has_information[row]):
+            self._stations -= 1
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the joined status and information of a station
+        
+        Args:
+            key (str): Station key
+        
+        Returns:
+            Optional[Dict[str, Any]]: Current state with only the fields known for the
+            station, or None for an unknown station
+        """
+        row = self._index.get(key)
+        if row is None or not (self._has_status[row] or self._has_information[row]):
+            return None
+        
+        state: Dict[str, Any] = {'station_key': key}
+        if self._has_information[row]:
+            for column, values in self._texts.items():
+                if values[row] is not None:
+                    state[column] = values[row]
+            for column, values in self._floats.items():
+                if not math.isnan(values[row]):
+                    state[column] = values[row]
+            for column, values in self._ints.items():
+                if values[row] != MISSING:
+                    state[column] = values[row]
+        if self._has_status[row]:
+            for column, values in self._status.items():
+                if values[row] != MISSING:
+                    state[column] = values[row]
+        return state
+    
+    def value(self, key: str, column: str) -> Optional[Any]:
+        """
+        Get a single field of a station without building the joined record
+        
+        Args:
+            key (str): Station key
+            column (str): Status or information column, e.g. num_bikes_available
+        
+        Returns:
+            Optional[Any]: The field value, or None if the station or field is unknown
+        """
+        row = self._index.get(key)
+        if row is None:
+            return None
+        
+        if column in self._status:
+            value = self._status[column][row] if self._has_status[row] else MISSING
+            return None if value == MISSING else value
+        if not self._has_information[row]:
+            return None
+        if column in self._floats:
+            value = self._floats[column][row]
+            return None if math.isnan(value) else value
+        if column in self._ints:
+            value = self._ints[column][row]
+            return None if value == MISSING else value
+        if column in self._texts:
+            return self._texts[column][row]
+        raise KeyError(f"Unknown station column: {column}")
+    
+    def save_checkpoint(self, path: str, offsets: Dict[Tuple[str, int], int]):
+        """
+        Write the table and the Kafka offsets it reflects to disk atomically
+        
+        Args:
+            path (str): Checkpoint file
+            offsets (Dict[Tuple[str, int], int]): Next offset to read per (topic, partition)
+        """
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'keys': self._keys,
+            'status': self._status,
+            'floats': self._floats,
+            'ints': self._ints,
+            'texts': self._texts,
+            'has_status': self._has_status,
+            'has_information': self._has_information,
+            'offsets': dict(offsets)
+        }
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'wb') as checkpoint_file:
+                pickle.dump(checkpoint, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+            # A crash mid-write leaves the previous checkpoint intact
+            os.replace(temp_path, path)
+            self.logger.debug(f"Checkpointed {len(self._keys)} stations to {path}")
+        except Exception as e:
+            self.logger.error(f"Failed to write station state checkpoint {path}: {e}")
+            raise
+    
+    def load_checkpoint(self, path: str) -> Dict[Tuple[str, int], int]:
+        """
+        Restore the table from a checkpoint written by save_checkpoint
+        
+        Args:
+            path (str): Checkpoint file
+        
+        Returns:
+            Dict[Tuple[str, int], int]: Offsets to resume from, empty when there is no
+            usable checkpoint
+        """
+        if not os.path.exists(path):
+            return {}
+        
+        try:
+            with open(path, 'rb') as checkpoint_file:
+                checkpoint = pickle.load(checkpoint_file)
+        except Exception as e:
+            self.logger.error(f"Failed to read station state checkpoint {path}, starting empty: {e}")
+            return {}
+        
+        if checkpoint.get('version') != CHECKPOINT_VERSION:
+            self.logger.warning(f"Ignoring station state checkpoint {path} with version {checkpoint.get('version')}")
+            return {}
+        
+        self._keys = checkpoint['keys']
+        self._index = {key: row for row, key in enumerate(self._keys)}
+        self._status = checkpoint['status']
+        self._floats = checkpoint['floats']
+        self._ints = checkpoint['ints']
+        self._texts = checkpoint['texts']
+        self._has_status = checkpoint['has_status']
+        self._has_information = checkpoint['has_information']
+        self._stations = sum(1 for status, information in zip(self._has_status, self._has_information)
+                             if status or information)
+        self.logger.info(f"Restored {len(self)} stations from checkpoint {path}")
+        return checkpoint['offsets']
+
+
+def _to_int(value: Any) -> int:
+    """Convert a GBFS number, flag or timestamp to an int column value"""
+    if value is None:
+        return MISSING
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            # GBFS 3.0 last_reported is an RFC 3339 timestamp
+            return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    # GBFS 1.x sends flags as 0/1, 2.x as booleans; int() covers both
+    return int(value)
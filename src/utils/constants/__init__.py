@@ -1,2 +1,10 @@
-from .routes import BIKES_STATION_INFORMATION, BIKES_STATION_STATUS
-from .topics import BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC
+from .routes import BIKES_STATION_INFORMATION, BIKES_STATION_STATUS, CITIBIKE_GBFS_DISCOVERY
+from .topics import (
+    BIKES_STATION_INFORMATION_TOPIC,
+    BIKES_STATION_STATUS_TOPIC,
+    BIKES_FREE_BIKE_STATUS_TOPIC,
+    BIKES_SYSTEM_INFORMATION_TOPIC,
+    BIKES_SYSTEM_REGIONS_TOPIC,
+    GBFS_FEED_TOPICS,
+    COMPACTED_TOPICS
+)
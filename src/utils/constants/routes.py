@@ -1,2 +1,5 @@
 BIKES_STATION_INFORMATION = "https://gbfs.citibikenyc.com/gbfs/en/station_information.json"
-BIKES_STATION_STATUS = "https://gbfs.citibikenyc.com/gbfs/en/station_status.json"
\ No newline at end of file
+BIKES_STATION_STATUS = "https://gbfs.citibikenyc.com/gbfs/en/station_status.json"
+
+# GBFS auto-discovery document listing every feed of the Citi Bike system
+CITIBIKE_GBFS_DISCOVERY = "https://gbfs.citibikenyc.com/gbfs/gbfs.json"
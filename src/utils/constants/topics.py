@@ -1,2 +1,30 @@
 BIKES_STATION_INFORMATION_TOPIC = "bikes-station-information"
-BIKES_STATION_STATUS_TOPIC = "bikes-station-status"
\ No newline at end of file
+BIKES_STATION_STATUS_TOPIC = "bikes-station-status"
+BIKES_FREE_BIKE_STATUS_TOPIC = "bikes-free-bike-status"
+BIKES_SYSTEM_INFORMATION_TOPIC = "bikes-system-information"
+BIKES_SYSTEM_REGIONS_TOPIC = "bikes-system-regions"
+
+# Windowed station and region availability computed from the status topic
+BIKES_STATION_ROLLUPS_TOPIC = "bikes-station-rollups"
+
+# Topic of every GBFS feed the pipeline knows by name; other feeds use "bikes-<feed-name>"
+GBFS_FEED_TOPICS = {
+    "station_information": BIKES_STATION_INFORMATION_TOPIC,
+    "station_status": BIKES_STATION_STATUS_TOPIC,
+    "free_bike_status": BIKES_FREE_BIKE_STATUS_TOPIC,
+    "system_information": BIKES_SYSTEM_INFORMATION_TOPIC,
+    "system_regions": BIKES_SYSTEM_REGIONS_TOPIC
+}
+
+# Reference-data topics holding one current record per key; Kafka log compaction keeps the
+# latest record of every station/system/region so consumers can rebuild the catalogue
+COMPACTED_TOPICS = (
+    BIKES_STATION_INFORMATION_TOPIC,
+    BIKES_SYSTEM_INFORMATION_TOPIC,
+    BIKES_SYSTEM_REGIONS_TOPIC
+)
+
+# Topics the pipeline derives from the feed topics
+DERIVED_TOPICS = (
+    BIKES_STATION_ROLLUPS_TOPIC,
+)
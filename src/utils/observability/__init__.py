@@ -0,0 +1,2 @@
+from .log_setup import LogAggregator, configure_logging, stop_logging
+from .metrics import REGISTRY, MetricsRegistry, MetricsServer, observe_feed_report
@@ -0,0 +1,147 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from src.core.config import LoggingConfig, config as default_config
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def configure_logging(level: Optional[str] = None, file_path: Optional[str] = None,
+                      logging_config: Optional[LoggingConfig] = None, console: bool = True,
+                      multiprocess: bool = False) -> QueueListener:
+    """
+    Route all logging through a queue drained by a background listener thread
+    
+    Application threads only put records on an in-memory queue; formatting and the
+    stdout and file writes happen on the listener thread, so slow terminals or disks
+    no longer stall polling and publishing. The log file rotates according to
+    LoggingConfig.max_file_size and backup_count. Calling it again replaces the
+    previous setup.
+    
+    Args:
+        level (Optional[str]): Root log level, LoggingConfig.level by default
+        file_path (Optional[str]): Log file, LoggingConfig.file_path by default; '' disables it
+        logging_config (Optional[LoggingConfig]): Settings, the global config by default
+        console (bool): Also write to stdout
+        multiprocess (bool): Use a multiprocessing queue, so that forked worker processes
+            log through the parent's listener instead of writing the file themselves
+    
+    Returns:
+        QueueListener: The started listener
+    """
+    global _listener
+    settings = logging_config or default_config.logging
+    file_path = settings.file_path if file_path is None else file_path
+    formatter = logging.Formatter(settings.format)
+    
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    if file_path:
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(RotatingFileHandler(file_path, maxBytes=settings.max_file_size,
+                                            backupCount=settings.backup_count, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = multiprocessing.Queue(-1) if multiprocess else queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    
+    with _lock:
+        stop_logging()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(QueueHandler(log_queue))
+        root.setLevel(getattr(logging, (level or settings.level).upper(), logging.INFO))
+        listener.start()
+        _listener = listener
+    
+    # atexit runs handlers last-registered-first; registering after the queue exists stops
+    # the listener before multiprocessing tears its queues down
+    atexit.unregister(stop_logging)
+    atexit.register(stop_logging)
+    
+    return listener
+
+
+def stop_logging():
+    """Write out every queued record and stop the listener thread"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+class LogAggregator:
+    def __init__(self, logger: logging.Logger, description: str, interval: float = 10.0,
+                 level: int = logging.INFO, sample_every: int = 0, sample_level: int = logging.DEBUG):
+        """
+        Initialize a counter that replaces one log line per record with one line per interval
+        
+        Args:
+            logger (logging.Logger): Logger the summaries are written to
+            description (str): What is counted, e.g. "Messages sent"
+            interval (float): Seconds between two summaries
+            level (int): Level of the summaries
+            sample_every (int): Also log the first and then every Nth event's detail at
+                sample_level; 0 disables samples
+            sample_level (int): Level of the samples
+        """
+        self.logger = logger
+        self.description = description
+        self.interval = interval
+        self.level = level
+        self.sample_every = sample_every
+        self.sample_level = sample_level
+        self.total = 0
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+    
+    def record(self, key: str, count: int = 1, sample: Any = None):
+        """
+        Count events and emit a summary once the interval has elapsed
+        
+        Args:
+            key (str): Event group, e.g. a topic or feed name
+            count (int): Number of events
+            sample (Any): Detail of the event, only formatted when it is sampled
+        """
+        with self._lock:
+            seen = self.total
+            self.total += count
+            self._counts[key] = self._counts.get(key, 0) + count
+            due = time.monotonic() - self._window_start >= self.interval
+        
+        # Sample when this call crosses a multiple of sample_every (the first event included)
+        if (sample is not None and self.sample_every
+                and (seen + count - 1) // self.sample_every != (seen - 1) // self.sample_every
+                and self.logger.isEnabledFor(self.sample_level)):
+            self.logger.log(self.sample_level, f"{self.description} sample [{key}]: {sample}")
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Emit the summary of the current window, if anything was counted"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            now = time.monotonic()
+            elapsed, self._window_start = now - self._window_start, now
+        if counts and self.logger.isEnabledFor(self.level):
+            summary = ", ".join(f"{key}: {count}" for key, count in sorted(counts.items()))
+            self.logger.log(self.level, f"{self.description} in the last {elapsed:.1f}s: {summary}")
@@ -0,0 +1,359 @@
+import logging
+import math
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond acks up to feed downloads of tens of seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: Any) -> str:
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, including the special float values"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base of the metric types: a name, help text and one child per label combination"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+    
+    def labels(self, *values: Any):
+        """
+        Get the child for one combination of label values
+        
+        Args:
+            *values (Any): One value per label name, in order
+        
+        Returns:
+            The child metric, created on first use
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def _label_text(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        """Render the {label="value"} part of a sample line"""
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+    
+    def render(self) -> List[str]:
+        """Render the metric in the Prometheus text exposition format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        # Snapshot under the lock, as a new label set may be added while a scrape renders
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+    
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {_format_value(child.get())}"]
+
+
+class _Value:
+    """A single float guarded by a lock"""
+    
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+    
+    def set(self, value: float):
+        with self._lock:
+            self._value = float(value)
+    
+    def get(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. records published"""
+    
+    kind = "counter"
+    
+    def _new_child(self):
+        return _Value()
+    
+    def inc(self, amount: float = 1.0):
+        """Increment the counter of a metric without labels"""
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. consumer lag"""
+    
+    kind = "gauge"
+    
+    def _new_child(self):
+        return _Value()
+    
+    def set(self, value: float):
+        """Set the value of a metric without labels"""
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count of one histogram child"""
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets, e.g. fetch latency"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+    
+    def observe(self, value: float):
+        """Observe a value of a metric without labels"""
+        self.labels().observe(value)
+    
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        counts, total, count = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = "+Inf" if math.isinf(bound) else _format_value(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(key, ('le', le))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Initialize an in-process registry of named metrics"""
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric_class, name: str, *args, **kwargs) -> _Metric:
+        """Return the metric with this name, creating it on first use"""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Get or create a counter"""
+        return self._register(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Get or create a gauge"""
+        return self._register(Gauge, name, documentation, labelnames)
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+    
+    def render(self) -> str:
+        """
+        Render every metric
+        
+        Returns:
+            str: Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Feed polling
+FEED_FETCH_SECONDS = REGISTRY.histogram(
+    "bikes_feed_fetch_seconds", "Time to download a GBFS feed; streamed feeds are parsed while downloading", ("feed",))
+FEED_PARSE_SECONDS = REGISTRY.histogram(
+    "bikes_feed_parse_seconds", "Time to decode a GBFS feed document and extract its records", ("feed",))
+FEED_PUBLISH_SECONDS = REGISTRY.histogram(
+    "bikes_feed_publish_seconds", "Time to publish a feed snapshot until every record was acknowledged", ("feed",))
+FEED_RECORDS = REGISTRY.counter(
+    "bikes_feed_records_total", "Records published per feed", ("feed",))
+FEED_POLLS = REGISTRY.counter(
+    "bikes_feed_polls_total", "Feed polls by outcome (published, skipped reason or error)", ("feed", "outcome"))
+
+# Producing
+PRODUCE_ACK_SECONDS = REGISTRY.histogram(
+    "bikes_produce_ack_seconds", "Time from handing a message to the producer until the broker acknowledged it",
+    ("topic",))
+PRODUCE_MESSAGES = REGISTRY.counter(
+    "bikes_produce_messages_total", "Messages produced by outcome (acked or failed)", ("topic", "outcome"))
+
+# Consuming
+CONSUMER_RECORDS = REGISTRY.counter(
+    "bikes_consumer_records_total", "Records consumed", ("group", "topic"))
+CONSUMER_LAG = REGISTRY.gauge(
+    "bikes_consumer_lag", "Records between the consumer position and the partition high watermark",
+    ("group", "topic", "partition"))
+
+# Data lake sink
+SINK_FILES = REGISTRY.counter(
+    "bikes_sink_files_total", "Parquet files written by the data lake sink", ("feed",))
+SINK_RECORDS = REGISTRY.counter(
+    "bikes_sink_records_total", "Records written to Parquet files", ("feed",))
+SINK_BYTES = REGISTRY.counter(
+    "bikes_sink_bytes_total", "Compressed Parquet bytes written", ("feed",))
+SINK_WRITE_SECONDS = REGISTRY.histogram(
+    "bikes_sink_write_seconds", "Time to encode and store one Parquet file", ("feed",))
+
+# Rollups
+ROLLUPS = REGISTRY.counter(
+    "bikes_rollups_total", "Window rollups emitted by entity (station or region) and window", ("entity", "window"))
+ROLLUP_WATERMARK_LAG_SECONDS = REGISTRY.gauge(
+    "bikes_rollup_watermark_lag_seconds", "Wall-clock time minus the rollup watermark")
+
+# Scheduling
+JOB_DURATION_SECONDS = REGISTRY.histogram(
+    "bikes_job_duration_seconds", "Duration of scheduled job runs", ("job",))
+JOB_LAG_SECONDS = REGISTRY.histogram(
+    "bikes_job_lag_seconds", "Delay between a job's scheduled and actual start", ("job",))
+JOB_OVERRUNS = REGISTRY.counter(
+    "bikes_job_overruns_total", "Job runs that took longer than the job interval", ("job",))
+JOB_SKIPPED_TICKS = REGISTRY.counter(
+    "bikes_job_skipped_ticks_total", "Scheduled runs dropped because a job fell behind", ("job",))
+JOB_FAILURES = REGISTRY.counter(
+    "bikes_job_failures_total", "Job runs that raised an exception", ("job",))
+
+
+def observe_feed_report(report: Dict[str, Any]):
+    """
+    Record the timings and counts of one feed snapshot report
+    
+    Args:
+        report (Dict[str, Any]): Report returned by Bikes.process_feed or AsyncBikes.fetch_and_publish
+    """
+    feed = report.get('feed') or report.get('topic')
+    if report.get('error'):
+        FEED_POLLS.labels(feed, "error").inc()
+        return
+    
+    FEED_FETCH_SECONDS.labels(feed).observe(report.get('fetch_seconds', 0.0))
+    if report.get('skipped'):
+        FEED_POLLS.labels(feed, f"skipped: {report['skipped']}").inc()
+        return
+    
+    if 'parse_seconds' in report:
+        FEED_PARSE_SECONDS.labels(feed).observe(report['parse_seconds'])
+    FEED_PUBLISH_SECONDS.labels(feed).observe(report.get('publish_seconds', 0.0))
+    FEED_RECORDS.labels(feed).inc(report.get('records', 0))
+    FEED_POLLS.labels(feed, "published").inc()
+
+
+class MetricsServer:
+    def __init__(self, port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY):
+        """
+        Initialize a local HTTP endpoint serving the registry at /metrics
+        
+        Args:
+            port (int): Port to listen on, 0 for any free port
+            host (str): Interface to bind, loopback by default
+            registry (MetricsRegistry): Registry to serve
+        """
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.server = None
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+    
+    def start(self) -> "MetricsServer":
+        """Start serving in a background thread"""
+        registry = self.registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would flood the pipeline log
+                pass
+        
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]
+            self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+            self._thread.start()
+            self.logger.info(f"Serving metrics at http://{self.host}:{self.port}/metrics")
+        except Exception as e:
+            self.logger.error(f"Failed to start metrics server on {self.host}:{self.port}: {e}")
+            raise
+        return self
+    
+    def stop(self):
+        """Stop serving and release the port"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,4 @@
+from .avro_codec import AvroDeserializer, AvroSerializer
+from .codec import JsonCodec, OrjsonCodec, get_codec
+from .schema_registry import HttpSchemaRegistry, LocalSchemaRegistry, get_schema_registry
+from .stream_parser import iter_array_items
@@ -0,0 +1,176 @@
+import io
+import logging
+import struct
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from kafka.serializer import Deserializer, Serializer
+from src.utils.serialization.codec import JsonCodec, get_codec
+from src.utils.serialization.schema_registry import get_schema_registry, subject_for
+
+try:
+    import fastavro
+except ImportError:  # pragma: no cover - depends on the environment
+    fastavro = None
+
+logger = logging.getLogger(__name__)
+
+# Confluent wire format: magic byte 0, 4-byte big-endian schema id, Avro binary body
+MAGIC_BYTE = 0
+HEADER = struct.Struct('>bI')
+
+WIRE_FORMATS = ('json', 'avro')
+
+
+class AvroSerializer(Serializer):
+    """Kafka value serializer writing Avro records in the Confluent wire format"""
+    
+    def __init__(self, registry=None, fallback: Optional[Union[str, JsonCodec]] = None, allow_json: bool = False):
+        """
+        Initialize the serializer
+        
+        The schema of a topic is the latest version of its "<topic>-value" subject.
+        Writing to a topic without a schema raises, so a missing or misplaced registry
+        cannot silently turn Avro output into JSON. With allow_json, such topics (e.g.
+        feeds found through discovery) are written with the fallback JSON codec
+        instead, which consumers tell apart by the missing magic byte.
+        
+        Args:
+            registry: LocalSchemaRegistry or HttpSchemaRegistry, config/schemas by default
+            fallback (Optional[Union[str, JsonCodec]]): Codec for topics without a schema
+            allow_json (bool): Write topics without a schema as JSON instead of raising
+        """
+        if fastavro is None:
+            raise ImportError("fastavro is not installed")
+        self.registry = registry if registry is not None else get_schema_registry()
+        self.fallback = get_codec(fallback)
+        self.allow_json = allow_json
+        self._writers: Dict[str, Optional[Tuple[bytes, Any]]] = {}
+    
+    def _writer(self, topic: str) -> Optional[Tuple[bytes, Any]]:
+        """Return the header and parsed schema of a topic, resolved once per topic"""
+        if topic not in self._writers:
+            latest = self.registry.get_latest(subject_for(topic))
+            if latest is None:
+                if not self.allow_json:
+                    location = getattr(self.registry, 'directory', None) or getattr(self.registry, 'url', None)
+                    raise ValueError(f"No Avro schema for topic {topic} (subject {subject_for(topic)}) in "
+                                     f"schema registry {location}")
+                logger.info(f"No schema for topic {topic}, writing JSON")
+                self._writers[topic] = None
+            else:
+                schema_id, schema = latest
+                self._writers[topic] = (HEADER.pack(MAGIC_BYTE, schema_id), fastavro.parse_schema(schema))
+        return self._writers[topic]
+    
+    def serialize(self, topic: str, value: Any) -> Optional[bytes]:
+        """
+        Encode one message value
+        
+        Args:
+            topic (str): Target topic
+            value (Any): Record; None (and other empty values) are sent as tombstones
+        
+        Returns:
+            Optional[bytes]: Encoded payload
+        """
+        if not value:
+            return None
+        
+        writer = self._writer(topic)
+        if writer is None:
+            return self.fallback.encode(value)
+        
+        header, schema = writer
+        buffer = io.BytesIO()
+        buffer.write(header)
+        fastavro.schemaless_writer(buffer, schema, value)
+        return buffer.getvalue()
+
+
+class AvroDeserializer(Deserializer):
+    """Kafka value deserializer reading Confluent wire format Avro, and JSON from topics without a schema"""
+    
+    def __init__(self, registry=None, fallback: Optional[Union[str, JsonCodec]] = None):
+        """
+        Initialize the deserializer
+        
+        Args:
+            registry: LocalSchemaRegistry or HttpSchemaRegistry, config/schemas by default
+            fallback (Optional[Union[str, JsonCodec]]): Codec for payloads without the magic byte
+        """
+        if fastavro is None:
+            raise ImportError("fastavro is not installed")
+        self.registry = registry if registry is not None else get_schema_registry()
+        self.fallback = get_codec(fallback)
+        self._readers: Dict[int, Any] = {}
+    
+    def deserialize(self, topic: str, data: Optional[bytes]) -> Any:
+        """
+        Decode one message value
+        
+        Records come back with every field of their writer schema; fields the producer
+        did not have are None.
+        
+        Args:
+            topic (str): Source topic
+            data (Optional[bytes]): Encoded payload
+        
+        Returns:
+            Any: Decoded record, or None for a tombstone
+        """
+        if not data:
+            return None
+        if data[0] != MAGIC_BYTE:
+            return self.fallback.decode(data)
+        
+        _, schema_id = HEADER.unpack_from(data)
+        schema = self._readers.get(schema_id)
+        if schema is None:
+            schema = self._readers[schema_id] = fastavro.parse_schema(self.registry.get_by_id(schema_id))
+        buffer = io.BytesIO(data)
+        buffer.seek(HEADER.size)
+        return fastavro.schemaless_reader(buffer, schema)
+
+
+def value_serializer(codec: Optional[Union[str, JsonCodec]] = None, wire_format: str = 'json',
+                     schema_registry: Optional[str] = None,
+                     allow_json: bool = False) -> Union[Serializer, Callable[[Any], Optional[bytes]]]:
+    """
+    Build the value_serializer of a KafkaProducer
+    
+    Args:
+        codec (Optional[Union[str, JsonCodec]]): JSON codec, also used for topics without an Avro schema
+        wire_format (str): 'json' or 'avro'
+        schema_registry (Optional[str]): Registry URL or schema directory for Avro
+        allow_json (bool): With Avro, write topics without a schema as JSON instead of raising
+    
+    Returns:
+        Union[Serializer, Callable[[Any], Optional[bytes]]]: Serializer accepted by kafka-python
+    """
+    codec = get_codec(codec)
+    if wire_format == 'avro':
+        return AvroSerializer(get_schema_registry(schema_registry), fallback=codec, allow_json=allow_json)
+    if wire_format != 'json':
+        raise ValueError(f"Unknown wire format '{wire_format}', expected one of {list(WIRE_FORMATS)}")
+    return lambda x: codec.encode(x) if x else None
+
+
+def value_deserializer(codec: Optional[Union[str, JsonCodec]] = None, wire_format: str = 'json',
+                       schema_registry: Optional[str] = None) -> Union[Deserializer, Callable[[bytes], Any]]:
+    """
+    Build the value_deserializer of a KafkaConsumer
+    
+    Args:
+        codec (Optional[Union[str, JsonCodec]]): JSON codec, also used for payloads that are not Avro
+        wire_format (str): 'json' or 'avro'
+        schema_registry (Optional[str]): Registry URL or schema directory for Avro
+    
+    Returns:
+        Union[Deserializer, Callable[[bytes], Any]]: Deserializer accepted by kafka-python
+    """
+    codec = get_codec(codec)
+    if wire_format == 'avro':
+        return AvroDeserializer(get_schema_registry(schema_registry), fallback=codec)
+    if wire_format != 'json':
+        raise ValueError(f"Unknown wire format '{wire_format}', expected one of {list(WIRE_FORMATS)}")
+    return lambda x: codec.decode(x) if x else None
@@ -0,0 +1,89 @@
+import json
+import logging
+from typing import Any, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class JsonCodec:
+    """JSON codec backed by the standard library"""
+    
+    name = 'json'
+    
+    def encode(self, value: Any) -> bytes:
+        """
+        Serialize a value to UTF-8 encoded JSON
+        
+        Args:
+            value (Any): JSON-compatible value
+            
+        Returns:
+            bytes: Encoded payload
+        """
+        return json.dumps(value, separators=(',', ':')).encode('utf-8')
+    
+    def decode(self, data: Union[bytes, str]) -> Any:
+        """
+        Deserialize a JSON payload
+        
+        Args:
+            data (Union[bytes, str]): Encoded payload
+            
+        Returns:
+            Any: Decoded value
+        """
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """JSON codec backed by orjson"""
+    
+    name = 'orjson'
+    
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+    
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+    
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+
+CODECS = {
+    JsonCodec.name: JsonCodec,
+    OrjsonCodec.name: OrjsonCodec
+}
+
+DEFAULT_CODEC = OrjsonCodec.name
+
+
+def get_codec(codec: Optional[Union[str, JsonCodec]] = None) -> JsonCodec:
+    """
+    Resolve a codec by name, falling back to the stdlib codec if orjson is missing
+    
+    Args:
+        codec (Optional[Union[str, JsonCodec]]): Codec name, codec instance or None
+            for the default codec
+            
+    Returns:
+        JsonCodec: Codec instance
+    """
+    if isinstance(codec, JsonCodec):
+        return codec
+    
+    name = codec or DEFAULT_CODEC
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec '{name}', expected one of {sorted(CODECS)}")
+    
+    try:
+        return CODECS[name]()
+    except ImportError as e:
+        logger.warning(f"Codec '{name}' unavailable ({e}), falling back to '{JsonCodec.name}'")
+        return JsonCodec()
@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+
+# The schemas shipped in the repository, independent of the working directory
+DEFAULT_SCHEMA_DIRECTORY = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "config", "schemas"))
+
+REGISTRY_INDEX = "registry.json"
+
+
+def subject_for(topic: str) -> str:
+    """Subject of a topic's values under the registry's default TopicNameStrategy"""
+    return f"{topic}-value"
+
+
+class LocalSchemaRegistry:
+    def __init__(self, directory: str = DEFAULT_SCHEMA_DIRECTORY):
+        """
+        Initialize a file-based schema registry for offline use
+        
+        Schemas are Avro .avsc files listed in registry.json with a global id, a subject
+        and a version per subject, mirroring what Confluent Schema Registry assigns.
+        The ids are written into every message, so producers and consumers must share
+        the same index; new versions are only ever appended.
+        
+        Args:
+            directory (str): Directory holding registry.json and the schema files
+        """
+        self.directory = directory
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._entries = []
+        self._schemas: Dict[int, Dict[str, Any]] = {}
+        self._load()
+    
+    def _load(self):
+        """Read the index and every schema it references"""
+        index_path = os.path.join(self.directory, REGISTRY_INDEX)
+        if not os.path.exists(index_path):
+            self.logger.warning(f"No schema registry index at {index_path}, starting empty")
+            return
+        
+        try:
+            with open(index_path, 'r') as index_file:
+                self._entries = json.load(index_file).get('schemas', [])
+            for entry in self._entries:
+                with open(os.path.join(self.directory, entry['file']), 'r') as schema_file:
+                    self._schemas[entry['id']] = json.load(schema_file)
+            self.logger.info(f"Loaded {len(self._entries)} schemas from {self.directory}")
+        except Exception as e:
+            self.logger.error(f"Failed to load schema registry {self.directory}: {e}")
+            raise
+    
+    def get_latest(self, subject: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Get the latest version of a subject
+        
+        Args:
+            subject (str): Subject name, e.g. bikes-station-status-value
+        
+        Returns:
+            Optional[Tuple[int, Dict[str, Any]]]: Schema id and schema, or None if the
+            subject has no schema
+        """
+        versions = [entry for entry in self._entries if entry['subject'] == subject]
+        if not versions:
+            return None
+        latest = max(versions, key=lambda entry: entry['version'])
+        return latest['id'], self._schemas[latest['id']]
+    
+    def get_by_id(self, schema_id: int) -> Dict[str, Any]:
+        """
+        Get a schema by its global id
+        
+        Args:
+            schema_id (int): Id written in the message header
+        
+        Returns:
+            Dict[str, Any]: Writer schema
+        """
+        if schema_id not in self._schemas:
+            raise KeyError(f"Unknown schema id {schema_id} in {self.directory}")
+        return self._schemas[schema_id]
+    
+    def register(self, subject: str, schema: Dict[str, Any]) -> int:
+        """
+        Add a schema as the next version of a subject, unless it is already registered
+        
+        Args:
+            subject (str): Subject name
+            schema (Dict[str, Any]): Avro schema
+        
+        Returns:
+            int: Schema id
+        """
+        with self._lock:
+            for entry in self._entries:
+                if entry['subject'] == subject and self._schemas[entry['id']] == schema:
+                    return entry['id']
+            
+            schema_id = max((entry['id'] for entry in self._entries), default=0) + 1
+            version = max((entry['version'] for entry in self._entries if entry['subject'] == subject), default=0) + 1
+            name = subject[:-len('-value')] if subject.endswith('-value') else subject
+            entry = {'id': schema_id, 'subject': subject, 'version': version,
+                     'file': f"{name.replace('-', '_')}.v{version}.avsc"}
+            
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, entry['file']), 'w') as schema_file:
+                json.dump(schema, schema_file, indent=2)
+            self._entries.append(entry)
+            self._schemas[schema_id] = schema
+            with open(os.path.join(self.directory, REGISTRY_INDEX), 'w') as index_file:
+                json.dump({'schemas': self._entries}, index_file, indent=2)
+        
+        self.logger.info(f"Registered {subject} version {version} with id {schema_id}")
+        return schema_id
+
+
+class HttpSchemaRegistry:
+    def __init__(self, url: str, timeout: float = 10.0):
+        """
+        Initialize a client of a Confluent-compatible schema registry
+        
+        Args:
+            url (str): Registry URL, e.g. http://localhost:8081
+            timeout (float): Request timeout in seconds
+        """
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.logger = logging.getLogger(__name__)
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+    
+    def get_latest(self, subject: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Get the latest version of a subject
+        
+        Args:
+            subject (str): Subject name
+        
+        Returns:
+            Optional[Tuple[int, Dict[str, Any]]]: Schema id and schema, or None if the
+            subject is not registered
+        """
+        try:
+            response = self.session.get(f"{self.url}/subjects/{subject}/versions/latest", timeout=self.timeout)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            self.logger.error(f"Failed to get latest schema of {subject} from {self.url}: {e}")
+            raise
+        
+        schema = json.loads(body['schema'])
+        self._by_id[body['id']] = schema
+        return body['id'], schema
+    
+    def get_by_id(self, schema_id: int) -> Dict[str, Any]:
+        """
+        Get a schema by its global id
+        
+        Args:
+            schema_id (int): Id written in the message header
+        
+        Returns:
+            Dict[str, Any]: Writer schema
+        """
+        if schema_id not in self._by_id:
+            try:
+                response = self.session.get(f"{self.url}/schemas/ids/{schema_id}", timeout=self.timeout)
+                response.raise_for_status()
+                self._by_id[schema_id] = json.loads(response.json()['schema'])
+            except Exception as e:
+                self.logger.error(f"Failed to get schema {schema_id} from {self.url}: {e}")
+                raise
+        return self._by_id[schema_id]
+    
+    def register(self, subject: str, schema: Dict[str, Any]) -> int:
+        """
+        Register a schema under a subject; the registry returns the existing id for a known schema
+        
+        Args:
+            subject (str): Subject name
+            schema (Dict[str, Any]): Avro schema
+        
+        Returns:
+            int: Schema id
+        """
+        try:
+            response = self.session.post(
+                f"{self.url}/subjects/{subject}/versions",
+                json={'schema': json.dumps(schema)},
+                headers={'Content-Type': 'application/vnd.schemaregistry.v1+json'},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            schema_id = response.json()['id']
+        except Exception as e:
+            self.logger.error(f"Failed to register schema of {subject} with {self.url}: {e}")
+            raise
+        
+        self._by_id[schema_id] = schema
+        self.logger.info(f"Registered {subject} with id {schema_id} at {self.url}")
+        return schema_id
+
+
+def get_schema_registry(location: Optional[str] = None):
+    """
+    Resolve a schema registry from a URL or a schema directory
+    
+    Args:
+        location (Optional[str]): http(s) URL of a schema registry, a directory of local
+            schemas, or None for the schemas shipped in config/schemas
+    
+    Returns:
+        LocalSchemaRegistry or HttpSchemaRegistry
+    """
+    if location and location.startswith(('http://', 'https://')):
+        return HttpSchemaRegistry(location)
+    return LocalSchemaRegistry(location or DEFAULT_SCHEMA_DIRECTORY)
@@ -0,0 +1,89 @@
+import re
+from typing import Any, Iterable, Iterator, Optional, Union
+from src.utils.serialization.codec import JsonCodec, get_codec
+
+# Complete strings are consumed whole so brackets inside them are never seen; a lone
+# quote only matches when the string is cut off at the end of the buffer
+_TOKENS = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|"|[{}\[\]]', re.S)
+
+_QUOTE = ord('"')
+_OPENERS = (ord('{'), ord('['))
+
+
+def iter_array_items(chunks: Iterable[bytes], key: str = 'stations',
+                     codec: Optional[Union[str, JsonCodec]] = None) -> Iterator[Any]:
+    """
+    Incrementally decode the items of a JSON array from a stream of byte chunks
+    
+    The first array stored under ``key`` (e.g. ``"stations": [...]`` in a GBFS feed)
+    is located and each of its object items is decoded and yielded as soon as its
+    closing brace has arrived, so only the item being assembled is kept in memory.
+    
+    Args:
+        chunks (Iterable[bytes]): Raw document bytes in arbitrary chunk sizes
+        key (str): Name of the member holding the array
+        codec (Optional[Union[str, JsonCodec]]): Codec used to decode each item
+        
+    Yields:
+        Any: Decoded array items, in document order
+        
+    Raises:
+        ValueError: If the array is missing or the document ends inside it
+    """
+    codec = get_codec(codec)
+    array_start = re.compile(rb'"' + re.escape(key.encode('utf-8')) + rb'"\s*:\s*\[')
+    chunks = iter(chunks)
+    buffer = bytearray()
+    
+    # Locate the array, keeping only a short tail in case the key spans two chunks
+    tail = len(key) + 64
+    for chunk in chunks:
+        buffer += chunk
+        match = array_start.search(buffer)
+        if match:
+            del buffer[:match.end()]
+            break
+        if len(buffer) > tail:
+            del buffer[:-tail]
+    else:
+        raise ValueError(f"Array '{key}' not found in JSON document")
+    
+    position = 0
+    depth = 0
+    item_start = 0
+    
+    while True:
+        for match in _TOKENS.finditer(buffer, position):
+            index = match.start()
+            char = buffer[index]
+            position = match.end()
+            
+            if char == _QUOTE:
+                if position - index == 1:
+                    # Unterminated string: rescan it once more bytes have arrived
+                    position = index
+                    break
+            elif char in _OPENERS:
+                if depth == 0:
+                    item_start = index
+                depth += 1
+            elif depth == 0:
+                # Closing bracket of the array itself
+                return
+            else:
+                depth -= 1
+                if depth == 0:
+                    yield codec.decode(bytes(buffer[item_start:position]))
+        else:
+            position = len(buffer)
+        
+        # Drop everything before the item (or string) currently being assembled
+        consumed = item_start if depth else position
+        del buffer[:consumed]
+        position -= consumed
+        item_start = 0
+        
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError(f"JSON document ended inside array '{key}'")
+        buffer += chunk
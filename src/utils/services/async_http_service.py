@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+import aiohttp
+
+
+class AsyncHttpService:
+    def __init__(self, timeout: int = 30, max_retries: int = 3, max_connections: int = 100):
+        """
+        Initialize asyncio HTTP Service
+        
+        Args:
+            timeout (int): Request timeout in seconds
+            max_retries (int): Maximum number of retries for failed requests
+            max_connections (int): Maximum number of simultaneous connections
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.session = None
+        self.logger = logging.getLogger(__name__)
+        
+        # ETag / Last-Modified validators of the last full response, keyed by URL
+        self._validators: Dict[str, Dict[str, str]] = {}
+    
+    async def start(self):
+        """Open the underlying client session"""
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            headers={
+                'User-Agent': 'CitiBikes-DataPipeline/1.0',
+                'Accept': 'application/json'
+            }
+        )
+        self.logger.info(
+            f"Async HTTP Service initialized with timeout: {self.timeout}s, "
+            f"max retries: {self.max_retries}, max connections: {self.max_connections}"
+        )
+    
+    async def get_bytes(self, url: str, params: Optional[Dict[str, Any]] = None,
+                        conditional: bool = False) -> Optional[bytes]:
+        """
+        Make GET request with retry logic and return the raw body
+        
+        Args:
+            url (str): Target URL
+            params (Optional[Dict[str, Any]]): Query parameters
+            conditional (bool): Send If-None-Match / If-Modified-Since from the
+                previous response for this URL
+            
+        Returns:
+            Optional[bytes]: Response body, or None on 304 Not Modified
+        """
+        if not self.session:
+            raise RuntimeError("Async HTTP Service not started")
+        
+        headers = {}
+        validators = self._validators.get(url, {}) if conditional else {}
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+        if 'last_modified' in validators:
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.session.get(url, params=params, headers=headers) as response:
+                    if response.status == 304:
+                        self.logger.debug(f"{url} not modified since the previous request")
+                        return None
+                    response.raise_for_status()
+                    body = await response.read()
+                    
+                    validators = {}
+                    if response.headers.get('ETag'):
+                        validators['etag'] = response.headers['ETag']
+                    if response.headers.get('Last-Modified'):
+                        validators['last_modified'] = response.headers['Last-Modified']
+                    self._validators[url] = validators
+                    
+                    self.logger.info(f"Successful GET request to {url} - Status: {response.status}")
+                    return body
+                    
+            except aiohttp.ClientResponseError as e:
+                self.logger.error(f"HTTP error {e.status} for GET request to {url}")
+                raise
+                
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < self.max_retries:
+                    self.logger.warning(f"Request failed, retrying... (attempt {attempt + 1}/{self.max_retries + 1}): {e}")
+                    continue
+                self.logger.error(f"Request to {url} failed after {self.max_retries + 1} attempts: {e}")
+                raise
+    
+    def clear_validators(self, url: Optional[str] = None):
+        """
+        Forget stored response validators so the next conditional GET is unconditional
+        
+        Args:
+            url (Optional[str]): Only forget validators for this URL
+        """
+        if url is None:
+            self._validators.clear()
+        else:
+            self._validators.pop(url, None)
+    
+    async def close(self):
+        """Close the HTTP session"""
+        try:
+            if self.session:
+                await self.session.close()
+                self.logger.info("Async HTTP session closed successfully")
+        except Exception as e:
+            self.logger.error(f"Error closing async HTTP session: {e}")
+    
+    async def __aenter__(self):
+        """Async context manager entry"""
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit"""
+        await self.close()
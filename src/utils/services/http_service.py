@@ -1,6 +1,6 @@
 import requests
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
 from requests.exceptions import RequestException, Timeout, HTTPError
 
 class HttpService:
@@ -17,6 +17,9 @@ class HttpService:
         self.session = requests.Session()
         self.logger = logging.getLogger(__name__)
         
+        # ETag / Last-Modified validators of the last full response, keyed by request
+        self._validators: Dict[str, Dict[str, str]] = {}
+        
         # Set default headers
         self.session.headers.update({
             'User-Agent': 'CitiBikes-DataPipeline/1.0',
@@ -95,6 +98,105 @@ class HttpService:
         """
         return self._make_request('GET', url, params=params, **kwargs)
     
+    def get_if_modified(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Optional[requests.Response]:
+        """
+        Make a conditional GET request using the validators of the previous response
+        
+        Sends If-None-Match / If-Modified-Since when an earlier response for the same
+        URL and parameters carried an ETag or Last-Modified header.
+        
+        Args:
+            url (str): Target URL
+            params (Optional[Dict[str, Any]]): Query parameters
+            **kwargs: Additional request parameters
+            
+        Returns:
+            Optional[requests.Response]: HTTP response object, or None when the server
+            answered 304 Not Modified
+        """
+        cache_key = self._validator_key(url, params)
+        validators = self._validators.get(cache_key, {})
+        
+        headers = dict(kwargs.pop('headers', None) or {})
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+        if 'last_modified' in validators:
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        response = self._make_request('GET', url, params=params, headers=headers, **kwargs)
+        
+        if response.status_code == 304:
+            self.logger.debug(f"{url} not modified since the previous request")
+            return None
+        
+        validators = {}
+        if response.headers.get('ETag'):
+            validators['etag'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            validators['last_modified'] = response.headers['Last-Modified']
+        if validators:
+            self._validators[cache_key] = validators
+        else:
+            self._validators.pop(cache_key, None)
+        
+        return response
+    
+    def stream(self, url: str, params: Optional[Dict[str, Any]] = None, chunk_size: int = 64 * 1024,
+               conditional: bool = False, **kwargs) -> Optional[Iterator[bytes]]:
+        """
+        Make GET request and return the body as an iterator of raw byte chunks
+        
+        The body is read from the socket lazily as the iterator is consumed, and the
+        connection is released once it is exhausted or closed.
+        
+        Args:
+            url (str): Target URL
+            params (Optional[Dict[str, Any]]): Query parameters
+            chunk_size (int): Maximum number of bytes per chunk
+            conditional (bool): Send the stored validators like get_if_modified()
+            **kwargs: Additional request parameters
+            
+        Returns:
+            Optional[Iterator[bytes]]: Body chunks, or None when a conditional request
+            was answered with 304 Not Modified
+        """
+        kwargs['stream'] = True
+        if conditional:
+            response = self.get_if_modified(url, params, **kwargs)
+            if response is None:
+                return None
+        else:
+            response = self._make_request('GET', url, params=params, **kwargs)
+        
+        def iter_chunks():
+            try:
+                yield from response.iter_content(chunk_size=chunk_size)
+            finally:
+                response.close()
+        
+        return iter_chunks()
+    
+    def clear_validators(self, url: Optional[str] = None):
+        """
+        Forget stored response validators so the next conditional GET is unconditional
+        
+        Args:
+            url (Optional[str]): Only forget validators for this URL
+        """
+        if url is None:
+            self._validators.clear()
+        else:
+            for cache_key in [key for key in self._validators if key.split('?', 1)[0] == url]:
+                del self._validators[cache_key]
+    
+    @staticmethod
+    def _validator_key(url: str, params: Optional[Dict[str, Any]]) -> str:
+        """Build the validator cache key for a URL and its query parameters"""
+        if not params:
+            return url
+        query = '&'.join(f"{key}={params[key]}" for key in sorted(params))
+        return f"{url}?{query}"
+    
     def post(self, url: str, data: Optional[Dict[str, Any]] = None, json_data: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
         """
         Make POST request
@@ -4,20 +4,78 @@ Test script for Citi Bikes Real-Time Streaming Project
 """
 
 import unittest
+import argparse
+import asyncio
 import logging
+import multiprocessing
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
 import time
-from unittest.mock import Mock, patch
-from bikes_module.bikes import Bikes
-from kafka_producer.producer import Producer
-from kafka_consumer.consumer import Consumer
-from services.http_service import HttpService
-from constants.routes import BIKES_STATION_INFORMATION, BIKES_STATION_STATUS
-from constants.topics import BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock, patch
+import boto3
+import gzip
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.stub import Stubber
+from kafka.consumer.fetcher import ConsumerRecord
+from kafka.structs import TopicPartition
+from moto import mock_aws
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.core.bikes_module.bikes import Bikes
+from src.core.bikes_module.async_bikes import AsyncBikes
+from src.core.main import async_incompatible_options
+from src.streaming.kafka_producer.producer import Producer
+from src.streaming.kafka_consumer.consumer import Consumer
+from src.utils.services.http_service import HttpService
+from src.core.bikes_module.station_diff import StationStatusTracker
+from src.core.bikes_module.station_snapshot import StationSnapshot, ColumnarStatusTracker
+from src.core.bikes_module.discovery import GbfsDiscovery
+from src.core.bikes_module.feeds import GbfsFeed, record_key
+from src.streaming.kafka_consumer.compacted_reader import CompactedTopicReader
+from src.streaming.kafka_admin.topic_admin import COMPACTED_TOPIC_CONFIG, TopicAdmin
+from src.streaming.state_store.spatial_index import StationSpatialIndex
+from src.streaming.state_store.station_store import StationStateStore
+from src.streaming.state_store.materializer import StationStateMaterializer
+from src.streaming.sinks.parquet_sink import PARQUET_TABLES, ParquetSink
+from src.streaming.sinks.storage import S3Storage
+from src.streaming.rollups.station_rollups import (ParquetRollupOutput, StationRollupAggregator, StationRollupStage,
+                                                   TopicRollupOutput, WindowSpec)
+from src.aws.create_parquet_tables import create_parquet_tables
+from src.aws.aws_upload import LogShipper
+from src.aws.query_athena import AthenaQueryError, AthenaQueryRunner
+from src.core.config import Config, PRODUCER_PROFILES
+from src.core.scheduler import Scheduler
+from src.streaming.kafka_consumer.consumer_group import ConsumerGroupRunner
+from src.utils.observability.log_setup import LogAggregator, configure_logging, stop_logging
+from src.utils.observability.metrics import MetricsRegistry, MetricsServer, observe_feed_report, FEED_RECORDS
+from src.utils.serialization.avro_codec import AvroDeserializer, AvroSerializer
+from src.utils.serialization.codec import JsonCodec, get_codec
+from src.utils.serialization.schema_registry import LocalSchemaRegistry
+from src.utils.serialization.stream_parser import iter_array_items
+from src.utils.constants.topics import (BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_ROLLUPS_TOPIC,
+                                       BIKES_STATION_STATUS_TOPIC)
+from benchmarks.fake_services import FakeGbfsServer, in_memory_kafka
+from benchmarks.pipeline_benchmark import run_scenario
 
 # Set up logging for tests
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def report_on_stop(stop_event, stats_queue):
+    """Consumer worker stand-in whose final report is too large for the queue's pipe buffer"""
+    stop_event.wait(10)
+    stats_queue.put({'worker_id': 0, 'records': 7, 'batches': 1, 'padding': 'x' * (1 << 20)})
+
 class TestHttpService(unittest.TestCase):
     """Test HTTP service functionality"""
     
@@ -48,7 +106,7 @@ class TestHttpService(unittest.TestCase):
 class TestProducer(unittest.TestCase):
     """Test Kafka producer functionality"""
     
-    @patch('kafka.KafkaProducer')
+    @patch('src.streaming.kafka_producer.producer.KafkaProducer')
     def test_producer_initialization(self, mock_kafka_producer):
         """Test producer initialization"""
         mock_producer_instance = Mock()
@@ -59,7 +117,7 @@ class TestProducer(unittest.TestCase):
         self.assertIsNotNone(producer.producer)
         mock_kafka_producer.assert_called_once()
     
-    @patch('kafka.KafkaProducer')
+    @patch('src.streaming.kafka_producer.producer.KafkaProducer')
     def test_data_producer(self, mock_kafka_producer):
         """Test data production"""
         mock_producer_instance = Mock()
@@ -74,10 +132,57 @@ class TestProducer(unittest.TestCase):
         self.assertIsNotNone(result)
         mock_producer_instance.send.assert_called_once()
 
+class TestProducerProfiles(unittest.TestCase):
+    """Test producer throughput profiles read from Config"""
+    
+    def test_profiles_map_to_producer_settings(self):
+        """Test every profile yields complete KafkaProducer settings"""
+        config = Config()
+        for name, profile in PRODUCER_PROFILES.items():
+            settings = config.get_producer_config(name)
+            self.assertEqual(settings['linger_ms'], profile.linger_ms)
+            self.assertEqual(settings['buffer_memory'], profile.buffer_memory)
+            self.assertEqual(settings['acks'], config.kafka.producer_acks)
+        
+        with self.assertRaises(ValueError):
+            config.get_producer_config('fastest')
+    
+    @patch('src.streaming.kafka_producer.producer.KafkaProducer')
+    def test_producer_reads_profile_with_overrides(self, mock_kafka_producer):
+        """Test the producer uses the profile and explicit arguments override it"""
+        config = Config()
+        config.kafka.bootstrap_servers = "broker:9092"
+        
+        Producer(profile='max-throughput', config=config)
+        settings = mock_kafka_producer.call_args.kwargs
+        self.assertEqual(settings['bootstrap_servers'], ["broker:9092"])
+        self.assertEqual(settings['compression_type'], 'lz4')
+        self.assertEqual(settings['max_in_flight_requests_per_connection'], 10)
+        
+        producer = Producer(profile='max-throughput', compression_type='none', linger_ms=5, config=config)
+        settings = mock_kafka_producer.call_args.kwargs
+        self.assertIsNone(settings['compression_type'])
+        self.assertEqual(settings['linger_ms'], 5)
+        self.assertEqual(producer.batch_size, PRODUCER_PROFILES['max-throughput'].batch_size)
+    
+    @patch('src.streaming.kafka_producer.producer.KafkaProducer')
+    def test_unknown_profile_fails_on_producer_creation(self, mock_kafka_producer):
+        """Test a bad KAFKA_PRODUCER_PROFILE does not break imports but fails when a producer is created"""
+        env = dict(os.environ, KAFKA_PRODUCER_PROFILE='fastest')
+        result = subprocess.run([sys.executable, '-c', 'import src.streaming.kafka_producer.producer'],
+                                cwd=Path(__file__).resolve().parent.parent, env=env, capture_output=True)
+        self.assertEqual(result.returncode, 0, result.stderr.decode())
+        
+        with patch.dict(os.environ, {'KAFKA_PRODUCER_PROFILE': 'fastest'}):
+            config = Config()
+        with self.assertRaisesRegex(ValueError, "KAFKA_PRODUCER_PROFILE"):
+            Producer(config=config)
+        mock_kafka_producer.assert_not_called()
+
 class TestConsumer(unittest.TestCase):
     """Test Kafka consumer functionality"""
     
-    @patch('kafka.KafkaConsumer')
+    @patch('src.streaming.kafka_consumer.consumer.KafkaConsumer')
     def test_consumer_initialization(self, mock_kafka_consumer):
         """Test consumer initialization"""
         mock_consumer_instance = Mock()
@@ -89,7 +194,7 @@ class TestConsumer(unittest.TestCase):
         self.assertEqual(consumer.group_id, "test-group")
         mock_kafka_consumer.assert_called_once()
     
-    @patch('kafka.KafkaConsumer')
+    @patch('src.streaming.kafka_consumer.consumer.KafkaConsumer')
     def test_subscribe_to_topics(self, mock_kafka_consumer):
         """Test topic subscription"""
         mock_consumer_instance = Mock()
@@ -100,145 +205,1291 @@ class TestConsumer(unittest.TestCase):
         consumer.subscribe_to_topics(topics)
         
         mock_consumer_instance.subscribe.assert_called_once_with(topics)
+    
+    @patch('src.streaming.kafka_consumer.consumer.KafkaConsumer')
+    def test_poll_batches_and_commit(self, mock_kafka_consumer):
+        """Test polled batches are committed one past the last offset of each partition"""
+        consumer = Consumer("test-group", enable_auto_commit=False)
+        consumer.consumer = Mock()
+        batches = {
+            TopicPartition("topic1", 0): [Mock(offset=4), Mock(offset=5)],
+            TopicPartition("topic1", 1): [Mock(offset=9)]
+        }
+        consumer.consumer.poll.return_value = batches
+        
+        self.assertEqual(consumer.poll_batches(max_records=10, timeout_ms=100), batches)
+        consumer.consumer.poll.assert_called_once_with(timeout_ms=100, max_records=10)
+        
+        consumer.commit(batches)
+        offsets = consumer.consumer.commit.call_args[0][0]
+        self.assertEqual({partition: offset.offset for partition, offset in offsets.items()},
+                         {("topic1", 0): 6, ("topic1", 1): 10})
+    
+    @patch('src.streaming.kafka_consumer.consumer.KafkaConsumer')
+    def test_consume_messages_stops_after_timeout(self, mock_kafka_consumer):
+        """Test consume_messages ends once a poll returns nothing within timeout_ms"""
+        consumer = Consumer("test-group")
+        consumer.consumer = Mock()
+        consumer.consumer.poll.return_value = {}
+        
+        self.assertEqual(list(consumer.consume_messages(timeout_ms=10)), [])
+        consumer.consumer.poll.assert_called_once()
+
+class TestConsumerGroupRunner(unittest.TestCase):
+    """Test supervision of consumer group worker processes"""
+    
+    def setUp(self):
+        self.runner = ConsumerGroupRunner(["topic1"], workers=3, max_restarts=1)
+        self.runner._spawn = Mock()
+    
+    def test_crashed_worker_is_restarted(self):
+        """Test crashed workers are restarted until max_restarts while clean exits are not"""
+        self.runner.processes = {
+            0: Mock(is_alive=Mock(return_value=True)),
+            1: Mock(is_alive=Mock(return_value=False), exitcode=-9),
+            2: Mock(is_alive=Mock(return_value=False), exitcode=0)
+        }
+        
+        self.runner._supervise()
+        self.runner._spawn.assert_called_once_with(1)
+        self.assertNotIn(2, self.runner.processes)
+        
+        self.runner._supervise()
+        self.assertEqual(self.runner._spawn.call_count, 1)
+        self.assertEqual(sorted(self.runner.processes), [0])
+        self.assertEqual(self.runner.stats()['restarts'], 1)
+    
+    def test_stats_are_aggregated(self):
+        """Test throughput reports of all workers are summed"""
+        self.runner.stats_queue = Mock()
+        self.runner.stats_queue.get_nowait.side_effect = [
+            {'worker_id': 0, 'records': 100, 'batches': 2},
+            {'worker_id': 1, 'records': 50, 'batches': 1},
+            {'worker_id': 0, 'records': 10, 'batches': 1},
+            queue.Empty()
+        ]
+        
+        self.runner._collect_stats(timeout=0)
+        stats = self.runner.stats()
+        
+        self.assertEqual(stats['records'], 160)
+        self.assertEqual(stats['batches'], 4)
+        self.assertEqual(stats['records_per_worker'], {0: 110, 1: 50})
+    
+    def test_shutdown_drains_final_reports(self):
+        """Test a worker blocked flushing its last report still exits and is counted"""
+        process = multiprocessing.Process(target=report_on_stop, args=(self.runner.stop_event, self.runner.stats_queue))
+        process.start()
+        self.runner.processes = {0: process}
+        
+        start = time.monotonic()
+        self.runner.shutdown(timeout=10)
+        
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.runner.stats()['records'], 7)
 
 class TestBikes(unittest.TestCase):
-    """Test Bikes orchestrator functionality"""
+    """Test the Bikes orchestrator against a fake GBFS server and an in-memory broker"""
     
     def setUp(self):
+        kafka = in_memory_kafka()
+        self.broker = kafka.__enter__()
+        self.addCleanup(kafka.__exit__, None, None, None)
+        self.server = FakeGbfsServer(stations=50, change_rate=0.2).start()
+        self.addCleanup(self.server.stop)
         self.bikes = Bikes()
+        self.addCleanup(self.bikes.close)
     
     def test_bikes_initialization(self):
         """Test bikes orchestrator initialization"""
         self.assertIsNotNone(self.bikes.http_service)
         self.assertIsNotNone(self.bikes.producer)
-        self.assertEqual(self.bikes.retry_attempts, 3)
-        self.assertEqual(self.bikes.retry_delay, 5)
-    
-    def test_validate_station_data_valid(self):
-        """Test station data validation with valid data"""
-        valid_station = {
-            'station_id': 'test123',
-            'name': 'Test Station',
-            'lat': 40.7589,
-            'lon': -73.9851
-        }
+        self.assertTrue(self.bikes.changes_only)
+        self.assertTrue(self.bikes.respect_ttl)
+    
+    def test_publishes_changed_stations(self):
+        """Test a full snapshot is published first, then nothing on a 304 and only changes afterwards"""
+        feed = self.server.feed("station_status")
+        self.assertEqual(self.bikes.process_feed(feed)['records'], 50)
+        self.assertEqual(self.bikes.process_feed(feed)['skipped'], "not modified")
         
-        result = self.bikes._validate_station_data(valid_station)
-        self.assertTrue(result)
+        changed = self.server.advance()
+        report = self.bikes.process_feed(feed)
+        self.assertEqual(report['records'], changed)
+        self.assertEqual(report['acked'], changed)
+        self.assertEqual(self.broker.record_count(feed.topic), 50 + changed)
     
-    def test_validate_station_data_invalid(self):
-        """Test station data validation with invalid data"""
-        invalid_station = {
-            'station_id': 'test123',
-            'name': 'Test Station'
-            # Missing lat and lon
-        }
+    def test_invalid_station_data_is_dropped(self):
+        """Test station information with coordinates out of range is not published"""
+        self.server.feeds.information[0]['lat'] = 140.0
+        self.server.feeds.encode()
+        bikes = Bikes(columnar=True)
+        self.addCleanup(bikes.close)
         
-        result = self.bikes._validate_station_data(invalid_station)
-        self.assertFalse(result)
+        self.assertEqual(bikes.process_feed(self.server.feed("station_information"))['records'], 49)
     
-    def test_validate_status_data_valid(self):
-        """Test status data validation with valid data"""
-        valid_status = {
-            'station_id': 'test123',
-            'num_bikes_available': 5,
-            'num_docks_available': 10
-        }
+    def test_invalid_status_data_is_dropped(self):
+        """Test station status with a negative bike count is not published"""
+        self.server.feeds.status[0]['num_bikes_available'] = -5
+        self.server.feeds.encode()
+        bikes = Bikes(columnar=True)
+        self.addCleanup(bikes.close)
         
-        result = self.bikes._validate_status_data(valid_status)
-        self.assertTrue(result)
+        self.assertEqual(bikes.process_feed(self.server.feed("station_status"))['records'], 49)
+
+class TestAsyncBikes(unittest.TestCase):
+    """Test the asyncio engine against a fake GBFS server"""
     
-    def test_validate_status_data_invalid(self):
-        """Test status data validation with invalid data"""
-        invalid_status = {
-            'station_id': 'test123',
-            'num_bikes_available': -1,  # Invalid negative value
-            'num_docks_available': 10
-        }
+    def setUp(self):
+        self.server = FakeGbfsServer(stations=30, change_rate=0.2).start()
+        self.addCleanup(self.server.stop)
+    
+    def test_publishes_changed_stations(self):
+        """Test both feeds are fetched in one cycle, then skipped on a 304 and diffed after a change"""
+        published = []
+        
+        async def send_batch(topic, messages, key=None, key_func=None):
+            published.extend((topic, key_func(message)) for message in messages)
+            return {'topic': topic, 'sent': len(messages), 'acked': len(messages), 'failed': 0}
         
-        result = self.bikes._validate_status_data(invalid_status)
-        self.assertFalse(result)
+        async def run():
+            bikes = AsyncBikes(feeds=[self.server.feed("station_information"), self.server.feed("station_status")])
+            bikes.producer = Mock(start=AsyncMock(), close=AsyncMock(), send_batch=AsyncMock(side_effect=send_batch))
+            async with bikes:
+                first = await bikes.run_cycle()
+                second = await bikes.run_cycle()
+                changed = self.server.advance()
+                third = await bikes.run_cycle()
+            return first, second, changed, third
+        
+        first, second, changed, third = asyncio.run(run())
+        self.assertEqual([report['records'] for report in first], [30, 30])
+        self.assertTrue(first[1]['checkpoint'])
+        self.assertEqual([report['skipped'] for report in second], ["not modified", "not modified"])
+        self.assertEqual(third[1]['records'], changed)
+        self.assertEqual(len(published), sum(report['records'] for report in first + third))
+        self.assertEqual({topic for topic, _ in published}, {BIKES_STATION_INFORMATION_TOPIC, BIKES_STATION_STATUS_TOPIC})
+    
+    def test_rejects_unsupported_options(self):
+        """Test options only the threaded engine implements are reported for async mode"""
+        args = argparse.Namespace(streaming_parse=True, publish_mode="record", columnar=False, concurrent=True)
+        self.assertEqual(async_incompatible_options(args), ["--streaming-parse", "--publish-mode record", "--concurrent"])
+        args = argparse.Namespace(streaming_parse=False, publish_mode="batch", columnar=False, concurrent=False)
+        self.assertEqual(async_incompatible_options(args), [])
 
-class TestIntegration(unittest.TestCase):
-    """Integration tests for the complete pipeline"""
+class TestCodec(unittest.TestCase):
+    """Test JSON codec selection and round trips"""
+    
+    def test_round_trip(self):
+        """Test every codec decodes what it encodes"""
+        station = {'station_id': 'test123', 'num_bikes_available': 5, 'lat': 40.7589, 'is_renting': True}
+        for name in ('json', 'orjson'):
+            codec = get_codec(name)
+            self.assertEqual(codec.decode(codec.encode(station)), station)
+    
+    def test_codec_instance_passthrough(self):
+        """Test an existing codec instance is returned unchanged"""
+        codec = JsonCodec()
+        self.assertIs(get_codec(codec), codec)
+    
+    def test_unknown_codec(self):
+        """Test unknown codec names are rejected"""
+        with self.assertRaises(ValueError):
+            get_codec('xml')
+
+class TestWireFormat(unittest.TestCase):
+    """Test the Avro wire format and the local schema registry"""
+    
+    def test_avro_round_trip(self):
+        """Test station records round trip through the shipped schemas and are smaller than JSON"""
+        registry = LocalSchemaRegistry()
+        serializer = AvroSerializer(registry)
+        deserializer = AvroDeserializer(registry)
+        status = {'station_id': 'test123', 'num_bikes_available': 5, 'num_docks_available': 10,
+                  'is_renting': True, 'is_installed': 1, 'last_reported': 1700000000}
+        
+        payload = serializer.serialize(BIKES_STATION_STATUS_TOPIC, status)
+        decoded = deserializer.deserialize(BIKES_STATION_STATUS_TOPIC, payload)
+        
+        self.assertEqual(payload[0], 0)
+        self.assertLess(len(payload), len(JsonCodec().encode(status)))
+        self.assertEqual({key: value for key, value in decoded.items() if value is not None}, status)
+        self.assertIsNone(serializer.serialize(BIKES_STATION_STATUS_TOPIC, None))
+    
+    def test_topics_without_schema_use_json(self):
+        """Test topics without a registered schema fall back to JSON on both sides when allowed"""
+        registry = LocalSchemaRegistry()
+        payload = AvroSerializer(registry, fallback='json', allow_json=True).serialize("bikes-free-bike-status", {'bike_id': 'b1'})
+        
+        self.assertEqual(payload, b'{"bike_id":"b1"}')
+        self.assertEqual(AvroDeserializer(registry).deserialize("bikes-free-bike-status", payload), {'bike_id': 'b1'})
+    
+    @patch('src.streaming.kafka_producer.producer.KafkaProducer')
+    def test_producer_writes_discovered_feeds_as_json_when_allowed(self, mock_kafka_producer):
+        """Test an Avro Producer raises for topics without a schema unless allow_json is set, as with discovery"""
+        Producer(wire_format='avro')
+        strict = mock_kafka_producer.call_args.kwargs['value_serializer']
+        with self.assertRaisesRegex(ValueError, "No Avro schema for topic bikes-free-bike-status"):
+            strict.serialize("bikes-free-bike-status", {'bike_id': 'b1'})
+        
+        Producer(wire_format='avro', codec='json', allow_json=True)
+        lenient = mock_kafka_producer.call_args.kwargs['value_serializer']
+        self.assertEqual(lenient.serialize("bikes-free-bike-status", {'bike_id': 'b1'}), b'{"bike_id":"b1"}')
+        self.assertEqual(lenient.serialize(BIKES_STATION_STATUS_TOPIC, {'station_id': '72'})[0], 0)
+    
+    def test_missing_schema_raises(self):
+        """Test Avro output fails instead of writing JSON when a topic has no schema"""
+        with self.assertRaises(ValueError):
+            AvroSerializer(LocalSchemaRegistry()).serialize("bikes-free-bike-status", {'bike_id': 'b1'})
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                AvroSerializer(LocalSchemaRegistry(directory)).serialize(BIKES_STATION_STATUS_TOPIC, {'station_id': '72'})
+    
+    def test_default_schemas_found_from_any_directory(self):
+        """Test the shipped schemas are found regardless of the working directory"""
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                self.assertIsNotNone(LocalSchemaRegistry().get_latest(f"{BIKES_STATION_STATUS_TOPIC}-value"))
+            finally:
+                os.chdir(cwd)
+    
+    def test_register_new_version(self):
+        """Test registering a schema appends a version with a new id and is idempotent"""
+        with tempfile.TemporaryDirectory() as directory:
+            registry = LocalSchemaRegistry(directory)
+            schema = {'type': 'record', 'name': 'Region', 'fields': [{'name': 'region_id', 'type': 'string'}]}
+            
+            schema_id = registry.register("bikes-system-regions-value", schema)
+            self.assertEqual(registry.register("bikes-system-regions-value", schema), schema_id)
+            self.assertEqual(LocalSchemaRegistry(directory).get_latest("bikes-system-regions-value"), (schema_id, schema))
+    
+    @patch('src.streaming.kafka_producer.producer.KafkaProducer')
+    def test_producer_wire_format(self, mock_kafka_producer):
+        """Test the producer hands the Avro serializer to kafka-python"""
+        Producer(wire_format='avro')
+        
+        self.assertIsInstance(mock_kafka_producer.call_args.kwargs['value_serializer'], AvroSerializer)
+        with self.assertRaises(ValueError):
+            Producer(wire_format='xml')
+
+class TestStreamParser(unittest.TestCase):
+    """Test incremental decoding of GBFS station arrays"""
+    
+    def setUp(self):
+        self.document = (
+            b'{"last_updated": 1700000000, "ttl": 5, "data": {"stations": ['
+            b'{"station_id": "a", "name": "Broadway & W 60 St [}\\"{]", "rental_uris": {"ios": "x"}},'
+            b'{"station_id": "b", "name": "8 Ave", "rental_methods": ["KEY", "CREDITCARD"]}'
+            b']}}'
+        )
+    
+    def test_items_match_full_parse(self):
+        """Test items decode identically for any chunk size"""
+        expected = JsonCodec().decode(self.document)['data']['stations']
+        for chunk_size in (1, 2, 5, 17, len(self.document)):
+            chunks = [self.document[i:i + chunk_size] for i in range(0, len(self.document), chunk_size)]
+            self.assertEqual(list(iter_array_items(chunks)), expected)
+    
+    def test_truncated_document(self):
+        """Test a document cut off inside the array is rejected"""
+        with self.assertRaises(ValueError):
+            list(iter_array_items([self.document[:80]]))
+    
+    def test_missing_array(self):
+        """Test a document without the array is rejected"""
+        with self.assertRaises(ValueError):
+            list(iter_array_items([b'{"data": {"bikes": []}}']))
+
+class TestStationStatusTracker(unittest.TestCase):
+    """Test change detection for station status snapshots"""
+    
+    def setUp(self):
+        self.tracker = StationStatusTracker(checkpoint_every=3)
+        self.stations = [
+            {'station_id': 'a', 'num_bikes_available': 5, 'num_docks_available': 10, 'last_reported': 1},
+            {'station_id': 'b', 'num_bikes_available': 0, 'num_docks_available': 15, 'last_reported': 1}
+        ]
+    
+    def test_first_poll_is_full_checkpoint(self):
+        """Test the first poll publishes every station"""
+        changed, checkpoint = self.tracker.diff(self.stations)
+        self.assertTrue(checkpoint)
+        self.assertEqual(len(changed), 2)
+    
+    def test_only_changed_stations_published(self):
+        """Test unchanged stations are filtered and last_reported is ignored"""
+        self.tracker.diff(self.stations)
+        updated = [
+            dict(self.stations[0], num_bikes_available=4),
+            dict(self.stations[1], last_reported=2)
+        ]
+        changed, checkpoint = self.tracker.diff(updated)
+        self.assertFalse(checkpoint)
+        self.assertEqual([station['station_id'] for station in changed], ['a'])
     
-    @patch('services.http_service.HttpService.get')
-    @patch('kafka_producer.producer.Producer.data_producer')
-    def test_end_to_end_pipeline(self, mock_producer, mock_http_get):
-        """Test complete pipeline execution"""
-        # Mock HTTP response
-        mock_response = Mock()
-        mock_response.json.return_value = {
-            'data': {
-                'stations': [
-                    {
-                        'station_id': 'test123',
-                        'name': 'Test Station',
-                        'lat': 40.7589,
-                        'lon': -73.9851
-                    }
-                ]
-            }
+    def test_periodic_checkpoint(self):
+        """Test a full snapshot is published every checkpoint_every polls"""
+        results = [self.tracker.diff(self.stations) for _ in range(4)]
+        self.assertEqual([checkpoint for _, checkpoint in results], [True, False, False, True])
+        self.assertEqual(len(results[3][0]), 2)
+    
+    def test_reset_forces_full_snapshot(self):
+        """Test reset makes the next poll a checkpoint"""
+        self.tracker.diff(self.stations)
+        self.tracker.reset()
+        changed, checkpoint = self.tracker.diff(self.stations)
+        self.assertTrue(checkpoint)
+        self.assertEqual(len(changed), 2)
+
+class TestStationSnapshot(unittest.TestCase):
+    """Test the columnar station snapshot"""
+    
+    def setUp(self):
+        self.stations = [
+            {'station_id': '1', 'num_bikes_available': 5, 'num_docks_available': 10, 'is_renting': True, 'last_reported': 1700000000},
+            {'station_id': '2', 'num_bikes_available': 0, 'num_docks_available': 15, 'is_renting': False},
+            {'station_id': '3', 'num_bikes_available': -2, 'num_docks_available': 3, 'is_renting': 1}
+        ]
+        self.snapshot = StationSnapshot.from_records(self.stations)
+    
+    def test_columns_and_validation(self):
+        """Test records become typed columns and invalid stations are flagged"""
+        self.assertEqual(self.snapshot.num_bikes_available.tolist(), [5, 0, -2])
+        self.assertEqual(self.snapshot.is_renting.tolist(), [1, 0, 1])
+        self.assertEqual(self.snapshot.last_reported.tolist(), [1700000000, -1, -1])
+        self.assertEqual(self.snapshot.validate().tolist(), [True, True, False])
+        self.assertEqual(self.snapshot.totals()['bikes_available'], 5)
+    
+    def test_changed_since(self):
+        """Test changed and new stations are found regardless of row order"""
+        current = StationSnapshot.from_records([
+            dict(self.stations[1], num_bikes_available=1),
+            self.stations[0],
+            {'station_id': '4', 'num_bikes_available': 2}
+        ])
+        self.assertEqual(current.changed_since(self.snapshot).tolist(), [True, False, True])
+    
+    def test_columnar_tracker_matches_dict_tracker(self):
+        """Test the vectorized tracker publishes the same stations as StationStatusTracker"""
+        columnar, tracker = ColumnarStatusTracker(), StationStatusTracker()
+        columnar.diff(self.stations)
+        tracker.diff(self.stations)
+        
+        update = [self.stations[0], dict(self.stations[1], is_renting=True), self.stations[2]]
+        self.assertEqual(columnar.diff(update), tracker.diff(update))
+    
+    def test_bytes_round_trip(self):
+        """Test serialization keeps every column"""
+        restored = StationSnapshot.from_bytes(self.snapshot.to_bytes())
+        self.assertEqual(restored.station_id.tolist(), ['1', '2', '3'])
+        self.assertEqual(restored.to_records(), self.snapshot.to_records())
+
+class TestGbfsDiscovery(unittest.TestCase):
+    """Test resolution of gbfs.json discovery documents"""
+    
+    def setUp(self):
+        documents = {
+            'http://test.com/gbfs.json': {
+                'data': {'en': {'feeds': [
+                    {'name': 'system_information', 'url': 'http://test.com/system_information.json'},
+                    {'name': 'station_status', 'url': 'http://test.com/station_status.json'},
+                    {'name': 'free_bike_status', 'url': 'http://test.com/free_bike_status.json'},
+                    {'name': 'gbfs_versions', 'url': 'http://test.com/gbfs_versions.json'}
+                ]}}
+            },
+            'http://test.com/system_information.json': {'data': {'system_id': 'test_system'}}
         }
-        mock_http_get.return_value = mock_response
+        self.http_service = Mock()
+        self.http_service.get.side_effect = lambda url: Mock(content=JsonCodec().encode(documents[url]))
+    
+    def test_discover_feeds(self):
+        """Test every advertised data feed is resolved with its topic and record key"""
+        feeds = {feed.name: feed for feed in GbfsDiscovery(self.http_service).discover('http://test.com/gbfs.json')}
         
-        # Mock producer
-        mock_producer.return_value = Mock()
+        self.assertEqual(
+            sorted(feeds),
+            ['test_system/free_bike_status', 'test_system/station_status', 'test_system/system_information']
+        )
+        self.assertEqual(feeds['test_system/station_status'].topic, BIKES_STATION_STATUS_TOPIC)
+        self.assertTrue(feeds['test_system/station_status'].track_changes)
+        self.assertEqual(feeds['test_system/free_bike_status'].records_key, 'bikes')
+        self.assertIsNone(feeds['test_system/system_information'].records_key)
+    
+    def test_unreachable_system_is_skipped(self):
+        """Test discover_all keeps going when one discovery document fails"""
+        feeds = GbfsDiscovery(self.http_service).discover_all(['http://missing.com/gbfs.json', 'http://test.com/gbfs.json'])
+        self.assertEqual(len(feeds), 3)
+
+class TestLogging(unittest.TestCase):
+    """Test queued logging and aggregated per-record logs"""
+    
+    def test_aggregator_summarizes_and_samples(self):
+        """Test events are summarized per key and only every Nth detail is logged"""
+        logger = Mock()
+        logger.isEnabledFor.return_value = True
+        aggregator = LogAggregator(logger, "Messages sent", interval=3600, sample_every=100)
         
-        # Create bikes instance and test
-        bikes = Bikes()
-        result = bikes.get_bikes_station_information("http://test.com")
+        for _ in range(250):
+            aggregator.record("bikes-station-status", sample={'station_id': '72'})
+        aggregator.record("bikes-station-information", count=40)
+        self.assertEqual(logger.log.call_count, 3)
         
-        # Verify results
-        self.assertEqual(len(result), 1)
-        self.assertEqual(result[0]['station_id'], 'test123')
-        mock_producer.assert_called_once()
+        aggregator.flush()
+        summary = logger.log.call_args.args[1]
+        self.assertIn("bikes-station-status: 250", summary)
+        self.assertIn("bikes-station-information: 40", summary)
+        self.assertEqual(aggregator.total, 290)
+    
+    def test_queue_listener_writes_rotating_file(self):
+        """Test records reach the rotating log file through the queue listener"""
+        root = logging.getLogger()
+        previous_handlers, previous_level = list(root.handlers), root.level
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "logs", "pipeline.log")
+                listener = configure_logging(level="INFO", file_path=path, console=False)
+                logging.getLogger("test").info("queued record")
+                stop_logging()
+                
+                self.assertEqual(type(listener.handlers[0]).__name__, "RotatingFileHandler")
+                with open(path) as log_file:
+                    self.assertIn("queued record", log_file.read())
+        finally:
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            for handler in previous_handlers:
+                root.addHandler(handler)
+            root.setLevel(previous_level)
 
-def run_performance_test():
-    """Run performance test for the pipeline"""
-    logger.info("Starting Performance Test")
+class TestMetrics(unittest.TestCase):
+    """Test the in-process metrics registry and its Prometheus endpoint"""
     
-    start_time = time.time()
+    def setUp(self):
+        self.registry = MetricsRegistry()
     
-    try:
-        # Test producer performance
-        producer = Producer()
-        test_messages = [{"test": f"message_{i}"} for i in range(100)]
+    def test_render_snapshots_children_under_lock(self):
+        """Test rendering reads the label sets under the lock new label sets are added with"""
+        counter = self.registry.counter("records_total", "Records", ("topic",))
+        counter.labels("status").inc()
+        
+        class CheckedChildren(dict):
+            def items(inner):
+                self.assertTrue(counter._lock.locked())
+                return super().items()
+        
+        counter._children = CheckedChildren(counter._children)
+        self.assertIn('records_total{topic="status"} 1', self.registry.render())
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test observations land in cumulative buckets with sum and count"""
+        histogram = self.registry.histogram("fetch_seconds", "Fetch latency", ("feed",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.labels("station_status").observe(value)
+        
+        text = self.registry.render()
+        self.assertIn("# TYPE fetch_seconds histogram", text)
+        self.assertIn('fetch_seconds_bucket{feed="station_status",le="0.1"} 1', text)
+        self.assertIn('fetch_seconds_bucket{feed="station_status",le="1"} 3', text)
+        self.assertIn('fetch_seconds_bucket{feed="station_status",le="+Inf"} 4', text)
+        self.assertIn('fetch_seconds_count{feed="station_status"} 4', text)
+        self.assertIn('fetch_seconds_sum{feed="station_status"} 4.25', text)
+    
+    def test_counter_labels_and_type_conflicts(self):
+        """Test counters are kept per label value and names cannot change type"""
+        counter = self.registry.counter("records_total", "Records", ("feed",))
+        counter.labels("a").inc(3)
+        counter.labels("a").inc()
+        self.assertIs(self.registry.counter("records_total", "Records", ("feed",)), counter)
+        self.assertIn('records_total{feed="a"} 4', self.registry.render())
+        with self.assertRaises(ValueError):
+            self.registry.gauge("records_total", "Records")
+        with self.assertRaises(ValueError):
+            counter.labels("a", "b")
+    
+    def test_feed_report_counts_records(self):
+        """Test published reports count records and skipped polls do not"""
+        before = FEED_RECORDS.labels("metrics_test").get()
+        observe_feed_report({'feed': 'metrics_test', 'records': 12, 'fetch_seconds': 0.2,
+                             'parse_seconds': 0.01, 'publish_seconds': 0.1})
+        observe_feed_report({'feed': 'metrics_test', 'records': 0, 'skipped': 'not modified',
+                             'fetch_seconds': 0.05, 'publish_seconds': 0.0})
+        self.assertEqual(FEED_RECORDS.labels("metrics_test").get() - before, 12)
+    
+    def test_server_exposes_metrics(self):
+        """Test the HTTP endpoint serves the registry in text format"""
+        import urllib.request
+        self.registry.gauge("consumer_lag", "Lag", ("partition",)).labels(0).set(42)
+        server = MetricsServer(0, registry=self.registry).start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+                body = response.read().decode()
+                self.assertTrue(response.headers['Content-Type'].startswith("text/plain"))
+        finally:
+            server.stop()
+        self.assertIn('consumer_lag{partition="0"} 42', body)
+
+class TestScheduler(unittest.TestCase):
+    """Test the drift-free feed scheduler"""
+    
+    def setUp(self):
+        self.scheduler = Scheduler()
+    
+    def test_next_run_stays_on_grid(self):
+        """Test a job that finishes late in its slot still keeps its original cadence"""
+        job = self.scheduler.add_job("status", 10, Mock())
+        start = job.next_run
+        job.last_duration = 3
+        self.scheduler._schedule_next(job, start + 3)
+        self.assertEqual(job.next_run, start + 10)
+        self.assertEqual(job.skipped_ticks, 0)
+    
+    def test_catch_up_policies(self):
+        """Test missed ticks are skipped, replayed or re-anchored after an overrun"""
+        expected = {'skip': 40, 'catch_up': 20, 'reanchor': 45}
+        for policy, next_offset in expected.items():
+            job = self.scheduler.add_job(policy, 10, Mock(), catch_up=policy, max_catch_up=2)
+            start = job.next_run
+            job.last_duration = 35
+            self.scheduler._schedule_next(job, start + 35)
+            self.assertEqual(job.next_run, start + next_offset, policy)
+            self.assertEqual(job.overruns, 1)
+    
+    def test_stop_interrupts_wait(self):
+        """Test the scheduler runs due jobs and stops without waiting out the interval"""
+        func = Mock(side_effect=lambda: self.scheduler.stop())
+        self.scheduler.add_job("status", 3600, func)
+        
+        start = time.monotonic()
+        self.scheduler.run()
+        
+        self.assertLess(time.monotonic() - start, 5)
+        func.assert_called_once()
+        self.assertEqual(self.scheduler.metrics()['status']['runs'], 1)
+    
+    def test_metrics_run_while_feed_jobs_block(self):
+        """Test a metrics job still runs while every feed job is stuck"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.scheduler.add_job("station_information", 3600, release.wait)
+        self.scheduler.add_job("station_status", 3600, release.wait)
+        metrics = Mock(side_effect=lambda: self.scheduler.stop())
+        self.scheduler.add_job("scheduler_metrics", 3600, metrics, delay=0.2)
+        
+        thread = threading.Thread(target=self.scheduler.run, daemon=True)
+        thread.start()
+        self.assertTrue(self.scheduler.stop_event.wait(5))
+        metrics.assert_called_once()
+        release.set()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+class TestStationKeys(unittest.TestCase):
+    """Test station-keyed publishing and compacted topic bootstrap"""
+    
+    def test_record_key(self):
+        """Test records are keyed by id, prefixed with the system for multi-system feeds"""
+        station = {'station_id': 72, 'name': 'W 52 St & 11 Ave'}
+        
+        self.assertEqual(record_key(GbfsFeed("status", "url", "topic"), station), "72")
+        self.assertEqual(record_key(GbfsFeed("status", "url", "topic", system_id="bkn", tag_system=True), station), "bkn:72")
+        self.assertIsNone(record_key(GbfsFeed("status", "url", "topic", key_field=None), station))
+        self.assertIsNone(record_key(GbfsFeed("status", "url", "topic"), {'name': 'no id'}))
+    
+    @patch('src.streaming.kafka_consumer.compacted_reader.KafkaConsumer')
+    def test_read_latest_applies_tombstones(self, mock_kafka_consumer):
+        """Test the compacted reader keeps the last value per key and drops tombstoned keys"""
+        partition = ("bikes-station-information", 0)
+        consumer = mock_kafka_consumer.return_value
+        consumer.partitions_for_topic.return_value = {0}
+        consumer.end_offsets.return_value = {partition: 3}
+        consumer.position.side_effect = [0, 3]
+        consumer.poll.return_value = {partition: [
+            Mock(key="72", value={'name': 'old'}),
+            Mock(key="79", value={'name': 'removed'}),
+            Mock(key="72", value={'name': 'new'}),
+            Mock(key="79", value=None)
+        ]}
+        
+        with patch('src.streaming.kafka_consumer.compacted_reader.TopicPartition', side_effect=lambda topic, p: (topic, p)):
+            catalog = CompactedTopicReader().load_station_catalog(timeout_ms=1000)
+        
+        self.assertEqual(catalog, {"72": {'name': 'new'}})
+        consumer.close.assert_called_once()
+    
+    @patch('src.streaming.kafka_admin.topic_admin.KafkaAdminClient')
+    def test_compaction_applied_only_when_missing(self, mock_admin_client):
+        """Test an existing topic is altered only when its config differs from the compaction settings"""
+        admin = mock_admin_client.return_value
+        admin.list_topics.return_value = [BIKES_STATION_INFORMATION_TOPIC]
+        entries = [(name, value, False, False, False) for name, value in COMPACTED_TOPIC_CONFIG.items()]
+        admin.describe_configs.return_value = [Mock(resources=[(0, None, 2, BIKES_STATION_INFORMATION_TOPIC, entries)])]
+        
+        topic_admin = TopicAdmin()
+        self.assertEqual(topic_admin.ensure_topic(BIKES_STATION_INFORMATION_TOPIC, compacted=True), 'exists')
+        admin.alter_configs.assert_not_called()
+        
+        entries[0] = ('cleanup.policy', 'delete', False, True, False)
+        self.assertEqual(topic_admin.ensure_topic(BIKES_STATION_INFORMATION_TOPIC, compacted=True), 'updated')
+        admin.alter_configs.assert_called_once()
+
+class TestStationStateStore(unittest.TestCase):
+    """Test the materialized station state table"""
+    
+    def setUp(self):
+        self.store = StationStateStore()
+        self.store.upsert_information("72", {'station_id': "72", 'name': 'W 52 St & 11 Ave', 'lat': 40.767, 'lon': -73.993, 'capacity': 55})
+        self.store.upsert_status("72", {'station_id': "72", 'num_bikes_available': 10, 'num_docks_available': 45, 'is_renting': True})
+    
+    def test_status_joined_with_information(self):
+        """Test lookups return the latest status joined with the station information"""
+        self.store.upsert_status("72", {'station_id': "72", 'num_bikes_available': 7, 'num_docks_available': 48, 'is_renting': True})
+        
+        state = self.store.get("72")
+        self.assertEqual(state['name'], 'W 52 St & 11 Ave')
+        self.assertEqual(state['num_bikes_available'], 7)
+        self.assertEqual(state['is_renting'], 1)
+        self.assertNotIn('num_ebikes_available', state)
+        self.assertEqual(self.store.value("72", 'capacity'), 55)
+        self.assertIsNone(self.store.get("79"))
+        self.assertEqual(len(self.store), 1)
+    
+    def test_tombstone_removes_status_only(self):
+        """Test removing a station's status keeps its information"""
+        self.store.remove("72", information=False)
+        
+        self.assertIsNone(self.store.value("72", 'num_bikes_available'))
+        self.assertEqual(self.store.get("72")['name'], 'W 52 St & 11 Ave')
+        self.assertIn("72", self.store)
+    
+    def test_checkpoint_round_trip(self):
+        """Test a checkpoint restores the table and the offsets it reflects"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'station_state.ckpt')
+            self.store.save_checkpoint(path, {('bikes-station-status', 0): 42})
+            
+            restored = StationStateStore()
+            offsets = restored.load_checkpoint(path)
+        
+        self.assertEqual(offsets, {('bikes-station-status', 0): 42})
+        self.assertEqual(restored.get("72"), self.store.get("72"))
+        self.assertEqual(len(restored), 1)
+    
+    def test_keys_while_a_station_is_added(self):
+        """Test listing keys while another thread appends a new row does not index past a column"""
+        store = self.store
+        listed = []
+        
+        class ListingColumn(list):
+            def append(self, value):
+                listed.append(store.keys())
+                super().append(value)
+        
+        column = next(iter(store._texts))
+        store._texts[column] = ListingColumn(store._texts[column])
+        store.upsert_status("79", {'station_id': "79", 'num_bikes_available': 3, 'num_docks_available': 12})
+        self.assertEqual(listed, [["72"]])
+        self.assertEqual(store.keys(), ["72", "79"])
+    
+    @patch('src.streaming.state_store.materializer.Consumer')
+    def test_materializer_failure_reaches_the_caller(self, mock_consumer):
+        """Test a consumer error ending the materializer thread is raised from join() instead of looking like a stop"""
+        mock_consumer.return_value.poll_batches.side_effect = RuntimeError("broker gone")
+        with tempfile.TemporaryDirectory() as directory:
+            materializer = StationStateMaterializer(self.store, checkpoint_path=os.path.join(directory, 'state.ckpt'))
+            materializer.start()
+            
+            with self.assertRaisesRegex(RuntimeError, "broker gone"):
+                while materializer.join(5):
+                    pass
+            materializer.stop()
+        mock_consumer.return_value.close.assert_called_once()
+
+class TestStationSpatialIndex(unittest.TestCase):
+    """Test nearest and bounding-box station queries joined with live availability"""
+    
+    STATIONS = {
+        "72": (40.7673, -73.9939, 0),
+        "79": (40.7191, -74.0067, 4),
+        "82": (40.7114, -74.0003, 2),
+        "83": (40.6836, -73.9763, 0),
+        "116": (40.7415, -74.0016, 9)
+    }
+    
+    def setUp(self):
+        self.store = StationStateStore()
+        for key, (lat, lon, bikes) in self.STATIONS.items():
+            self.store.upsert_information(key, {'station_id': key, 'lat': lat, 'lon': lon, 'capacity': 20})
+            self.store.upsert_status(key, {'station_id': key, 'num_bikes_available': bikes,
+                                           'num_docks_available': 20 - bikes, 'is_renting': 1, 'is_returning': 1})
+        self.index = StationSpatialIndex(self.store)
+        self.index.rebuild()
+    
+    def test_nearest_and_within_follow_status(self):
+        """Test queries rank by distance and filter on the latest status"""
+        nearest = self.index.nearest(40.7180, -74.0040, k=3)
+        self.assertEqual([station['station_key'] for station in nearest], ["79", "82", "116"])
+        self.assertLess(nearest[0]['distance_m'], nearest[1]['distance_m'])
+        self.assertEqual(nearest[0]['num_bikes_available'], 4)
+        
+        self.assertEqual([station['station_key'] for station in self.index.nearest(40.7673, -73.9939, k=2, min_bikes=1)],
+                         ["116", "79"])
+        self.store.upsert_status("72", {'station_id': "72", 'num_bikes_available': 3, 'num_docks_available': 17,
+                                        'is_renting': 1, 'is_returning': 1})
+        self.assertEqual(self.index.nearest(40.7673, -73.9939, k=1, min_bikes=1)[0]['station_key'], "72")
+        self.assertEqual(self.index.nearest(40.7673, -73.9939, k=5, max_distance_m=1000)[0]['station_key'], "72")
+        self.assertEqual(len(self.index.nearest(40.7673, -73.9939, k=5, max_distance_m=1000)), 1)
+        
+        within = self.index.within(40.70, -74.01, 40.75, -73.99)
+        self.assertEqual({station['station_key'] for station in within}, {"79", "82", "116"})
+        self.assertEqual({station['station_key'] for station in self.index.within(40.70, -74.01, 40.75, -73.99, min_bikes=3)},
+                         {"79", "116"})
+        self.assertEqual(self.index.within(40.80, -74.01, 40.90, -73.99), [])
+    
+    def test_materializer_moves_and_removes_stations(self):
+        """Test station information updates and tombstones keep the index current"""
+        materializer = StationStateMaterializer(self.store, spatial_index=self.index)
+        information = TopicPartition(BIKES_STATION_INFORMATION_TOPIC, 0)
+        materializer.apply({information: [
+            ConsumerRecord(information.topic, 0, 0, 0, 0, "83", {'station_id': "83", 'lat': 40.7180, 'lon': -74.0041},
+                           [], None, 2, 10, -1),
+            ConsumerRecord(information.topic, 0, 1, 0, 0, "79", None, [], None, 2, 0, -1),
+            ConsumerRecord(information.topic, 0, 2, 0, 0, "90", {'station_id': "90", 'lat': 40.7181, 'lon': -74.0040},
+                           [], None, 2, 10, -1)
+        ]})
+        
+        self.assertEqual([station['station_key'] for station in self.index.nearest(40.7180, -74.0040, k=3)],
+                         ["83", "90", "82"])
+        self.assertNotIn('num_bikes_available', self.index.nearest(40.7181, -74.0040, k=1)[0])
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.within(40.6830, -73.9770, 40.6840, -73.9760), [])
+    
+    def test_queries_during_rebuild_see_the_old_grid(self):
+        """Test a query issued while the index is rebuilt answers from the complete previous grid"""
+        keys = self.store.keys()
+        seen = []
+        
+        def keys_queried_midway():
+            for position, key in enumerate(keys):
+                if position == 2:
+                    seen.append(len(self.index.within(40.6, -74.1, 40.8, -73.9)))
+                yield key
+        
+        with patch.object(self.store, 'keys', side_effect=keys_queried_midway):
+            self.index.rebuild()
+        self.assertEqual(seen, [5])
+        self.assertEqual(self.index.stats()['stations'], 5)
+
+class TestParquetSink(unittest.TestCase):
+    """Test the Parquet data lake sink"""
+    
+    # 2024-05-01 13:00 UTC in milliseconds
+    HOUR_MS = 1714568400000
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.status = TopicPartition(BIKES_STATION_STATUS_TOPIC, 0)
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def records(self, tp, first_offset, timestamps):
+        return [
+            ConsumerRecord(tp.topic, tp.partition, first_offset + index, timestamp, 0, str(index),
+                           {'station_id': str(index), 'num_bikes_available': index, 'is_renting': 1,
+                            'last_reported': timestamp // 1000, 'vehicle_types_available': [{'vehicle_type_id': '1', 'count': index}]},
+                           [], None, 1, 100, -1)
+            for index, timestamp in enumerate(timestamps)
+        ]
+    
+    def parquet_files(self):
+        return sorted(Path(self.directory.name).rglob("*.parquet"))
+    
+    def test_rollover_writes_partitioned_parquet(self):
+        """Test files roll over at max_file_records and are partitioned by feed, date and hour"""
+        sink = ParquetSink(self.directory.name, max_file_records=3)
+        sink.add({self.status: self.records(self.status, 0, [self.HOUR_MS] * 5 + [self.HOUR_MS + 3600 * 1000])})
+        self.assertEqual(len(self.parquet_files()), 1)
+        self.assertEqual(sink.stats()['records_buffered'], 3)
+        
+        sink.flush()
+        files = self.parquet_files()
+        self.assertEqual(len(files), 3)
+        self.assertEqual(sorted({file.parent.relative_to(self.directory.name).as_posix() for file in files}),
+                         ["feed=station_status/dt=2024-05-01/hour=13", "feed=station_status/dt=2024-05-01/hour=14"])
+        
+        table = max((pq.read_table(file) for file in files), key=len)
+        self.assertEqual(table.schema, PARQUET_TABLES[BIKES_STATION_STATUS_TOPIC].schema)
+        row = table.to_pylist()[1]
+        self.assertEqual(row['num_bikes_available'], 1)
+        self.assertIs(row['is_renting'], True)
+        self.assertEqual(row['vehicle_types_available'], [{'vehicle_type_id': '1', 'count': 1}])
+        self.assertEqual(row['last_reported'].isoformat(), "2024-05-01T13:00:00")
+        self.assertEqual(sink.stats()['records_written'], 6)
+    
+    def test_commits_only_written_offsets(self):
+        """Test offsets of records still buffered are not committed"""
+        sink = ParquetSink(self.directory.name)
+        sink.consumer = Mock()
+        information = TopicPartition(BIKES_STATION_INFORMATION_TOPIC, 0)
+        sink.add({self.status: self.records(self.status, 10, [self.HOUR_MS] * 4)})
+        sink.flush()
+        sink.add({self.status: self.records(self.status, 14, [self.HOUR_MS] * 2),
+                  information: [ConsumerRecord(information.topic, 0, 7, self.HOUR_MS, 0, "72", None, [], None, 2, -1, -1)]})
+        
+        sink.commit()
+        self.assertEqual(sink.consumer.commit_offsets.call_args_list[0].args[0], {self.status: 14})
+        self.assertEqual(sink.consumer.commit_offsets.call_args_list[1].args[0], {information: 8})
+        
+        sink.flush()
+        self.assertEqual(sink.consumer.commit_offsets.call_args.args[0], {self.status: 16})
+        self.assertEqual(len(self.parquet_files()), 2)
+    
+    @mock_aws
+    def test_s3_output_and_glue_tables(self):
+        """Test files are uploaded to S3 and Glue tables are typed and partitioned"""
+        s3_client = boto3.client('s3', region_name='us-east-1')
+        s3_client.create_bucket(Bucket='citibikes-test')
+        sink = ParquetSink(storage=S3Storage('citibikes-test', 'datalake', s3_client=s3_client))
+        sink.add({self.status: self.records(self.status, 0, [self.HOUR_MS] * 2)})
+        sink.flush()
+        
+        keys = [item['Key'] for item in s3_client.list_objects_v2(Bucket='citibikes-test')['Contents']]
+        self.assertEqual(len(keys), 1)
+        self.assertTrue(keys[0].startswith("datalake/feed=station_status/dt=2024-05-01/hour=13/part-"))
+        
+        glue_client = boto3.client('glue', region_name='us-east-1')
+        self.assertTrue(create_parquet_tables(glue_client, "s3://citibikes-test/datalake", "citibikes_test"))
+        self.assertTrue(create_parquet_tables(glue_client, "s3://citibikes-test/datalake", "citibikes_test"))
+        table = glue_client.get_table(DatabaseName="citibikes_test", Name="station_status")['Table']
+        columns = {column['Name']: column['Type'] for column in table['StorageDescriptor']['Columns']}
+        self.assertEqual(columns['num_bikes_available'], 'int')
+        self.assertEqual(columns['last_reported'], 'timestamp')
+        self.assertEqual([key['Name'] for key in table['PartitionKeys']], ['dt', 'hour'])
+        self.assertEqual(table['StorageDescriptor']['Location'], "s3://citibikes-test/datalake/feed=station_status/")
+    
+    @patch('src.streaming.sinks.parquet_sink.Consumer')
+    def test_write_failure_reaches_the_caller(self, mock_consumer):
+        """Test a storage error ending the sink thread is raised from join() instead of looking like a stop"""
+        mock_consumer.return_value.poll_batches.return_value = {self.status: self.records(self.status, 0, [self.HOUR_MS])}
+        storage = Mock(put=Mock(side_effect=OSError("disk full")))
+        sink = ParquetSink(storage=storage, max_file_records=1)
+        sink.start()
+        
+        with self.assertRaisesRegex(OSError, "disk full"):
+            while sink.join(5):
+                pass
+        sink.stop()
+        storage.put.assert_called_once()
+        mock_consumer.return_value.close.assert_called_once()
+
+class TestStationRollups(unittest.TestCase):
+    """Test windowed station and region rollups"""
+    
+    # 2024-05-01 13:00 UTC in milliseconds
+    START = 1714568400000
+    
+    def setUp(self):
+        self.aggregator = StationRollupAggregator([WindowSpec("1m", 60, 60), WindowSpec("3m/1m", 180, 60)])
+    
+    def rollups(self, watermark, window=None):
+        return {(rollup['entity'], rollup['entity_id'], rollup['window_name'], (rollup['window_start'] - self.START) // 1000): rollup
+                for rollup in self.aggregator.advance(watermark) if window in (None, rollup['window_name'])}
+    
+    def test_tumbling_and_sliding_windows(self):
+        """Test time-weighted stats per tumbling window and sliding windows merged from panes"""
+        self.aggregator.observe_status("72", self.START, 5, 10)
+        self.aggregator.observe_status("72", self.START + 30000, 0, 15)
+        self.aggregator.observe_status("72", self.START + 90000, 2, 0)
+        self.assertEqual(self.aggregator.advance(self.START + 59000), [])
         
-        producer_start = time.time()
-        for message in test_messages:
-            producer.data_producer("test-topic", message)
-        producer_time = time.time() - producer_start
+        rollups = self.rollups(self.START + 180000)
+        first = rollups[('station', "72", "1m", 0)]
+        self.assertEqual((first['min_bikes'], first['max_bikes'], first['avg_bikes']), (0, 5, 2.5))
+        self.assertEqual((first['empty_seconds'], first['turnover'], first['observations']), (30.0, 5, 2))
+        second = rollups[('station', "72", "1m", 60)]
+        self.assertEqual((second['avg_bikes'], second['full_seconds'], second['turnover']), (1.0, 30.0, 2))
+        # The station keeps its last counts while nothing changes
+        self.assertEqual(rollups[('station', "72", "1m", 120)]['avg_bikes'], 2.0)
         
-        logger.info(f"Producer performance: {len(test_messages)} messages in {producer_time:.2f}s")
-        logger.info(f"   Rate: {len(test_messages)/producer_time:.1f} messages/second")
+        sliding = rollups[('station', "72", "3m/1m", 0)]
+        self.assertAlmostEqual(sliding['avg_bikes'], (5 * 30 + 2 * 90) / 180)
+        self.assertEqual((sliding['min_bikes'], sliding['max_bikes'], sliding['turnover']), (0, 5, 7))
+        self.assertEqual((sliding['empty_seconds'], sliding['full_seconds'], sliding['covered_seconds']), (60.0, 90.0, 180.0))
+        self.assertEqual(len([key for key in rollups if key[2] == "3m/1m"]), 3)
+    
+    def test_region_totals_and_late_records(self):
+        """Test regions sum their stations and records for closed panes count from the first open one"""
+        self.aggregator.set_region("72", "71", self.START)
+        self.aggregator.observe_status("72", self.START, 5, 10)
+        self.aggregator.observe_status("79", self.START, 3, 0)
+        self.aggregator.set_region("79", "71", self.START + 30000)
+        region = self.rollups(self.START + 60000, "1m")[('region', "71", "1m", 0)]
+        self.assertEqual((region['min_bikes'], region['max_bikes'], region['avg_bikes']), (5, 8, 6.5))
+        
+        self.aggregator.observe_status("79", self.START + 10000, 1, 2)
+        self.assertEqual(self.aggregator.late_records, 1)
+        rollups = self.rollups(self.START + 120000, "1m")
+        self.assertEqual(rollups[('station', "79", "1m", 60)]['avg_bikes'], 1.0)
+        self.assertEqual(rollups[('region', "71", "1m", 60)]['avg_bikes'], 6.0)
+        self.assertEqual(rollups[('region', "71", "1m", 60)]['turnover'], 2)
+    
+    def test_stage_outputs(self):
+        """Test the stage reads both station topics and writes rollups to a topic or Parquet"""
+        status = TopicPartition(BIKES_STATION_STATUS_TOPIC, 0)
+        information = TopicPartition(BIKES_STATION_INFORMATION_TOPIC, 0)
+        producer = Mock()
+        stage = StationRollupStage(TopicRollupOutput(producer), windows=[WindowSpec("1m", 60, 60)], lateness_seconds=0)
+        stage.apply({
+            information: [ConsumerRecord(information.topic, 0, 0, self.START, 0, "72", {'station_id': "72", 'region_id': "71"},
+                                         [], None, 2, 10, -1)],
+            status: [ConsumerRecord(status.topic, 0, offset, self.START + offset * 1000, 0, "72",
+                                    {'station_id': "72", 'num_bikes_available': bikes, 'num_docks_available': 10},
+                                    [], None, 2, 10, -1) for offset, bikes in enumerate([4, 6, 5])]
+        })
+        self.assertEqual(stage.emit(stage.watermark(idle=False)), 0)
+        self.assertEqual(stage.emit(self.START + 60000), 2)
+        topic, rollups = producer.send_batch.call_args.args
+        self.assertEqual(topic, "bikes-station-rollups")
+        self.assertEqual(producer.send_batch.call_args.kwargs['key_func'](rollups[0]), "station:72")
+        self.assertEqual({rollup['entity'] for rollup in rollups}, {'station', 'region'})
+        
+        with tempfile.TemporaryDirectory() as directory:
+            ParquetRollupOutput(directory).write(rollups)
+            files = list(Path(directory).rglob("*.parquet"))
+            self.assertEqual([file.parent.relative_to(directory).as_posix() for file in files],
+                             ["feed=station_rollups/dt=2024-05-01/hour=13"])
+            table = pq.read_table(files[0])
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.column('turnover').to_pylist(), [3, 3])
+    
+    def test_rollups_partitioned_alike_by_both_outputs(self):
+        """Test Parquet rollups and rollups the sink reads from the topic land in the partition of their window"""
+        self.aggregator.observe_status("72", self.START + 59 * 60000, 5, 10)
+        rollups = self.aggregator.advance(self.START + 3600 * 1000)
+        self.assertEqual([rollup['window_end'] for rollup in rollups if rollup['window_name'] == "1m"][-1],
+                         self.START + 3600 * 1000)
+        rollups_tp = TopicPartition(BIKES_STATION_ROLLUPS_TOPIC, 0)
+        # Emitted during a replay, days after the windows
+        emitted_at = self.START + 3 * 24 * 3600 * 1000
         
-        # Test HTTP service performance
-        http_service = HttpService()
+        partitions = []
+        for write in ('output', 'sink'):
+            with tempfile.TemporaryDirectory() as directory:
+                if write == 'output':
+                    ParquetRollupOutput(directory).write(rollups)
+                else:
+                    sink = ParquetSink(directory, topics=[BIKES_STATION_ROLLUPS_TOPIC])
+                    sink.add({rollups_tp: [ConsumerRecord(rollups_tp.topic, 0, offset, emitted_at, 0, "station:72", rollup,
+                                                          [], None, 10, 100, -1) for offset, rollup in enumerate(rollups)]})
+                    sink.flush()
+                partitions.append({file.parent.relative_to(directory).as_posix(): pq.read_table(file).num_rows
+                                   for file in Path(directory).rglob("*.parquet")})
+        self.assertEqual(partitions[0], {"feed=station_rollups/dt=2024-05-01/hour=13": len(rollups)})
+        self.assertEqual(partitions[1], partitions[0])
+    
+    def status_batch(self, status, bikes_counts):
+        """Status records from a few minutes ago, so closing windows on the wall clock stays cheap"""
+        start = (int(time.time()) // 60 - 5) * 60000
+        return {status: [ConsumerRecord(status.topic, 0, offset, start + offset * 1000, 0, "72",
+                                        {'station_id': "72", 'num_bikes_available': bikes, 'num_docks_available': 10},
+                                        [], None, 2, 10, -1) for offset, bikes in enumerate(bikes_counts)]}
+    
+    @patch('src.streaming.rollups.station_rollups.Consumer')
+    def test_empty_poll_mid_replay_keeps_event_time(self, mock_consumer):
+        """Test an empty poll closes windows on the wall clock only once the status partitions are caught up"""
+        status = TopicPartition(BIKES_STATION_STATUS_TOPIC, 0)
+        kafka_consumer = mock_consumer.return_value.consumer
+        kafka_consumer.assignment.return_value = {status, TopicPartition(BIKES_STATION_INFORMATION_TOPIC, 0)}
+        kafka_consumer.end_offsets.return_value = {status: 10}
+        # Three of ten records read at the first empty poll, all of them at the second
+        kafka_consumer.position.side_effect = [3, 10]
+        mock_consumer.return_value.poll_batches.side_effect = [self.status_batch(status, [4, 6, 5]), {}, {}]
+        output = Mock()
+        stage = StationRollupStage(output, windows=[WindowSpec("1m", 60, 60)], lateness_seconds=0)
+        output.write.side_effect = lambda rollups: stage.stop_event.set()
         
-        http_start = time.time()
-        for i in range(10):
+        stage.run(poll_timeout_ms=0)
+        output.write.assert_called_once()
+        self.assertEqual(kafka_consumer.position.call_count, 2)
+        kafka_consumer.end_offsets.assert_called_with([status])
+    
+    @patch('src.streaming.rollups.station_rollups.Consumer')
+    def test_stage_failure_reaches_the_caller(self, mock_consumer):
+        """Test an output error ending the stage thread is raised from join() instead of looking like a stop"""
+        status = TopicPartition(BIKES_STATION_STATUS_TOPIC, 0)
+        kafka_consumer = mock_consumer.return_value.consumer
+        kafka_consumer.assignment.return_value = {status}
+        kafka_consumer.end_offsets.return_value = {status: 3}
+        kafka_consumer.position.return_value = 3
+        mock_consumer.return_value.poll_batches.side_effect = [self.status_batch(status, [4, 6, 5]), {}]
+        stage = StationRollupStage(Mock(write=Mock(side_effect=OSError("broker down"))),
+                                   windows=[WindowSpec("1m", 60, 60)], lateness_seconds=0)
+        stage.start()
+        
+        with self.assertRaisesRegex(OSError, "broker down"):
+            while stage.join(5):
+                pass
+        stage.stop()
+        mock_consumer.return_value.close.assert_called_once()
+
+class TestLogShipper(unittest.TestCase):
+    """Test incremental log shipping to S3"""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.directory.name, "citibikes_pipeline.log")
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3_client = boto3.client('s3', region_name='us-east-1')
+        self.s3_client.create_bucket(Bucket='citibikes-logs')
+    
+    def tearDown(self):
+        self.mock.stop()
+        self.directory.cleanup()
+    
+    def shipper(self, **kwargs):
+        return LogShipper('citibikes-logs', state_path=os.path.join(self.directory.name, "state.json"),
+                          patterns=[os.path.join(self.directory.name, "*.log*")], s3_client=self.s3_client, **kwargs)
+    
+    def shipped(self):
+        """Decompressed content of every uploaded segment, in key order"""
+        contents = self.s3_client.list_objects_v2(Bucket='citibikes-logs').get('Contents', [])
+        return [
+            gzip.decompress(self.s3_client.get_object(Bucket='citibikes-logs', Key=item['Key'])['Body'].read())
+            for item in sorted(contents, key=lambda item: item['Key'])
+        ]
+    
+    def write(self, path, text):
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(text)
+    
+    def test_ships_only_new_complete_lines(self):
+        """Test each run uploads the lines added since the last one, never a partial line"""
+        self.write(self.log_path, "first line\nsecond line\npartial")
+        self.assertEqual(self.shipper().ship()['bytes_read'], 23)
+        self.assertEqual(self.shipped(), [b"first line\nsecond line\n"])
+        
+        self.write(self.log_path, " line\nthird line\n")
+        report = self.shipper().ship()
+        self.assertEqual(report['segments'], 1)
+        self.assertEqual(self.shipped()[1], b"partial line\nthird line\n")
+        
+        self.assertEqual(self.shipper().ship()['segments'], 0)
+    
+    def test_rotation_and_concurrent_segments(self):
+        """Test a rotated log continues from its offset and large tails are split at line ends"""
+        lines = "".join(f"line {index:04d}\n" for index in range(100))
+        self.write(self.log_path, lines[:500])
+        self.shipper().ship()
+        
+        self.write(self.log_path, lines[500:])
+        os.rename(self.log_path, self.log_path + ".1")
+        self.write(self.log_path, "after rotation\n")
+        report = self.shipper(segment_bytes=100, max_workers=4).ship()
+        
+        self.assertEqual(report['files'], 2)
+        self.assertGreater(report['segments'], 5)
+        segments = self.shipped()
+        self.assertTrue(all(segment.endswith(b"\n") for segment in segments))
+        self.assertEqual(b"".join(segment for segment in segments if segment.startswith(b"line")), lines.encode())
+        self.assertIn(b"after rotation\n", segments)
+    
+    def test_failed_segment_retried_without_duplicates(self):
+        """Test only a failed middle segment is uploaded again, under the date of its first line"""
+        lines = "".join(f"2024-05-01 12:00:{index % 60:02d},000 - pipeline - INFO - line {index:04d}\n" for index in range(40))
+        self.write(self.log_path, lines)
+        upload = self.s3_client.upload_fileobj
+        attempts = []
+        
+        def fail_second_segment(fileobj, bucket, key, **kwargs):
+            attempts.append(key)
+            if len(attempts) == 2:
+                raise OSError("connection reset")
+            return upload(fileobj, bucket, key, **kwargs)
+        
+        with patch.object(self.s3_client, 'upload_fileobj', side_effect=fail_second_segment):
+            report = self.shipper(segment_bytes=500, max_workers=1).ship()
+        self.assertEqual(report['failed_segments'], 1)
+        self.assertGreater(report['segments'], 2)
+        
+        retry = self.shipper(segment_bytes=500, max_workers=1).ship()
+        self.assertEqual((retry['segments'], retry['failed_segments']), (1, 0))
+        self.assertEqual(b"".join(self.shipped()), lines.encode())
+        keys = [item['Key'] for item in self.s3_client.list_objects_v2(Bucket='citibikes-logs')['Contents']]
+        self.assertIn(attempts[1], keys)
+        self.assertTrue(all("/dt=2024-05-01/" in key for key in keys))
+        self.assertEqual(self.shipper().ship()['segments'], 0)
+
+class TestAthenaQueryRunner(unittest.TestCase):
+    """Test the concurrent Athena query runner against a stubbed client"""
+    
+    COLUMNS = [{'Name': 'station_id', 'Type': 'varchar'}, {'Name': 'avg_bikes', 'Type': 'double'},
+               {'Name': 'day', 'Type': 'date'}]
+    
+    def setUp(self):
+        self.client = boto3.client('athena', region_name='us-east-1', aws_access_key_id='test',
+                                   aws_secret_access_key='test')
+        self.stubber = Stubber(self.client)
+        self.stubber.activate()
+        self.runner = AthenaQueryRunner('citibikes_test', 's3://results/', athena_client=self.client,
+                                        poll_interval=0, max_poll_interval=0)
+    
+    def tearDown(self):
+        self.stubber.deactivate()
+    
+    def stub_start(self, execution_id):
+        self.stubber.add_response('start_query_execution', {'QueryExecutionId': execution_id})
+    
+    def stub_states(self, **states):
+        self.stubber.add_response('batch_get_query_execution', {'QueryExecutions': [
+            {'QueryExecutionId': execution_id, 'Status': {'State': state},
+             'Statistics': {'DataScannedInBytes': 1024}}
+            for execution_id, state in states.items()
+        ], 'UnprocessedQueryExecutionIds': []})
+    
+    def stub_page(self, rows, next_token=None, columns=None):
+        response = {'ResultSet': {'Rows': [{'Data': [{'VarCharValue': value} if value is not None else {} for value in row]}
+                                           for row in rows],
+                                  'ResultSetMetadata': {'ColumnInfo': columns or self.COLUMNS}}}
+        if next_token:
+            response['NextToken'] = next_token
+        self.stubber.add_response('get_query_results', response)
+    
+    def test_concurrent_queries_and_typed_pages(self):
+        """Test queries run together and results stream as typed rows and Arrow batches"""
+        self.stub_start('q1')
+        self.stub_start('q2')
+        self.stub_states(q1='RUNNING', q2='SUCCEEDED')
+        self.stub_states(q1='SUCCEEDED')
+        self.stub_page([['station_id', 'avg_bikes', 'day'], ['72', '4.5', '2024-05-01']], next_token='page-2')
+        self.stub_page([['79', None, '2024-05-01']])
+        self.stub_page([['station_id', 'avg_bikes', 'day'], ['72', '4.5', '2024-05-01']])
+        
+        results = self.runner.run_queries({'emptiest': "SELECT 1", 'fullest': "SELECT 2"})
+        self.assertEqual(results['emptiest']['execution_id'], 'q1')
+        self.assertEqual(results['fullest']['state'], 'SUCCEEDED')
+        self.assertEqual(results['fullest']['data_scanned_bytes'], 1024)
+        
+        rows = list(self.runner.iter_rows('q1'))
+        self.assertEqual(rows, [{'station_id': '72', 'avg_bikes': 4.5, 'day': date(2024, 5, 1)},
+                                {'station_id': '79', 'avg_bikes': None, 'day': date(2024, 5, 1)}])
+        batch = next(self.runner.iter_arrow_batches('q2'))
+        self.assertEqual(batch.schema.field('avg_bikes').type, pa.float64())
+        self.assertEqual(batch.to_pylist(), [{'station_id': '72', 'avg_bikes': 4.5, 'day': date(2024, 5, 1)}])
+        self.stubber.assert_no_pending_responses()
+    
+    def test_cache_and_failures(self):
+        """Test a repeated query reuses the earlier execution and failures raise"""
+        self.stub_start('q1')
+        self.stub_states(q1='SUCCEEDED')
+        self.runner.run_queries({'count': "SELECT COUNT(*) FROM station_status"})
+        
+        # Formatting differences hit the cache; no further start_query_execution is stubbed
+        result = self.runner.run_queries({'count': "SELECT COUNT(*)\n  FROM station_status;"})['count']
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['execution_id'], 'q1')
+        
+        self.stub_start('q2')
+        self.stubber.add_response('batch_get_query_execution', {'QueryExecutions': [
+            {'QueryExecutionId': 'q2', 'Status': {'State': 'FAILED', 'StateChangeReason': "Table not found"}}
+        ]})
+        with self.assertRaises(AthenaQueryError):
+            self.runner.run("SELECT * FROM missing")
+        self.stubber.assert_no_pending_responses()
+    
+    def test_queries_on_current_date_always_run(self):
+        """Test a query whose result depends on the day is not served from the cache"""
+        sql = "SELECT station_id FROM station_status WHERE dt = CAST(current_date AS varchar)"
+        for execution_id in ('q1', 'q2'):
+            self.stub_start(execution_id)
+            self.stub_states(**{execution_id: 'SUCCEEDED'})
+            result = self.runner.run_queries({'today': sql})['today']
+            self.assertFalse(result['cached'])
+            self.assertEqual(result['execution_id'], execution_id)
+        self.stubber.assert_no_pending_responses()
+    
+    def test_unconvertible_arrow_values_are_null(self):
+        """Test values a typed Arrow column cannot hold become null instead of failing the batch"""
+        columns = [{'Name': 'station_id', 'Type': 'varchar'},
+                   {'Name': 'avg_bikes', 'Type': 'decimal', 'Precision': 10, 'Scale': 2},
+                   {'Name': 'docks', 'Type': 'integer'}]
+        self.stub_page([['station_id', 'avg_bikes', 'docks'], ['72', '4.50', '12'], ['79', 'NaN', 'n/a']],
+                       columns=columns)
+        batch = next(self.runner.iter_arrow_batches('q1'))
+        self.assertEqual(batch.to_pylist(), [{'station_id': '72', 'avg_bikes': Decimal('4.50'), 'docks': 12},
+                                             {'station_id': '79', 'avg_bikes': None, 'docks': None}])
+    
+    @patch('src.aws.query_athena.time')
+    def test_timeout_survives_failed_stop(self, mock_time):
+        """Test a failing stop_query_execution does not lose the results of the other queries"""
+        mock_time.time = time.time
+        mock_time.monotonic.side_effect = [0, 0, 100]
+        for execution_id in ('q1', 'q2', 'q3'):
+            self.stub_start(execution_id)
+        self.stub_states(q1='SUCCEEDED', q2='RUNNING', q3='RUNNING')
+        self.stubber.add_client_error('stop_query_execution', 'InternalServerException')
+        self.stubber.add_response('stop_query_execution', {}, {'QueryExecutionId': 'q3'})
+        
+        results = self.runner.run_queries({'done': "SELECT 1", 'slow': "SELECT 2", 'slower': "SELECT 3"}, timeout=10)
+        self.assertEqual(results['done']['state'], 'SUCCEEDED')
+        self.assertEqual((results['slow']['state'], results['slower']['state']), ('CANCELLED', 'CANCELLED'))
+        self.stubber.assert_no_pending_responses()
+
+class TestIntegration(unittest.TestCase):
+    """Integration tests for the complete pipeline"""
+    
+    def test_end_to_end_pipeline(self):
+        """Test stations fetched over HTTP are published and consumed back"""
+        with FakeGbfsServer(stations=20) as server, in_memory_kafka():
+            bikes = Bikes()
+            try:
+                result = bikes.get_bikes_station_information(server.feed("station_information").url)
+            finally:
+                bikes.close()
+            
+            consumer = Consumer("test-group")
             try:
-                response = http_service.get("https://httpbin.org/get")
-                logger.debug(f"HTTP request {i+1}: {response.status_code}")
-            except Exception as e:
-                logger.warning(f"HTTP request {i+1} failed: {e}")
-        http_time = time.time() - http_start
+                consumer.subscribe_to_topics([BIKES_STATION_INFORMATION_TOPIC])
+                messages = list(consumer.consume_messages(max_messages=20, timeout_ms=1000))
+            finally:
+                consumer.close()
         
-        logger.info(f"HTTP service performance: 10 requests in {http_time:.2f}s")
-        logger.info(f"   Rate: {10/http_time:.1f} requests/second")
+        # Verify results
+        self.assertEqual(result['records'], 20)
+        self.assertEqual(len(messages), 20)
+        self.assertEqual(sorted(message['key'] for message in messages),
+                         sorted(station['station_id'] for station in server.feeds.information))
+        self.assertEqual(messages[0]['value']['station_id'], messages[0]['key'])
+
+def run_performance_test():
+    """Run performance test for the pipeline against the fake GBFS server and in-memory broker"""
+    logger.info("Starting Performance Test")
+    
+    start_time = time.time()
+    
+    try:
+        for stations in (1000, 10000):
+            result = run_scenario(stations, change_rate=0.1, polls=3)
+            logger.info(
+                f"{result['name']}: poll p50 {result['poll_p50_ms']:.1f}ms "
+                f"(fetch {result['fetch_ms']:.1f}ms, parse {result['parse_ms']:.1f}ms, "
+                f"publish {result['publish_ms']:.1f}ms)"
+            )
+            logger.info(
+                f"   Rate: {result['publish_records_per_second']:.0f} records/second published, "
+                f"{result['consume_records_per_second']:.0f} records/second consumed"
+            )
         
         total_time = time.time() - start_time
         logger.info(f"Performance test completed in {total_time:.2f}s")
+        logger.info("For comparable results across commits run benchmarks/pipeline_benchmark.py")
         
     except Exception as e:
         logger.error(f"Performance test failed: {e}")
         raise
-    finally:
-        if 'producer' in locals():
-            producer.close()
-        if 'http_service' in locals():
-            http_service.close()
 
 def main():
     """Run all tests"""